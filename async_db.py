@@ -0,0 +1,252 @@
+# async_db.py
+"""
+Async Veri Erişim Katmanı - Flask sunucusu için await edilebilir Database
+
+SQLite çağrıları sabit boyutlu bir yürütücüde (thread havuzu) çalışır; her
+yürütücü thread'i kendine sabitlenmiş tek bir bağlantıyı yeniden kullanır.
+Böylece bu katmandan açılan bağlantı sayısı havuz boyutuyla sınırlıdır ve
+event loop SQLite G/Ç'si sırasında bloklanmaz. db.get_connection()'ı doğrudan
+çağıran yollar (NDJSON/SSE akış üreteçleri, kimlik doğrulama, fiyat önbelleği
+sembol listesi) havuz dışındadır ve kendi kısa ömürlü bağlantılarını açar.
+
+Sabit bağlantıda yalnızca en dıştaki blok commit eder; iç bloklardaki
+conn.commit() çağrıları etkisizdir, böylece _replace_tables gibi tek işlemlik
+yazmalar ya hep ya hiç kalır.
+
+Kullanım:
+    adb = AsyncDatabase(db, max_connections=4)
+    portfolio = await adb.get_portfolio(user_id)
+    await adb.replace_transactions(user_id, rows)
+    adb.close()
+"""
+
+import json
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import merge_engine
+
+# Havuz boyutu: SQLite tek yazıcılı, okumalar için birkaç bağlantı yeterli
+DEFAULT_MAX_CONNECTIONS = 4
+
+
+class AsyncDatabase:
+    """Database metotlarının await edilebilir karşılıkları"""
+
+    def __init__(self, db, max_connections=DEFAULT_MAX_CONNECTIONS):
+        self.db = db
+        self.max_connections = max_connections
+        self._connections = []
+        self._lock = threading.Lock()
+        # observer(saniye): her çağrının süresi (kuyruk bekleme dahil), metrikler için
+        self.observer = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_connections,
+            thread_name_prefix="db",
+            initializer=self._init_worker,
+        )
+
+    def _init_worker(self):
+        conn = self.db.pin_connection()
+        with self._lock:
+            self._connections.append(conn)
+
+    async def run(self, func, *args, **kwargs):
+        """Herhangi bir senkron Database çağrısını yürütücüde çalıştır"""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs)
+            )
+        finally:
+            if self.observer:
+                self.observer(time.perf_counter() - start)
+
+    def close(self):
+        """Yürütücüyü durdur ve sabit bağlantıları kapat"""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    # ========== OKUMALAR ==========
+
+    async def get_portfolio(self, user_id):
+        return await self.run(self.db.get_portfolio, user_id)
+
+    async def get_transactions(self, user_id):
+        return await self.run(self.db.get_transactions, user_id)
+
+    async def get_dividends(self, user_id):
+        return await self.run(self.db.get_dividends, user_id)
+
+    async def get_settings(self, user_id):
+        return await self.run(self.db.get_settings, user_id)
+
+    async def get_all(self, user_id):
+        """Tüm veriler - dört okuma havuzda paralel çalışır"""
+        portfolio, transactions, dividends, settings = await asyncio.gather(
+            self.get_portfolio(user_id),
+            self.get_transactions(user_id),
+            self.get_dividends(user_id),
+            self.get_settings(user_id),
+        )
+        return {
+            "portfolio": portfolio,
+            "transactions": transactions,
+            "dividends": dividends,
+            "settings": settings,
+        }
+
+    async def table_versions(self, user_id, tables):
+        return await self.run(self.db.changes.table_versions, user_id, tables)
+
+    async def events_since(self, user_id, since, limit):
+        return await self.run(self.db.ledger.events_since, user_id, since, limit)
+
+    async def get_positions(self, user_id, as_of=None):
+        return await self.run(self.db.get_positions, user_id, as_of)
+
+    # ========== SENKRON YAZMALAR ==========
+
+    async def replace_portfolio(self, user_id, items):
+        return await self.run(self._replace_portfolio, user_id, items)
+
+    async def replace_transactions(self, user_id, transactions):
+        return await self.run(self._replace_transactions, user_id, transactions)
+
+    async def replace_dividends(self, user_id, dividends):
+        return await self.run(self._replace_dividends, user_id, dividends)
+
+    async def sync_batch(self, user_id, tables, device_id=None):
+        """Tüm tabloları tek istekte ve tek işlemde değiştir"""
+        return await self.run(self._replace_tables, user_id, tables, device_id)
+
+    async def update_settings(self, user_id, settings):
+        return await self.run(self.db.update_settings, settings, user_id)
+
+    async def sync_delta(self, user_id, device_id, since, changes):
+        return await self.run(self.db.changes.sync_delta, user_id, device_id, since, changes)
+
+    async def changes_since(self, user_id, since, exclude_origin=None):
+        return await self.run(self.db.changes.changes_since, user_id, since,
+                              exclude_origin=exclude_origin)
+
+    def _replace_portfolio(self, user_id, items):
+        return self._replace_tables(user_id, {"portfolio": items})["portfolio"]
+
+    def _replace_transactions(self, user_id, transactions):
+        return self._replace_tables(user_id, {"transactions": transactions})["transactions"]
+
+    def _replace_dividends(self, user_id, dividends):
+        return self._replace_tables(user_id, {"dividends": dividends})["dividends"]
+
+    def _replace_tables(self, user_id, tables, device_id=None):
+        """
+        Verilen tabloları tek işlemde tam kopyayla değiştir
+
+        Portföy sembolle, işlem/temettü satırları uid ile eşleştirilir (değişmeyen
+        satırlar yerinde kalır); gönderilmeyenler silinir. Ayarlar yalnızca
+        eklenir/güncellenir. Bir tabloda hata olursa hiçbiri yazılmaz.
+
+        Değişen satırlar yerel yazma gibi saat alır: diğer cihazlara delta ile
+        giderken alan bazında birleştirmede eski saatlere yenilmezler.
+        """
+        counts = {}
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if device_id:
+                # Değişiklikler bu cihaza delta senkronunda geri gönderilmesin
+                self.db.changes.set_meta(cursor, "apply_origin", device_id)
+                self.db.changes.set_meta(cursor, merge_engine.STAMP_KEY, 1)
+            try:
+                if "portfolio" in tables:
+                    # Yalnızca portföy satırları değişir (işlem/temettüler korunur)
+                    counts["portfolio"] = self._replace_keyed_rows(
+                        cursor, user_id, "portfolios", "sembol",
+                        ("adet", "ort_maliyet", "guncel_fiyat"), tables["portfolio"])
+
+                if "transactions" in tables:
+                    counts["transactions"] = self._replace_keyed_rows(
+                        cursor, user_id, "transactions", "uid",
+                        ("sembol", "tip", "adet", "fiyat", "toplam", "komisyon", "tarih"),
+                        tables["transactions"])
+
+                if "dividends" in tables:
+                    counts["dividends"] = self._replace_keyed_rows(
+                        cursor, user_id, "dividends", "uid",
+                        ("sembol", "tutar", "adet", "hisse_basi_tutar", "tarih"),
+                        tables["dividends"])
+
+                if "settings" in tables:
+                    settings = tables["settings"]
+                    cursor.executemany('''
+                        INSERT INTO settings (user_id, setting_key, setting_value)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(user_id, setting_key) DO UPDATE SET
+                            setting_value = excluded.setting_value
+                        WHERE setting_value IS NOT excluded.setting_value
+                    ''', [(user_id, key, json.dumps(value)) for key, value in settings.items()])
+                    counts["settings"] = len(settings)
+            finally:
+                if device_id:
+                    cursor.execute("DELETE FROM sync_meta WHERE key IN ('apply_origin', ?)",
+                                   (merge_engine.STAMP_KEY,))
+
+            if "transactions" in tables or "dividends" in tables:
+                # Değişen işlemleri olay defterine yansıt (iptal + yeni olay)
+                self.db.ledger.reconcile(cursor, user_id)
+        return counts
+
+    def _replace_keyed_rows(self, cursor, user_id, table, key, columns, rows):
+        """
+        Anahtarlı satırları upsert et, gönderilmeyen anahtarları sil
+
+        Değişmeyen satırlara dokunulmaz (tetikleyici/değişiklik günlüğü oluşmaz).
+        Anahtarsız satırlar (eski istemcilerden uid'siz işlemler) içerikçe aynı
+        mevcut satırla eşleşirse korunur, eşleşmezse yeni satır olarak eklenir;
+        böylece her senkronda tüm satırlar silinip yeniden eklenmez.
+        """
+        def values(row):
+            return tuple(row.get(column, 0 if column == "komisyon" else None) for column in columns)
+
+        names = ", ".join(columns)
+        cursor.execute(f"SELECT {key}, {names} FROM {table} WHERE user_id = ?", (user_id,))
+        existing = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+        sent = {row[key] for row in rows if row.get(key)}
+
+        # Gönderilmeyen mevcut satırlar içerik -> anahtar listesi
+        by_content = {}
+        for value, content in existing.items():
+            if value not in sent:
+                by_content.setdefault(content, []).append(value)
+        unkeyed = []
+        for row in rows:
+            if row.get(key):
+                continue
+            matches = by_content.get(values(row))
+            if matches:
+                sent.add(matches.pop())
+            else:
+                unkeyed.append(row)
+
+        cursor.executemany(f"DELETE FROM {table} WHERE user_id = ? AND {key} = ?",
+                           [(user_id, value) for value in existing.keys() - sent])
+
+        placeholders = ", ".join("?" * len(columns))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in columns)
+        changed = " OR ".join(f"{column} IS NOT excluded.{column}" for column in columns)
+
+        cursor.executemany(f'''
+            INSERT INTO {table} (user_id, {key}, {names}) VALUES (?, ?, {placeholders})
+            ON CONFLICT(user_id, {key}) DO UPDATE SET {updates} WHERE {changed}
+        ''', [(user_id, row[key], *values(row)) for row in rows if row.get(key)])
+
+        cursor.executemany(f"INSERT INTO {table} (user_id, {names}) VALUES (?, {placeholders})",
+                           [(user_id, *values(row)) for row in unkeyed])
+        return len(rows)
@@ -6,29 +6,67 @@ Kimlik doğrulama ve JWT Token servisleri
 import hashlib
 import jwt
 import secrets
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from database import Database
+from password_hasher import PasswordHasher, LoginThrottle
+
+# Doğrulanmış token önbelleği (LRU) boyutu
+TOKEN_CACHE_SIZE = 10000
+# Kullanıcı kaydı önbelleği süresi (saniye)
+USER_CACHE_TTL = 60
+
+# sessions tablosunda kullanıcı bazlı iptal satırlarının token öneki
+# (bu andan önce verilmiş tüm token'lar geçersiz)
+USER_REVOKE_PREFIX = "user:"
+
+
+def _token_digest(token: str) -> str:
+    """İptal listesinde ham token yerine özeti saklanır"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _utc_timestamp(value: datetime) -> float:
+    """Saat dilimsiz UTC datetime -> epoch saniyesi (JWT iat ile karşılaştırılır)"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
 
 class AuthService:
-    def __init__(self, db: Database, secret_key=None):
+    def __init__(self, db: Database, secret_key=None, token_cache_size=TOKEN_CACHE_SIZE,
+                 user_cache_ttl=USER_CACHE_TTL, hasher=None, throttle=None):
         self.db = db
+        # Varsayılan: aynı thread'de hash (masaüstü); sunucu süreç havuzlu hasher verir
+        self.hasher = hasher or PasswordHasher()
+        self.throttle = throttle or LoginThrottle()
         self.secret_key = secret_key or secrets.token_hex(32)
         self.algorithm = "HS256"
         self.token_expiry = 7  # 7 gün
+        
+        # token -> (user_id, exp, iat); isabette jwt.decode çalışmaz
+        self._token_cache = OrderedDict()
+        self._token_cache_size = token_cache_size
+        # user_id -> (kayıt, geçerlilik sonu)
+        self._user_cache = {}
+        self._user_cache_ttl = user_cache_ttl
+        self._lock = threading.Lock()
+        
+        # sessions tablosunun bellekteki kopyası: iptal edilen token özetleri
+        # ve kullanıcı bazlı iptal zamanları
+        self._revoked_tokens = set()
+        self._revoked_before = {}
+        self._load_revocations()
     
     def hash_password(self, password: str) -> str:
-        """Şifreyi hash'le (PBKDF2)"""
-        salt = secrets.token_hex(32)
-        pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-        return f"{salt}${pwd_hash.hex()}"
+        """Şifreyi hash'le (PBKDF2, iterasyon sayısı hash içinde saklanır)"""
+        return self.hasher.hash(password)
     
     def verify_password(self, password: str, password_hash: str) -> bool:
         """Şifreyi doğrula"""
         try:
-            salt, stored_hash = password_hash.split('$')
-            pwd_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-            return pwd_hash.hex() == stored_hash
-        except:
+            return self.hasher.verify(password, password_hash)
+        except (TypeError, AttributeError):
             return False
     
     def register_user(self, username: str, email: str, password: str) -> dict:
@@ -52,19 +90,34 @@ class AuthService:
         else:
             return {"success": False, "error": "Bu kullanıcı adı veya email zaten kullanılıyor"}
     
-    def login_user(self, username: str, password: str) -> dict:
-        """Kullanıcı girişi"""
+    def login_user(self, username: str, password: str, ip: str = None) -> dict:
+        """Kullanıcı girişi - hesap/IP başına hatalı deneme kısıtlaması"""
+        keys = (f"user:{username.lower()}", f"ip:{ip}" if ip else None)
+        retry_after = self.throttle.retry_after(*keys)
+        if retry_after > 0:
+            return {"success": False, "error": "Çok fazla hatalı deneme, daha sonra tekrar deneyin",
+                    "retry_after": int(retry_after) + 1}
+        
         user = self.db.get_user(username)
         
         if not user:
+            self.throttle.record_failure(*keys)
             return {"success": False, "error": "Kullanıcı adı veya şifre yanlış"}
         
         if not self.verify_password(password, user['password_hash']):
+            self.throttle.record_failure(*keys)
             return {"success": False, "error": "Kullanıcı adı veya şifre yanlış"}
         
         if not user['is_active']:
             return {"success": False, "error": "Hesap deaktif edilmiş"}
         
+        # IP sayacı sıfırlanmaz: tek geçerli hesap başka hesaplara denemeyi açmasın
+        self.throttle.record_success(keys[0])
+        
+        if self.hasher.needs_rehash(user['password_hash']):
+            # İş faktörü değişti: doğru şifreyle yeni hash'i sessizce yaz
+            self._store_password_hash(user['id'], self.hash_password(password), touch=False)
+        
         token = self.create_token(user['id'])
         return {
             "success": True,
@@ -74,6 +127,18 @@ class AuthService:
             "message": "Giriş başarılı"
         }
     
+    def _store_password_hash(self, user_id: int, password_hash: str, touch=True):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if touch:
+                cursor.execute('''
+                    UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP 
+                    WHERE id = ?
+                ''', (password_hash, user_id))
+            else:
+                cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (password_hash, user_id))
+        self.invalidate_user(user_id)
+    
     def create_token(self, user_id: int) -> str:
         """JWT token oluştur"""
         payload = {
@@ -85,18 +150,103 @@ class AuthService:
         return token
     
     def verify_token(self, token: str) -> dict:
-        """Token doğrula"""
+        """Token doğrula - önbellekteyse yalnızca sözlük araması"""
+        with self._lock:
+            cached = self._token_cache.get(token)
+            if cached is not None:
+                self._token_cache.move_to_end(token)
+        
+        if cached is not None:
+            user_id, exp, _ = cached
+            if exp > time.time():
+                return {"success": True, "user_id": user_id}
+            with self._lock:
+                self._token_cache.pop(token, None)
+            return {"success": False, "error": "Token süresi dolmuş"}
+        
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return {"success": True, "user_id": payload['user_id']}
         except jwt.ExpiredSignatureError:
             return {"success": False, "error": "Token süresi dolmuş"}
         except jwt.InvalidTokenError:
             return {"success": False, "error": "Geçersiz token"}
+        
+        user_id = payload['user_id']
+        iat = payload.get('iat', 0)
+        if self._is_revoked(token, user_id, iat):
+            return {"success": False, "error": "Token iptal edilmiş"}
+        
+        with self._lock:
+            self._token_cache[token] = (user_id, payload['exp'], iat)
+            if len(self._token_cache) > self._token_cache_size:
+                self._token_cache.popitem(last=False)
+        return {"success": True, "user_id": user_id}
+    
+    # ========== TOKEN İPTALİ ==========
+    
+    def _load_revocations(self):
+        """Süresi dolmamış iptalleri sessions tablosundan belleğe al"""
+        now = datetime.utcnow()
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM sessions WHERE expires_at <= ?", (now.isoformat(),))
+            cursor.execute("SELECT user_id, token, created_at FROM sessions")
+            for row in cursor.fetchall():
+                if row['token'].startswith(USER_REVOKE_PREFIX):
+                    cutoff = int(_utc_timestamp(datetime.fromisoformat(str(row['created_at']))))
+                    self._revoked_before[row['user_id']] = max(
+                        self._revoked_before.get(row['user_id'], 0), cutoff)
+                else:
+                    self._revoked_tokens.add(row['token'])
+    
+    def _is_revoked(self, token: str, user_id: int, iat: float) -> bool:
+        # iat tam saniyedir; iptal saniyesinde verilen (ör. şifre değişince
+        # alınan yeni) token geçerli kalır
+        cutoff = self._revoked_before.get(user_id)
+        if cutoff is not None and iat < cutoff:
+            return True
+        return bool(self._revoked_tokens) and _token_digest(token) in self._revoked_tokens
+    
+    def revoke_token(self, token: str) -> bool:
+        """Tek bir token'ı iptal et (çıkış)"""
+        try:
+            payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except jwt.InvalidTokenError:
+            return False
+        
+        digest = _token_digest(token)
+        expires_at = datetime.utcfromtimestamp(payload['exp'])
+        with self.db.get_connection() as conn:
+            conn.execute('''
+                INSERT OR IGNORE INTO sessions (user_id, token, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', (payload['user_id'], digest, datetime.utcnow().isoformat(), expires_at.isoformat()))
+        
+        with self._lock:
+            self._revoked_tokens.add(digest)
+            self._token_cache.pop(token, None)
+        return True
+    
+    def revoke_user_tokens(self, user_id: int):
+        """Kullanıcının şimdiye kadar aldığı tüm token'ları iptal et"""
+        now = datetime.utcnow()
+        # En uzun ömürlü token da bu süre sonunda dolar; satır sonra silinebilir
+        expires_at = now + timedelta(days=self.token_expiry)
+        with self.db.get_connection() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO sessions (user_id, token, created_at, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, f"{USER_REVOKE_PREFIX}{user_id}", now.isoformat(), expires_at.isoformat()))
+        
+        with self._lock:
+            self._revoked_before[user_id] = int(_utc_timestamp(now))
+            for token in [t for t, cached in self._token_cache.items() if cached[0] == user_id]:
+                del self._token_cache[token]
+        self.invalidate_user(user_id)
     
     def change_password(self, user_id: int, old_password: str, new_password: str) -> dict:
-        """Şifre değiştir"""
-        user = self.db.get_user(user_id)
+        """Şifre değiştir - mevcut token'lar iptal edilir"""
+        user = self._get_user_record(user_id)
         if not user:
             return {"success": False, "error": "Kullanıcı bulunamadı"}
         
@@ -106,26 +256,53 @@ class AuthService:
         if len(new_password) < 6:
             return {"success": False, "error": "Yeni şifre en az 6 karakter olmalı"}
         
-        new_hash = self.hash_password(new_password)
+        self._store_password_hash(user_id, self.hash_password(new_password))
+        
+        self.revoke_user_tokens(user_id)
+        return {"success": True, "message": "Şifre başarıyla değiştirildi"}
+    
+    def deactivate_user(self, user_id: int) -> dict:
+        """Hesabı deaktif et - mevcut token'lar iptal edilir"""
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                UPDATE users SET password_hash = ?, updated_at = CURRENT_TIMESTAMP 
+                UPDATE users SET is_active = 0, updated_at = CURRENT_TIMESTAMP 
                 WHERE id = ?
-            ''', (new_hash, user_id))
-            conn.commit()
+            ''', (user_id,))
+            if cursor.rowcount == 0:
+                return {"success": False, "error": "Kullanıcı bulunamadı"}
         
-        return {"success": True, "message": "Şifre başarıyla değiştirildi"}
+        self.revoke_user_tokens(user_id)
+        return {"success": True, "message": "Hesap deaktif edildi"}
     
-    def get_user_info(self, user_id: int) -> dict:
-        """Kullanıcı bilgisi getir"""
+    # ========== KULLANICI ÖNBELLEĞİ ==========
+    
+    def _get_user_record(self, user_id: int):
+        """Kullanıcı satırı (kısa süreli önbellekten)"""
+        now = time.monotonic()
+        cached = self._user_cache.get(user_id)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT id, username, email, created_at FROM users WHERE id = ?
+                SELECT id, username, email, password_hash, is_active, created_at 
+                FROM users WHERE id = ?
             ''', (user_id,))
-            user = cursor.fetchone()
-            
-            if user:
-                return dict(user)
+            row = cursor.fetchone()
+        
+        user = dict(row) if row else None
+        if user:
+            self._user_cache[user_id] = (user, now + self._user_cache_ttl)
+        return user
+    
+    def invalidate_user(self, user_id: int):
+        self._user_cache.pop(user_id, None)
+    
+    def get_user_info(self, user_id: int) -> dict:
+        """Kullanıcı bilgisi getir"""
+        user = self._get_user_record(user_id)
+        if user:
+            return {key: user[key] for key in ('id', 'username', 'email', 'created_at')}
         return None
@@ -0,0 +1,116 @@
+# benchmarks/cost_basis_benchmark.py
+
+"""
+Maliyet motoru karşılaştırması: satır satır döngü vs vektörel motor
+
+Kullanım:
+    python benchmarks/cost_basis_benchmark.py                # 10k, 100k, 1M
+    python benchmarks/cost_basis_benchmark.py --rows 50000 --symbols 200
+    python benchmarks/cost_basis_benchmark.py --loop-limit 100000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.cost_basis import compute_cost_basis, summarize
+
+
+def generate(rows, symbols, seed=42):
+    """Rastgele işlem defteri (satışlar küçük, ara sıra geçersiz satış olabilir)"""
+    rng = np.random.default_rng(seed)
+    names = np.array([f"HSE{i:04d}" for i in range(symbols)], dtype=object)
+    tips = rng.choice(np.array(["Alım", "Satış"], dtype=object), rows, p=[0.55, 0.45])
+    adet = np.where(tips == "Alım", rng.integers(50, 500, rows), rng.integers(1, 200, rows))
+    return (
+        rng.choice(names, rows),
+        tips,
+        adet.astype(np.float64),
+        rng.uniform(1, 250, rows),
+        np.where(rng.random(rows) < 0.5, 0.0, rng.uniform(0, 10, rows)),
+    )
+
+
+def presort(data):
+    """Veritabanının ORDER BY sembol, tarih ile döndürdüğü sıra"""
+    order = np.argsort(data[0], kind="stable")
+    return tuple(column[order] for column in data)
+
+
+def loop_cost_basis(symbols, tips, adet, fiyat, komisyon, commission_rate=0.0004):
+    """recalculate_portfolio_from_transactions'taki eski döngünün (print'siz) eşdeğeri"""
+    portfolio = {}
+    for symbol, tip, a, f, k in zip(symbols, tips, adet, fiyat, komisyon):
+        if symbol not in portfolio:
+            portfolio[symbol] = {"adet": 0, "toplam_maliyet": 0, "gerceklesen_kar": 0}
+        data = portfolio[symbol]
+        tutar = a * f
+        fee = k if k > 0 else tutar * commission_rate
+        if tip == "Alım":
+            data["adet"] += a
+            data["toplam_maliyet"] += tutar + fee
+        elif tip == "Satış":
+            if data["adet"] < a:
+                continue
+            satis_maliyeti = a * data["toplam_maliyet"] / data["adet"]
+            data["toplam_maliyet"] -= satis_maliyeti
+            data["adet"] -= a
+            data["gerceklesen_kar"] += tutar - fee - satis_maliyeti
+    return portfolio
+
+
+def run(rows, symbols, loop_limit):
+    data = generate(rows, symbols)
+
+    start = time.perf_counter()
+    summary = summarize(compute_cost_basis(*data))
+    vector_time = time.perf_counter() - start
+
+    sorted_data = presort(data)
+    start = time.perf_counter()
+    summarize(compute_cost_basis(*sorted_data, presorted=True))
+    presorted_time = time.perf_counter() - start
+
+    loop_time = None
+    max_diff = None
+    if rows <= loop_limit:
+        start = time.perf_counter()
+        expected = loop_cost_basis(*data)
+        loop_time = time.perf_counter() - start
+
+        max_diff = max(
+            abs(summary.loc[symbol, "toplam_maliyet"] - values["toplam_maliyet"])
+            + abs(summary.loc[symbol, "adet"] - values["adet"])
+            for symbol, values in expected.items()
+        )
+
+    return vector_time, presorted_time, loop_time, max_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maliyet motoru benchmark")
+    parser.add_argument("--rows", type=int, nargs="*", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--loop-limit", type=int, default=1_000_000,
+                        help="Bu satır sayısının üstünde eski döngü çalıştırılmaz")
+    args = parser.parse_args()
+
+    print(f"{'satır':>10} {'vektörel':>12} {'sıralı':>12} {'döngü':>12} {'hızlanma':>10} {'maks. fark':>12}")
+    print("-" * 74)
+    for rows in args.rows:
+        vector_time, presorted_time, loop_time, max_diff = run(rows, args.symbols, args.loop_limit)
+        if loop_time is None:
+            print(f"{rows:>10,} {vector_time * 1000:>10.1f}ms {presorted_time * 1000:>10.1f}ms "
+                  f"{'-':>12} {'-':>10} {'-':>12}")
+        else:
+            print(f"{rows:>10,} {vector_time * 1000:>10.1f}ms {presorted_time * 1000:>10.1f}ms "
+                  f"{loop_time * 1000:>10.1f}ms {loop_time / presorted_time:>9.1f}x {max_diff:>12.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/login_benchmark.py
+
+"""
+Giriş verimi: şifre doğrulama aynı thread'de vs süreç havuzunda
+
+Kullanım:
+    python benchmarks/login_benchmark.py                       # 200 giriş, 16 eşzamanlı
+    python benchmarks/login_benchmark.py --logins 500 --threads 32 --workers 4
+    python benchmarks/login_benchmark.py --iterations 100000 310000 600000
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from password_hasher import PasswordHasher
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def run(hasher, password_hash, logins, threads):
+    """Eşzamanlı doğrulama: (giriş/sn, p50 ms, p95 ms)"""
+    def login(_):
+        start = time.perf_counter()
+        assert hasher.verify("correct horse", password_hash)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    return logins / elapsed, percentile(latencies, 50) * 1000, percentile(latencies, 95) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Giriş verimi benchmark")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=16, help="Eşzamanlı istek thread'i")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Hash süreç sayısı")
+    parser.add_argument("--iterations", type=int, nargs="*", default=[310000])
+    args = parser.parse_args()
+
+    print(f"{args.logins} giriş, {args.threads} eşzamanlı, {args.workers} süreç")
+    print(f"{'iterasyon':>10} {'mod':<10} {'tek hash':>10} {'giriş/sn':>10} {'p50':>10} {'p95':>10}")
+    print("-" * 66)
+    for iterations in args.iterations:
+        inline = PasswordHasher(iterations=iterations)
+        pooled = PasswordHasher(iterations=iterations, max_workers=args.workers,
+                                max_pending=args.threads)
+        password_hash = inline.hash("correct horse")
+
+        start = time.perf_counter()
+        inline.verify("correct horse", password_hash)
+        single_ms = (time.perf_counter() - start) * 1000
+
+        # Havuz süreçlerini ısıt (ilk submit süreç başlatır)
+        pooled.verify("correct horse", password_hash)
+
+        for name, hasher in (("thread", inline), ("süreç", pooled)):
+            rate, p50, p95 = run(hasher, password_hash, args.logins, args.threads)
+            print(f"{iterations:>10,} {name:<10} {single_ms:>8.1f}ms {rate:>10.1f} {p50:>8.1f}ms {p95:>8.1f}ms")
+        pooled.close()
+
+
+if __name__ == "__main__":
+    main()
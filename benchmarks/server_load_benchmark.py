@@ -0,0 +1,250 @@
+# benchmarks/server_load_benchmark.py
+
+"""
+Bulut sunucusu yük testi: server.py geçici veritabanıyla localhost'ta başlatılır,
+N eşzamanlı kullanıcı kayıt olur, giriş yapar, portföy senkronlar ve veri çeker.
+
+Her kullanıcının akışı:
+    register -> login -> sync/batch (tam veri) -> tur başına:
+        pull/all (koşulsuz) -> pull/all (If-None-Match, 304 beklenir)
+        -> sync/delta (birkaç değişiklik) -> pull/transactions (sütunsal) -> auth/me
+
+Kullanım:
+    python benchmarks/server_load_benchmark.py                          # 20 kullanıcı, 5 tur
+    python benchmarks/server_load_benchmark.py --users 50 --rounds 10 --transactions 2000
+    python benchmarks/server_load_benchmark.py --iterations 100000 --hash-workers 4
+    python benchmarks/server_load_benchmark.py --url http://localhost:5000   # çalışan sunucu
+    python benchmarks/server_load_benchmark.py --rate-limit             # 429 davranışını gözle
+"""
+
+import os
+import sys
+import time
+import uuid
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from password_hasher import DEFAULT_ITERATIONS
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+# ========== SUNUCU ==========
+
+def start_server(workdir, port, iterations, hash_workers, rate_limit=False):
+    """server.py'yi alt süreçte başlat ve /api/health yanıt verene kadar bekle"""
+    # Tüm sanal kullanıcılar aynı IP'den gelir: istek sınırları varsayılan olarak kapalı
+    env = dict(os.environ,
+               DATABASE_FILE=os.path.join(workdir, "load_test.db"),
+               PORT=str(port), HOST="127.0.0.1", FLASK_DEBUG="0",
+               PASSWORD_ITERATIONS=str(iterations), HASH_WORKERS=str(hash_workers),
+               RATE_LIMIT="1" if rate_limit else "0",
+               QUOTE_WORKER="0", QUOTE_CACHE_FILE=os.path.join(workdir, "quote_cache.json"),
+               SECRET_KEY=uuid.uuid4().hex)
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py")],
+                               cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            log.close()
+            with open(log.name, encoding="utf-8", errors="replace") as f:
+                raise RuntimeError(f"Sunucu başlatılamadı:\n{f.read()[-2000:]}")
+        try:
+            if requests.get(f"{url}/api/health", timeout=1).status_code == 200:
+                return process, log, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+
+    process.terminate()
+    log.close()
+    raise RuntimeError("Sunucu 60 saniyede yanıt vermedi")
+
+
+def stop_server(process, log):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    log.close()
+
+
+# ========== VERİ ==========
+
+def generate_dataset(rng, transactions, dividends, symbols):
+    """Gerçekçi boyutta portföy: işlemler, temettüler, semboller ve ayarlar"""
+    names = [f"HSE{i:03d}" for i in range(symbols)]
+
+    def row_date():
+        return f"202{rng.randint(0, 5)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00"
+
+    trans = []
+    for _ in range(transactions):
+        adet, fiyat = rng.randint(1, 500), round(rng.uniform(1, 250), 2)
+        trans.append({"uid": uuid.uuid4().hex, "sembol": rng.choice(names),
+                      "tip": rng.choice(("Alım", "Alım", "Satış")), "adet": adet, "fiyat": fiyat,
+                      "toplam": round(adet * fiyat, 2), "komisyon": round(adet * fiyat * 0.0004, 2),
+                      "tarih": row_date()})
+
+    divs = [{"uid": uuid.uuid4().hex, "sembol": rng.choice(names), "tutar": round(rng.uniform(10, 5000), 2),
+             "adet": rng.randint(1, 500), "hisse_basi_tutar": round(rng.uniform(0.1, 10), 2),
+             "tarih": row_date()} for _ in range(dividends)]
+
+    portfolio = [{"sembol": name, "adet": rng.randint(1, 1000), "ort_maliyet": round(rng.uniform(1, 250), 2),
+                  "guncel_fiyat": round(rng.uniform(1, 250), 2)} for name in names]
+
+    return {"portfolio": portfolio, "transactions": trans, "dividends": divs,
+            "settings": {"tema": "koyu", "para_birimi": "TRY"}}
+
+
+# ========== İSTEMCİ ==========
+
+class Recorder:
+    """Uç nokta başına gecikme ve durum kodları (thread güvenli)"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def record(self, name, elapsed, status, ok):
+        with self._lock:
+            self.latencies[name].append(elapsed)
+            self.statuses[name][status] += 1
+            if not ok:
+                self.errors[name] += 1
+
+
+def simulate_user(index, url, args, recorder, password="yuk-testi-sifre"):
+    rng = random.Random(args.seed + index)
+    session = requests.Session()
+    username = f"load_{uuid.uuid4().hex[:10]}"
+
+    def call(name, method, path, expected=(200, 201), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, f"{url}{path}", timeout=args.timeout, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, "hata"
+        recorder.record(name, time.perf_counter() - start, status, status in expected)
+        return response if status in expected else None
+
+    response = call("auth/register", "POST", "/api/auth/register",
+                    json={"username": username, "email": f"{username}@example.com", "password": password})
+    if response is None:
+        return
+    response = call("auth/login", "POST", "/api/auth/login",
+                    json={"username": username, "password": password})
+    if response is None:
+        return
+    session.headers["Authorization"] = f"Bearer {response.json()['token']}"
+
+    data = generate_dataset(rng, args.transactions, args.dividends, args.symbols)
+    device_id = uuid.uuid4().hex
+    call("sync/batch", "POST", "/api/sync/batch", json={**data, "device_id": device_id})
+
+    cursor = 0
+    for _ in range(args.rounds):
+        response = call("pull/all", "GET", "/api/pull/all")
+        etag = response.headers.get("ETag") if response is not None else None
+        if etag:
+            call("pull/all (304)", "GET", "/api/pull/all", expected=(304,),
+                 headers={"If-None-Match": etag})
+
+        changes = []
+        for row in rng.sample(data["transactions"], min(args.changes, len(data["transactions"]))):
+            row["adet"] = rng.randint(1, 500)
+            changes.append({"table": "transactions", "key": row["uid"], "op": "upsert", "row": row})
+        response = call("sync/delta", "POST", "/api/sync/delta",
+                        json={"device_id": device_id, "since": cursor, "changes": changes})
+        if response is not None:
+            cursor = response.json().get("cursor", cursor)
+
+        call("pull/transactions", "GET", "/api/pull/transactions", params={"format": "columns"})
+        call("auth/me", "GET", "/api/auth/me")
+
+
+# ========== RAPOR ==========
+
+def report(recorder, elapsed, users):
+    total = sum(len(samples) for samples in recorder.latencies.values())
+    errors = sum(recorder.errors.values())
+    print(f"\n{users} kullanıcı, {total} istek, {elapsed:.1f}s -> {total / elapsed:.1f} istek/sn, "
+          f"hata oranı %{errors / max(total, 1) * 100:.2f}")
+    print(f"{'uç nokta':<20} {'istek':>7} {'istek/sn':>9} {'hata %':>7} {'p50':>9} {'p95':>9} {'p99':>9}  durumlar")
+    print("-" * 100)
+    for name, samples in recorder.latencies.items():
+        statuses = ", ".join(f"{status}:{count}" for status, count in sorted(
+            recorder.statuses[name].items(), key=lambda item: str(item[0])))
+        print(f"{name:<20} {len(samples):>7} {len(samples) / elapsed:>9.1f} "
+              f"{recorder.errors[name] / len(samples) * 100:>7.2f} "
+              f"{percentile(samples, 50) * 1000:>7.1f}ms {percentile(samples, 95) * 1000:>7.1f}ms "
+              f"{percentile(samples, 99) * 1000:>7.1f}ms  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulut sunucusu yük testi")
+    parser.add_argument("--users", type=int, default=20, help="Eşzamanlı kullanıcı")
+    parser.add_argument("--rounds", type=int, default=5, help="Kullanıcı başına senkron turu")
+    parser.add_argument("--transactions", type=int, default=500, help="Kullanıcı başına işlem")
+    parser.add_argument("--dividends", type=int, default=40)
+    parser.add_argument("--symbols", type=int, default=30)
+    parser.add_argument("--changes", type=int, default=5, help="Tur başına değişen işlem")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="PBKDF2 iterasyonu")
+    parser.add_argument("--hash-workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate-limit", action="store_true", help="Sunucunun istek sınırlarını açık bırak")
+    parser.add_argument("--url", help="Sunucu başlatmak yerine çalışan sunucuyu kullan")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hissetakip_load_")
+    server = None
+    if args.url:
+        url = args.url.rstrip("/")
+    else:
+        process, log, url = start_server(workdir, free_port(), args.iterations, args.hash_workers,
+                                         args.rate_limit)
+        server = (process, log)
+        print(f"Sunucu: {url} (veritabanı ve günlük: {workdir})")
+
+    try:
+        recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for future in [pool.submit(simulate_user, i, url, args, recorder) for i in range(args.users)]:
+                future.result()
+        report(recorder, time.perf_counter() - start, args.users)
+    finally:
+        if server:
+            stop_server(*server)
+
+
+if __name__ == "__main__":
+    main()
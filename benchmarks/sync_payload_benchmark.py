@@ -0,0 +1,94 @@
+# benchmarks/sync_payload_benchmark.py
+
+"""
+Senkron yükü karşılaştırması: JSON satırlar vs sütunsal, gzip/zstd, MessagePack
+
+Kullanım:
+    python benchmarks/sync_payload_benchmark.py                  # 1k, 10k, 100k işlem
+    python benchmarks/sync_payload_benchmark.py --rows 50000 --repeat 5
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_codec
+
+
+def generate(rows, symbols=300, seed=42):
+    """/api/pull/transactions yanıtındaki biçimde rastgele işlemler"""
+    rng = random.Random(seed)
+    names = [f"HSE{i:04d}" for i in range(symbols)]
+    return [
+        {
+            "id": i + 1,
+            "sembol": rng.choice(names),
+            "tip": rng.choice(("Alım", "Satış")),
+            "adet": rng.randint(1, 500),
+            "fiyat": round(rng.uniform(1, 250), 2),
+            "toplam": round(rng.uniform(10, 100_000), 2),
+            "komisyon": round(rng.uniform(0, 10), 2),
+            "tarih": f"202{rng.randint(0, 5)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+        for i in range(rows)
+    ]
+
+
+def measure(obj, content_type, encoding, repeat):
+    """(bayt, kodlama ms, çözme ms) - repeat tekrarın en iyisi"""
+    best_encode = best_decode = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body, used = sync_codec.encode(obj, content_type, encoding, min_size=0)
+        best_encode = min(best_encode, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        sync_codec.decode(body, content_type, used)
+        best_decode = min(best_decode, time.perf_counter() - start)
+    return len(body), best_encode * 1000, best_decode * 1000
+
+
+def variants():
+    types = [("json", sync_codec.JSON_TYPE)]
+    if sync_codec.msgpack:
+        types.append(("msgpack", sync_codec.MSGPACK_TYPE))
+    encodings = [None] + list(reversed(sync_codec.available_encodings()))
+    for type_name, content_type in types:
+        for layout in ("satır", "sütun"):
+            for encoding in encodings:
+                yield f"{type_name}/{layout}/{encoding or 'ham'}", content_type, layout, encoding
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Senkron yükü benchmark")
+    parser.add_argument("--rows", type=int, nargs="*", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if not sync_codec.msgpack:
+        print("(msgpack kurulu değil - MessagePack satırları atlandı)")
+    if not sync_codec.zstandard:
+        print("(zstandard kurulu değil - zstd satırları atlandı)")
+
+    for rows in args.rows:
+        data = generate(rows)
+        columns = sync_codec.to_columns(data)
+        baseline = None
+
+        print(f"\n{rows:,} işlem")
+        print(f"{'biçim':<24} {'boyut':>12} {'oran':>8} {'kodlama':>10} {'çözme':>10}")
+        print("-" * 68)
+        for name, content_type, layout, encoding in variants():
+            obj = data if layout == "satır" else columns
+            size, encode_ms, decode_ms = measure(obj, content_type, encoding, args.repeat)
+            baseline = baseline or size
+            print(f"{name:<24} {size / 1024:>10.1f}KB {baseline / size:>7.1f}x "
+                  f"{encode_ms:>8.1f}ms {decode_ms:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
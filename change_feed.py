@@ -0,0 +1,120 @@
+# change_feed.py
+"""
+Değişiklik Bildirimi - kullanıcı başına Server-Sent Events akışı
+
+Yazma uçları başarılı olunca notifier.publish(user_id) çağırır; o kullanıcının
+açık akışları uyanır ve sync_changes'te yeni seq varsa "change" olayı gönderir.
+Bildirim yalnızca uyandırıcıdır: akış her kalp atışında günlüğü de kontrol
+eder, böylece başka süreçlerden gelen yazmalar da en geç HEARTBEAT saniyede görülür.
+
+Olay biçimi (text/event-stream):
+    retry: 3000
+
+    event: change
+    id: 1234
+    data: {"seq": 1234}
+
+    : ping          (HEARTBEAT saniyede bir, bağlantıyı canlı tutar)
+
+İstemci (CloudSync.change_events) satırları iter_sse() ile çözer.
+"""
+
+import json
+import time
+import threading
+from collections import defaultdict
+
+EVENT_STREAM_TYPE = "text/event-stream"
+
+# Boşta bekleme süresi (yorum satırı gönderilir)
+HEARTBEAT = 15
+# Bir akışın en uzun ömrü; istemci yeniden bağlanır (sızıntı ve proxy zaman aşımı için)
+STREAM_MAX_AGE = 300
+# İstemcinin yeniden bağlanmadan önce beklemesi (ms)
+RETRY_MS = 3000
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class ChangeNotifier:
+    """Kullanıcı başına sürüm sayacı + bekleyenleri uyandıran koşul değişkeni"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = defaultdict(int)
+        self._conditions = {}
+
+    def _condition(self, user_id):
+        condition = self._conditions.get(user_id)
+        if condition is None:
+            condition = self._conditions.setdefault(user_id, threading.Condition(self._lock))
+        return condition
+
+    def version(self, user_id):
+        with self._lock:
+            return self._versions[user_id]
+
+    def publish(self, user_id):
+        with self._lock:
+            self._versions[user_id] += 1
+            condition = self._conditions.get(user_id)
+            if condition is not None:
+                condition.notify_all()
+
+    def wait(self, user_id, version, timeout):
+        """Sürüm değişene veya süre dolana kadar bekle; güncel sürümü döndür"""
+        with self._lock:
+            condition = self._condition(user_id)
+            condition.wait_for(lambda: self._versions[user_id] != version, timeout)
+            return self._versions[user_id]
+
+
+def change_stream(notifier, latest_seq, user_id, since, heartbeat=HEARTBEAT, max_age=STREAM_MAX_AGE):
+    """
+    SSE üreteci: since'ten büyük değişiklik olunca "change" olayı
+
+    latest_seq(user_id) -> int; istemcinin kendi değişikliklerini hariç tutmalı.
+    """
+    deadline = time.monotonic() + max_age
+    last = since
+    version = notifier.version(user_id)
+    yield f"retry: {RETRY_MS}\n\n".encode("utf-8")
+
+    while time.monotonic() < deadline:
+        latest = latest_seq(user_id)
+        if latest > last:
+            last = latest
+            yield sse_event("change", {"seq": latest}, latest)
+
+        new_version = notifier.wait(user_id, version, min(heartbeat, max(0.0, deadline - time.monotonic())))
+        if new_version == version:
+            yield b": ping\n\n"
+        version = new_version
+
+
+def iter_sse(lines):
+    """Metin satırlarından SSE olaylarını çöz: {"event", "id", "data"} (yorumlar ve verisiz bloklar atlanır)"""
+    event = {}
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                event.setdefault("event", "message")
+                event["data"] = "\n".join(data)
+                yield event
+            event, data = {}, []
+            continue
+        if line.startswith(":"):
+            continue
+        name, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if name == "data":
+            data.append(value)
+        elif name in ("event", "id", "retry"):
+            event[name] = value
@@ -13,12 +13,13 @@ class HeatmapChart:
         self.parent = parent
         self.theme = theme
     
-    def create_correlation_matrix(self, portfolio, period_days=90):
+    def create_correlation_matrix(self, portfolio, period_days=90, price_store=None):
         """
         Hisseler arası korelasyon matrisi
         
         portfolio: Portföy listesi
         period_days: Kaç günlük veri kullanılacak
+        price_store: Kapanışların okunacağı PriceStore (yoksa yfinance)
         """
         fig = Figure(figsize=(8, 7), dpi=90)
         ax = fig.add_subplot(111)
@@ -50,15 +51,22 @@ class HeatmapChart:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=period_days)
         
-        for symbol in symbols:
-            try:
-                ticker = yf.Ticker(f"{symbol}.IS")
-                hist = ticker.history(start=start_date, end=end_date)
-                
-                if not hist.empty:
-                    price_data[symbol] = hist['Close']
-            except Exception as e:
-                print(f"Korelasyon verisi alınamadı ({symbol}): {e}")
+        if price_store is not None:
+            # Yerel daily_prices tablosundan ortak gün eksenine hizalı matris
+            days, matrix = price_store.get_close_matrix(symbols, period_days)
+            for j, symbol in enumerate(symbols):
+                if np.count_nonzero(~np.isnan(matrix[:, j])) > 1:
+                    price_data[symbol] = pd.Series(matrix[:, j], index=days)
+        else:
+            for symbol in symbols:
+                try:
+                    ticker = yf.Ticker(f"{symbol}.IS")
+                    hist = ticker.history(start=start_date, end=end_date)
+                    
+                    if not hist.empty:
+                        price_data[symbol] = hist['Close']
+                except Exception as e:
+                    print(f"Korelasyon verisi alınamadı ({symbol}): {e}")
         
         if len(price_data) < 2:
             ax.text(0.5, 0.5, 'Yeterli veri alınamadı', 
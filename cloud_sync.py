@@ -5,9 +5,11 @@ Bulut Senkronizasyonu Modülü (Cloud Sync)
 
 import requests
 import json
-import threading
 from datetime import datetime
 from database import Database
+from sync_worker import SyncWorker, parse_retry_after
+import change_feed
+import sync_codec
 
 class CloudSync:
     def __init__(self, db: Database, cloud_url="http://localhost:5000"):
@@ -18,6 +20,15 @@ class CloudSync:
         self.token = None
         self.sync_interval = 300  # 5 dakika
         self.last_sync = None
+        # Sunucunun istek gövdesi için kabul ettiği kodlamalar (yanıttaki Accept-Encoding)
+        self.server_encodings = []
+        # Sunucu MessagePack yanıtı döndürdüyse istekler de MessagePack gönderilir
+        self.server_msgpack = False
+        # Uzun listeler sütunsal MessagePack ile çekilir (msgpack kuruluysa)
+        self.content_type = sync_codec.MSGPACK_TYPE if sync_codec.msgpack else sync_codec.JSON_TYPE
+        # data_type -> (ETag, son çekilen veri); 304 yanıtında veri buradan döner
+        self._pull_cache = {}
+        self.worker = None
     
     def set_credentials(self, user_id: int, token: str, cloud_url: str = None):
         """Bulut senkronizasyon kimlik bilgilerini ayarla"""
@@ -26,6 +37,10 @@ class CloudSync:
         if cloud_url:
             self.cloud_url = cloud_url
         self.enabled = True
+        self._pull_cache.clear()
+        if self.worker:
+            # Yeni token: kimlik hatası nedeniyle durmuş işçiyi hemen çalıştır
+            self.worker.sync_now()
         print(f"☁️ Bulut senkronizasyonu etkinleştirildi: {self.cloud_url}")
     
     def disable_sync(self):
@@ -33,6 +48,7 @@ class CloudSync:
         self.enabled = False
         self.user_id = None
         self.token = None
+        self._pull_cache.clear()
         print("❌ Bulut senkronizasyonu devre dışı bırakıldı")
     
     def get_headers(self):
@@ -42,69 +58,164 @@ class CloudSync:
             "Content-Type": "application/json"
         }
     
+    def _request(self, method, path, payload=None, params=None, timeout=10, extra_headers=None):
+        """Kodlanmış istek gönder: (HTTP durumu, çözülmüş gövde, yanıt başlıkları)"""
+        headers = self.get_headers()
+        headers.update(extra_headers or {})
+        headers["Accept"] = f"{self.content_type}, {sync_codec.JSON_TYPE};q=0.5"
+        
+        body = None
+        if payload is not None:
+            encoding = next((e for e in sync_codec.available_encodings() if e in self.server_encodings), None)
+            content_type = sync_codec.MSGPACK_TYPE if self.server_msgpack else sync_codec.JSON_TYPE
+            body, encoding = sync_codec.encode(payload, content_type, encoding)
+            headers["Content-Type"] = content_type
+            if encoding:
+                headers["Content-Encoding"] = encoding
+        
+        # requests yanıttaki gzip/zstd kodlamasını kendisi açar
+        response = requests.request(method, f"{self.cloud_url}{path}", data=body,
+                                    params=params, headers=headers, timeout=timeout)
+        
+        accepted = response.headers.get("Accept-Encoding")
+        if accepted:
+            self.server_encodings = [e.strip() for e in accepted.split(",")]
+        
+        if response.status_code not in (200, 201):
+            return response.status_code, None, response.headers
+        content_type = response.headers.get("Content-Type", sync_codec.JSON_TYPE)
+        self.server_msgpack = (self.content_type == sync_codec.MSGPACK_TYPE
+                               and content_type.startswith(sync_codec.MSGPACK_TYPE))
+        return response.status_code, sync_codec.loads(response.content, content_type), response.headers
+    
     def sync_all_data(self):
-        """Tüm verileri senkronize et"""
+        """Değişen verileri senkronize et (delta: gönder + çek tek istekte)"""
         if not self.enabled or not self.user_id or not self.token:
             return {"success": False, "error": "Senkronizasyon yapılandırılmamış"}
         
         try:
-            print("\n☁️ Bulut senkronizasyonu başlıyor...")
-            
-            # Portföy
-            portfolio = self.db.get_portfolio(self.user_id)
-            result = self._sync_data("portfolio", portfolio)
-            if not result["success"]:
-                return result
+            changes_log = self.db.changes
+            device_id = changes_log.device_id()
+            push_cursor, pull_cursor = changes_log.get_cursors(self.user_id)
+            sent = received = 0
             
-            # İşlemler
-            transactions = self.db.get_transactions(self.user_id)
-            result = self._sync_data("transactions", transactions)
-            if not result["success"]:
-                return result
-            
-            # Temettüler
-            dividends = self.db.get_dividends(self.user_id)
-            result = self._sync_data("dividends", dividends)
-            if not result["success"]:
-                return result
+            if pull_cursor == 0:
+                # İlk çekme: sunucudaki tüm satırlar sayfa sayfa delta yerine tek akışta
+                initial = self.ingest_data("all")
+                if not initial["success"]:
+                    return initial
+                received += sum(initial["counts"].values())
+                push_cursor, pull_cursor = changes_log.get_cursors(self.user_id)
             
-            # Ayarlar
-            settings = self.db.get_settings(self.user_id)
-            result = self._sync_data("settings", settings)
-            if not result["success"]:
-                return result
+            # Sayfa sayfa: gönderilecek veya çekilecek değişiklik kalmayana kadar
+            while True:
+                local, new_push_cursor, more_local = changes_log.changes_since(
+                    self.user_id, push_cursor, local_only=True)
+                
+                payload = {"device_id": device_id, "since": pull_cursor, "changes": local}
+                status, result, headers = self._request("POST", "/api/sync/delta", payload, timeout=30)
+                
+                if status != 200:
+                    print(f"❌ Senkronizasyon hatası: {status}")
+                    # 429/503: Retry-After işçinin geri çekilme süresine eklenir
+                    return {"success": False, "error": f"HTTP {status}", "status": status,
+                            "retry_after": parse_retry_after(headers.get("Retry-After")),
+                            "sent": sent, "received": received}
+                
+                if result.get("reset"):
+                    # Sunucu günlüğü imlecimizin gerisinde: deltalar artık eşleşmez
+                    return self.full_resync()
+                
+                remote = result.get("changes", [])
+                push_cursor, pull_cursor = new_push_cursor, result.get("cursor", pull_cursor)
+                changes_log.apply_pulled(self.user_id, remote, push_cursor, pull_cursor)
+                
+                sent += len(local)
+                received += len(remote)
+                if not more_local and not result.get("has_more"):
+                    break
             
             self.last_sync = datetime.now()
-            print("✅ Bulut senkronizasyonu tamamlandı")
-            return {"success": True, "message": "Tüm veriler senkronize edildi"}
+            if sent or received:
+                print(f"☁️ Bulut senkronizasyonu: {sent} değişiklik gönderildi, {received} alındı")
+            return {"success": True, "sent": sent, "received": received,
+                    "message": "Tüm veriler senkronize edildi"}
+        
+        except (requests.ConnectionError, requests.Timeout) as e:
+            # Gönderilmeyenler sync_changes'te kalır, bağlantı gelince gider
+            print(f"📴 Sunucuya ulaşılamıyor: {e}")
+            return {"success": False, "error": str(e), "offline": True}
         
         except Exception as e:
             print(f"❌ Senkronizasyon hatası: {e}")
             return {"success": False, "error": str(e)}
     
-    def _sync_data(self, data_type: str, data: list) -> dict:
-        """Veri türünü senkronize et"""
+    def sync_batch(self):
+        """Tüm tabloların tam kopyasını tek istekte gönder (sunucuda tek işlem)"""
+        if not self.enabled or not self.user_id or not self.token:
+            return {"success": False, "error": "Senkronizasyon yapılandırılmamış"}
+        
         try:
-            url = f"{self.cloud_url}/api/sync/{data_type}"
+            changes_log = self.db.changes
+            # Veriden önce alınır: okuma sırasında gelen değişiklikler sonraki deltada gider
+            latest = changes_log.latest_seq(self.user_id)
+            _, pull_cursor = changes_log.get_cursors(self.user_id)
+            
+            transactions = self.db.get_transactions(self.user_id)
+            dividends = self.db.get_dividends(self.user_id)
+            if self.content_type == sync_codec.MSGPACK_TYPE:
+                transactions = sync_codec.to_columns(transactions)
+                dividends = sync_codec.to_columns(dividends)
+            
             payload = {
-                "user_id": self.user_id,
-                "data": data,
-                "timestamp": datetime.now().isoformat()
+                "device_id": changes_log.device_id(),
+                "portfolio": self.db.get_portfolio(self.user_id),
+                "transactions": transactions,
+                "dividends": dividends,
+                "settings": self.db.get_settings(self.user_id),
             }
+            status, result, headers = self._request("POST", "/api/sync/batch", payload, timeout=30)
             
-            response = requests.post(url, json=payload, headers=self.get_headers(), timeout=10)
+            if status not in (200, 201):
+                print(f"❌ Toplu senkronizasyon hatası: {status}")
+                return {"success": False, "error": f"HTTP {status}", "status": status,
+                        "retry_after": parse_retry_after(headers.get("Retry-After"))}
             
-            if response.status_code in [200, 201]:
-                print(f"  ✅ {data_type}: {len(data)} öğe senkronize edildi")
-                return {"success": True}
-            else:
-                print(f"  ❌ {data_type} senkronizasyon hatası: {response.status_code}")
-                return {"success": False, "error": f"HTTP {response.status_code}"}
+            # Gönderilen her şey sunucuda: yerel değişiklik imleci ileri alınır
+            changes_log.apply_pulled(self.user_id, [], latest, pull_cursor)
+            self.last_sync = datetime.now()
+            print(f"✅ Toplu senkronizasyon tamamlandı: {result.get('message', '')}")
+            return {"success": True, "counts": result.get("counts", {})}
         
         except Exception as e:
-            print(f"  ❌ {data_type} senkronizasyon hatası: {e}")
+            print(f"❌ Toplu senkronizasyon hatası: {e}")
             return {"success": False, "error": str(e)}
     
+    def full_resync(self):
+        """
+        İki yönlü tam senkron: sunucudaki tüm satırları akışla al, birleşik
+        yerel kopyayı toplu gönder
+
+        Sunucu değişiklik günlüğü istemcinin imlecinin gerisine düştüğünde
+        (ör. sunucu yedekten dönüldü) çalışır. Önce çekildiği için sunucudaki
+        satırlar kaybolmaz; bu arada yerelde silinmiş satırlar geri gelebilir.
+        """
+        changes_log = self.db.changes
+        push_cursor, _ = changes_log.get_cursors(self.user_id)
+        changes_log.apply_pulled(self.user_id, [], push_cursor, 0)
+        
+        pulled = self.ingest_data("all")
+        if not pulled["success"]:
+            return pulled
+        pushed = self.sync_batch()
+        if not pushed["success"]:
+            return pushed
+        
+        print("🔄 Sunucu günlüğü sıfırlanmıştı: tam senkron yapıldı")
+        return {"success": True, "sent": sum(pushed["counts"].values()),
+                "received": sum(pulled["counts"].values()), "resync": True,
+                "message": "Tüm veriler senkronize edildi"}
+    
     def pull_data(self, data_type: str = "all") -> dict:
         """Buluttan verileri çek"""
         if not self.enabled or not self.user_id or not self.token:
@@ -113,50 +224,158 @@ class CloudSync:
         try:
             print(f"\n☁️ {data_type} verileri buluttan çekiliyor...")
             
-            url = f"{self.cloud_url}/api/pull/{data_type}"
-            response = requests.get(url, headers=self.get_headers(), timeout=10)
+            # İşlem/temettü listeleri sütunsal kodlamayla daha küçük
+            columnar = data_type in ("transactions", "dividends") and sync_codec.msgpack
+            params = {"format": "columns"} if columnar else None
+            # Önceki ETag gönderilir; veri değişmediyse sunucu tabloları okumadan 304 döner
+            cached = self._pull_cache.get(data_type)
+            conditional = {"If-None-Match": cached[0]} if cached else None
+            status, data, headers = self._request("GET", f"/api/pull/{data_type}", params=params,
+                                                  extra_headers=conditional)
+            
+            if status == 304 and cached:
+                print(f"✅ {data_type} verileri değişmemiş")
+                return {"success": True, "data": cached[1], "not_modified": True}
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
+                if sync_codec.is_columnar(data):
+                    data = sync_codec.from_columns(data)
+                etag = headers.get("ETag")
+                if etag:
+                    self._pull_cache[data_type] = (etag, data)
+                else:
+                    self._pull_cache.pop(data_type, None)
                 print(f"✅ {data_type} verileri başarıyla çekildi")
                 return {"success": True, "data": data}
             else:
-                print(f"❌ Veri çekme hatası: {response.status_code}")
-                return {"success": False, "error": f"HTTP {response.status_code}"}
+                print(f"❌ Veri çekme hatası: {status}")
+                return {"success": False, "error": f"HTTP {status}", "status": status,
+                        "retry_after": parse_retry_after(headers.get("Retry-After"))}
         
         except Exception as e:
             print(f"❌ Veri çekme hatası: {e}")
             return {"success": False, "error": str(e)}
     
-    def merge_data(self, cloud_data: dict, conflict_resolution: str = "cloud"):
-        """Bulut verilerini yerel verilerle birleştir"""
-        if conflict_resolution == "cloud":
-            # Bulut verilerine dayalı merge
-            if "portfolio" in cloud_data:
-                for item in cloud_data["portfolio"]:
-                    # Portföy güncelle/ekle
-                    pass
+    def get_quotes(self, symbols) -> dict:
+        """
+        Sunucunun paylaşılan fiyat önbelleğinden toplu fiyat al
+
+        Dönüş: {"success", "quotes": {ticker: {"price", "prev_close", "change_pct",
+        "updated_at"}}, "missing": [...]}. Ticker'lar Yahoo biçimindedir (THYAO.IS).
+        """
+        if not self.enabled or not self.token:
+            return {"success": False, "error": "Senkronizasyon yapılandırılmamış"}
+
+        try:
+            # ETag sembol kümesine bağlı: farklı küme için sunucu zaten 200 döner
+            cached = self._pull_cache.get("quotes")
+            conditional = {"If-None-Match": cached[0]} if cached else None
+            status, data, headers = self._request("GET", "/api/quotes",
+                                                  params={"symbols": ",".join(symbols)},
+                                                  timeout=5, extra_headers=conditional)
+            if status == 304 and cached:
+                return {"success": True, **cached[1], "not_modified": True}
+            if status != 200:
+                return {"success": False, "error": f"HTTP {status}"}
+
+            if headers.get("ETag"):
+                self._pull_cache["quotes"] = (headers["ETag"], data)
+            return {"success": True, **data}
+
+        except Exception as e:
+            print(f"❌ Fiyat çekme hatası: {e}")
+            return {"success": False, "error": str(e)}
+
+    def pull_stream(self, data_type: str = "all", timeout=30, meta=None):
+        """
+        NDJSON akışını çek ve {"table", "row"} kayıtlarını tek tek üret
+
+        Yanıt belleğe alınmaz; satırlar geldikçe çözülür. meta verilirse
+        sunucunun akış imleci (X-Sync-Cursor) meta["cursor"]'a yazılır.
+        """
+        headers = self.get_headers()
+        headers["Accept"] = sync_codec.NDJSON_TYPE
+        with requests.get(f"{self.cloud_url}/api/pull/{data_type}", headers=headers,
+                          stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            if meta is not None and response.headers.get("X-Sync-Cursor"):
+                meta["cursor"] = int(response.headers["X-Sync-Cursor"])
+            yield from sync_codec.iter_ndjson(response.iter_lines(chunk_size=64 * 1024))
+    
+    def change_events(self, since: int = 0):
+        """
+        Sunucunun değişiklik bildirim akışına (SSE) bağlan ve olayları üret
+
+        Sunucu akışı HEARTBEAT saniyede bir ping'ler; okuma zaman aşımı bunun
+        iki katı, böylece kopan bağlantı fark edilir. Bağlantı kabul edilince
+        önce {"event": "open"} üretilir.
+        """
+        headers = self.get_headers()
+        headers["Accept"] = change_feed.EVENT_STREAM_TYPE
+        params = {"since": since, "device_id": self.db.changes.device_id()}
+        with requests.get(f"{self.cloud_url}/api/changes/stream", headers=headers, params=params,
+                          stream=True, timeout=(5, change_feed.HEARTBEAT * 2)) as response:
+            response.raise_for_status()
+            yield {"event": "open"}
+            # chunk_size=None: veri geldikçe (tampon dolmasını beklemeden)
+            yield from change_feed.iter_sse(response.iter_lines(chunk_size=None, decode_unicode=True))
+    
+    def ingest_data(self, data_type: str = "all") -> dict:
+        """
+        Buluttaki satırları akış halinde yerel veritabanına yaz (upsert)
+
+        "all" çekildiğinde çekme imleci sunucunun akış imlecine alınır: sonraki
+        delta yalnızca akıştan sonraki değişiklikleri getirir.
+        """
+        if not self.enabled or not self.user_id or not self.token:
+            return {"success": False, "error": "Senkronizasyon yapılandırılmamış"}
+        
+        try:
+            print(f"\n☁️ {data_type} verileri akış halinde çekiliyor...")
+            changes_log = self.db.changes
+            meta = {}
+            counts = changes_log.ingest_rows(self.user_id, self.pull_stream(data_type, meta=meta))
+            if data_type == "all" and "cursor" in meta:
+                push_cursor, pull_cursor = changes_log.get_cursors(self.user_id)
+                changes_log.apply_pulled(self.user_id, [], push_cursor,
+                                         max(pull_cursor, meta["cursor"]))
+            print(f"✅ {sum(counts.values())} satır yazıldı")
+            return {"success": True, "counts": counts}
         
-        elif conflict_resolution == "local":
-            # Yerel verileri sakla
-            pass
+        except requests.HTTPError as e:
+            status = e.response.status_code
+            print(f"❌ Akışlı çekme hatası: {status}")
+            return {"success": False, "error": f"HTTP {status}", "status": status,
+                    "retry_after": parse_retry_after(e.response.headers.get("Retry-After"))}
         
-        print(f"✅ Veriler {conflict_resolution} kaynağına göre birleştirildi")
+        except (requests.ConnectionError, requests.Timeout) as e:
+            print(f"📴 Sunucuya ulaşılamıyor: {e}")
+            return {"success": False, "error": str(e), "offline": True}
+        
+        except Exception as e:
+            print(f"❌ Akışlı çekme hatası: {e}")
+            return {"success": False, "error": str(e)}
+    
+    def merge_data(self, cloud_data: dict = None, conflict_resolution: str = None):
+        """
+        Bulut ve yerel verileri satır/alan bazında birleştir
+
+        Tam tablo üzerine yazma yerine delta senkronu çalışır: yalnızca değişen
+        satırlar gönderilip alınır, çakışan alanları HLC saatleri çözer (son
+        yazan kazanır, silme mezar taşıyla). Parametreler eski çağrılar için
+        kabul edilir; çözümü saatler belirlediği için kullanılmaz.
+        """
+        return self.sync_all_data()
     
     def start_auto_sync(self):
-        """Otomatik senkronizasyonu başlat"""
-        def sync_loop():
-            while self.enabled:
-                try:
-                    threading.Event().wait(self.sync_interval)
-                    if self.enabled:
-                        self.sync_all_data()
-                except Exception as e:
-                    print(f"Auto sync hatası: {e}")
-        
-        thread = threading.Thread(target=sync_loop, daemon=True)
-        thread.start()
-        print("⚙️ Otomatik senkronizasyon başlatıldı")
+        """Arka plan senkron işçisini başlat (erteleme + geri çekilme)"""
+        if self.worker is None:
+            self.worker = SyncWorker(self, pull_interval=self.sync_interval)
+        self.worker.start()
+    
+    def stop_auto_sync(self):
+        if self.worker:
+            self.worker.stop()
     
     def get_sync_status(self) -> dict:
         """Senkronizasyon durumunu getir"""
@@ -164,7 +383,8 @@ class CloudSync:
             "enabled": self.enabled,
             "user_id": self.user_id,
             "last_sync": self.last_sync.isoformat() if self.last_sync else None,
-            "cloud_url": self.cloud_url
+            "cloud_url": self.cloud_url,
+            "worker": self.worker.status() if self.worker else None
         }
     
     def test_connection(self) -> bool:
@@ -55,6 +55,7 @@ DEFAULT_SETTINGS = {
     # Portföy
     "commission_rate": 0.04,  # %0.04 (on binde 4)
     "tax_rate": 0,
+    "lot_method": "FIFO",  # FIFO veya average (vergi lotu eşleştirme)
     "portfolio_target": 100000,
     "risk_tolerance": "orta",
     "investment_period": "orta",
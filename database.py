@@ -6,12 +6,66 @@ import sqlite3
 import json
 import os
 import sys
+import time
+import threading
 from datetime import datetime
 from config import DEFAULT_SETTINGS
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from query_profiler import QueryProfiler, make_connection_class, caller_name
+from ledger import Ledger, EVENT_SPLIT, EVENT_RIGHTS
+from sync_log import ChangeLog
+
+# Vergi lotu eşleştirmesinde kullanılan işlem tipleri
+LOT_BUY_TYPES = ('Alım',)
+LOT_SELL_TYPES = ('Satış',)
+# Bedelli sermaye artırımından gelen (sentetik) komisyonsuz alım
+LOT_RIGHTS_TYPES = ('Bedelli',)
+# Bu süreden uzun tutulan lotlar uzun vadeli sayılır (gün)
+LONG_TERM_DAYS = 365
+
+class _GatedConnection(sqlite3.Connection):
+    """Kapanınca Database geçidini bırakan ham bağlantı (bakım, yedekleme)"""
+
+    _release = None
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            release, self._release = self._release, None
+            if release:
+                release()
+
+
+class _NestedConnection:
+    """
+    Sabit bağlantının iç blok görünümü: commit/rollback en dıştaki bloğa kalır
+
+    Kendi içinde conn.commit() çağıran metotlar (ör. sync_tax_lots) başka bir
+    işlemin içinden çağrılınca dıştaki işlemi erken commit etmez.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
 
 class Database:
-    def __init__(self, db_name="portfolio.db", json_file="portfoy_data.json"):
+    def __init__(self, db_name="portfolio.db", json_file="portfoy_data.json", profile=None):
         # Exe'nin çalıştığı dizini belirle
         if getattr(sys, 'frozen', False):
             # PyInstaller ile derlenmiş exe - exe dosyasının konumunu kullan
@@ -31,7 +85,41 @@ class Database:
         self.db_name = os.path.join(app_dir, db_name)
         self.json_file = os.path.join(app_dir, json_file)
         self.connection = None
+
+        # Sorgu profilleme (opsiyonel - varsayılan kapalı)
+        self.profiler = None
+        self._connection_factory = sqlite3.Connection
+        if profile is None:
+            profile = os.environ.get("HISSETAKIP_DB_PROFILE", "").lower() in ("1", "true", "yes", "on")
+        if profile:
+            self.enable_profiling(slow_log_path=os.path.join(app_dir, "logs", "slow_queries.log"))
+
+        # Vergi lotları bu oturumda işlemlerle karşılaştırılan kullanıcılar
+        self._lots_checked = set()
         
+        # Yalnızca eklenen olay defteri (işlem, temettü, bölünme, bedelli, fiyat)
+        self.ledger = Ledger(self)
+        
+        # Satır bazında değişiklik günlüğü (delta senkronizasyonu)
+        self.changes = ChangeLog(self)
+        
+        # Son bağlantı zamanı (bakım servisi boşta pencereyi buna göre seçer)
+        self.last_activity = 0.0
+        
+        # İş parçacığına sabitlenmiş bağlantılar (async_db yürütücü thread'leri)
+        self._pinned = threading.local()
+        self._pinned_conns = set()
+        
+        # Geri yükleme sırasında dosya değişirken hiçbir bağlantı açık olmamalı:
+        # açık bağlantılar sayılır, exclusive() hepsinin kapanmasını bekler
+        self._gate = threading.Condition()
+        self._open_connections = 0
+        self._exclusive_owner = None
+        self._generation = 0
+        # Dosya değişince bellekteki türetilmiş durumu bırakan geri çağrılar
+        self._cache_listeners = []
+        self.add_cache_listener(self.ledger.reset)
+
         print(f"[DB] Database konumu: {self.db_name}")
         
         # Veritabanını başlat
@@ -50,12 +138,55 @@ class Database:
                 self.migrate_from_json()
         except Exception as e:
             print(f"[WARN] JSON geçişi başarısız: {e}")
+        
+        # Olay defteri henüz olmayan kullanıcıların geçmişini aktar
+        try:
+            self.ledger.backfill_all()
+        except Exception as e:
+            print(f"[WARN] Olay defteri oluşturulamadı: {e}")
     
     @contextmanager
     def get_connection(self):
         """Context manager for database connections"""
-        conn = sqlite3.connect(self.db_name)
-        conn.row_factory = sqlite3.Row
+        self.last_activity = time.monotonic()
+        pinned = getattr(self._pinned, "conn", None)
+        if pinned is not None:
+            # Sabit bağlantı: yalnızca en dıştaki blok commit/rollback yapar
+            if self._pinned.depth == 0:
+                self._enter()
+                if self._pinned.generation != self._generation:
+                    # Geri yükleme sırasında kapatıldı: yeni dosyaya yeniden bağlan
+                    pinned = self._repin()
+            self._pinned.depth += 1
+            try:
+                yield pinned if self._pinned.depth == 1 else _NestedConnection(pinned)
+                if self._pinned.depth == 1:
+                    pinned.commit()
+            except Exception as e:
+                if self._pinned.depth == 1:
+                    pinned.rollback()
+                    print(f"Database error: {e}")
+                raise
+            finally:
+                self._pinned.depth -= 1
+                if self._pinned.depth == 0:
+                    self._leave()
+            return
+
+        profiler = self.profiler
+        if profiler:
+            method = caller_name()
+            start = time.perf_counter()
+
+        self._enter()
+        try:
+            conn = self._connect()
+        except Exception:
+            self._leave()
+            raise
+
+        if profiler:
+            profiler.record_connect(time.perf_counter() - start)
         try:
             yield conn
             conn.commit()
@@ -65,6 +196,143 @@ class Database:
             raise
         finally:
             conn.close()
+            self._leave()
+            if profiler:
+                profiler.record_method(method, time.perf_counter() - start)
+
+    def _connect(self, check_same_thread=True):
+        conn = sqlite3.connect(self.db_name, factory=self._connection_factory,
+                               check_same_thread=check_same_thread)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def pin_connection(self):
+        """Bu thread'e kalıcı bir bağlantı bağla (get_connection onu yeniden kullanır)"""
+        if getattr(self._pinned, "conn", None) is None:
+            self._pinned.depth = 0
+            self._repin()
+        return self._pinned.conn
+
+    def _repin(self):
+        # Sahibi kapanışta, exclusive() geri yüklemede başka thread'den kapatabilsin
+        conn = self._connect(check_same_thread=False)
+        with self._gate:
+            self._pinned_conns.discard(getattr(self._pinned, "conn", None))
+            self._pinned_conns.add(conn)
+            self._pinned.generation = self._generation
+        self._pinned.conn = conn
+        return conn
+
+    def unpin_connection(self):
+        """Bu thread'in kalıcı bağlantısını kapat"""
+        conn = getattr(self._pinned, "conn", None)
+        if conn is not None:
+            self._pinned.conn = None
+            with self._gate:
+                self._pinned_conns.discard(conn)
+            conn.close()
+
+    # ========== BAĞLANTI GEÇİDİ ==========
+
+    def _enter(self):
+        me = threading.get_ident()
+        with self._gate:
+            while self._exclusive_owner not in (None, me):
+                self._gate.wait()
+            self._open_connections += 1
+
+    def _leave(self):
+        with self._gate:
+            self._open_connections -= 1
+            self._gate.notify_all()
+
+    def raw_connection(self, **kwargs):
+        """get_connection dışında açılan bağlantı (geçide dahil; close() ile bırakılır)"""
+        self._enter()
+        try:
+            conn = sqlite3.connect(self.db_name, factory=_GatedConnection, **kwargs)
+        except Exception:
+            self._leave()
+            raise
+        conn._release = self._leave
+        return conn
+
+    @contextmanager
+    def exclusive(self, timeout=30):
+        """
+        Açık bağlantıların kapanmasını bekle ve yenilerini beklet (dosya değişimi için)
+
+        Sabit bağlantılar kapatılır; sahipleri bir sonraki kullanımda yeniden
+        bağlanır. Çıkışta reset_caches() çağrılır.
+        """
+        me = threading.get_ident()
+        deadline = time.monotonic() + timeout
+        with self._gate:
+            while self._exclusive_owner is not None:
+                self._gate.wait()
+            self._exclusive_owner = me
+            while self._open_connections:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._exclusive_owner = None
+                    self._gate.notify_all()
+                    raise TimeoutError(f"{self._open_connections} veritabanı bağlantısı kapanmadı")
+                self._gate.wait(remaining)
+            for conn in self._pinned_conns:
+                conn.close()
+            self._pinned_conns.clear()
+            self._generation += 1
+        try:
+            yield
+        finally:
+            with self._gate:
+                self._exclusive_owner = None
+                self._gate.notify_all()
+            self.reset_caches()
+
+    def add_cache_listener(self, callback):
+        """Veritabanı dosyası değişince (geri yükleme) çağrılacak önbellek temizleyici"""
+        self._cache_listeners.append(callback)
+
+    def reset_caches(self):
+        self._lots_checked.clear()
+        for callback in list(self._cache_listeners):
+            try:
+                callback()
+            except Exception as e:
+                print(f"[WARN] Önbellek temizlenemedi: {e}")
+
+    # ========== SORGU PROFİLLEME ==========
+
+    def enable_profiling(self, slow_ms=100, slow_log_path=None):
+        """Sorgu süresi ölçümünü aç (ifade/metot/kapsam bazında)"""
+        self.profiler = QueryProfiler(slow_ms=slow_ms, slow_log_path=slow_log_path)
+        self._connection_factory = make_connection_class(self.profiler)
+        print(f"[DB] Sorgu profilleme açık (yavaş sorgu eşiği: {slow_ms}ms)")
+        return self.profiler
+
+    def disable_profiling(self):
+        """Sorgu süresi ölçümünü kapat"""
+        self.profiler = None
+        self._connection_factory = sqlite3.Connection
+
+    def profile_scope(self, name):
+        """Bir bloğun DB maliyetini isimle topla (profilleme kapalıysa etkisiz)"""
+        if self.profiler:
+            return self.profiler.scope(name)
+        return nullcontext()
+
+    def get_query_stats(self, top=None):
+        """Toplanan sorgu istatistiklerini getir"""
+        if not self.profiler:
+            return {}
+        return self.profiler.get_stats(top)
+
+    def dump_query_stats(self, filename, top=None):
+        """Sorgu istatistiklerini JSON dosyasına yaz"""
+        if not self.profiler:
+            return None
+        return self.profiler.dump(filename, top)
     
     def init_db(self):
         """Veritabanını başlat - tüm tabloları oluştur"""
@@ -258,6 +526,191 @@ class Database:
                     ON price_alerts(symbol)
                 ''')
                 
+                # ========== GÜNLÜK FİYAT GEÇMİŞİ ==========
+                # Sembol sözlüğü (daily_prices satırlarında metin yerine tamsayı id)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS price_symbols (
+                        id INTEGER PRIMARY KEY,
+                        symbol TEXT UNIQUE NOT NULL
+                    )
+                ''')
+
+                # OHLCV - sembol+gün ile kümelenmiş, day = 1970-01-01'den beri gün sayısı
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS daily_prices (
+                        symbol_id INTEGER NOT NULL,
+                        day INTEGER NOT NULL,
+                        open REAL,
+                        high REAL,
+                        low REAL,
+                        close REAL NOT NULL,
+                        volume REAL,
+                        PRIMARY KEY (symbol_id, day)
+                    ) WITHOUT ROWID
+                ''')
+                
+                # Sağlayıcının bildirdiği bölünmeler (Yahoo barları bunlara göre zaten düzeltilmiş)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS price_splits (
+                        symbol_id INTEGER NOT NULL,
+                        day INTEGER NOT NULL,
+                        ratio REAL NOT NULL,
+                        PRIMARY KEY (symbol_id, day)
+                    ) WITHOUT ROWID
+                ''')
+                
+                # ========== VERGİ LOTLARI ==========
+                # Her alım bir lot; satışlar seçilen yönteme göre lotlardan düşülür
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS tax_lots (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        sembol TEXT NOT NULL,
+                        buy_txn_id INTEGER,
+                        acquired_at TIMESTAMP NOT NULL,
+                        adet_initial REAL NOT NULL,
+                        adet_open REAL NOT NULL,
+                        unit_cost REAL NOT NULL,
+                        closed_at TIMESTAMP,
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
+                ''')
+                
+                # Açık lotlar: satış eşleştirmesi ve "1 yıldan eski lotlar" sorgusu
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_tax_lots_open 
+                    ON tax_lots(user_id, sembol, acquired_at) WHERE adet_open > 0
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_tax_lots_open_age 
+                    ON tax_lots(user_id, acquired_at) WHERE adet_open > 0
+                ''')
+                
+                # Satışta lotlardan gerçekleşen kazanç kayıtları
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS lot_realizations (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        lot_id INTEGER NOT NULL,
+                        sell_txn_id INTEGER,
+                        sembol TEXT NOT NULL,
+                        adet REAL NOT NULL,
+                        unit_cost REAL NOT NULL,
+                        unit_proceeds REAL NOT NULL,
+                        gain REAL NOT NULL,
+                        acquired_at TIMESTAMP NOT NULL,
+                        sold_at TIMESTAMP NOT NULL,
+                        holding_days INTEGER NOT NULL,
+                        long_term BOOLEAN NOT NULL,
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_lot_realizations_user_sold 
+                    ON lot_realizations(user_id, sold_at)
+                ''')
+                
+                # Sembol başına işlem parmak izi: lotların işlemlerle uyumunu denetler
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS tax_lot_state (
+                        user_id INTEGER NOT NULL,
+                        sembol TEXT NOT NULL,
+                        fingerprint TEXT NOT NULL,
+                        PRIMARY KEY (user_id, sembol)
+                    ) WITHOUT ROWID
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_transactions_user_symbol 
+                    ON transactions(user_id, sembol, tarih)
+                ''')
+                
+                # ========== ŞİRKET AKSİYONLARI ==========
+                
+                # Bölünme / bedelli: yeniden hesaplamada ve fiyat okumada uygulanır
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS corporate_actions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        sembol TEXT NOT NULL,
+                        tip TEXT NOT NULL,
+                        oran REAL NOT NULL,
+                        fiyat REAL,
+                        ex_date TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        UNIQUE(user_id, sembol, tip, ex_date),
+                        FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_corporate_actions_symbol 
+                    ON corporate_actions(sembol, ex_date)
+                ''')
+                
+                # Eski bölünme kayıtlarını aktar (bedelli kayıtlarında oran saklanmamıştı)
+                cursor.execute('''
+                    INSERT OR IGNORE INTO corporate_actions (user_id, sembol, tip, oran, ex_date)
+                    SELECT user_id, sembol, 'split', adet, substr(tarih, 1, 10)
+                    FROM advanced_transactions 
+                    WHERE tip = 'StockSplit' AND adet > 0
+                ''')
+                
+                # Bakım görevlerinin son çalışma zamanları (utils/db_maintenance.py)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS maintenance_log (
+                        task TEXT PRIMARY KEY,
+                        last_run TEXT NOT NULL,
+                        duration_ms REAL,
+                        detail TEXT
+                    ) WITHOUT ROWID
+                ''')
+                
+                # ========== OLAY DEFTERİ ==========
+                
+                # Yalnızca eklenir; düzeltmeler 'void' olayıyla yapılır
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS ledger_events (
+                        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                        user_id INTEGER NOT NULL,
+                        event_type TEXT NOT NULL,
+                        sembol TEXT,
+                        ref_id INTEGER,
+                        payload TEXT NOT NULL,
+                        occurred_at TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_ledger_events_time 
+                    ON ledger_events(user_id, occurred_at, seq)
+                ''')
+                
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_ledger_events_ref 
+                    ON ledger_events(user_id, event_type, ref_id)
+                ''')
+                
+                # Periyodik durum snapshot'ları (türetilmiş, silinip yeniden kurulabilir)
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS ledger_snapshots (
+                        user_id INTEGER NOT NULL,
+                        as_of TEXT NOT NULL,
+                        last_seq INTEGER NOT NULL,
+                        state TEXT NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (user_id, as_of, last_seq)
+                    ) WITHOUT ROWID
+                ''')
+                
+                # ========== DELTA SENKRONİZASYONU ==========
+                
+                # sync_changes/sync_meta, uid sütunları ve değişiklik tetikleyicileri
+                self.changes.install(cursor)
+
                 conn.commit()
                 print(f"[OK] Veritabanı başarıyla oluşturuldu: {self.db_name}")
         except Exception as e:
@@ -417,110 +870,121 @@ class Database:
             cursor.execute("DELETE FROM transactions WHERE user_id = ? AND sembol = ?", (user_id, symbol))
             # İlgili temettüleri sil
             cursor.execute("DELETE FROM dividends WHERE user_id = ? AND sembol = ?", (user_id, symbol))
+            # Vergi lotlarını sil
+            self._delete_tax_lots(cursor, user_id, [symbol])
+            # Silinen işlem/temettü olaylarını iptal et
+            self.ledger.reconcile(cursor, user_id)
             conn.commit()
             return True
     
 
     def recalculate_portfolio_from_transactions(self, user_id=1):
-        """Portföyü işlemlerden yeniden hesapla - SATIŞ DÜZELTİLMİŞ"""
-        print("\n" + "="*60)
-        print("Portföy yeniden hesaplanıyor (komisyon dahil)...")
-        print("="*60)
+        """Portföyü işlemlerden yeniden hesapla - vektörel maliyet motoru ile"""
+        import numpy as np
+        from utils.cost_basis import compute_cost_basis, summarize
+        
+        started = time.perf_counter()
+        settings = self.get_settings(user_id)
+        commission_rate = self._lot_commission_rate(settings)
         
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            settings = self.get_settings(user_id)
-            commission_rate = settings.get("komisyon_orani", 0.0004)
-            
-            try:
-                if isinstance(commission_rate, str):
-                    commission_rate = commission_rate.replace(',', '.')
-                commission_rate = float(commission_rate)
-            except:
-                commission_rate = 0.0004
-            
-            # Mevcut fiyatları al
+            # İşlemleri sembol + tarih sırasında getir (idx_transactions_user_symbol)
             cursor.execute('''
-                SELECT sembol, guncel_fiyat FROM portfolios WHERE user_id = ?
+                SELECT sembol, tip, adet, fiyat, komisyon, tarih FROM transactions 
+                WHERE user_id = ? 
+                ORDER BY sembol ASC, tarih ASC, id ASC
             ''', (user_id,))
-            current_prices = {row['sembol']: row['guncel_fiyat'] for row in cursor.fetchall()}
+            rows = cursor.fetchall()
             
-            # Portföyü temizle
-            cursor.execute("DELETE FROM portfolios WHERE user_id = ?", (user_id,))
+            arrays, source = self._adjusted_transaction_arrays(cursor, user_id, rows, commission_rate)
+            result = compute_cost_basis(*arrays, commission_rate=commission_rate, presorted=True)
+            
+            # Eldeki adetten büyük satışlar hesaba katılmadı
+            skipped = ~result["gecerli"].to_numpy() & np.isin(arrays[1], LOT_SELL_TYPES)
+            for i in source[result.index[skipped]]:
+                print(f"  ⚠️ {rows[i]['sembol']} SATIŞ HATASI: Yetersiz adet! (Satış: {rows[i]['adet']})")
+            
+            summary = summarize(result)
+            summary = summary[summary["adet"] > 0]
             
-            # İşlemleri tarihe göre getir
+            # Mevcut satırlar (güncel fiyat korunur)
             cursor.execute('''
-                SELECT sembol, tip, adet, fiyat, komisyon, tarih FROM transactions 
-                WHERE user_id = ? 
-                ORDER BY tarih ASC
+                SELECT sembol, adet, ort_maliyet FROM portfolios WHERE user_id = ?
             ''', (user_id,))
+            existing = {row['sembol']: (row['adet'], row['ort_maliyet']) for row in cursor.fetchall()}
             
-            temp_portfolio = {}
+            # Sadece farkları yaz: çıkan semboller silinir, değişenler güncellenir
+            removed = [symbol for symbol in existing if symbol not in summary.index]
+            cursor.executemany("DELETE FROM portfolios WHERE user_id = ? AND sembol = ?",
+                               [(user_id, symbol) for symbol in removed])
             
-            for row in cursor.fetchall():
-                # SQLite Row nesnesini dict'e dönüştür
-                row_dict = dict(row)
-                
-                symbol = row_dict['sembol']
-                adet = row_dict['adet']
-                fiyat = row_dict['fiyat']
-                tip = row_dict['tip']
-                
-                # Komisyon değerini kontrol et
-                stored_komisyon = row_dict.get('komisyon', 0)
-                
-                if symbol not in temp_portfolio:
-                    temp_portfolio[symbol] = {'adet': 0, 'toplam_maliyet': 0}
-                
-                if tip == 'Alım':
-                    islem_tutari = adet * fiyat
-                    komisyon = stored_komisyon if stored_komisyon and stored_komisyon > 0 else islem_tutari * commission_rate
-                    toplam_maliyet = islem_tutari + komisyon
-                    
-                    temp_portfolio[symbol]['adet'] += adet
-                    temp_portfolio[symbol]['toplam_maliyet'] += toplam_maliyet
-                    
-                    print(f"  ✅ {symbol} ALIM: {adet} x {fiyat:.2f}₺ + {komisyon:.2f}₺ kom. = {toplam_maliyet:.2f}₺")
-                
-                elif tip == 'Satış':
-                    # ✅ SATIŞ KONTROLÜ GÜÇLENDİRİLDİ
-                    if symbol not in temp_portfolio:
-                        print(f"  ⚠️ {symbol} SATIŞ HATASI: Portföyde bu hisse yok!")
-                        continue
-                        
-                    if temp_portfolio[symbol]['adet'] < adet:
-                        print(f"  ⚠️ {symbol} SATIŞ HATASI: Yetersiz adet! (Portföyde: {temp_portfolio[symbol]['adet']}, Satış: {adet})")
-                        continue
-                    
-                    # ✅ SATIŞ İŞLEMİ
-                    ortalama_maliyet = temp_portfolio[symbol]['toplam_maliyet'] / temp_portfolio[symbol]['adet']
-                    satis_maliyeti = adet * ortalama_maliyet
-                    
-                    temp_portfolio[symbol]['toplam_maliyet'] -= satis_maliyeti
-                    temp_portfolio[symbol]['adet'] -= adet
-                    
-                    print(f"  ❌ {symbol} SATIŞ: {adet} adet x {ortalama_maliyet:.2f}₺ = {satis_maliyeti:.2f}₺")
-                    print(f"     → Kalan: {temp_portfolio[symbol]['adet']} adet, Maliyet: {temp_portfolio[symbol]['toplam_maliyet']:.2f}₺")
+            changed = []
+            for symbol, adet, ort_maliyet in zip(summary.index, summary["adet"], summary["ort_maliyet"]):
+                adet = int(round(adet)) if abs(adet - round(adet)) < 1e-9 else float(adet)
+                old = existing.get(symbol)
+                if old is None or old[0] != adet or abs(old[1] - ort_maliyet) > 1e-9:
+                    changed.append((user_id, symbol, adet, float(ort_maliyet), float(ort_maliyet)))
             
-            # Portföyü kaydet
-            for symbol, data in temp_portfolio.items():
-                if data['adet'] > 0:
-                    ort_maliyet = data['toplam_maliyet'] / data['adet']
-                    guncel_fiyat = current_prices.get(symbol, ort_maliyet)
-                    
-                    cursor.execute('''
-                        INSERT INTO portfolios 
-                        (user_id, sembol, adet, ort_maliyet, guncel_fiyat)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (user_id, symbol, data['adet'], ort_maliyet, guncel_fiyat))
-                    
-                    print(f"  💼 {symbol}: {data['adet']} adet, Ort.Maliyet: {ort_maliyet:.2f}₺")
-                else:
-                    print(f"  🗑️ {symbol}: Portföyden çıkarıldı (adet: 0)")
+            cursor.executemany('''
+                INSERT INTO portfolios (user_id, sembol, adet, ort_maliyet, guncel_fiyat)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, sembol) DO UPDATE SET 
+                    adet = excluded.adet, 
+                    ort_maliyet = excluded.ort_maliyet, 
+                    updated_at = CURRENT_TIMESTAMP
+            ''', changed)
+            
+            # İşlemleri değişen sembollerin vergi lotlarını yeniden kur
+            self._sync_tax_lots(cursor, user_id, settings)
+            
+            # Düzenlenen/silinen işlemleri olay defterine yansıt
+            self.ledger.reconcile(cursor, user_id, commission_rate)
+            
+            # Olay defterinden kurulan durum (snapshot + kuyruk) ile adetleri karşılaştır
+            ledger_positions = {p["sembol"]: p["adet"] for p in self.ledger.get_positions(user_id, cursor=cursor)}
+            drift = [symbol for symbol in set(ledger_positions) | set(summary.index)
+                     if abs(ledger_positions.get(symbol, 0) - (summary["adet"].get(symbol, 0))) > 1e-6]
+            if drift:
+                print(f"  ⚠️ Olay defteri portföyle uyuşmuyor: {', '.join(sorted(drift))}")
             
             conn.commit()
-            print("="*60 + "\n")
+        
+        print(f"[DB] Portföy yeniden hesaplandı: {len(rows)} işlem, {len(summary)} pozisyon, "
+              f"{len(changed)} güncelleme, {len(removed)} silme ({(time.perf_counter() - started) * 1000:.1f}ms)")
+    
+    def get_positions(self, user_id=1, as_of=None):
+        """Olay defterinden (as_of anındaki) pozisyonlar, gerçekleşen kâr ve temettü ile"""
+        return self.ledger.get_positions(user_id, as_of)
+    
+    def get_cost_basis_summary(self, user_id=1):
+        """Sembol başına adet, maliyet, gerçekleşen kâr ve komisyon (vektörel)"""
+        from utils.cost_basis import compute_cost_basis, summarize
+        
+        commission_rate = self._lot_commission_rate(self.get_settings(user_id))
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            rows = cursor.execute('''
+                SELECT sembol, tip, adet, fiyat, komisyon, tarih FROM transactions 
+                WHERE user_id = ? 
+                ORDER BY sembol ASC, tarih ASC, id ASC
+            ''', (user_id,)).fetchall()
+            arrays, _ = self._adjusted_transaction_arrays(cursor, user_id, rows, commission_rate)
+        return summarize(compute_cost_basis(*arrays, commission_rate=commission_rate, presorted=True))
+    
+    def _adjusted_transaction_arrays(self, cursor, user_id, rows, commission_rate):
+        """İşlem satırlarını dizilere çevir ve şirket aksiyonlarını uygula"""
+        import numpy as np
+        from utils.cost_basis import apply_corporate_actions, transactions_to_arrays
+        
+        arrays = transactions_to_arrays([tuple(row)[:5] for row in rows])
+        actions = self._corporate_actions(cursor, user_id)
+        if not actions:
+            return arrays, np.arange(len(rows))
+        arrays, _, source = apply_corporate_actions(arrays, [row['tarih'] for row in rows],
+                                                    actions, commission_rate)
+        return arrays, source
     
     # ========== İŞLEM İŞLEMLERİ ==========
     
@@ -529,7 +993,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT sembol, tip, adet, fiyat, toplam, komisyon, tarih 
+                SELECT sembol, tip, adet, fiyat, toplam, komisyon, tarih, uid 
                 FROM transactions 
                 WHERE user_id = ?
                 ORDER BY tarih DESC
@@ -600,16 +1064,35 @@ class Database:
         if not all([sembol, tip, adet, fiyat, tarih]):
             raise ValueError("Eksik işlem bilgisi!")
         
+        settings = self.get_settings(user_id) if tip in LOT_BUY_TYPES + LOT_SELL_TYPES else None
+        
         # Database'e kaydet
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if settings is not None:
+                lots_in_sync = self._tax_lots_in_sync(cursor, user_id, sembol, settings)
+            
             cursor.execute('''
                 INSERT INTO transactions 
                 (user_id, sembol, tip, adet, fiyat, toplam, komisyon, tarih)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (user_id, sembol, tip, adet, fiyat, toplam, komisyon, tarih))
+            transaction_id = cursor.lastrowid
+            
+            # Vergi lotlarını artımlı güncelle; geriye tarihli işlemde sembolü yeniden kur
+            if settings is not None:
+                if lots_in_sync and not self._is_backdated(cursor, user_id, sembol, tarih):
+                    self._apply_lot_transaction(cursor, user_id, transaction_id, sembol, tip,
+                                                adet, fiyat, komisyon, tarih, settings)
+                    self._store_lot_fingerprint(cursor, user_id, sembol, settings)
+                else:
+                    self._rebuild_tax_lots(cursor, user_id, [sembol], settings)
+                
+                self.ledger.append_trade(cursor, user_id, transaction_id, sembol, tip, adet, fiyat,
+                                         komisyon, tarih, self._lot_commission_rate(settings))
+            
             conn.commit()
-            return cursor.lastrowid
+            return transaction_id
     
     # ========== TEMETTÜ İŞLEMLERİ ==========
     
@@ -618,7 +1101,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT sembol, tutar, adet, hisse_basi_tutar, tarih 
+                SELECT sembol, tutar, adet, hisse_basi_tutar, tarih, uid 
                 FROM dividends 
                 WHERE user_id = ?
                 ORDER BY tarih DESC
@@ -707,8 +1190,10 @@ class Database:
                 (user_id, sembol, tutar, adet, hisse_basi_tutar, tarih)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (user_id, sembol, tutar, adet, hisse_basi_tutar, tarih))
+            dividend_id = cursor.lastrowid
+            self.ledger.append_dividend(cursor, user_id, dividend_id, sembol, tutar, tarih)
             conn.commit()
-            return cursor.lastrowid
+            return dividend_id
     
     # ========== AYAR İŞLEMLERİ ==========
     
@@ -954,14 +1439,68 @@ class Database:
     
     # ========== GELİŞMİŞ İŞLEMLER ==========
     
-    def apply_stock_split(self, symbol, split_ratio, user_id=1):
+    def _corporate_actions(self, cursor, user_id, symbols=None):
+        """Kullanıcının aksiyonları (sembol, tip, oran, fiyat, ex_date) - ex_date sırasında"""
+        query = "SELECT sembol, tip, oran, fiyat, ex_date FROM corporate_actions WHERE user_id = ?"
+        params = [user_id]
+        if symbols is not None:
+            query += f" AND sembol IN ({','.join('?' * len(symbols))})"
+            params.extend(symbols)
+        cursor.execute(query + " ORDER BY ex_date ASC, id ASC", params)
+        return [tuple(row) for row in cursor.fetchall()]
+    
+    def _record_corporate_action(self, cursor, user_id, symbol, action_type, ratio, price, ex_date, settings):
+        """Aksiyonu kaydet ve sembolün vergi lotlarını düzeltilmiş geçmişle yeniden kur"""
+        cursor.execute('''
+            INSERT OR REPLACE INTO corporate_actions (user_id, sembol, tip, oran, fiyat, ex_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, symbol, action_type, ratio, price, str(ex_date).replace("T", " ")[:19]))
+        action_id = cursor.lastrowid
+        self._rebuild_tax_lots(cursor, user_id, [symbol], settings)
+        return action_id
+    
+    def add_corporate_action(self, symbol, action_type, ratio, price=None, ex_date=None, user_id=1):
+        """
+        Şirket aksiyonu ekle (portföyü yeniden hesaplamadan)
+        
+        action_type: 'split' (oran = yeni/eski adet) veya
+                     'rights' (oran = kaç eski hisseye 1 yeni hisse, fiyat = bedel)
+        """
+        if action_type not in ('split', 'rights'):
+            raise ValueError(f"Geçersiz aksiyon tipi: {action_type}")
+        if not ratio or ratio <= 0:
+            raise ValueError("Aksiyon oranı pozitif olmalı!")
+        
+        settings = self.get_settings(user_id)
+        ex_date = ex_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.get_connection() as conn:
+            action_id = self._record_corporate_action(conn.cursor(), user_id, symbol, action_type,
+                                                      ratio, price, ex_date, settings)
+            conn.commit()
+            return action_id
+    
+    def get_corporate_actions(self, user_id=1, symbol=None):
+        """Şirket aksiyonlarını getir"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            query = "SELECT * FROM corporate_actions WHERE user_id = ?"
+            params = [user_id]
+            if symbol:
+                query += " AND sembol = ?"
+                params.append(symbol)
+            cursor.execute(query + " ORDER BY ex_date DESC, id DESC", params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def apply_stock_split(self, symbol, split_ratio, user_id=1, ex_date=None):
         """Hisse bölünmesi uygula"""
+        settings = self.get_settings(user_id)
+        ex_date = ex_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
             # Portföyden hisseyi getir
             cursor.execute('''
-                SELECT adet, ort_maliyet FROM portfolios 
+                SELECT adet, ort_maliyet, guncel_fiyat FROM portfolios 
                 WHERE user_id = ? AND sembol = ?
             ''', (user_id, symbol))
             
@@ -972,16 +1511,17 @@ class Database:
             old_adet = stock['adet']
             old_cost = stock['ort_maliyet']
             
-            # Yeni değerleri hesapla
+            # Yeni değerleri hesapla (güncel fiyat da bölünme sonrası birime çevrilir)
             new_adet = old_adet * split_ratio
             new_cost = old_cost / split_ratio
+            new_price = stock['guncel_fiyat'] / split_ratio if stock['guncel_fiyat'] else new_cost
             
             # Portföyü güncelle
             cursor.execute('''
                 UPDATE portfolios 
-                SET adet = ?, ort_maliyet = ?, updated_at = CURRENT_TIMESTAMP
+                SET adet = ?, ort_maliyet = ?, guncel_fiyat = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE user_id = ? AND sembol = ?
-            ''', (new_adet, new_cost, user_id, symbol))
+            ''', (new_adet, new_cost, new_price, user_id, symbol))
             
             # İşlem kaydı ekle
             cursor.execute('''
@@ -993,11 +1533,18 @@ class Database:
                   f'Hisse Bölünmesi: {old_adet} x {old_cost:.2f}₺ -> {int(new_adet)} x {new_cost:.2f}₺',
                   datetime.now().isoformat()))
             
+            self.ledger.append(cursor, user_id, EVENT_SPLIT, symbol, {"oran": split_ratio}, ex_date)
+            
+            # Yeniden hesaplamada bölünmenin geri alınmaması için aksiyon olarak kaydet
+            self._record_corporate_action(cursor, user_id, symbol, 'split', split_ratio, None, ex_date, settings)
+            
             conn.commit()
             return True
     
-    def apply_rights_issue(self, symbol, rights_ratio, new_share_price, user_id=1):
+    def apply_rights_issue(self, symbol, rights_ratio, new_share_price, user_id=1, ex_date=None):
         """Rüçhan hakkı uygula (bedelli sermaye artırımı)"""
+        settings = self.get_settings(user_id)
+        ex_date = ex_date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
@@ -1039,6 +1586,12 @@ class Database:
                   f'Bedelli Sermaye Artırımı: {new_shares:.0f} hisse x {new_share_price:.2f}₺',
                   datetime.now().isoformat()))
             
+            self.ledger.append(cursor, user_id, EVENT_RIGHTS, symbol,
+                               {"yeni_adet": new_shares, "fiyat": new_share_price}, ex_date)
+            
+            self._record_corporate_action(cursor, user_id, symbol, 'rights', rights_ratio,
+                                          new_share_price, ex_date, settings)
+            
             conn.commit()
             return True
     
@@ -1116,6 +1669,308 @@ class Database:
             
             return [dict(row) for row in cursor.fetchall()]
     
+    # ========== VERGİ LOTLARI ==========
+    
+    @staticmethod
+    def _lot_commission_rate(settings):
+        """Ayarlardaki komisyon oranını sayıya çevir"""
+        rate = settings.get("komisyon_orani", 0.0004)
+        try:
+            if isinstance(rate, str):
+                rate = rate.replace(',', '.')
+            return float(rate)
+        except:
+            return 0.0004
+    
+    @staticmethod
+    def _lot_method(settings):
+        method = str(settings.get("lot_method", "FIFO")).lower()
+        return "average" if method in ("average", "ortalama") else "fifo"
+    
+    @staticmethod
+    def _holding_days(acquired_at, sold_at):
+        try:
+            start = datetime.fromisoformat(str(acquired_at))
+            end = datetime.fromisoformat(str(sold_at))
+            return max(0, (end - start).days)
+        except ValueError:
+            return 0
+    
+    def _lot_fingerprints(self, cursor, user_id, symbols=None):
+        """
+        Sembol başına işlem parmak izi: satır sayısı, id toplamı, adet ve tutar
+        toplamları, id ağırlıklı işaretli adet/fiyat/tarih, son tarih, aksiyonlar
+
+        id ağırlıklı toplamlar tutarı aynı kalan düzenlemeleri de yakalar
+        (10@100 -> 20@50, alım <-> satış, tarihi başka satırın önüne alma).
+        """
+        types = LOT_BUY_TYPES + LOT_SELL_TYPES
+        query = f'''
+            SELECT sembol, COUNT(*), SUM(id), TOTAL(adet), TOTAL(adet * fiyat + komisyon),
+                   TOTAL(id * CASE WHEN tip IN ({','.join('?' * len(LOT_SELL_TYPES))}) THEN -adet ELSE adet END),
+                   TOTAL(id * fiyat), TOTAL(id * julianday(tarih)), MAX(tarih),
+                   (SELECT COUNT(*) || '/' || IFNULL(MAX(c.id), 0) FROM corporate_actions c 
+                    WHERE c.user_id = transactions.user_id AND c.sembol = transactions.sembol)
+            FROM transactions 
+            WHERE user_id = ? AND tip IN ({','.join('?' * len(types))})
+        '''
+        params = [*LOT_SELL_TYPES, user_id, *types]
+        if symbols is not None:
+            query += f" AND sembol IN ({','.join('?' * len(symbols))})"
+            params.extend(symbols)
+        cursor.execute(query + " GROUP BY sembol", params)
+        return {row[0]: (f"{row[1]}:{row[2]}:{row[3]:.4f}:{row[4]:.4f}:{row[5]:.4f}:{row[6]:.4f}:"
+                         f"{row[7]:.6f}:{row[8]}:{row[9]}")
+                for row in cursor.fetchall()}
+    
+    def _store_lot_fingerprint(self, cursor, user_id, symbol, settings):
+        fingerprint = self._lot_fingerprints(cursor, user_id, [symbol]).get(symbol)
+        if fingerprint is None:
+            cursor.execute("DELETE FROM tax_lot_state WHERE user_id = ? AND sembol = ?", (user_id, symbol))
+            return
+        cursor.execute('''
+            INSERT OR REPLACE INTO tax_lot_state (user_id, sembol, fingerprint)
+            VALUES (?, ?, ?)
+        ''', (user_id, symbol, f"{self._lot_method(settings)}|{fingerprint}"))
+    
+    def _stored_lot_fingerprints(self, cursor, user_id):
+        cursor.execute("SELECT sembol, fingerprint FROM tax_lot_state WHERE user_id = ?", (user_id,))
+        return {row[0]: row[1] for row in cursor.fetchall()}
+    
+    def _tax_lots_in_sync(self, cursor, user_id, symbol, settings):
+        """Sembolün lotları mevcut işlemlerle ve lot yöntemiyle uyumlu mu?"""
+        current = self._lot_fingerprints(cursor, user_id, [symbol]).get(symbol)
+        cursor.execute('''
+            SELECT fingerprint FROM tax_lot_state WHERE user_id = ? AND sembol = ?
+        ''', (user_id, symbol))
+        row = cursor.fetchone()
+        if current is None:
+            return row is None
+        return row is not None and row[0] == f"{self._lot_method(settings)}|{current}"
+    
+    def _is_backdated(self, cursor, user_id, symbol, tarih):
+        """İşlem, sembolün son lot hareketinden önce mi tarihlenmiş?"""
+        cursor.execute('''
+            SELECT MAX(t) FROM (
+                SELECT MAX(acquired_at) AS t FROM tax_lots WHERE user_id = ? AND sembol = ?
+                UNION ALL
+                SELECT MAX(sold_at) FROM lot_realizations WHERE user_id = ? AND sembol = ?
+            )
+        ''', (user_id, symbol, user_id, symbol))
+        last = cursor.fetchone()[0]
+        return last is not None and str(tarih) < last
+    
+    def _apply_lot_transaction(self, cursor, user_id, transaction_id, symbol, tip,
+                               adet, fiyat, komisyon, tarih, settings):
+        """Tek bir alım/satımı lot tablosuna işle"""
+        islem_tutari = adet * fiyat
+        if tip in LOT_RIGHTS_TYPES:
+            komisyon = 0
+        elif not komisyon or komisyon <= 0:
+            komisyon = islem_tutari * self._lot_commission_rate(settings)
+        tarih = str(tarih)
+        
+        if tip in LOT_BUY_TYPES + LOT_RIGHTS_TYPES:
+            cursor.execute('''
+                INSERT INTO tax_lots 
+                (user_id, sembol, buy_txn_id, acquired_at, adet_initial, adet_open, unit_cost)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, symbol, transaction_id, tarih, adet, adet, (islem_tutari + komisyon) / adet))
+            return
+        
+        if tip not in LOT_SELL_TYPES:
+            return
+        
+        cursor.execute('''
+            SELECT id, adet_open, unit_cost, acquired_at FROM tax_lots 
+            WHERE user_id = ? AND sembol = ? AND adet_open > 0
+            ORDER BY acquired_at, id
+        ''', (user_id, symbol))
+        lots = cursor.fetchall()
+        total_open = sum(lot['adet_open'] for lot in lots)
+        
+        # Portföy hesabıyla aynı kural: yetersiz adetli satış yok sayılır
+        if total_open + 1e-9 < adet:
+            print(f"  ⚠️ {symbol} LOT HATASI: Yetersiz adet! (Açık lot: {total_open}, Satış: {adet})")
+            return
+        
+        unit_proceeds = (islem_tutari - komisyon) / adet
+        
+        if self._lot_method(settings) == "average":
+            # Ortalama maliyet: satış tüm açık lotlardan orantılı düşülür
+            average_cost = sum(lot['adet_open'] * lot['unit_cost'] for lot in lots) / total_open
+            ratio = adet / total_open
+            matches = [(lot, lot['adet_open'] * ratio, average_cost) for lot in lots]
+            cursor.execute('''
+                UPDATE tax_lots SET unit_cost = ? 
+                WHERE user_id = ? AND sembol = ? AND adet_open > 0
+            ''', (average_cost, user_id, symbol))
+        else:
+            # FIFO: en eski lottan başla
+            matches = []
+            remaining = adet
+            for lot in lots:
+                if remaining <= 1e-9:
+                    break
+                used = min(lot['adet_open'], remaining)
+                matches.append((lot, used, lot['unit_cost']))
+                remaining -= used
+        
+        for lot, used, unit_cost in matches:
+            left = lot['adet_open'] - used
+            if left <= 1e-9:
+                left = 0
+            cursor.execute('''
+                UPDATE tax_lots SET adet_open = ?, closed_at = ? WHERE id = ?
+            ''', (left, tarih if left == 0 else None, lot['id']))
+            
+            holding_days = self._holding_days(lot['acquired_at'], tarih)
+            cursor.execute('''
+                INSERT INTO lot_realizations 
+                (user_id, lot_id, sell_txn_id, sembol, adet, unit_cost, unit_proceeds, gain,
+                 acquired_at, sold_at, holding_days, long_term)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, lot['id'], transaction_id, symbol, used, unit_cost, unit_proceeds,
+                  used * (unit_proceeds - unit_cost), lot['acquired_at'], tarih,
+                  holding_days, holding_days >= LONG_TERM_DAYS))
+    
+    def _delete_tax_lots(self, cursor, user_id, symbols):
+        marks = ','.join('?' * len(symbols))
+        for table in ("lot_realizations", "tax_lots", "tax_lot_state"):
+            cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND sembol IN ({marks})",
+                           (user_id, *symbols))
+    
+    def _rebuild_tax_lots(self, cursor, user_id, symbols, settings):
+        """Verilen sembollerin lotlarını işlem geçmişinden yeniden kur"""
+        if not symbols:
+            return
+        self._delete_tax_lots(cursor, user_id, symbols)
+        
+        cursor.execute(f'''
+            SELECT id, sembol, tip, adet, fiyat, komisyon, tarih FROM transactions 
+            WHERE user_id = ? AND sembol IN ({','.join('?' * len(symbols))})
+            ORDER BY sembol ASC, tarih ASC, id ASC
+        ''', (user_id, *symbols))
+        rows = cursor.fetchall()
+        actions = self._corporate_actions(cursor, user_id, symbols)
+        
+        if not actions:
+            for row in rows:
+                self._apply_lot_transaction(cursor, user_id, row['id'], row['sembol'], row['tip'],
+                                            row['adet'], row['fiyat'], row['komisyon'], row['tarih'], settings)
+        else:
+            # Bölünme/bedelli düzeltmeli satırlar; bedelli lotu ex_date'te açılır
+            from utils.cost_basis import apply_corporate_actions, transactions_to_arrays
+            arrays, days, source = apply_corporate_actions(
+                transactions_to_arrays([tuple(row)[1:6] for row in rows]), [row['tarih'] for row in rows],
+                actions, self._lot_commission_rate(settings))
+            for i, src in enumerate(source):
+                row = rows[src] if src >= 0 else None
+                self._apply_lot_transaction(cursor, user_id, row['id'] if row else None, arrays[0][i],
+                                            arrays[1][i], float(arrays[2][i]), float(arrays[3][i]),
+                                            row['komisyon'] if row else 0,
+                                            row['tarih'] if row else days[i], settings)
+        
+        for symbol in symbols:
+            self._store_lot_fingerprint(cursor, user_id, symbol, settings)
+    
+    def _sync_tax_lots(self, cursor, user_id, settings):
+        """Parmak izi değişen (silinen/düzenlenen işlem, yöntem değişikliği) sembolleri yeniden kur"""
+        method = self._lot_method(settings)
+        current = {symbol: f"{method}|{fp}" for symbol, fp in self._lot_fingerprints(cursor, user_id).items()}
+        stored = self._stored_lot_fingerprints(cursor, user_id)
+        
+        stale = [symbol for symbol, fp in current.items() if stored.get(symbol) != fp]
+        removed = [symbol for symbol in stored if symbol not in current]
+        
+        if removed:
+            self._delete_tax_lots(cursor, user_id, removed)
+        if stale:
+            print(f"[DB] Vergi lotları yeniden kuruluyor: {', '.join(stale)}")
+            self._rebuild_tax_lots(cursor, user_id, stale, settings)
+        self._lots_checked.add(user_id)
+    
+    def sync_tax_lots(self, user_id=1):
+        """Vergi lotlarını işlemlerle uyumlu hale getir"""
+        settings = self.get_settings(user_id)
+        with self.get_connection() as conn:
+            self._sync_tax_lots(conn.cursor(), user_id, settings)
+            conn.commit()
+    
+    def _ensure_tax_lots(self, user_id):
+        # Oturumdaki ilk sorguda eski veritabanları için lotları oluştur
+        if user_id not in self._lots_checked:
+            self.sync_tax_lots(user_id)
+    
+    def get_realized_gains(self, year=None, user_id=1, symbol=None):
+        """Gerçekleşen kazanç satırları (lot bazında)"""
+        self._ensure_tax_lots(user_id)
+        query = "SELECT * FROM lot_realizations WHERE user_id = ?"
+        params = [user_id]
+        if year:
+            query += " AND sold_at >= ? AND sold_at < ?"
+            params += [f"{int(year)}-01-01", f"{int(year) + 1}-01-01"]
+        if symbol:
+            query += " AND sembol = ?"
+            params.append(symbol)
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY sold_at, id", params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_realized_gain_summary(self, year=None, user_id=1):
+        """Yıl için toplam / kısa vade / uzun vade gerçekleşen kazanç"""
+        self._ensure_tax_lots(user_id)
+        query = '''
+            SELECT TOTAL(gain) AS toplam,
+                   TOTAL(CASE WHEN long_term THEN 0 ELSE gain END) AS kisa_vade,
+                   TOTAL(CASE WHEN long_term THEN gain ELSE 0 END) AS uzun_vade,
+                   TOTAL(adet * unit_proceeds) AS satis_geliri,
+                   TOTAL(adet * unit_cost) AS maliyet,
+                   TOTAL(CASE WHEN gain > 0 THEN gain ELSE 0 END) AS kazanclar,
+                   TOTAL(CASE WHEN gain < 0 THEN gain ELSE 0 END) AS zararlar
+            FROM lot_realizations WHERE user_id = ?
+        '''
+        params = [user_id]
+        if year:
+            query += " AND sold_at >= ? AND sold_at < ?"
+            params += [f"{int(year)}-01-01", f"{int(year) + 1}-01-01"]
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return dict(cursor.fetchone())
+    
+    def get_open_lots(self, user_id=1, symbol=None, min_holding_days=None):
+        """Açık lotlar + güncel fiyata göre gerçekleşmemiş kazanç"""
+        self._ensure_tax_lots(user_id)
+        query = '''
+            SELECT l.id, l.sembol, l.acquired_at, l.adet_initial, l.adet_open, l.unit_cost,
+                   p.guncel_fiyat,
+                   l.adet_open * (COALESCE(p.guncel_fiyat, l.unit_cost) - l.unit_cost) AS unrealized,
+                   CAST(julianday('now') - julianday(l.acquired_at) AS INTEGER) AS holding_days
+            FROM tax_lots l
+            LEFT JOIN portfolios p ON p.user_id = l.user_id AND p.sembol = l.sembol
+            WHERE l.user_id = ? AND l.adet_open > 0
+        '''
+        params = [user_id]
+        if symbol:
+            query += " AND l.sembol = ?"
+            params.append(symbol)
+        if min_holding_days is not None:
+            query += " AND l.acquired_at <= datetime('now', 'localtime', ?)"
+            params.append(f"-{int(min_holding_days)} days")
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query + " ORDER BY l.acquired_at, l.id", params)
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_long_term_lots(self, user_id=1):
+        """1 yıldan uzun süredir tutulan açık lotlar"""
+        return self.get_open_lots(user_id, min_holding_days=LONG_TERM_DAYS)
+    
     # ========== VERİ YÖNETİMİ ==========
     
     def export_data(self, filename, user_id=1):
@@ -1180,6 +2035,11 @@ class Database:
             cursor.execute("DELETE FROM dividends WHERE user_id = ?", (user_id,))
             cursor.execute("DELETE FROM settings WHERE user_id = ?", (user_id,))
             cursor.execute("DELETE FROM price_alerts WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM tax_lots WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM lot_realizations WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM tax_lot_state WHERE user_id = ?", (user_id,))
+            cursor.execute("DELETE FROM corporate_actions WHERE user_id = ?", (user_id,))
+            self.ledger.void_all(cursor, user_id)
             conn.commit()
             return True
     
@@ -0,0 +1,464 @@
+# ledger.py
+"""
+Olay Defteri - yalnızca eklenen (append-only) portföy olay günlüğü + periyodik snapshot
+
+Olay tipleri:
+    trade     alım/satım      (ref_id = transactions.id)
+    dividend  temettü         (ref_id = dividends.id)
+    split     hisse bölünmesi
+    rights    bedelli sermaye artırımı
+    price     fiyat işaretleri (tek olayda birden çok sembol)
+    void      düzeltme: ref_id = iptal edilen olayın seq'i
+
+Durum, olaylar (occurred_at, seq) sırasında katlanarak elde edilir. Snapshot
+belirli bir (occurred_at, seq) sınırına kadarki durumu saklar; herhangi bir
+andaki durum = en yakın snapshot + kısa olay kuyruğu. Snapshot'lar türetilmiş
+önbellektir: geriye tarihli olay veya iptal geldiğinde etkilenenler silinir.
+
+Son snapshot'tan sonraki olay sayısı bellekte tutulur (ilk kullanımda bir kez
+sayılır); snapshot kararı her eklemede COUNT(*) çalıştırmaz. Sayaç yalnızca
+snapshot zamanlamasını etkiler, kaymış olması sonucu bozmaz.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+EVENT_TRADE = "trade"
+EVENT_DIVIDEND = "dividend"
+EVENT_SPLIT = "split"
+EVENT_RIGHTS = "rights"
+EVENT_PRICE = "price"
+EVENT_VOID = "void"
+
+BUY_TYPES = ("Alım",)
+SELL_TYPES = ("Satış",)
+
+# Son snapshot'tan sonra bu kadar olay birikince yeni snapshot alınır
+SNAPSHOT_INTERVAL = 500
+
+EPS = 1e-9
+
+
+def normalize_time(value=None):
+    """Olay zamanını sıralanabilir 'YYYY-MM-DD HH:MM:SS' biçimine getir"""
+    if value is None:
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    text = str(value)
+    try:
+        return datetime.fromisoformat(text).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return text
+
+
+def empty_state():
+    return {"positions": {}}
+
+
+def _position(state, symbol):
+    positions = state["positions"]
+    if symbol not in positions:
+        positions[symbol] = {"adet": 0.0, "maliyet": 0.0, "fiyat": None, "kar": 0.0, "temettu": 0.0}
+    return positions[symbol]
+
+
+def apply_event(state, event_type, symbol, payload):
+    """Tek bir olayı duruma uygula (saf fonksiyon, state yerinde değişir)"""
+    if event_type == EVENT_TRADE:
+        pos = _position(state, symbol)
+        adet, fiyat, komisyon = payload["adet"], payload["fiyat"], payload.get("komisyon", 0.0)
+        if payload["tip"] in BUY_TYPES:
+            pos["adet"] += adet
+            pos["maliyet"] += adet * fiyat + komisyon
+        elif payload["tip"] in SELL_TYPES and pos["adet"] + EPS >= adet:
+            # Ortalama maliyet: satış maliyetten adet oranında düşer
+            cost = pos["maliyet"] * adet / pos["adet"]
+            pos["maliyet"] -= cost
+            pos["adet"] -= adet
+            pos["kar"] += adet * fiyat - komisyon - cost
+            if pos["adet"] <= EPS:
+                pos["adet"] = 0.0
+                pos["maliyet"] = 0.0
+
+    elif event_type == EVENT_DIVIDEND:
+        _position(state, symbol)["temettu"] += payload["tutar"]
+
+    elif event_type == EVENT_SPLIT:
+        pos = _position(state, symbol)
+        pos["adet"] *= payload["oran"]
+        if pos["fiyat"]:
+            pos["fiyat"] /= payload["oran"]
+
+    elif event_type == EVENT_RIGHTS:
+        pos = _position(state, symbol)
+        pos["adet"] += payload["yeni_adet"]
+        pos["maliyet"] += payload["yeni_adet"] * payload["fiyat"]
+
+    elif event_type == EVENT_PRICE:
+        for price_symbol, price in payload["fiyatlar"].items():
+            _position(state, price_symbol)["fiyat"] = price
+
+    return state
+
+
+class Ledger:
+    """ledger_events / ledger_snapshots tabloları üzerinde olay defteri"""
+
+    def __init__(self, db, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.db = db
+        self.snapshot_interval = snapshot_interval
+        # user_id -> son snapshot'tan sonraki olay sayısı
+        self._pending = {}
+        self._batch = threading.local()
+
+    def reset(self):
+        """Veritabanı dosyası değişti: sayaçlar yeniden sayılsın"""
+        self._pending.clear()
+
+    @contextmanager
+    def _batching(self, cursor, user_id):
+        """Toplu eklemede snapshot kararı sona ertelenir (tek değerlendirme)"""
+        if getattr(self._batch, "active", False):
+            yield
+            return
+        self._batch.active = True
+        try:
+            yield
+        finally:
+            self._batch.active = False
+        self._maybe_snapshot(cursor, user_id)
+
+    # ========== YAZMA ==========
+
+    def append(self, cursor, user_id, event_type, symbol, payload, occurred_at=None, ref_id=None):
+        """Olay ekle (çağıranın bağlantısı/işlemi içinde)"""
+        occurred_at = normalize_time(occurred_at)
+        cursor.execute('''
+            INSERT INTO ledger_events (user_id, event_type, sembol, ref_id, payload, occurred_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, event_type, symbol, ref_id, json.dumps(payload, ensure_ascii=False), occurred_at))
+        seq = cursor.lastrowid
+
+        # Geriye tarihli olay: sınırı bu olaydan sonra olan snapshot'lar geçersiz.
+        # İptal, hedefiyle aynı zamanı taşır; hedefi içeren snapshot da düşer.
+        self._invalidate(cursor, user_id, occurred_at, inclusive=event_type == EVENT_VOID)
+        if user_id in self._pending:
+            self._pending[user_id] += 1
+        if not getattr(self._batch, "active", False):
+            self._maybe_snapshot(cursor, user_id)
+        return seq
+
+    def append_trade(self, cursor, user_id, transaction_id, symbol, tip, adet, fiyat, komisyon,
+                     tarih, commission_rate=0.0004):
+        # Komisyon girilmemişse portföy hesabındaki oranla aynı varsayılan
+        effective = komisyon if komisyon and komisyon > 0 else adet * fiyat * commission_rate
+        payload = {"tip": tip, "adet": adet, "fiyat": fiyat, "komisyon": effective,
+                   "komisyon_kayit": komisyon or 0, "tarih": str(tarih)}
+        return self.append(cursor, user_id, EVENT_TRADE, symbol, payload, tarih, transaction_id)
+
+    def append_dividend(self, cursor, user_id, dividend_id, symbol, tutar, tarih):
+        payload = {"tutar": tutar, "tarih": str(tarih)}
+        return self.append(cursor, user_id, EVENT_DIVIDEND, symbol, payload, tarih, dividend_id)
+
+    def record_prices(self, user_id, prices):
+        """Fiyat işaretlerini tek olay olarak ekle"""
+        if not prices:
+            return None
+        with self.db.get_connection() as conn:
+            seq = self.append(conn.cursor(), user_id, EVENT_PRICE, None,
+                              {"fiyatlar": {symbol: float(price) for symbol, price in prices.items()}})
+            conn.commit()
+            return seq
+
+    def void(self, cursor, user_id, seq):
+        """Bir olayı iptal et (olay silinmez, düzeltme olayı eklenir)"""
+        cursor.execute("SELECT occurred_at FROM ledger_events WHERE seq = ?", (seq,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return self.append(cursor, user_id, EVENT_VOID, None, {}, row[0], seq)
+
+    def void_all(self, cursor, user_id):
+        """Kullanıcı verileri silindiğinde tüm canlı olayları iptal et"""
+        with self._batching(cursor, user_id):
+            self._void_all(cursor, user_id)
+
+    def _void_all(self, cursor, user_id):
+        cursor.execute('''
+            SELECT seq FROM ledger_events e
+            WHERE e.user_id = ? AND e.event_type != 'void'
+              AND NOT EXISTS (SELECT 1 FROM ledger_events v
+                              WHERE v.user_id = e.user_id AND v.event_type = 'void' AND v.ref_id = e.seq)
+        ''', (user_id,))
+        for row in cursor.fetchall():
+            self.void(cursor, user_id, row[0])
+
+    # ========== MUTABAKAT ==========
+
+    def reconcile(self, cursor, user_id, commission_rate=0.0004):
+        """
+        transactions/dividends tablolarındaki düzenleme ve silmeleri olaylara yansıt
+
+        Kaynak satırı silinen veya değişen canlı olaylar iptal edilir; olayı
+        olmayan kaynak satırları yeni olay olarak eklenir. Satır silinip aynı
+        içerikle yeniden eklendiyse (ör. uid göndermeyen eski istemcilerin
+        senkronu) olay iptal edilmez, yalnızca yeni satıra bağlanır.
+        """
+        with self._batching(cursor, user_id):
+            return self._reconcile(cursor, user_id, commission_rate)
+
+    def _reconcile(self, cursor, user_id, commission_rate):
+        live = '''
+            NOT EXISTS (SELECT 1 FROM ledger_events v
+                        WHERE v.user_id = e.user_id AND v.event_type = 'void' AND v.ref_id = e.seq)
+        '''
+        cursor.execute(f'''
+            SELECT e.seq, e.event_type, e.sembol, e.payload FROM ledger_events e
+            LEFT JOIN transactions t ON t.id = e.ref_id AND t.user_id = e.user_id
+            WHERE e.user_id = ? AND e.event_type = 'trade' AND {live}
+              AND (t.id IS NULL OR t.sembol != e.sembol
+                   OR t.tip != json_extract(e.payload, '$.tip')
+                   OR t.adet != json_extract(e.payload, '$.adet')
+                   OR t.fiyat != json_extract(e.payload, '$.fiyat')
+                   OR IFNULL(t.komisyon, 0) != json_extract(e.payload, '$.komisyon_kayit')
+                   OR t.tarih != json_extract(e.payload, '$.tarih'))
+            UNION ALL
+            SELECT e.seq, e.event_type, e.sembol, e.payload FROM ledger_events e
+            LEFT JOIN dividends d ON d.id = e.ref_id AND d.user_id = e.user_id
+            WHERE e.user_id = ? AND e.event_type = 'dividend' AND {live}
+              AND (d.id IS NULL OR d.sembol != e.sembol
+                   OR d.tutar != json_extract(e.payload, '$.tutar')
+                   OR d.tarih != json_extract(e.payload, '$.tarih'))
+        ''', (user_id, user_id))
+        stale = cursor.fetchall()
+
+        missing_trades, missing_dividends = self._unlinked_rows(cursor, user_id, live)
+
+        # İçerik anahtarı -> olayı olmayan kaynak satırları (tarih sırasında)
+        unmatched = {}
+        for row in missing_trades:
+            key = (EVENT_TRADE, row[1], row[2], row[3], row[4], row[5] or 0, str(row[6]))
+            unmatched.setdefault(key, []).append(row[0])
+        for row in missing_dividends:
+            unmatched.setdefault((EVENT_DIVIDEND, row[1], row[2], str(row[3])), []).append(row[0])
+
+        voided = 0
+        for seq, event_type, symbol, payload in stale:
+            payload = json.loads(payload)
+            if event_type == EVENT_TRADE:
+                key = (EVENT_TRADE, symbol, payload["tip"], payload["adet"], payload["fiyat"],
+                       payload["komisyon_kayit"], payload["tarih"])
+            else:
+                key = (EVENT_DIVIDEND, symbol, payload["tutar"], payload["tarih"])
+            ids = unmatched.get(key)
+            if ids:
+                # Aynı olay: durum değişmez, yalnızca kaynak satır bağlantısı güncellenir
+                cursor.execute("UPDATE ledger_events SET ref_id = ? WHERE seq = ?", (ids.pop(0), seq))
+            else:
+                self.void(cursor, user_id, seq)
+                voided += 1
+
+        # İptal edilen veya bağlantısı taşınan olayların satırları da burada eklenir
+        missing_trades, missing_dividends = self._unlinked_rows(cursor, user_id, live)
+        for row in missing_trades:
+            self.append_trade(cursor, user_id, row[0], row[1], row[2], row[3], row[4], row[5], row[6],
+                              commission_rate)
+        for row in missing_dividends:
+            self.append_dividend(cursor, user_id, row[0], row[1], row[2], row[3])
+
+        return voided, len(missing_trades) + len(missing_dividends)
+
+    def _unlinked_rows(self, cursor, user_id, live):
+        """Canlı olayı olmayan işlem ve temettü satırları"""
+        cursor.execute(f'''
+            SELECT t.id, t.sembol, t.tip, t.adet, t.fiyat, t.komisyon, t.tarih FROM transactions t
+            WHERE t.user_id = ? AND t.tip IN ({", ".join("?" * len(BUY_TYPES + SELL_TYPES))})
+              AND NOT EXISTS (SELECT 1 FROM ledger_events e
+                              WHERE e.user_id = t.user_id AND e.event_type = 'trade'
+                                AND e.ref_id = t.id AND {live})
+            ORDER BY t.tarih, t.id
+        ''', (user_id, *BUY_TYPES, *SELL_TYPES))
+        trades = cursor.fetchall()
+
+        cursor.execute(f'''
+            SELECT d.id, d.sembol, d.tutar, d.tarih FROM dividends d
+            WHERE d.user_id = ?
+              AND NOT EXISTS (SELECT 1 FROM ledger_events e
+                              WHERE e.user_id = d.user_id AND e.event_type = 'dividend'
+                                AND e.ref_id = d.id AND {live})
+            ORDER BY d.tarih, d.id
+        ''', (user_id,))
+        return trades, cursor.fetchall()
+
+    def backfill(self, cursor, user_id, commission_rate=0.0004):
+        """Olay defteri boş olan kullanıcı için geçmişi mevcut tablolardan kur"""
+        with self._batching(cursor, user_id):
+            self._reconcile(cursor, user_id, commission_rate)
+
+            # Bölünme / bedelli kayıtları advanced_transactions'ta tutuluyordu
+            cursor.execute('''
+                SELECT sembol, tip, adet, fiyat, tarih FROM advanced_transactions
+                WHERE user_id = ? AND tip IN ('StockSplit', 'RightsIssue')
+                ORDER BY tarih, id
+            ''', (user_id,))
+            for row in cursor.fetchall():
+                if row[1] == 'StockSplit':
+                    self.append(cursor, user_id, EVENT_SPLIT, row[0], {"oran": row[2]}, row[4])
+                else:
+                    self.append(cursor, user_id, EVENT_RIGHTS, row[0],
+                                {"yeni_adet": row[2], "fiyat": row[3]}, row[4])
+
+    def backfill_all(self):
+        """Olayı olmayan tüm kullanıcılar için geçmişi aktar (ilk açılış)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT DISTINCT user_id FROM (
+                    SELECT user_id FROM transactions UNION SELECT user_id FROM dividends
+                ) WHERE user_id NOT IN (SELECT DISTINCT user_id FROM ledger_events)
+            ''')
+            users = [row[0] for row in cursor.fetchall()]
+            for user_id in users:
+                self.backfill(cursor, user_id)
+            conn.commit()
+        if users:
+            print(f"[DB] Olay defteri oluşturuldu: {len(users)} kullanıcı")
+
+    # ========== SNAPSHOT ==========
+
+    def _invalidate(self, cursor, user_id, occurred_at, inclusive=False):
+        cursor.execute(f'''
+            DELETE FROM ledger_snapshots WHERE user_id = ? AND as_of {'>=' if inclusive else '>'} ?
+        ''', (user_id, occurred_at))
+        if cursor.rowcount:
+            # Son snapshot değişti: kuyruk uzunluğu bir sonraki kararda yeniden sayılır
+            self._pending.pop(user_id, None)
+
+    def _latest_snapshot(self, cursor, user_id, as_of=None):
+        if as_of is None:
+            cursor.execute('''
+                SELECT as_of, last_seq, state FROM ledger_snapshots
+                WHERE user_id = ? ORDER BY as_of DESC, last_seq DESC LIMIT 1
+            ''', (user_id,))
+        else:
+            cursor.execute('''
+                SELECT as_of, last_seq, state FROM ledger_snapshots
+                WHERE user_id = ? AND as_of <= ? ORDER BY as_of DESC, last_seq DESC LIMIT 1
+            ''', (user_id, as_of))
+        return cursor.fetchone()
+
+    def _tail(self, cursor, user_id, after=None, as_of=None):
+        """Snapshot sınırından sonraki olaylar (occurred_at, seq) sırasında"""
+        query = "SELECT seq, event_type, sembol, ref_id, payload, occurred_at FROM ledger_events WHERE user_id = ?"
+        params = [user_id]
+        if after is not None:
+            query += " AND (occurred_at > ? OR (occurred_at = ? AND seq > ?))"
+            params += [after[0], after[0], after[1]]
+        if as_of is not None:
+            query += " AND occurred_at <= ?"
+            params.append(as_of)
+        cursor.execute(query + " ORDER BY occurred_at, seq", params)
+        return cursor.fetchall()
+
+    def _fold(self, cursor, user_id, as_of=None):
+        """En yakın snapshot + kuyruk -> (durum, son olay sınırı, uygulanan olay sayısı)"""
+        snapshot = self._latest_snapshot(cursor, user_id, as_of)
+        if snapshot:
+            state = json.loads(snapshot[2])
+            boundary = (snapshot[0], snapshot[1])
+        else:
+            state = empty_state()
+            boundary = None
+
+        events = self._tail(cursor, user_id, boundary, as_of)
+        voided = {row[3] for row in events if row[1] == EVENT_VOID}
+        for seq, event_type, symbol, _, payload, occurred_at in events:
+            if seq in voided or event_type == EVENT_VOID:
+                continue
+            apply_event(state, event_type, symbol, json.loads(payload))
+        if events:
+            boundary = (events[-1][5], events[-1][0])
+        return state, boundary, len(events)
+
+    def _maybe_snapshot(self, cursor, user_id):
+        if self._pending_count(cursor, user_id) >= self.snapshot_interval:
+            self._write_snapshot(cursor, user_id)
+
+    def _pending_count(self, cursor, user_id):
+        """Son snapshot'tan sonraki olay sayısı (yalnızca sayaç yoksa sorgulanır)"""
+        count = self._pending.get(user_id)
+        if count is None:
+            snapshot = self._latest_snapshot(cursor, user_id)
+            if snapshot:
+                cursor.execute('''
+                    SELECT COUNT(*) FROM ledger_events
+                    WHERE user_id = ? AND (occurred_at > ? OR (occurred_at = ? AND seq > ?))
+                ''', (user_id, snapshot[0], snapshot[0], snapshot[1]))
+            else:
+                cursor.execute("SELECT COUNT(*) FROM ledger_events WHERE user_id = ?", (user_id,))
+            count = self._pending[user_id] = cursor.fetchone()[0]
+        return count
+
+    def _write_snapshot(self, cursor, user_id):
+        state, boundary, _ = self._fold(cursor, user_id)
+        if boundary is None:
+            return
+        cursor.execute('''
+            INSERT INTO ledger_snapshots (user_id, as_of, last_seq, state)
+            VALUES (?, ?, ?, ?)
+        ''', (user_id, boundary[0], boundary[1], json.dumps(state, ensure_ascii=False)))
+        self._pending[user_id] = 0
+
+    def snapshot(self, user_id):
+        """Şu anki durumu snapshot olarak kaydet"""
+        with self.db.get_connection() as conn:
+            self._write_snapshot(conn.cursor(), user_id)
+            conn.commit()
+
+    # ========== OKUMA ==========
+
+    def get_state(self, user_id, as_of=None, cursor=None):
+        """Şimdiki (veya as_of anındaki) portföy durumu: en yakın snapshot + kuyruk"""
+        as_of = normalize_time(as_of) if as_of else None
+        if cursor is not None:
+            return self._fold(cursor, user_id, as_of)[0]
+        with self.db.get_connection() as conn:
+            state, _, _ = self._fold(conn.cursor(), user_id, as_of)
+        return state
+
+    def get_positions(self, user_id, as_of=None, cursor=None):
+        """Durumu get_portfolio biçiminde listele (adet > 0)"""
+        positions = []
+        for symbol, pos in sorted(self.get_state(user_id, as_of, cursor)["positions"].items()):
+            if pos["adet"] <= EPS:
+                continue
+            ort_maliyet = pos["maliyet"] / pos["adet"]
+            positions.append({
+                "sembol": symbol,
+                "adet": pos["adet"],
+                "ort_maliyet": ort_maliyet,
+                "guncel_fiyat": pos["fiyat"] if pos["fiyat"] is not None else ort_maliyet,
+                "gerceklesen_kar": pos["kar"],
+                "temettu": pos["temettu"],
+            })
+        return positions
+
+    def events_since(self, user_id, since_seq=0, limit=1000):
+        """seq'i since_seq'ten büyük olaylar (senkronizasyon için)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT seq, event_type, sembol, ref_id, payload, occurred_at, created_at
+                FROM ledger_events
+                WHERE user_id = ? AND seq > ?
+                ORDER BY seq LIMIT ?
+            ''', (user_id, since_seq, limit))
+            events = []
+            for row in cursor.fetchall():
+                event = dict(row)
+                event["payload"] = json.loads(event["payload"])
+                events.append(event)
+            return events
@@ -53,10 +53,19 @@ from integration_manager import IntegrationManager
 try:
     from utils.settings_manager import SettingsManager
     from utils.backup_manager import BackupManager
+    from utils.db_maintenance import DatabaseMaintenance
 except ImportError as e:
     print(f"Modül import hatası: {e}")
     SettingsManager = None
     BackupManager = None
+    DatabaseMaintenance = None
+
+# Bulut fiyat önbelleği
+try:
+    from utils.api_manager import CloudQuoteProvider
+except ImportError as e:
+    print(f"Modül import hatası: {e}")
+    CloudQuoteProvider = None
 
 # Price Alert Manager - YENİ
 try:
@@ -97,9 +106,15 @@ class HisseTakipProgrami(ctk.CTk):
         self.auth = AuthService(self.db)
         self.api = APIService()
         self.cloud_sync = CloudSync(self.db)
+        # Senkron açıkken fiyatlar sunucunun paylaşılan önbelleğinden (tek istek)
+        self.quote_provider = CloudQuoteProvider(self.cloud_sync) if CloudQuoteProvider else None
         self.integration_manager = IntegrationManager(self.db)
         self.credentials_manager = CredentialsManager()
         
+        # Sembol indeksini arka planda hazırla (ilk öneri anında gelsin)
+        from utils.symbol_index import get_symbol_index
+        threading.Thread(target=get_symbol_index, daemon=True).start()
+        
         # Kullanıcı oturumu
         self.current_user_id = None
         self.current_token = None
@@ -110,12 +125,23 @@ class HisseTakipProgrami(ctk.CTk):
         else:
             self.settings_manager = None
         
+        # Debug modunda DB sorgu profilleme
+        if self.settings_manager and self.settings_manager.get("debug_mode", False) and not self.db.profiler:
+            self.db.enable_profiling(slow_log_path=os.path.join(LOG_DIR, "slow_queries.log"))
+        
         # Backup Manager
         if BackupManager and self.settings_manager:
             self.backup_manager = BackupManager(self.db, self.settings_manager)
         else:
             self.backup_manager = None
         
+        # Veritabanı bakımı (ANALYZE/optimize/vakum - sadece boşta)
+        if DatabaseMaintenance:
+            self.db_maintenance = DatabaseMaintenance(self.db)
+            self.db_maintenance.start()
+        else:
+            self.db_maintenance = None
+        
         # Price Alert Manager - YENİ
         if PriceAlertManager:
             self.alert_manager = PriceAlertManager(self.db, self.settings_manager)
@@ -164,6 +190,10 @@ class HisseTakipProgrami(ctk.CTk):
         # Cloud sync ayarla
         self.cloud_sync.set_credentials(self.current_user_id, self.current_token)
         
+        # JSON geri yükleme doğru kullanıcıya yazılsın
+        if self.backup_manager:
+            self.backup_manager.user_id = self.current_user_id
+        
         # Ana uygulamayı başlat
         self.init_main_app()
     
@@ -255,30 +285,31 @@ class HisseTakipProgrami(ctk.CTk):
         
         class PriceProvider:
             """Fiyat sağlayıcı"""
-            def __init__(self, api_service, db, user_id):
+            def __init__(self, api_service, db, user_id, quote_provider=None):
                 self.api = api_service
                 self.db = db
                 self.user_id = user_id
+                self.quote_provider = quote_provider
             
             def get_current_prices(self, symbols):
-                """Güncel fiyatları al"""
-                prices = {}
-                
-                import yfinance as yf
-                for symbol in symbols:
-                    try:
-                        stock = yf.Ticker(symbol + ".IS")
-                        hist = stock.history(period="1d")
-                        
-                        if not hist.empty:
-                            prices[symbol] = float(hist['Close'].iloc[-1])
-                    except Exception as e:
-                        print(f"Fiyat alma hatası ({symbol}): {e}")
+                """
+                Güncel fiyatları al: senkron açıksa bulut önbelleğinden, bulunamayanlar
+                yerelden (bugünün barı daily_prices'a yazılır, oradan okunur)
+                """
+                from utils.price_store import get_price_store
                 
-                return prices
+                try:
+                    prices = self.quote_provider.get_stock_prices(symbols) if self.quote_provider else {}
+                    missing = [s for s in symbols if s not in prices]
+                    if missing:
+                        prices.update(get_price_store(self.db).refresh_latest(missing))
+                    return prices
+                except Exception as e:
+                    print(f"Fiyat alma hatası: {e}")
+                    return {}
         
         # Provider oluştur
-        provider = PriceProvider(self.api, self.db, self.current_user_id)
+        provider = PriceProvider(self.api, self.db, self.current_user_id, self.quote_provider)
         
         # İzlemeyi başlat (30 saniyede bir kontrol)
         interval = 30
@@ -382,30 +413,37 @@ class HisseTakipProgrami(ctk.CTk):
             if not portfolio:
                 return
             
-            import yfinance as yf
-            updated_count = 0
+            symbols = [stock['sembol'] for stock in portfolio]
+            # Senkron açıksa tüm semboller sunucunun önbelleğinden tek istekte
+            prices = self.quote_provider.get_stock_prices(symbols) if self.quote_provider else {}
+            missing = [s for s in symbols if s not in prices]
             
-            for stock in portfolio:
+            if missing:
+                import yfinance as yf
+            
+            for symbol in missing:
                 try:
-                    ticker = yf.Ticker(f"{stock['sembol']}.IS")
+                    ticker = yf.Ticker(f"{symbol}.IS")
                     hist = ticker.history(period="1d")
                     
                     if not hist.empty:
-                        new_price = float(hist['Close'].iloc[-1])
-                        
-                        # Veritabanını güncelle
-                        with self.db.get_connection() as conn:
-                            cursor = conn.cursor()
-                            cursor.execute('''
-                                UPDATE portfolios 
-                                SET guncel_fiyat = ?, updated_at = CURRENT_TIMESTAMP
-                                WHERE sembol = ? AND user_id = ?
-                            ''', (new_price, stock['sembol'], self.current_user_id))
-                        
-                        updated_count += 1
+                        prices[symbol] = float(hist['Close'].iloc[-1])
                 
                 except Exception as e:
-                    print(f"Fiyat güncellemesi hatası ({stock['sembol']}): {e}")
+                    print(f"Fiyat güncellemesi hatası ({symbol}): {e}")
+            
+            # Veritabanını güncelle
+            with self.db.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.executemany('''
+                    UPDATE portfolios 
+                    SET guncel_fiyat = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE sembol = ? AND user_id = ?
+                ''', [(price, symbol, self.current_user_id) for symbol, price in prices.items()])
+            updated_count = len(prices)
+            
+            # Fiyat işaretlerini olay defterine tek olay olarak yaz
+            self.db.ledger.record_prices(self.current_user_id, prices)
             
             # Sayfayı yenile
             if updated_count > 0:
@@ -808,15 +846,17 @@ class HisseTakipProgrami(ctk.CTk):
                     'reload_app': self.reload_app,
                     'get_settings_manager': lambda: self.settings_manager,
                     'get_backup_manager': lambda: self.backup_manager,
+                    'get_db_maintenance': lambda: self.db_maintenance,
                     'get_cloud_sync': lambda: self.cloud_sync,
                     'get_api_service': lambda: self.api,
                     'user_id': self.current_user_id
                 }
                 page_instance = SettingsPage(self.main_frame, self.db, app_callbacks)
             
-            # Sayfayı oluştur
+            # Sayfayı oluştur (profilleme açıksa DB maliyeti sayfa adıyla toplanır)
             if page_instance:
-                page_instance.create()
+                with self.db.profile_scope(f"page:{page_name}"):
+                    page_instance.create()
         
         except Exception as e:
             print(f"Sayfa oluşturma hatası ({page_name}): {e}")
@@ -918,6 +958,13 @@ class HisseTakipProgrami(ctk.CTk):
             # Auto-update'i durdur
             self.auto_update_running = False
             
+            # Bakım zamanlayıcısını durdur
+            if self.db_maintenance:
+                self.db_maintenance.stop()
+            
+            # Senkron işçisini durdur (gönderilmeyenler sync_changes'te kalır)
+            self.cloud_sync.stop_auto_sync()
+            
             # Alarm izlemeyi durdur
             if self.alert_manager:
                 self.alert_manager.stop_monitoring()
@@ -935,6 +982,13 @@ class HisseTakipProgrami(ctk.CTk):
             print(f"Kapatma işlemi hatası: {e}")
         
         finally:
+            # DB profil istatistiklerini kaydet
+            if self.db.profiler:
+                try:
+                    self.db.profiler.print_report()
+                    self.db.dump_query_stats(os.path.join(LOG_DIR, "db_stats.json"))
+                except Exception as e:
+                    print(f"DB istatistik kaydı hatası: {e}")
             self.destroy()
 
 
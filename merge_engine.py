@@ -0,0 +1,275 @@
+# merge_engine.py
+"""
+Satır Birleştirme Motoru - alan bazında son yazan kazanır (HLC) + mezar taşları
+
+Her senkronlanan satır için iki tür saat tutulur:
+
+    sync_field_clocks   (tablo, anahtar, alan) -> alanın son yazılma saati
+    sync_row_clocks     (tablo, anahtar)       -> varlık saati + silindi mi
+
+Saat biçimi "<mantıksal ms, 15 hane>:<cihaz kimliği>"; metin olarak
+karşılaştırılabilir. Mantıksal ms hibrit mantıksal saattir (HLC): yerel
+yazmada max(fiziksel ms, son değer + 1), uzak saat görülünce en az onun
+kadar ileri alınır. Eşitlikte cihaz kimliği belirler, sonuç her yerde aynıdır.
+
+Yerel yazmaların saatlerini sync_log tetikleyicileri yazar (trigger_sql);
+uzak değişiklikler merge() ile yalnızca daha yeni saatli alanlar için
+uygulanır. Silme, satırın varlık saatinden yeniyse kazanır; aynı anahtarla
+yeniden ekleme mezar taşından yeniyse satırı geri getirir.
+"""
+
+NOW_MS = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+# Uzak değişiklik uygulanırken (apply_origin ayarlı) tetikleyiciler saat yazmaz;
+# toplu tam kopyada stamp_clocks da ayarlanır, satırlar yerel yazma gibi damgalanır
+STAMP_KEY = "stamp_clocks"
+LOCAL = ("((SELECT value FROM sync_meta WHERE key = 'apply_origin') IS NULL "
+         f"OR EXISTS (SELECT 1 FROM sync_meta WHERE key = '{STAMP_KEY}'))")
+
+CLOCK = ("printf('%015d:%s', (SELECT value FROM sync_meta WHERE key = 'hlc'), "
+         "(SELECT value FROM sync_meta WHERE key = 'device_id'))")
+
+TICK = f"UPDATE sync_meta SET value = MAX(CAST(value AS INTEGER) + 1, {NOW_MS}) WHERE key = 'hlc' AND {LOCAL};"
+
+
+def pack(ms, node):
+    return f"{int(ms):015d}:{node}"
+
+
+def logical_ms(clock):
+    return int(clock.split(":", 1)[0]) if clock else 0
+
+
+# ========== ŞEMA ==========
+
+def install(cursor, tracked_tables, device_id):
+    """Saat tablolarını oluştur; ilk kurulumda mevcut satırlara en eski saati ver"""
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_field_clocks'")
+    first_install = cursor.fetchone() is None
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_field_clocks (
+            user_id INTEGER NOT NULL,
+            tbl TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            field TEXT NOT NULL,
+            hlc TEXT NOT NULL,
+            PRIMARY KEY (user_id, tbl, row_key, field)
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_row_clocks (
+            user_id INTEGER NOT NULL,
+            tbl TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            hlc TEXT NOT NULL,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, tbl, row_key)
+        ) WITHOUT ROWID
+    ''')
+
+    cursor.execute("INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('hlc', '0')")
+
+    if first_install:
+        # Önceden var olan veriler her gerçek düzenlemeye yenilir
+        origin = pack(0, device_id)
+        for table, (key_column, columns) in tracked_tables.items():
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO sync_row_clocks (user_id, tbl, row_key, hlc)
+                SELECT user_id, '{table}', {key_column}, ? FROM {table}
+                WHERE {key_column} IS NOT NULL
+            ''', (origin,))
+            cursor.execute(f'''
+                INSERT OR IGNORE INTO sync_field_clocks (user_id, tbl, row_key, field, hlc)
+                SELECT user_id, '{table}', {key_column}, f.field, ? FROM {table},
+                    ({_field_list(columns)}) AS f
+                WHERE {key_column} IS NOT NULL
+            ''', (origin,))
+
+
+def _field_list(columns, changed=False):
+    """Alan adlarını satır olarak veren alt sorgu; changed=True ise yalnızca değişenler"""
+    parts = []
+    for column in columns:
+        where = f" WHERE OLD.{column} IS NOT NEW.{column}" if changed else ""
+        parts.append(f"SELECT '{column}' AS field{where}")
+    return " UNION ALL ".join(parts)
+
+
+def _set_row_clock(table, user_expr, key_expr, deleted, condition=""):
+    return f'''
+        DELETE FROM sync_row_clocks
+        WHERE user_id = {user_expr} AND tbl = '{table}' AND row_key = {key_expr} AND {LOCAL} {condition};
+        INSERT INTO sync_row_clocks (user_id, tbl, row_key, hlc, deleted)
+        SELECT {user_expr}, '{table}', {key_expr}, {CLOCK}, {deleted} WHERE {LOCAL} {condition};
+    '''
+
+
+def _set_field_clocks(table, user_expr, key_expr, fields):
+    return f'''
+        DELETE FROM sync_field_clocks
+        WHERE user_id = {user_expr} AND tbl = '{table}' AND row_key = {key_expr}
+            AND field IN ({fields}) AND {LOCAL};
+        INSERT INTO sync_field_clocks (user_id, tbl, row_key, field, hlc)
+        SELECT {user_expr}, '{table}', {key_expr}, field, {CLOCK} FROM ({fields}) WHERE {LOCAL};
+    '''
+
+
+def trigger_sql(table, key_column, columns, event, key_expr=None):
+    """
+    Yerel yazmada saatleri güncelleyen tetikleyici gövdesi parçası
+
+    event: 'insert' | 'update' | 'delete'. key_expr INSERT'te üretilen uid için.
+    """
+    if event == "insert":
+        key_expr = key_expr or f"NEW.{key_column}"
+        return (TICK + _set_row_clock(table, "NEW.user_id", key_expr, 0)
+                + _set_field_clocks(table, "NEW.user_id", key_expr, _field_list(columns)))
+
+    if event == "update":
+        key_changed = f"OLD.{key_column} IS NOT NEW.{key_column}"
+        # Anahtar değiştiyse eski anahtar silinmiş, yenisi baştan eklenmiş sayılır
+        fields = f"SELECT field FROM ({_field_list(columns)}) WHERE {key_changed} " \
+                 f"UNION {_field_list(columns, changed=True)}"
+        return (TICK
+                + _set_row_clock(table, "OLD.user_id", f"OLD.{key_column}", 1, f"AND {key_changed}")
+                + _set_row_clock(table, "NEW.user_id", f"NEW.{key_column}", 0, f"AND {key_changed}")
+                + _set_field_clocks(table, "NEW.user_id", f"NEW.{key_column}", fields))
+
+    return TICK + _set_row_clock(table, "OLD.user_id", f"OLD.{key_column}", 1)
+
+
+# ========== SAATLERİ OKUMA ==========
+
+def attach_clocks(cursor, user_id, table, changes):
+    """upsert'lere alan saatlerini ve varlık saatini, delete'lere mezar taşı saatini ekle"""
+    keys = [change["key"] for change in changes]
+    fields, rows = {}, {}
+    for start in range(0, len(keys), 500):
+        chunk = keys[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cursor.execute(f'''
+            SELECT row_key, field, hlc FROM sync_field_clocks
+            WHERE user_id = ? AND tbl = ? AND row_key IN ({placeholders})
+        ''', (user_id, table, *chunk))
+        for key, field, clock in cursor.fetchall():
+            fields.setdefault(key, {})[field] = clock
+        cursor.execute(f'''
+            SELECT row_key, hlc FROM sync_row_clocks
+            WHERE user_id = ? AND tbl = ? AND row_key IN ({placeholders})
+        ''', (user_id, table, *chunk))
+        rows.update(cursor.fetchall())
+
+    for change in changes:
+        key = change["key"]
+        if change["op"] == "delete":
+            change["hlc"] = rows.get(key, "")
+        else:
+            change["clocks"] = fields.get(key, {})
+            change["row_hlc"] = rows.get(key, "")
+
+
+# ========== BİRLEŞTİRME ==========
+
+def merge(cursor, user_id, table, key_column, columns, change):
+    """
+    Saatli uzak değişikliği yerel satırla birleştir
+
+    Dönüş: (uygulandı mı, yerelde daha yeni alan kaldı mı). İkincisi True ise
+    çağıran satırı yeniden yerel değişiklik olarak işaretlemeli ki birleşmiş
+    hali karşı tarafa da gitsin.
+    """
+    key = change["key"]
+    cursor.execute("SELECT hlc, deleted FROM sync_row_clocks WHERE user_id = ? AND tbl = ? AND row_key = ?",
+                   (user_id, table, key))
+    local_row = cursor.fetchone()
+    local_row_clock = local_row[0] if local_row else ""
+
+    if change.get("op") == "delete":
+        remote_clock = change.get("hlc") or ""
+        if remote_clock <= local_row_clock:
+            # Satır silmeden sonra (yeniden) eklenmiş
+            return False, bool(local_row and not local_row[1])
+        cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND {key_column} = ?", (user_id, key))
+        _store_row_clock(cursor, user_id, table, key, remote_clock, 1)
+        return True, False
+
+    row = dict(change.get("row") or {})
+    row[key_column] = key
+    remote_clocks = change.get("clocks") or {}
+    remote_row_clock = change.get("row_hlc") or ""
+    present = [column for column in columns if column in row]
+
+    cursor.execute(f"SELECT {', '.join(present)} FROM {table} WHERE user_id = ? AND {key_column} = ?",
+                   (user_id, key))
+    existing = cursor.fetchone()
+
+    if existing is None:
+        if local_row and local_row[1] and local_row_clock >= remote_row_clock:
+            # Mezar taşı daha yeni: silme kazanır
+            return False, True
+        cursor.execute(f'''
+            INSERT INTO {table} (user_id, {", ".join(present)})
+            VALUES (?, {", ".join("?" * len(present))})
+        ''', (user_id, *(row[column] for column in present)))
+        _store_row_clock(cursor, user_id, table, key, remote_row_clock, 0)
+        _store_field_clocks(cursor, user_id, table, key,
+                            {column: remote_clocks.get(column, "") for column in present})
+        return True, False
+
+    cursor.execute("SELECT field, hlc FROM sync_field_clocks WHERE user_id = ? AND tbl = ? AND row_key = ?",
+                   (user_id, table, key))
+    local_clocks = dict(cursor.fetchall())
+
+    won, local_newer = {}, False
+    for i, column in enumerate(present):
+        if column == key_column:
+            continue
+        remote_clock, local_clock = remote_clocks.get(column, ""), local_clocks.get(column, "")
+        if remote_clock > local_clock:
+            won[column] = remote_clock
+        elif local_clock > remote_clock and existing[i] != row[column]:
+            local_newer = True
+    changed = [column for column in won if existing[present.index(column)] != row[column]]
+
+    if changed:
+        cursor.execute(f'''
+            UPDATE {table} SET {", ".join(f"{column} = ?" for column in changed)}
+            WHERE user_id = ? AND {key_column} = ?
+        ''', (*(row[column] for column in changed), user_id, key))
+    if won:
+        _store_field_clocks(cursor, user_id, table, key, won)
+    if remote_row_clock > local_row_clock:
+        _store_row_clock(cursor, user_id, table, key, remote_row_clock, 0)
+    return bool(changed), local_newer
+
+
+def change_clocks(change):
+    """Değişikliğin taşıdığı tüm saatler: alan saatleri, varlık saati, mezar taşı"""
+    yield change.get("hlc")
+    yield change.get("row_hlc")
+    yield from (change.get("clocks") or {}).values()
+
+
+def observe(cursor, clocks):
+    """Uzak saatleri gör: yerel HLC en az en büyüğü kadar ileri alınır"""
+    latest = max((logical_ms(clock) for clock in clocks if clock), default=0)
+    if latest:
+        cursor.execute('''
+            UPDATE sync_meta SET value = MAX(CAST(value AS INTEGER), ?) WHERE key = 'hlc'
+        ''', (latest,))
+
+
+def _store_row_clock(cursor, user_id, table, key, clock, deleted):
+    cursor.execute('''
+        INSERT OR REPLACE INTO sync_row_clocks (user_id, tbl, row_key, hlc, deleted)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, table, key, clock, deleted))
+
+
+def _store_field_clocks(cursor, user_id, table, key, clocks):
+    cursor.executemany('''
+        INSERT OR REPLACE INTO sync_field_clocks (user_id, tbl, row_key, field, hlc)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(user_id, table, key, field, clock) for field, clock in clocks.items()])
@@ -285,6 +285,9 @@ class AdvancedAnalysisPage:
         self.tax_costs_entry = ctk.CTkEntry(form_frame, placeholder_text="0.00")
         self.tax_costs_entry.pack(fill="x", padx=15, pady=(0, 15))
         
+        # Vergi lotlarından bu yılın değerlerini doldur
+        self.prefill_tax_entries()
+        
         # Hesapla butonu
         calc_btn = ctk.CTkButton(
             form_frame,
@@ -403,6 +406,18 @@ Toplam Simülasyon: {result['simulasyon_sayisi']:,}
         except Exception as e:
             showerror("Hata", str(e))
     
+    def prefill_tax_entries(self):
+        """Gerçekleşen/gerçekleşmemiş kazancı tax_lots tablosundan al"""
+        try:
+            summary = self.db.get_realized_gain_summary(datetime.now().year, user_id=self.current_user_id)
+            open_lots = self.db.get_open_lots(user_id=self.current_user_id)
+            unrealized = sum(lot['unrealized'] for lot in open_lots)
+            
+            self.tax_realized_entry.insert(0, f"{summary['toplam']:.2f}")
+            self.tax_unrealized_entry.insert(0, f"{unrealized:.2f}")
+        except Exception as e:
+            print(f"Vergi lotları okunamadı: {e}")
+    
     def run_tax_optimization(self):
         """Vergi optimizasyonu çalıştır"""
         try:
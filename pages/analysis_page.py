@@ -11,6 +11,7 @@ import matplotlib.pyplot as plt
 # Hata yönetimli import
 try:
     from utils.metrics import PortfolioMetrics
+    from utils.price_store import get_price_store
     from utils.sector_mapper import get_all_sectors
     from utils.whatif_dialog import WhatIfDialog
     from utils.export_utils import export_to_txt, export_to_json, export_to_html
@@ -19,7 +20,7 @@ except ImportError as e:
     
     # Basit placeholder sınıflar
     class PortfolioMetrics:
-        def __init__(self, portfolio, transactions):
+        def __init__(self, portfolio, transactions, price_store=None):
             self.portfolio = portfolio
             self.transactions = transactions
         
@@ -32,6 +33,7 @@ except ImportError as e:
         def get_portfolio_composition(self): return []
     
     def get_all_sectors(portfolio): return {"Diğer": portfolio}
+    def get_price_store(db): return None
     
     # Export Utils placeholder
     def export_to_txt(data, title="Rapor", show_dialog=True): pass
@@ -74,6 +76,7 @@ class AnalysisPage:
         self.filtered_portfolio = []
         self.transactions = []
         self.metrics = None
+        self.price_store = get_price_store(db)
         
         # Filtre değişkenleri
         self.period_var = None
@@ -114,7 +117,7 @@ class AnalysisPage:
             self.transactions = self.db.get_transactions()
             
             if self.portfolio:
-                self.metrics = PortfolioMetrics(self.portfolio, self.transactions)
+                self.metrics = PortfolioMetrics(self.portfolio, self.transactions, self.price_store)
         except Exception as e:
             print(f"Veri yükleme hatası: {e}")
             self.portfolio = []
@@ -596,7 +599,8 @@ class AnalysisPage:
             
             if len(self.portfolio) >= 2:
                 try:
-                    HeatmapChart(corr_frame, self.theme).create_correlation_matrix(self.portfolio)
+                    HeatmapChart(corr_frame, self.theme).create_correlation_matrix(
+                        self.portfolio, price_store=self.price_store)
                 except Exception as corr_error:
                     print(f"Korelasyon matrisi oluşturma hatası: {corr_error}")
                     ctk.CTkLabel(corr_frame, text="Korelasyon matrisi oluşturulamadı",
@@ -824,7 +828,7 @@ class AnalysisPage:
                 self.filtered_portfolio = [s for s in self.portfolio if s['sembol'] == selected_stock]
             
             if self.filtered_portfolio:
-                self.metrics = PortfolioMetrics(self.filtered_portfolio, self.transactions)
+                self.metrics = PortfolioMetrics(self.filtered_portfolio, self.transactions, self.price_store)
         except Exception as e:
             print(f"Portföy filtreleme hatası: {e}")
             self.filtered_portfolio = self.portfolio.copy()
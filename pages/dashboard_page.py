@@ -7,7 +7,7 @@ from datetime import datetime
 import random
 import threading
 from config import COLORS
-from ui_utils import showinfo, showerror, askyesno
+from ui_utils import showinfo, showerror, askyesno, SymbolSuggestions
 
 def normalize_symbol(text):
     """Türkçe karakterleri İngilizce'ye çevir ve büyük harf yap"""
@@ -173,6 +173,7 @@ class DashboardPage:
                 entries["sembol"].icursor(min(cursor_pos, len(normalized)))
         
         entries["sembol"].bind("<KeyRelease>", on_symbol_change)
+        SymbolSuggestions(entries["sembol"], kinds=("bist",))
         
         summary_frame = ctk.CTkFrame(main_frame, fg_color=("gray85", "gray20"), corner_radius=10)
         summary_frame.pack(fill="x", pady=(20, 15))
@@ -2,7 +2,7 @@
 
 import customtkinter as ctk
 from config import COLORS
-from ui_utils import showinfo, showerror, askyesno
+from ui_utils import showinfo, showerror, askyesno, SymbolSuggestions
 from utils.price_alert_manager import PriceAlertManager
 from datetime import datetime
 
@@ -322,6 +322,7 @@ class PriceAlertPage:
                                     placeholder_text="Örn: THYAO")
         symbol_entry.pack(pady=(5, 15))
         symbol_entry.focus()
+        SymbolSuggestions(symbol_entry, kinds=("bist",))
         
         # Hedef Fiyat
         ctk.CTkLabel(content, text="Hedef Fiyat (₺):", 
@@ -224,6 +224,12 @@ class SettingsPage:
             from utils.backup_manager import BackupManager
             self.backup_manager = BackupManager(db, self.settings_manager)
         
+        # Veritabanı bakım servisi (yoksa istatistikler gösterilmez)
+        if 'get_db_maintenance' in app_callbacks:
+            self.db_maintenance = app_callbacks['get_db_maintenance']()
+        else:
+            self.db_maintenance = None
+        
         # Credentials yöneticisini al
         try:
             from credentials_manager import CredentialsManager
@@ -233,7 +239,8 @@ class SettingsPage:
         
         # Security ve API yöneticileri
         self.secure_settings = SecureSettings() if SecureSettings else None
-        self.api_manager = APIManager(self.settings_manager) if APIManager else None
+        cloud_sync = app_callbacks['get_cloud_sync']() if 'get_cloud_sync' in app_callbacks else None
+        self.api_manager = APIManager(self.settings_manager, cloud_sync=cloud_sync) if APIManager else None
         self.validator = SettingsValidator() if SettingsValidator else None
         
         self.settings = self.settings_manager.settings
@@ -555,6 +562,68 @@ class SettingsPage:
                         text=f"Mevcut önbellek boyutu: {size_mb:.2f} MB",
                         font=ctk.CTkFont(size=11),
                         text_color=("gray50", "gray70")).pack(anchor="w", pady=(5, 0))
+        
+        if self.db_maintenance:
+            self._create_db_maintenance_section()
+    
+    def _create_db_maintenance_section(self):
+        """Veritabanı boyutu, parçalanma ve son bakım zamanları"""
+        self.create_setting_group("Veritabanı")
+        
+        db_frame = ctk.CTkFrame(self.settings_container, fg_color="transparent")
+        db_frame.pack(fill="x", pady=10)
+        
+        status = ctk.CTkLabel(db_frame, text="İstatistikler hesaplanıyor...",
+                             font=ctk.CTkFont(size=11),
+                             text_color=("gray50", "gray70"))
+        status.pack(anchor="w")
+        
+        ctk.CTkButton(db_frame, text="🧹 Şimdi Bakım Yap",
+                     command=self.run_db_maintenance, width=200, height=40).pack(side="bottom", anchor="w", pady=(10, 0))
+        
+        # Nesne boyutları ve satır sayımı tüm tabloları tarar: arayüz thread'i dışında
+        def load():
+            try:
+                stats, error = self.db_maintenance.stats(), None
+            except Exception as e:
+                stats, error = None, e
+            self.parent.after(0, lambda: show(stats, error))
+        
+        def show(stats, error):
+            if not db_frame.winfo_exists():
+                return
+            if error is not None:
+                status.configure(text=f"İstatistikler okunamadı: {error}")
+                return
+            status.destroy()
+            
+            lines = [
+                f"Dosya boyutu: {stats['file_size'] / (1024 * 1024):.2f} MB"
+                + (f" (WAL: {stats['wal_size'] / 1024:.0f} KB)" if stats['wal_size'] else ""),
+                f"Boş sayfa: {stats['freelist_count']} / {stats['page_count']} "
+                f"(%{stats['fragmentation'] * 100:.1f} parçalanma, {stats['free_bytes'] / 1024:.0f} KB)",
+                f"Otomatik vakum: {stats['auto_vacuum']} | Günlük modu: {stats['journal_mode']}",
+            ]
+            
+            if stats['objects']:
+                largest = ", ".join(f"{o['name']} {o['size'] / 1024:.0f} KB" for o in stats['objects'][:5])
+                lines.append(f"En büyük tablo/indeksler: {largest}")
+            
+            lines.append("Eski istatistikler: " + (", ".join(stats['stale_tables']) or "yok"))
+            
+            last_runs = stats['last_runs']
+            if last_runs:
+                lines.append("Son bakım: " + ", ".join(
+                    f"{task} {when.replace('T', ' ')}" for task, when in sorted(last_runs.items())))
+            else:
+                lines.append("Son bakım: henüz çalışmadı")
+            
+            for line in lines:
+                ctk.CTkLabel(db_frame, text=line,
+                            font=ctk.CTkFont(size=11),
+                            text_color=("gray50", "gray70")).pack(anchor="w", pady=(2, 0))
+        
+        threading.Thread(target=load, daemon=True).start()
     
     def create_notifications_settings(self):
         """Bildirim ayarları"""
@@ -2105,19 +2174,60 @@ class SettingsPage:
     
     @handle_errors(show_error=True)
     def backup_now(self):
-        """Manuel yedekleme"""
-        backup_path = self.backup_manager.create_backup(auto=False)
-        if backup_path:
-            showinfo("Başarılı", f"✓ Yedek başarıyla alındı!\n\n{os.path.basename(backup_path)}")
-            # Sayfayı yenile (yedek listesini güncelle)
-            if self.active_category == "backup":
-                self.show_category("backup")
+        """Manuel yedekleme - online backup arka planda, arayüz donmaz"""
+        loading = LoadingDialog(self.parent, "Yedek alınıyor...")
+        
+        def run_backup():
+            backup_path = self.backup_manager.create_backup(auto=False)
+            
+            def finish():
+                try:
+                    loading.safe_destroy()
+                except:
+                    pass
+                if backup_path:
+                    showinfo("Başarılı", f"✓ Yedek başarıyla alındı!\n\n{os.path.basename(backup_path)}")
+                    # Sayfayı yenile (yedek listesini güncelle)
+                    if self.active_category == "backup":
+                        self.show_category("backup")
+                else:
+                    showerror("Hata", "Yedek alınamadı!")
+            
+            self.parent.after(100, finish)
+        
+        thread = threading.Thread(target=run_backup, daemon=True)
+        thread.start()
+    
+    @handle_errors(show_error=True)
+    def run_db_maintenance(self):
+        """Bakımı boşta beklemeden arka planda çalıştır"""
+        loading = LoadingDialog(self.parent, "Veritabanı bakımı yapılıyor...")
+        
+        def run():
+            done = self.db_maintenance.run_due(force=True)
+            
+            def finish():
+                try:
+                    loading.safe_destroy()
+                except:
+                    pass
+                if done:
+                    showinfo("Başarılı", f"✓ Bakım tamamlandı!\n\n{', '.join(done)}")
+                else:
+                    showinfo("Bilgi", "Bakım şu anda yapılamadı, daha sonra tekrar deneyin.")
+                if self.active_category == "data":
+                    self.show_category("data")
+            
+            self.parent.after(100, finish)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
     
     @handle_errors(show_error=True)
     def restore_backup(self):
         """Yedeği geri yükle"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON", "*.json"), ("All Files", "*.*")],
+            filetypes=[("Snapshot", "*.manifest"), ("SQLite Yedeği", "*.db"), ("JSON", "*.json"), ("All Files", "*.*")],
             title="Yedek Dosyası Seçin"
         )
         
@@ -10,6 +10,18 @@ import numpy as np
 import pandas as pd
 from config import COLORS
 import threading
+from utils.price_store import get_price_store
+from ui_utils import SymbolSuggestions
+
+# yfinance dönem kodlarının gün karşılıkları (daily_prices okuması için)
+PERIOD_DAYS = {
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "5y": 5 * 366,
+    "max": 30 * 366
+}
 
 # Mplfinance (opsiyonel - mum grafiği için)
 try:
@@ -30,6 +42,7 @@ class StockHistoryPage:
         self.stock_symbol = None
         self.stock_data = None
         self.chart_period = "1y"  # Varsayılan: 1 yıl
+        self.price_store = get_price_store(db)
         
         # Grafikler ve widget'lar
         self.stock_selector = None
@@ -172,6 +185,7 @@ class StockHistoryPage:
         entry = ctk.CTkEntry(dialog, width=250, height=35, font=ctk.CTkFont(size=14))
         entry.pack(pady=10)
         entry.focus()
+        SymbolSuggestions(entry, kinds=("bist",), limit=4)
         
         def on_submit():
             symbol = entry.get().strip().upper()
@@ -222,8 +236,8 @@ class StockHistoryPage:
             # Hisse bilgilerini al
             info = ticker.info
             
-            # Fiyat geçmişini al
-            hist = ticker.history(period=self.chart_period)
+            # Fiyat geçmişini yerel daily_prices tablosundan al (eksik günler ağdan tamamlanır)
+            hist = self.price_store.get_frame(self.stock_symbol, PERIOD_DAYS.get(self.chart_period, 365))
             
             if hist.empty:
                 raise Exception("Hisse verisi bulunamadı. Hisse kodu doğru mu kontrol edin.")
@@ -0,0 +1,155 @@
+# password_hasher.py
+"""
+Şifre Hash'leme - ayarlanabilir iş faktörü, süreç havuzu ve giriş kısıtlama
+
+Hash biçimi:  pbkdf2_sha256$<iterasyon>$<salt>$<hex>
+Eski biçim:   <salt>$<hex>  (100000 iterasyon kabul edilir)
+
+Giriş başarılı olduğunda hash mevcut iterasyon sayısıyla üretilmemişse
+needs_rehash() True döner ve AuthService hash'i sessizce yeniler.
+
+Sunucu PBKDF2'yi istek thread'lerinde değil ayrı bir süreç havuzunda
+çalıştırır; bekleyen iş sayısı sınırlıdır, dolduğunda HasherBusy atılır.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+ALGORITHM = "pbkdf2_sha256"
+DEFAULT_ITERATIONS = 310000
+LEGACY_ITERATIONS = 100000
+
+# Havuzda aynı anda bekleyebilecek en fazla hash işi
+DEFAULT_MAX_PENDING = 64
+
+# Giriş kısıtlama: pencere içinde bu kadar hatalı denemeden sonra kilit
+THROTTLE_MAX_FAILURES = 5
+THROTTLE_WINDOW = 300
+THROTTLE_LOCKOUT = 60
+THROTTLE_MAX_LOCKOUT = 3600
+# Bu kadar anahtar birikince eski kayıtlar temizlenir
+THROTTLE_MAX_KEYS = 10000
+
+
+class HasherBusy(Exception):
+    """Hash kuyruğu dolu - istemci daha sonra tekrar denemeli"""
+
+
+def pbkdf2(password: str, salt: str, iterations: int) -> str:
+    """Süreç havuzunda çalışan saf fonksiyon (pickle edilebilir olmalı)"""
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), iterations).hex()
+
+
+def parse_hash(password_hash: str):
+    """(iterasyon, salt, hex) - tanınmayan biçimde ValueError"""
+    parts = password_hash.split('$')
+    if len(parts) == 4 and parts[0] == ALGORITHM:
+        return int(parts[1]), parts[2], parts[3]
+    if len(parts) == 2:
+        return LEGACY_ITERATIONS, parts[0], parts[1]
+    raise ValueError("Tanınmayan şifre hash biçimi")
+
+
+class PasswordHasher:
+    """PBKDF2 hash/doğrulama; max_workers > 0 ise ayrı süreçlerde"""
+
+    def __init__(self, iterations=DEFAULT_ITERATIONS, max_workers=0, max_pending=DEFAULT_MAX_PENDING,
+                 queue_timeout=5.0):
+        self.iterations = iterations
+        self.queue_timeout = queue_timeout
+        self._executor = ProcessPoolExecutor(max_workers=max_workers) if max_workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def _run(self, password, salt, iterations):
+        if self._executor is None:
+            return pbkdf2(password, salt, iterations)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy("Şifre doğrulama kuyruğu dolu")
+        try:
+            return self._executor.submit(pbkdf2, password, salt, iterations).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        salt = secrets.token_hex(32)
+        digest = self._run(password, salt, self.iterations)
+        return f"{ALGORITHM}${self.iterations}${salt}${digest}"
+
+    def verify(self, password: str, password_hash: str) -> bool:
+        try:
+            iterations, salt, stored = parse_hash(password_hash)
+        except ValueError:
+            return False
+        return hmac.compare_digest(self._run(password, salt, iterations), stored)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        try:
+            iterations, _, _ = parse_hash(password_hash)
+        except ValueError:
+            return False
+        return not password_hash.startswith(ALGORITHM) or iterations != self.iterations
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class LoginThrottle:
+    """Hesap ve IP başına hatalı giriş sayacı; eşik aşılınca artan süreli kilit"""
+
+    def __init__(self, max_failures=THROTTLE_MAX_FAILURES, window=THROTTLE_WINDOW,
+                 lockout=THROTTLE_LOCKOUT, max_lockout=THROTTLE_MAX_LOCKOUT):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self.max_lockout = max_lockout
+        self._failures = {}
+        self._locked_until = {}
+        self._strikes = {}
+        self._lock = threading.Lock()
+
+    def retry_after(self, *keys) -> float:
+        """Anahtarlardan biri kilitliyse kalan saniye, değilse 0"""
+        now = time.monotonic()
+        with self._lock:
+            remaining = [self._locked_until.get(key, 0) - now for key in keys if key]
+        return max([0, *remaining])
+
+    def record_failure(self, *keys):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                if not key:
+                    continue
+                failures = self._failures.setdefault(key, deque())
+                failures.append(now)
+                while failures and failures[0] < now - self.window:
+                    failures.popleft()
+                if len(failures) >= self.max_failures:
+                    # Her yeni kilit öncekinin iki katı (üst sınırlı)
+                    strikes = self._strikes.get(key, 0)
+                    self._locked_until[key] = now + min(self.lockout * (2 ** strikes), self.max_lockout)
+                    self._strikes[key] = strikes + 1
+                    failures.clear()
+            if len(self._failures) > THROTTLE_MAX_KEYS:
+                self._prune(now)
+
+    def _prune(self, now):
+        """Penceresi geçmiş ve kilitli olmayan anahtarları unut"""
+        for key in [k for k, f in self._failures.items() if not f or f[-1] < now - self.window]:
+            if self._locked_until.get(key, 0) <= now:
+                self._failures.pop(key, None)
+                self._locked_until.pop(key, None)
+                self._strikes.pop(key, None)
+
+    def record_success(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+                self._locked_until.pop(key, None)
+                self._strikes.pop(key, None)
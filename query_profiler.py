@@ -0,0 +1,289 @@
+# query_profiler.py
+"""
+Veritabanı Sorgu Profilleyici - Database katmanı için opsiyonel ölçüm
+
+Kullanım:
+    db = Database(profile=True)          # veya HISSETAKIP_DB_PROFILE=1
+    db.enable_profiling(slow_ms=50)      # sonradan açmak için
+
+    with db.profiler.scope("dashboard"):
+        page.create()
+
+    db.get_query_stats()                 # dict
+    db.dump_query_stats("logs/db_stats.json")
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import sqlite3
+
+# p95 hesabı için ifade başına tutulan son süre sayısı
+SAMPLE_SIZE = 1000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """SQL metnini tek satıra indir (istatistik anahtarı)"""
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def _percentile(samples, pct):
+    """Sıralı olmayan örneklerden yüzdelik değeri hesapla"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _TimingStats:
+    """Sayaç + toplam süre + son örnekler"""
+
+    __slots__ = ("count", "total", "max", "rows", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+    def add(self, elapsed, rows=0):
+        self.count += 1
+        self.total += elapsed
+        self.rows += rows
+        if elapsed > self.max:
+            self.max = elapsed
+        self.samples.append(elapsed)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "avg_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "p95_ms": round(_percentile(self.samples, 95) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class QueryProfiler:
+    """İfade, metot ve kapsam (sayfa) bazında sorgu süresi toplayıcı"""
+
+    def __init__(self, slow_ms=100, slow_log_path=None):
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        """Tüm istatistikleri sıfırla"""
+        with self._lock:
+            self.statements = {}
+            self.methods = {}
+            self.scopes = {}
+            self.connections = _TimingStats()
+            self.started_at = datetime.now()
+
+    # ---------- kayıt ----------
+
+    def _current_scope(self):
+        stack = getattr(self._local, "scopes", None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def scope(self, name):
+        """Bir kod bloğundaki tüm DB maliyetini verilen isim altında topla"""
+        stack = getattr(self._local, "scopes", None)
+        if stack is None:
+            stack = self._local.scopes = []
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def record_connect(self, elapsed):
+        with self._lock:
+            self.connections.add(elapsed)
+
+    def record_method(self, method, elapsed):
+        scope = self._current_scope()
+        with self._lock:
+            self.methods.setdefault(method, _TimingStats()).add(elapsed)
+            if scope:
+                self.scopes.setdefault(scope, _TimingStats()).add(elapsed)
+
+    def record_statement(self, sql, elapsed, rows=0):
+        key = normalize_sql(sql)
+        with self._lock:
+            self.statements.setdefault(key, _TimingStats()).add(elapsed, rows)
+
+        if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+            self._log_slow(key, elapsed)
+
+    def _log_slow(self, sql, elapsed):
+        line = f"{datetime.now().isoformat()}\t{elapsed * 1000:.1f}ms\t{self._current_scope() or '-'}\t{sql}\n"
+        if not self.slow_log_path:
+            print(f"[DB][SLOW] {elapsed * 1000:.1f}ms {sql[:120]}")
+            return
+        try:
+            os.makedirs(os.path.dirname(self.slow_log_path) or ".", exist_ok=True)
+            with self._lock:
+                with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except Exception as e:
+            print(f"[WARN] Yavaş sorgu kaydı yazılamadı: {e}")
+
+    # ---------- rapor ----------
+
+    def get_stats(self, top=None):
+        """İstatistikleri toplam süreye göre sıralı dict olarak döndür"""
+        def ranked(table):
+            items = sorted(table.items(), key=lambda kv: kv[1].total, reverse=True)
+            if top:
+                items = items[:top]
+            return [dict(name=name, **stats.to_dict()) for name, stats in items]
+
+        with self._lock:
+            return {
+                "since": self.started_at.isoformat(),
+                "slow_ms": self.slow_ms,
+                "connections": self.connections.to_dict(),
+                "methods": ranked(self.methods),
+                "scopes": ranked(self.scopes),
+                "statements": ranked(self.statements),
+            }
+
+    def dump(self, filename, top=None):
+        """İstatistikleri JSON dosyasına yaz"""
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.get_stats(top), f, ensure_ascii=False, indent=2)
+        return filename
+
+    def print_report(self, top=10):
+        """Konsola kısa özet bas"""
+        stats = self.get_stats(top)
+        conn = stats["connections"]
+        print("\n" + "=" * 60)
+        print(f"📊 DB profil raporu ({conn['count']} bağlantı, açılış p95 {conn['p95_ms']}ms)")
+        print("=" * 60)
+        for title in ("scopes", "methods", "statements"):
+            if not stats[title]:
+                continue
+            print(f"\n[{title}]")
+            for row in stats[title]:
+                print(f"  {row['total_ms']:>10.1f}ms  x{row['count']:<6} p95 {row['p95_ms']:>8.2f}ms  "
+                      f"{row['rows']:>7} satır  {row['name'][:70]}")
+        print("=" * 60 + "\n")
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """execute/fetch sürelerini profilleyiciye bildiren cursor"""
+
+    profiler = None
+    _last_sql = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._last_sql = sql
+            self.profiler.record_statement(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._last_sql = sql
+            self.profiler.record_statement(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._last_sql = None
+            self.profiler.record_statement(sql_script, time.perf_counter() - start)
+
+    def _fetched(self, start, rows):
+        # SQLite satırları fetch sırasında üretir; bu süre de ifadeye yazılır
+        if self._last_sql is None:
+            return
+        key = normalize_sql(self._last_sql)
+        elapsed = time.perf_counter() - start
+        with self.profiler._lock:
+            stats = self.profiler.statements.get(key)
+            if stats:
+                stats.total += elapsed
+                stats.rows += rows
+                if stats.samples:
+                    stats.samples[-1] += elapsed
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 1 if row is not None else 0)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        return rows
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Varsayılan cursor'ı ProfiledCursor olan bağlantı"""
+
+    profiler = None
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = self._cursor_class
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def make_connection_class(profiler):
+    """Profilleyiciye bağlı Connection/Cursor sınıfı üret"""
+    cursor_class = type("BoundProfiledCursor", (ProfiledCursor,), {"profiler": profiler})
+    return type("BoundProfiledConnection", (ProfiledConnection,),
+                {"profiler": profiler, "_cursor_class": cursor_class})
+
+
+def caller_name(depth=1):
+    """get_connection'ı çağıran Database metodunun adını bul"""
+    try:
+        frame = sys._getframe(depth)
+        while frame is not None:
+            name = frame.f_code.co_name
+            if name not in ("caller_name", "__enter__", "get_connection"):
+                return name
+            frame = frame.f_back
+    except ValueError:
+        pass
+    return "?"
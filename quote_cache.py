@@ -0,0 +1,306 @@
+# quote_cache.py
+"""
+Paylaşılan Fiyat Önbelleği - tüm kullanıcılar için tek yenileme işçisi
+
+Her masaüstü istemcisi aynı BIST sembolleri için ayrı ayrı Yahoo'ya gitmek
+yerine fiyatları sunucudan toplu alır (GET /api/quotes?symbols=...). Sunucu:
+
+    - Yenilenecek semboller: symbols_source() (tüm portföyler + aktif alarmlar)
+      + son `interest_ttl` saniyede /api/quotes ile istenen diğer semboller
+    - Her `refresh_interval` saniyede sağlayıcıya parça başına tek toplu istek
+    - İlk kez istenen sembol beklemeden (işçi uyandırılarak) çekilir
+    - Sağlayıcının bulamadığı sembol `miss_ttl` saniye "yok" olarak hatırlanır:
+      bu sürede istenmesi işçiyi uyandırmaz ve izlenenlere eklenmez
+    - Fiyatlar bellekte ve diskte (JSON, atomik yazma) tutulur; yeniden
+      başlatmada diskten yüklenir
+
+Anahtar Yahoo ticker'ıdır (THYAO -> THYAO.IS). Her fiyatın bir sürümü vardır
+(fiyat değiştikçe artar); ETag istenen sembollerin sürümlerinden üretilir.
+
+Sağlayıcı yfinance'tir; kurulu değilse işçi çalışmaz, önbellektekiler sunulur.
+fetcher(tickers) -> {ticker: {"price": float, "prev_close": float | None}}
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+# Tam yenileme aralığı (saniye)
+REFRESH_INTERVAL = 60
+# Portföyde olmayan, yalnızca istenen sembol bu kadar süre yenilenmeye devam eder
+INTEREST_TTL = 3600
+# Sağlayıcıya tek istekte giden sembol sayısı
+FETCH_CHUNK = 100
+# Bir /api/quotes isteğinde en fazla sembol
+MAX_SYMBOLS = 200
+# İstenen (portföy dışı) sembol listesinin üst sınırı
+MAX_INTEREST = 2000
+# Sağlayıcının bulamadığı (bilinmeyen / işlemden kalkmış) sembol bu süre tekrar denenmez
+MISS_TTL = 900
+
+_TICKER = re.compile(r"^[A-Z0-9.=^\-]{1,20}$")
+
+
+def to_ticker(symbol):
+    """Uygulama sembolünü Yahoo ticker'ına çevir (THYAO -> THYAO.IS)"""
+    symbol = symbol.strip().upper()
+    if any(c in symbol for c in ".=^-"):
+        return symbol
+    return f"{symbol}.IS"
+
+
+def parse_symbols(value):
+    """'THYAO,asels.is' -> ['THYAO.IS', 'ASELS.IS'] (tekrarlar ve geçersizler atlanır)"""
+    tickers = []
+    for part in (value or "").split(","):
+        if not part.strip():
+            continue
+        ticker = to_ticker(part)
+        if _TICKER.match(ticker) and ticker not in tickers:
+            tickers.append(ticker)
+    return tickers
+
+
+def yfinance_fetch(tickers):
+    """yfinance ile son iki günlük kapanış, parça başına tek istek"""
+    data = yf.download(tickers, period="5d", interval="1d", group_by="ticker",
+                       auto_adjust=False, progress=False, threads=False)
+    quotes = {}
+    if data is None or data.empty:
+        return quotes
+    grouped = set(data.columns.get_level_values(0))
+    for ticker in tickers:
+        # Eski sürümler tek sembolde düz sütun döndürür
+        frame = data[ticker] if ticker in grouped else data if len(tickers) == 1 else None
+        if frame is None or "Close" not in frame:
+            continue
+        closes = frame["Close"].dropna()
+        if closes.empty:
+            continue
+        quotes[ticker] = {
+            "price": float(closes.iloc[-1]),
+            "prev_close": float(closes.iloc[-2]) if len(closes) > 1 else None,
+        }
+    return quotes
+
+
+class QuoteCache:
+    """Ticker -> son fiyat; tek arka plan thread'i ile yenilenir"""
+
+    def __init__(self, path=None, symbols_source=None, fetcher=None,
+                 refresh_interval=REFRESH_INTERVAL, interest_ttl=INTEREST_TTL, miss_ttl=MISS_TTL):
+        self.path = path
+        self.symbols_source = symbols_source
+        self.fetcher = fetcher or (yfinance_fetch if yf else None)
+        self.refresh_interval = refresh_interval
+        self.interest_ttl = interest_ttl
+        self.miss_ttl = miss_ttl
+        # observer(sembol sayısı, süre, başarılı mı): sağlayıcı çağrısı başına
+        self.observer = None
+
+        self.last_refresh = None
+        self.last_error = None
+        self._quotes = {}
+        self._version = 0
+        self._interest = {}
+        self._new = set()
+        # ticker -> sağlayıcının son bulamadığı an (negatif önbellek)
+        self._misses = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._load()
+
+    # ========== OKUMA ==========
+
+    def get(self, tickers):
+        """İstenen fiyatlar: (fiyatlar, bulunamayanlar, ETag)"""
+        now = time.monotonic()
+        with self._lock:
+            found = {t: dict(self._quotes[t]) for t in tickers if t in self._quotes}
+            missing = [t for t in tickers if t not in found]
+            # Yakın zamanda bulunamayanlar yeniden istenmez
+            known_missing = {t for t in missing
+                             if t in self._misses and now - self._misses[t] < self.miss_ttl}
+            for ticker in tickers:
+                if ticker in known_missing:
+                    continue
+                if ticker in self._interest or len(self._interest) < MAX_INTEREST:
+                    self._interest[ticker] = now
+            new = [t for t in missing if t not in self._new and t not in known_missing]
+            self._new.update(new)
+
+        if new and self.running:
+            self._wake.set()
+
+        tag = "|".join(f"{t}:{found[t]['version'] if t in found else 0}" for t in sorted(tickers))
+        etag = hashlib.sha1(tag.encode()).hexdigest()[:16]
+        for quote in found.values():
+            del quote["version"]
+        return found, missing, etag
+
+    def stats(self):
+        with self._lock:
+            return {
+                "symbols": len(self._quotes),
+                "interest": len(self._interest),
+                "misses": len(self._misses),
+                "running": self.running,
+                "provider": self.fetcher is not None,
+                "last_refresh": self.last_refresh,
+                "last_error": self.last_error,
+            }
+
+    # ========== YENİLEME ==========
+
+    def refresh(self, tickers=None):
+        """Sağlayıcıdan çek (varsayılan: izlenen tüm semboller); değişen fiyat sayısı"""
+        if self.fetcher is None:
+            return 0
+        if tickers is None:
+            tickers = self._wanted()
+        updated = 0
+        for start in range(0, len(tickers), FETCH_CHUNK):
+            chunk = tickers[start:start + FETCH_CHUNK]
+            started = time.perf_counter()
+            try:
+                fetched, ok = self.fetcher(chunk), True
+            except Exception as e:
+                fetched, ok = {}, False
+                self.last_error = str(e)
+                print(f"Fiyat yenileme hatası ({len(chunk)} sembol): {e}")
+            if self.observer:
+                self.observer(len(chunk), time.perf_counter() - started, ok)
+            updated += self._store(fetched)
+            if ok:
+                self._record_misses(chunk, fetched)
+
+        with self._lock:
+            self._new.difference_update(tickers)
+        self.last_refresh = time.time()
+        if updated:
+            self._save()
+        return updated
+
+    def _record_misses(self, chunk, fetched):
+        """Sağlayıcının döndürmediği ve önbellekte olmayan semboller: negatif önbellek"""
+        now = time.monotonic()
+        with self._lock:
+            for ticker in chunk:
+                if ticker in fetched or ticker in self._quotes:
+                    self._misses.pop(ticker, None)
+                    continue
+                self._misses[ticker] = now
+                self._interest.pop(ticker, None)
+
+    def _wanted(self):
+        symbols = set()
+        if self.symbols_source:
+            try:
+                symbols.update(to_ticker(s) for s in self.symbols_source() if s)
+            except Exception as e:
+                print(f"Sembol listesi okunamadı: {e}")
+        now = time.monotonic()
+        cutoff = now - self.interest_ttl
+        with self._lock:
+            for ticker in [t for t, seen in self._interest.items() if seen < cutoff]:
+                del self._interest[ticker]
+            for ticker in [t for t, missed in self._misses.items() if now - missed >= self.miss_ttl]:
+                del self._misses[ticker]
+            symbols.update(self._interest)
+        return sorted(symbols)
+
+    def _store(self, fetched):
+        now = time.time()
+        updated = 0
+        with self._lock:
+            for ticker, quote in fetched.items():
+                price, prev_close = quote.get("price"), quote.get("prev_close")
+                if price is None:
+                    continue
+                current = self._quotes.get(ticker)
+                if current and current["price"] == price and current["prev_close"] == prev_close:
+                    continue
+                self._version += 1
+                self._quotes[ticker] = {
+                    "price": price,
+                    "prev_close": prev_close,
+                    "change_pct": (price - prev_close) / prev_close * 100 if prev_close else None,
+                    "updated_at": now,
+                    "version": self._version,
+                }
+                updated += 1
+        return updated
+
+    # ========== İŞÇİ ==========
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running or self.fetcher is None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="quote-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        next_full = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_full:
+                self.refresh()
+                next_full = time.monotonic() + self.refresh_interval
+            else:
+                # Uyandırıldı: yalnızca ilk kez istenen semboller
+                with self._lock:
+                    new = sorted(self._new)
+                if new:
+                    self.refresh(new)
+            self._wake.wait(max(0.0, next_full - time.monotonic()))
+            self._wake.clear()
+
+    # ========== DİSK ==========
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                quotes = json.load(f)["quotes"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Fiyat önbelleği okunamadı: {e}")
+            return
+        self._quotes = quotes
+        self._version = max((q.get("version", 0) for q in quotes.values()), default=0)
+
+    def _save(self):
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps({"quotes": self._quotes}, separators=(",", ":"))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".quotes-", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Fiyat önbelleği yazılamadı: {e}")
@@ -0,0 +1,141 @@
+# request_limits.py
+"""
+İstek Sınırları - kullanıcı ve IP başına token bucket, okuma/yazma ayrı bütçe
+
+Her anahtar (kullanıcı veya IP) için kova başına iki sayı tutulur: kalan
+jeton ve son güncelleme zamanı. Kontrol O(1)'dir; kovalar istek anında
+doldurulur, arka plan thread'i yoktur. Dolmuş kovalar yokla eşdeğer olduğu
+için anahtar sayısı MAX_KEYS'i aşınca atılır (bellek sınırlı kalır).
+
+    read    GET/HEAD             -> kullanıcı + IP okuma kovası
+    write   POST/PUT/PATCH/DELETE -> kullanıcı + IP yazma kovası
+
+Yazma maliyeti gövde boyutuyla artar (her WRITE_COST_BYTES için +1 jeton),
+böylece büyük toplu senkronlar bütçeyi daha hızlı tüketir. İstek reddedilirse
+hiçbir kovadan jeton düşülmez ve gereken bekleme süresi döner (Retry-After).
+
+Limitler "hız:kapasite" biçimindedir: "2:20" = saniyede 2 jeton, en fazla 20.
+"""
+
+import math
+import time
+import threading
+
+READ = "read"
+WRITE = "write"
+
+DEFAULT_LIMITS = {
+    ("user", READ): "10:60",
+    ("user", WRITE): "2:20",
+    # Aynı NAT arkasında birden çok kullanıcı olabilir: IP bütçeleri daha geniş
+    ("ip", READ): "40:200",
+    ("ip", WRITE): "10:60",
+}
+
+# Yazma isteklerinde bu kadar bayt başına +1 jeton
+WRITE_COST_BYTES = 256 * 1024
+
+# Kodlanmış (sıkıştırılmış olabilir) gövde sınırları
+MAX_WRITE_BYTES = 16 * 1024 * 1024
+MAX_READ_BYTES = 64 * 1024
+# Açılmış gövde sınırı (sıkıştırma bombalarına karşı)
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+
+# Kova başına anahtar eşiği; aşılınca dolmuş kovalar atılır
+MAX_KEYS = 50000
+
+
+def parse_limit(value):
+    """'2:20' -> (2.0, 20.0)"""
+    rate, _, burst = str(value).partition(":")
+    rate = float(rate)
+    burst = float(burst) if burst else rate
+    if rate <= 0 or burst < 1:
+        raise ValueError(f"Geçersiz limit: {value}")
+    return rate, burst
+
+
+def request_kind(method):
+    return READ if method in ("GET", "HEAD") else WRITE
+
+
+def request_cost(kind, size):
+    if kind == WRITE and size:
+        return 1 + size // WRITE_COST_BYTES
+    return 1
+
+
+def retry_seconds(delay):
+    """Retry-After başlığı tam saniye olmalı; en az 1"""
+    return max(1, math.ceil(delay))
+
+
+class TokenBucket:
+    """Anahtar başına [jeton, son zaman]; sürekli dolan, `burst` ile sınırlı kova"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = MAX_KEYS
+        self._state = {}
+
+    def level(self, key, now):
+        state = self._state.get(key)
+        if state is None:
+            return self.burst
+        return min(self.burst, state[0] + (now - state[1]) * self.rate)
+
+    def wait_time(self, key, cost, now):
+        """Jeton yetiyorsa 0, yetmiyorsa gereken süre"""
+        missing = min(cost, self.burst) - self.level(key, now)
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self, key, cost, now):
+        self._state[key] = [self.level(key, now) - min(cost, self.burst), now]
+
+    def prune(self, now):
+        for key in [k for k in self._state if self.level(k, now) >= self.burst]:
+            del self._state[key]
+        # Hepsi aktifse bir sonraki tarama ancak boyut iki katına çıkınca (amortize O(1))
+        self.max_keys = max(MAX_KEYS, 2 * len(self._state))
+
+    def __len__(self):
+        return len(self._state)
+
+
+class RequestLimiter:
+    """Kullanıcı/IP kovalarını birlikte kontrol eden thread güvenli sınırlayıcı"""
+
+    def __init__(self, limits=None):
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.buckets = {scope: TokenBucket(*parse_limit(spec)) for scope, spec in limits.items()}
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def check(self, kind, cost=1, user_id=None, ip=None):
+        """
+        İzin varsa jetonları düş ve 0 döndür; yoksa hiçbir şey düşmeden bekleme süresi
+
+        Yalnızca verilen anahtarların kovaları kontrol edilir (ör. kimlik
+        doğrulamadan önce yalnızca IP).
+        """
+        now = time.monotonic()
+        checks = [(self.buckets[(scope, kind)], key)
+                  for scope, key in (("user", user_id), ("ip", ip)) if key is not None]
+        with self._lock:
+            wait = max([0.0, *(bucket.wait_time(key, cost, now) for bucket, key in checks)])
+            if wait > 0:
+                self.rejected += 1
+                return wait
+            for bucket, key in checks:
+                bucket.take(key, cost, now)
+                if len(bucket) > bucket.max_keys:
+                    bucket.prune(now)
+        return 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "keys": {f"{scope}_{kind}": len(bucket) for (scope, kind), bucket in self.buckets.items()},
+                "rejected": self.rejected,
+            }
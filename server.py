@@ -3,54 +3,312 @@
 Flask Backend API Sunucusu - Bulut Senkronizasyonu için
 Komut: python server.py
 Adres: http://localhost:5000
+
+Veri uçları async view'dır; Flask'ın async desteği gerekir:
+    pip install "flask[async]"
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, make_response, g, has_request_context
+from werkzeug.exceptions import RequestEntityTooLarge
 from flask_cors import CORS
 from functools import wraps
 import jwt
 import os
 import json
+import inspect
+import hashlib
+import time
+import hmac
 from datetime import datetime
 from database import Database
+from config import DEFAULT_SETTINGS
+from async_db import AsyncDatabase
 from auth_service import AuthService
+from password_hasher import PasswordHasher, HasherBusy
+import sync_codec
+from server_metrics import ServerMetrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from change_feed import ChangeNotifier, change_stream, EVENT_STREAM_TYPE
+from quote_cache import QuoteCache, parse_symbols, MAX_SYMBOLS
+from request_limits import (RequestLimiter, DEFAULT_LIMITS, WRITE, MAX_WRITE_BYTES, MAX_READ_BYTES,
+                            MAX_DECODED_BYTES, request_kind, request_cost, retry_seconds)
 
 app = Flask(__name__)
 CORS(app)
 
 # Konfigürasyon
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_secret_key_change_in_production')
-DATABASE_FILE = 'cloud_portfolio.db'
+# Content-Length'siz (chunked) gövdeler için de üst sınır
+app.config['MAX_CONTENT_LENGTH'] = MAX_WRITE_BYTES
+DATABASE_FILE = os.environ.get('DATABASE_FILE', 'cloud_portfolio.db')
 
 # Servisleri başlat
 db = Database(DATABASE_FILE)
-auth = AuthService(db, app.config['SECRET_KEY'])
+adb = AsyncDatabase(db, max_connections=int(os.environ.get('DB_MAX_CONNECTIONS', 4)))
+# PBKDF2 istek thread'lerinde değil ayrı süreçlerde; kuyruk dolarsa 503
+hasher = PasswordHasher(
+    iterations=int(os.environ.get('PASSWORD_ITERATIONS', 310000)),
+    max_workers=int(os.environ.get('HASH_WORKERS', os.cpu_count() or 2)),
+    max_pending=int(os.environ.get('HASH_MAX_PENDING', 64))
+)
+auth = AuthService(db, app.config['SECRET_KEY'], hasher=hasher)
+# Yazmalardan sonra kullanıcının açık SSE akışlarını uyandırır
+notifier = ChangeNotifier()
+
+# ============ METRİKLER ============
+
+metrics = ServerMetrics()
+# Ayarlıysa /api/metrics için "Authorization: Bearer <METRICS_TOKEN>" gerekir
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+def _record_db_time(elapsed):
+    metrics.observe_db_call(elapsed)
+    if has_request_context():
+        g.db_time = g.get('db_time', 0.0) + elapsed
+
+adb.observer = _record_db_time
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+# compress_response'tan önce kaydedilir: after_request ters sırada çalıştığı
+# için yanıt boyutu sıkıştırılmış haliyle ölçülür
+@app.after_request
+def record_metrics(response):
+    start = g.get('request_start')
+    if start is None:
+        return response
+    # Ham URL değil rota şablonu: seri sayısı rota sayısıyla sınırlı
+    route = request.url_rule.rule if request.url_rule else '<unmatched>'
+    metrics.observe_request(
+        route, request.method, response.status_code,
+        duration=time.perf_counter() - start,
+        request_bytes=request.content_length or 0,
+        response_bytes=None if response.is_streamed else response.content_length,
+        db=g.get('db_time', 0.0),
+        auth=g.get('auth_time', 0.0)
+    )
+    return response
+
+# ============ İSTEK SINIRLARI ============
+
+# RATE_LIMIT=0 kapatır; limitler "hız:kapasite" (ör. USER_WRITE_LIMIT=2:20)
+RATE_LIMIT = os.environ.get('RATE_LIMIT', '1') == '1'
+limiter = RequestLimiter({
+    (scope, kind): os.environ[f"{scope.upper()}_{kind.upper()}_LIMIT"]
+    for scope, kind in DEFAULT_LIMITS if f"{scope.upper()}_{kind.upper()}_LIMIT" in os.environ
+})
+# Sağlık kontrolü ve metrik toplayıcı sınırlanmaz
+LIMIT_EXEMPT = {'/api/health', '/api/metrics'}
+
+def too_many_requests(delay):
+    seconds = retry_seconds(delay)
+    return (jsonify({"error": "Çok fazla istek, daha sonra tekrar deneyin", "retry_after": seconds}),
+            429, {"Retry-After": str(seconds)})
+
+@app.before_request
+def enforce_limits():
+    """Gövde boyutu ve IP bütçesi; kullanıcı bütçesi token doğrulanınca (_authenticate)"""
+    if request.method == 'OPTIONS' or request.path in LIMIT_EXEMPT:
+        return None
+    
+    kind = request_kind(request.method)
+    size = request.content_length or 0
+    if size > (MAX_WRITE_BYTES if kind == WRITE else MAX_READ_BYTES):
+        return jsonify({"error": "İstek gövdesi çok büyük"}), 413
+    
+    g.limit = (kind, request_cost(kind, size))
+    if RATE_LIMIT:
+        wait = limiter.check(kind, g.limit[1], ip=request.remote_addr)
+        if wait:
+            return too_many_requests(wait)
+    return None
+
+def _limit_user():
+    """Kimliği doğrulanmış kullanıcının okuma/yazma bütçesi"""
+    if not RATE_LIMIT or 'limit' not in g:
+        return None
+    kind, cost = g.limit
+    wait = limiter.check(kind, cost, user_id=request.user_id)
+    return too_many_requests(wait) if wait else None
 
 # ============ MIDDLEWARE ============
 
+def _authenticate():
+    """Authorization başlığını doğrula; hata varsa yanıt döndür"""
+    start = time.perf_counter()
+    try:
+        return _check_token()
+    finally:
+        g.auth_time = g.get('auth_time', 0.0) + time.perf_counter() - start
+
+def _check_token():
+    token = request.headers.get('Authorization')
+    
+    if not token:
+        return jsonify({"error": "Token gerekli"}), 401
+    
+    try:
+        token = token.replace('Bearer ', '')
+        result = auth.verify_token(token)
+        
+        if not result['success']:
+            return jsonify({"error": result.get('error', 'Geçersiz token')}), 401
+        
+        request.user_id = result['user_id']
+        return _limit_user()
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 401
+
 def token_required(f):
-    """Token doğrulama decorator'u"""
+    """Token doğrulama decorator'u (senkron ve async view'lar için)"""
+    if inspect.iscoroutinefunction(f):
+        @wraps(f)
+        async def decorated_async(*args, **kwargs):
+            error = _authenticate()
+            if error:
+                return error
+            return await f(*args, **kwargs)
+        
+        return decorated_async
+    
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            return jsonify({"error": "Token gerekli"}), 401
-        
-        try:
-            token = token.replace('Bearer ', '')
-            result = auth.verify_token(token)
+        error = _authenticate()
+        if error:
+            return error
+        return f(*args, **kwargs)
+    
+    return decorated
+
+# ============ YÜK KODLAMA ============
+
+def get_payload():
+    """İstek gövdesini çöz (Content-Encoding: gzip/zstd, JSON veya MessagePack)"""
+    body = request.get_data(cache=True)
+    if not body:
+        return None
+    try:
+        return sync_codec.decode(body, request.mimetype or sync_codec.JSON_TYPE,
+                                 request.headers.get('Content-Encoding'), max_size=MAX_DECODED_BYTES)
+    except sync_codec.PayloadTooLarge:
+        raise RequestEntityTooLarge()
+
+def get_rows(data):
+    """'data' alanı satır listesi ya da sütunsal tablo olabilir"""
+    rows = (data or {}).get('data', [])
+    return sync_codec.from_columns(rows) if sync_codec.is_columnar(rows) else rows
+
+def respond(data, status=200, columnar=False):
+    """Accept başlığına göre JSON veya MessagePack yanıt (?format=columns: sütunsal)"""
+    if columnar and request.args.get('format') == 'columns':
+        data = sync_codec.to_columns(data)
+    content_type = sync_codec.preferred_type(request.headers.get('Accept'))
+    if content_type == sync_codec.JSON_TYPE:
+        return jsonify(data), status
+    return Response(sync_codec.dumps(data, content_type), status=status, mimetype=content_type)
+
+@app.after_request
+def compress_response(response):
+    """Yanıtı istemcinin kabul ettiği en iyi kodlamayla sıkıştır"""
+    # İstek gövdeleri için desteklenen kodlamalar (RFC 7694)
+    response.headers['Accept-Encoding'] = ", ".join(sync_codec.available_encodings())
+    response.vary.add('Accept-Encoding')
+    
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    
+    encoding = sync_codec.negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if response.is_streamed:
+        # Akışlı yanıt: parça parça sıkıştır, gövde belleğe alınmaz
+        # (SSE sıkıştırılmaz: ara katmanlar sıkıştırılmış akışı tamponlayabilir)
+        if encoding and response.mimetype != EVENT_STREAM_TYPE:
+            response.response = sync_codec.compress_stream(response.response, encoding)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+        return response
+    
+    body = response.get_data()
+    if encoding and len(body) >= sync_codec.MIN_COMPRESS_SIZE:
+        response.set_data(sync_codec.compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def wants_stream():
+    return sync_codec.wants_ndjson(request.headers.get('Accept'))
+
+def stream_tables(user_id, tables):
+    """
+    Tabloları NDJSON olarak DB imlecinden akıt (Accept: application/x-ndjson)
+
+    Her satır {"table": <tablo>, "row": {...}}; ayarlar ham setting_key/setting_value
+    satırlarıdır (varsayılanlar eklenmez). Üreteç view döndükten sonra WSGI
+    thread'inde çalışır ve kendi kısa ömürlü bağlantısını kullanır.
+
+    X-Sync-Cursor: veriden önce okunan son değişiklik numarası. İstemci çekme
+    imlecini buna alır; akış sırasında gelen yazmalar sonraki deltada tekrar
+    gelir (upsert olduğu için zararsız), hiçbiri kaçmaz.
+    """
+    latest = db.changes.latest_seq(user_id)
+    
+    def generate():
+        for table in tables:
+            for rows in db.changes.iter_row_batches(user_id, table):
+                yield sync_codec.ndjson_lines({"table": table, "row": row} for row in rows)
+    
+    return Response(generate(), mimetype=sync_codec.NDJSON_TYPE,
+                    headers={'X-Sync-Cursor': str(latest)})
+
+# ============ KOŞULLU GET ============
+
+# Varsayılan ayarlar değişirse (yeni sürüm) ayar ETag'leri de değişsin
+SETTINGS_DEFAULTS_TAG = hashlib.sha1(
+    json.dumps(DEFAULT_SETTINGS, sort_keys=True, default=str).encode()
+).hexdigest()[:8]
+
+def _representation():
+    """Aynı sürümün farklı gösterimleri farklı ETag almalı (msgpack/JSON, sütunsal)"""
+    if wants_stream():
+        return 'n'
+    content_type = sync_codec.preferred_type(request.headers.get('Accept'))
+    variant = 'm' if content_type == sync_codec.MSGPACK_TYPE else 'j'
+    if request.args.get('format') == 'columns':
+        variant += 'c'
+    return variant
+
+def conditional(*tables):
+    """
+    Tablo sürümlerinden ETag üret; If-None-Match eşleşirse tabloları okumadan 304
+
+    Sürümler veriden önce okunur: arada yazma olursa ETag veriden eski kalır
+    ve bir sonraki istek yalnızca gereksiz yere tam yanıt alır (asla bayat 304 değil).
+    """
+    def decorator(f):
+        @wraps(f)
+        async def decorated(*args, **kwargs):
+            versions = await adb.table_versions(request.user_id, tables)
+            etag = "-".join([str(request.user_id), *(str(versions[t]) for t in tables),
+                             _representation()])
+            if 'settings' in tables:
+                etag += f"-{SETTINGS_DEFAULTS_TAG}"
             
-            if not result['success']:
-                return jsonify({"error": result.get('error', 'Geçersiz token')}), 401
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(await f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
             
-            request.user_id = result['user_id']
-            return f(*args, **kwargs)
+            # Sıkıştırma baytları değiştirdiği için zayıf ETag
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Accept')
+            return response
         
-        except Exception as e:
-            return jsonify({"error": str(e)}), 401
+        return decorated
     
-    return decorated
+    return decorator
 
 # ============ HEALTH CHECK ============
 
@@ -63,17 +321,29 @@ def health_check():
         "service": "HisseTakip Cloud Server"
     }), 200
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus metin biçiminde istek ve süreç metrikleri"""
+    if METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '').replace('Bearer ', '')
+        if not hmac.compare_digest(supplied, METRICS_TOKEN):
+            return jsonify({"error": "Yetkisiz"}), 401
+    return Response(metrics.render(), mimetype=METRICS_CONTENT_TYPE)
+
 # ============ AUTH ENDPOINTS ============
 
 @app.route('/api/auth/register', methods=['POST'])
 def register():
     """Yeni kullanıcı kaydı"""
-    data = request.get_json()
+    data = get_payload()
     
     if not data or not data.get('username') or not data.get('password') or not data.get('email'):
         return jsonify({"error": "username, password, email gerekli"}), 400
     
-    result = auth.register_user(data['username'], data['email'], data['password'])
+    try:
+        result = auth.register_user(data['username'], data['email'], data['password'])
+    except HasherBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     
     if result['success']:
         return jsonify(result), 201
@@ -83,18 +353,31 @@ def register():
 @app.route('/api/auth/login', methods=['POST'])
 def login():
     """Kullanıcı girişi"""
-    data = request.get_json()
+    data = get_payload()
     
     if not data or not data.get('username') or not data.get('password'):
         return jsonify({"error": "username ve password gerekli"}), 400
     
-    result = auth.login_user(data['username'], data['password'])
+    try:
+        result = auth.login_user(data['username'], data['password'], ip=request.remote_addr)
+    except HasherBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     
     if result['success']:
         return jsonify(result), 200
+    elif 'retry_after' in result:
+        return jsonify(result), 429, {"Retry-After": str(result['retry_after'])}
     else:
         return jsonify(result), 401
 
+@app.route('/api/auth/logout', methods=['POST'])
+@token_required
+def logout():
+    """Çıkış - token iptal listesine eklenir"""
+    token = request.headers.get('Authorization', '').replace('Bearer ', '')
+    auth.revoke_token(token)
+    return jsonify({"success": True, "message": "Çıkış yapıldı"}), 200
+
 @app.route('/api/auth/me', methods=['GET'])
 @token_required
 def get_user_info():
@@ -110,12 +393,15 @@ def get_user_info():
 @token_required
 def change_password():
     """Şifre değiştir"""
-    data = request.get_json()
+    data = get_payload()
     
     if not data or not data.get('old_password') or not data.get('new_password'):
         return jsonify({"error": "old_password ve new_password gerekli"}), 400
     
-    result = auth.change_password(request.user_id, data['old_password'], data['new_password'])
+    try:
+        result = auth.change_password(request.user_id, data['old_password'], data['new_password'])
+    except HasherBusy as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "1"}
     
     if result['success']:
         return jsonify(result), 200
@@ -126,30 +412,18 @@ def change_password():
 
 @app.route('/api/sync/portfolio', methods=['POST'])
 @token_required
-def sync_portfolio():
+async def sync_portfolio():
     """Portföy verilerini senkronize et"""
-    data = request.get_json()
-    portfolio_data = data.get('data', [])
+    data = get_payload()
+    portfolio_data = get_rows(data)
     
     try:
-        # Mevcut portföyü temizle
-        db.clear_all_data(request.user_id)
-        
-        # Yeni portföyü kaydet
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            for item in portfolio_data:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO portfolios 
-                    (user_id, sembol, adet, ort_maliyet, guncel_fiyat)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (request.user_id, item['sembol'], item['adet'], 
-                      item['ort_maliyet'], item['guncel_fiyat']))
-            conn.commit()
+        count = await adb.replace_portfolio(request.user_id, portfolio_data)
+        notifier.publish(request.user_id)
         
         return jsonify({
             "success": True,
-            "message": f"{len(portfolio_data)} portföy öğesi senkronize edildi"
+            "message": f"{count} portföy öğesi senkronize edildi"
         }), 201
     
     except Exception as e:
@@ -157,29 +431,18 @@ def sync_portfolio():
 
 @app.route('/api/sync/transactions', methods=['POST'])
 @token_required
-def sync_transactions():
+async def sync_transactions():
     """İşlem verilerini senkronize et"""
-    data = request.get_json()
-    transactions = data.get('data', [])
+    data = get_payload()
+    transactions = get_rows(data)
     
     try:
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM transactions WHERE user_id = ?", (request.user_id,))
-            
-            for trans in transactions:
-                cursor.execute('''
-                    INSERT INTO transactions 
-                    (user_id, sembol, tip, adet, fiyat, toplam, tarih)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (request.user_id, trans['sembol'], trans['tip'],
-                      trans['adet'], trans['fiyat'], trans['toplam'], 
-                      trans['tarih']))
-            conn.commit()
+        count = await adb.replace_transactions(request.user_id, transactions)
+        notifier.publish(request.user_id)
         
         return jsonify({
             "success": True,
-            "message": f"{len(transactions)} işlem senkronize edildi"
+            "message": f"{count} işlem senkronize edildi"
         }), 201
     
     except Exception as e:
@@ -187,42 +450,83 @@ def sync_transactions():
 
 @app.route('/api/sync/dividends', methods=['POST'])
 @token_required
-def sync_dividends():
+async def sync_dividends():
     """Temettü verilerini senkronize et"""
-    data = request.get_json()
-    dividends = data.get('data', [])
+    data = get_payload()
+    dividends = get_rows(data)
     
     try:
-        with db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM dividends WHERE user_id = ?", (request.user_id,))
-            
-            for div in dividends:
-                cursor.execute('''
-                    INSERT INTO dividends 
-                    (user_id, sembol, tutar, adet, hisse_basi_tutar, tarih)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (request.user_id, div['sembol'], div['tutar'],
-                      div['adet'], div['hisse_basi_tutar'], div['tarih']))
-            conn.commit()
+        count = await adb.replace_dividends(request.user_id, dividends)
+        notifier.publish(request.user_id)
+        
+        return jsonify({
+            "success": True,
+            "message": f"{count} temettü senkronize edildi"
+        }), 201
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/sync/batch', methods=['POST'])
+@token_required
+async def sync_batch():
+    """Portföy, işlem, temettü ve ayarları tek istekte ve tek işlemde senkronize et"""
+    data = get_payload() or {}
+    tables = {}
+    
+    for name in ('portfolio', 'transactions', 'dividends'):
+        if name in data:
+            rows = data[name]
+            tables[name] = sync_codec.from_columns(rows) if sync_codec.is_columnar(rows) else rows
+    if 'settings' in data:
+        tables['settings'] = data['settings']
+    
+    if not tables:
+        return jsonify({"error": "portfolio, transactions, dividends veya settings gerekli"}), 400
+    
+    try:
+        counts = await adb.sync_batch(request.user_id, tables, data.get('device_id'))
+        notifier.publish(request.user_id)
         
         return jsonify({
             "success": True,
-            "message": f"{len(dividends)} temettü senkronize edildi"
+            "counts": counts,
+            "message": ", ".join(f"{count} {name}" for name, count in counts.items()) + " senkronize edildi"
         }), 201
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/sync/delta', methods=['POST'])
+@token_required
+async def sync_delta():
+    """Delta senkronu: yerel değişiklikleri al, since sonrasındaki diğerlerini döndür"""
+    data = get_payload() or {}
+    device_id = data.get('device_id')
+    
+    if not device_id:
+        return jsonify({"error": "device_id gerekli"}), 400
+    
+    try:
+        result = await adb.sync_delta(request.user_id, device_id,
+                                      int(data.get('since', 0)), data.get('changes', []))
+        if data.get('changes'):
+            notifier.publish(request.user_id)
+        return respond(result)
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/api/sync/settings', methods=['POST'])
 @token_required
-def sync_settings():
+async def sync_settings():
     """Ayarları senkronize et"""
-    data = request.get_json()
+    data = get_payload()
     settings = data.get('data', {})
     
     try:
-        db.update_settings(settings, request.user_id)
+        await adb.update_settings(request.user_id, settings)
+        notifier.publish(request.user_id)
         
         return jsonify({
             "success": True,
@@ -236,65 +540,183 @@ def sync_settings():
 
 @app.route('/api/pull/portfolio', methods=['GET'])
 @token_required
-def pull_portfolio():
+@conditional('portfolios')
+async def pull_portfolio():
     """Portföy verilerini indir"""
     try:
-        portfolio = db.get_portfolio(request.user_id)
-        return jsonify(portfolio), 200
+        if wants_stream():
+            return stream_tables(request.user_id, ('portfolios',))
+        portfolio = await adb.get_portfolio(request.user_id)
+        return respond(portfolio, columnar=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pull/transactions', methods=['GET'])
 @token_required
-def pull_transactions():
+@conditional('transactions')
+async def pull_transactions():
     """İşlem verilerini indir"""
     try:
-        transactions = db.get_transactions(request.user_id)
-        return jsonify(transactions), 200
+        if wants_stream():
+            return stream_tables(request.user_id, ('transactions',))
+        transactions = await adb.get_transactions(request.user_id)
+        return respond(transactions, columnar=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pull/dividends', methods=['GET'])
 @token_required
-def pull_dividends():
+@conditional('dividends')
+async def pull_dividends():
     """Temettü verilerini indir"""
     try:
-        dividends = db.get_dividends(request.user_id)
-        return jsonify(dividends), 200
+        if wants_stream():
+            return stream_tables(request.user_id, ('dividends',))
+        dividends = await adb.get_dividends(request.user_id)
+        return respond(dividends, columnar=True)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pull/settings', methods=['GET'])
 @token_required
-def pull_settings():
+@conditional('settings')
+async def pull_settings():
     """Ayarları indir"""
     try:
-        settings = db.get_settings(request.user_id)
-        return jsonify(settings), 200
+        settings = await adb.get_settings(request.user_id)
+        return respond(settings)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/pull/all', methods=['GET'])
 @token_required
-def pull_all():
+@conditional('portfolios', 'transactions', 'dividends', 'settings')
+async def pull_all():
     """Tüm verileri indir"""
     try:
-        data = {
-            "portfolio": db.get_portfolio(request.user_id),
-            "transactions": db.get_transactions(request.user_id),
-            "dividends": db.get_dividends(request.user_id),
-            "settings": db.get_settings(request.user_id)
-        }
-        return jsonify(data), 200
+        if wants_stream():
+            return stream_tables(request.user_id, ('portfolios', 'transactions', 'dividends', 'settings'))
+        data = await adb.get_all(request.user_id)
+        return respond(data)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/pull/events', methods=['GET'])
+@token_required
+async def pull_events():
+    """Olay defterini indir (?since=<seq> sonrasındaki olaylar)"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = min(request.args.get('limit', 1000, type=int), 5000)
+        events = await adb.events_since(request.user_id, since, limit)
+        return respond({
+            "events": events,
+            "last_seq": events[-1]["seq"] if events else since
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/pull/positions', methods=['GET'])
+@token_required
+async def pull_positions():
+    """Olay defterinden pozisyonlar (?as_of=<tarih> ile geçmiş bir andaki durum)"""
+    try:
+        as_of = request.args.get('as_of')
+        positions = await adb.get_positions(request.user_id, as_of)
+        return respond({"positions": positions, "as_of": as_of})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/pull/changes', methods=['GET'])
+@token_required
+async def pull_changes():
+    """Değişiklik günlüğünü indir (?since=<imleç>&device_id=<kendi değişikliklerini atla>)"""
+    try:
+        since = request.args.get('since', 0, type=int)
+        changes, cursor, has_more = await adb.changes_since(
+            request.user_id, since, exclude_origin=request.args.get('device_id'))
+        return respond({"changes": changes, "cursor": cursor, "has_more": has_more})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ============ CHANGE NOTIFICATIONS ============
+
+@app.route('/api/changes/stream', methods=['GET'])
+@token_required
+def stream_changes():
+    """Değişiklik bildirimleri (SSE): ?since=<imleç>&device_id=<kendi değişikliklerini atla>"""
+    user_id = request.user_id
+    since = request.args.get('since', 0, type=int)
+    device_id = request.args.get('device_id')
+    
+    def latest_seq(user):
+        return db.changes.latest_seq(user, exclude_origin=device_id)
+    
+    # Üreteç view döndükten sonra çalışır; request'e erişmez
+    response = Response(change_stream(notifier, latest_seq, user_id, since),
+                        mimetype=EVENT_STREAM_TYPE)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# ============ SHARED QUOTES ============
+
+def held_symbols():
+    """Tüm kullanıcıların portföy sembolleri + aktif alarm sembolleri"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT sembol FROM portfolios WHERE adet > 0
+            UNION SELECT symbol FROM price_alerts WHERE active = 1
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+
+quotes = QuoteCache(
+    os.environ.get('QUOTE_CACHE_FILE', 'quote_cache.json'),
+    symbols_source=held_symbols,
+    refresh_interval=int(os.environ.get('QUOTE_REFRESH_INTERVAL', 60))
+)
+quotes.observer = metrics.observe_quote_fetch
+
+@app.route('/api/quotes', methods=['GET'])
+@token_required
+def get_quotes():
+    """Paylaşılan önbellekten fiyatlar: ?symbols=THYAO,ASELS (ETag ile koşullu)"""
+    tickers = parse_symbols(request.args.get('symbols'))
+    if not tickers:
+        return jsonify({"error": "symbols gerekli"}), 400
+    if len(tickers) > MAX_SYMBOLS:
+        return jsonify({"error": f"En fazla {MAX_SYMBOLS} sembol"}), 400
+    
+    found, missing, etag = quotes.get(tickers)
+    etag = f"{etag}-{_representation()}"
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        # Bulunamayanlar işçi tarafından hemen çekilir; istemci sonra tekrar sorar
+        response = make_response(respond({"quotes": found, "missing": missing}))
+    
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept')
+    return response
+
+@app.route('/api/quotes/status', methods=['GET'])
+@token_required
+def quotes_status():
+    """Fiyat önbelleği durumu (sembol sayısı, son yenileme, hata)"""
+    return jsonify(quotes.stats()), 200
+
 # ============ ERROR HANDLERS ============
 
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint bulunamadı"}), 404
 
+@app.errorhandler(413)
+def payload_too_large(error):
+    return jsonify({"error": "İstek gövdesi çok büyük"}), 413
+
 @app.errorhandler(500)
 def server_error(error):
     return jsonify({"error": "Sunucu hatası"}), 500
@@ -305,15 +727,25 @@ if __name__ == '__main__':
     print("="*60)
     print("📊 HisseTakip Cloud Server başlıyor...")
     print("="*60)
-    print("URL: http://localhost:5000")
-    print("API Docs: http://localhost:5000/api/health")
+    port = int(os.environ.get('PORT', 5000))
+    print(f"URL: http://localhost:{port}")
+    print(f"API Docs: http://localhost:{port}/api/health")
     print("\nEndpoints:")
     print("  POST   /api/auth/register")
     print("  POST   /api/auth/login")
     print("  GET    /api/auth/me")
+    print("  POST   /api/auth/logout")
     print("  POST   /api/auth/change-password")
-    print("  POST   /api/sync/{portfolio,transactions,dividends,settings}")
-    print("  GET    /api/pull/{portfolio,transactions,dividends,settings,all}")
+    print("  POST   /api/sync/{portfolio,transactions,dividends,settings,batch,delta}")
+    print("  GET    /api/pull/{portfolio,transactions,dividends,settings,all,events,positions,changes}")
+    print("  GET    /api/changes/stream   (SSE)")
+    print("  GET    /api/quotes?symbols=...")
+    print("  GET    /api/metrics")
     print("="*60)
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # Yük testi gibi alt süreç çalıştırmalarında FLASK_DEBUG=0 (yeniden yükleyici yok)
+    debug = os.environ.get('FLASK_DEBUG', '1') == '1'
+    # Yeniden yükleyici açıksa işçi yalnızca uygulamayı çalıştıran alt süreçte
+    if os.environ.get('QUOTE_WORKER', '1') == '1' and (not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        quotes.start()
+    app.run(debug=debug, host=os.environ.get('HOST', '0.0.0.0'), port=port)
@@ -0,0 +1,208 @@
+# server_metrics.py
+"""
+Sunucu Metrikleri - rota bazında sayaç/histogram, Prometheus metin biçimi
+
+Kullanım:
+    metrics = ServerMetrics()
+    metrics.observe_request("/api/pull/all", "GET", 200, duration=0.012,
+                            request_bytes=0, response_bytes=5120, db=0.008, auth=0.001)
+    text = metrics.render()     # GET /api/metrics yanıtı
+
+Etiketler rota şablonudur (/api/pull/<tip> gibi), ham URL değil; böylece
+zaman serisi sayısı rota sayısıyla sınırlı kalır.
+"""
+
+import os
+import sys
+import time
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Saniye cinsinden gecikme kovaları
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bayt cinsinden yük kovaları
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Etiketli, yalnızca artan sayaç"""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            yield self.name, _labels(self.label_names, labels), value
+
+
+class Histogram:
+    """Etiketli, kümülatif kovalı histogram (Prometheus histogram tipi)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> [kova sayıları..., toplam, adet]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(state)) for labels, state in self._values.items())
+        for labels, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield (f"{self.name}_bucket",
+                       _labels(self.label_names, labels, f'le="{_number(float(bound))}"'), cumulative)
+            yield f"{self.name}_bucket", _labels(self.label_names, labels, 'le="+Inf"'), state[-1]
+            yield f"{self.name}_sum", _labels(self.label_names, labels), state[-2]
+            yield f"{self.name}_count", _labels(self.label_names, labels), state[-1]
+
+
+class ServerMetrics:
+    """server.py istek metrikleri + süreç istatistikleri"""
+
+    def __init__(self, prefix="hissetakip"):
+        route = ("route",)
+        self.requests = Counter(f"{prefix}_http_requests_total",
+                                "İstek sayısı", ("route", "method", "status"))
+        self.latency = Histogram(f"{prefix}_http_request_duration_seconds",
+                                 "İstek süresi (yanıt başlıklarına kadar)", route)
+        self.request_size = Histogram(f"{prefix}_http_request_size_bytes",
+                                      "İstek gövdesi boyutu (kodlanmış)", route, SIZE_BUCKETS)
+        self.response_size = Histogram(f"{prefix}_http_response_size_bytes",
+                                       "Yanıt gövdesi boyutu (sıkıştırılmış; akışlar hariç)",
+                                       route, SIZE_BUCKETS)
+        self.db_time = Histogram(f"{prefix}_http_request_db_seconds",
+                                 "İstek başına veritabanı süresi", route)
+        self.auth_time = Histogram(f"{prefix}_http_request_auth_seconds",
+                                   "İstek başına token doğrulama süresi", route)
+        self.db_calls = Histogram(f"{prefix}_db_call_seconds",
+                                  "Tek bir AsyncDatabase çağrısının süresi")
+        self.quote_fetches = Counter(f"{prefix}_quote_provider_symbols_total",
+                                     "Paylaşılan fiyat önbelleği için sağlayıcıdan istenen sembol",
+                                     ("outcome",))
+        self.quote_fetch_time = Histogram(f"{prefix}_quote_provider_request_seconds",
+                                          "Sağlayıcıya giden toplu fiyat isteğinin süresi")
+        self._metrics = [self.requests, self.latency, self.request_size, self.response_size,
+                         self.db_time, self.auth_time, self.db_calls,
+                         self.quote_fetches, self.quote_fetch_time]
+        self.prefix = prefix
+        self.started = time.time()
+
+    def observe_request(self, route, method, status, duration, request_bytes=None,
+                        response_bytes=None, db=0.0, auth=0.0):
+        self.requests.inc(route, method, str(status))
+        self.latency.observe(duration, route)
+        if request_bytes is not None:
+            self.request_size.observe(request_bytes, route)
+        if response_bytes is not None:
+            self.response_size.observe(response_bytes, route)
+        self.db_time.observe(db, route)
+        if auth:
+            self.auth_time.observe(auth, route)
+
+    def observe_db_call(self, elapsed):
+        self.db_calls.observe(elapsed)
+
+    def observe_quote_fetch(self, symbols, elapsed, ok):
+        self.quote_fetches.inc("ok" if ok else "error", amount=symbols)
+        self.quote_fetch_time.observe(elapsed)
+
+    # ========== SÜREÇ ==========
+
+    def process_stats(self):
+        """Bellek, thread ve CPU istatistikleri (platformda olmayanlar atlanır)"""
+        stats = {
+            "process_start_time_seconds": ("gauge", "Süreç başlangıç zamanı", self.started),
+            "process_threads": ("gauge", "Aktif Python thread sayısı", threading.active_count()),
+        }
+
+        rss = self._resident_memory()
+        if rss is not None:
+            stats["process_resident_memory_bytes"] = ("gauge", "Yerleşik bellek", rss)
+
+        if resource is not None:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            # Linux'ta KB, macOS'ta bayt
+            peak = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+            stats["process_max_resident_memory_bytes"] = ("gauge", "En yüksek yerleşik bellek", peak)
+            stats["process_cpu_seconds_total"] = ("counter", "Kullanıcı + sistem CPU süresi",
+                                                  usage.ru_utime + usage.ru_stime)
+        return stats
+
+    @staticmethod
+    def _resident_memory():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    # ========== ÇIKTI ==========
+
+    def render(self):
+        """Prometheus metin biçimi"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_number(value)}")
+
+        for name, (kind, help_text, value) in self.process_stats().items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,217 @@
+# sync_codec.py
+"""
+Senkron Yük Kodlaması - sıkıştırma ve sütunsal MessagePack
+
+CloudSync ile server.py arasındaki gövdeler için ortak kodlayıcı:
+
+    Content-Encoding    gzip her zaman, zstd (zstandard kuruluysa)
+    Content-Type        application/json veya application/x-msgpack (msgpack kuruluysa)
+
+Sütunsal kodlama: aynı anahtarlı satır listeleri (işlemler, temettüler)
+{"columns": [...], "rows": N, "data": [[sütun 1], [sütun 2], ...]} olarak
+gönderilir; uzun Türkçe sütun adları satır başına tekrarlanmaz.
+
+Sunucu yanıtlara Accept-Encoding başlığı koyar (RFC 7694); istemci istek
+gövdelerini yalnızca sunucunun desteklediği kodlamayla sıkıştırır.
+
+Büyük çekmeler NDJSON (application/x-ndjson) olarak akıtılabilir: her satır
+{"table": ..., "row": {...}} nesnesidir; iki uçta da bellek sabit kalır.
+"""
+
+import gzip
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/x-msgpack"
+NDJSON_TYPE = "application/x-ndjson"
+
+# Bundan küçük gövdeler sıkıştırılmaz (başlık maliyeti kazançtan büyük)
+MIN_COMPRESS_SIZE = 1024
+
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def available_encodings():
+    """Tercih sırasıyla desteklenen içerik kodlamaları"""
+    return ["zstd", "gzip"] if zstandard else ["gzip"]
+
+
+def compress(data, encoding):
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    raise ValueError(f"Desteklenmeyen kodlama: {encoding}")
+
+
+class PayloadTooLarge(ValueError):
+    """Açılmış gövde max_size'ı aşıyor"""
+
+
+def decompress(data, encoding, max_size=None):
+    """max_size verilirse açılan veri bu sınırı aşınca PayloadTooLarge (bellek sınırlı)"""
+    if not encoding or encoding == "identity":
+        if max_size is not None and len(data) > max_size:
+            raise PayloadTooLarge(f"Gövde {max_size} baytı aşıyor")
+        return data
+    if encoding == "gzip":
+        if max_size is None:
+            return gzip.decompress(data)
+        decompressor = zlib.decompressobj(31)
+        result = decompressor.decompress(data, max_size + 1)
+        # gzip.decompress gibi ardışık üyeler de açılır (kalan bütçeyle)
+        while decompressor.eof and decompressor.unused_data and len(result) <= max_size:
+            rest = decompressor.unused_data
+            decompressor = zlib.decompressobj(31)
+            result += decompressor.decompress(rest, max_size + 1 - len(result))
+        if len(result) > max_size:
+            raise PayloadTooLarge(f"Açılmış gövde {max_size} baytı aşıyor")
+        # Sınıra ulaşmadan veri bitti ama akış kapanmadı: gövde kesilmiş
+        if not decompressor.eof:
+            raise ValueError("Gzip gövdesi eksik (kesilmiş akış)")
+        return result
+    if encoding == "zstd" and zstandard:
+        # Akış halinde sıkıştırılmış çerçevelerde içerik boyutu yazılmayabilir
+        if max_size is None:
+            return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+        with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+            result = reader.read(max_size + 1)
+    else:
+        raise ValueError(f"Desteklenmeyen kodlama: {encoding}")
+    if len(result) > max_size:
+        raise PayloadTooLarge(f"Açılmış gövde {max_size} baytı aşıyor")
+    return result
+
+
+def negotiate_encoding(accept_encoding):
+    """Accept-Encoding başlığından desteklenen en iyi kodlamayı seç (yoksa None)"""
+    offered = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[name] = quality
+
+    for encoding in available_encodings():
+        if offered.get(encoding, offered.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def compress_stream(chunks, encoding):
+    """Parça akışını sıkıştır; her parça sonunda flush (istemci beklemeden açabilsin)"""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        flush_mode = zlib.Z_SYNC_FLUSH
+    elif encoding == "zstd" and zstandard:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        raise ValueError(f"Desteklenmeyen kodlama: {encoding}")
+
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(flush_mode)
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        # İstemci koparsa alttaki üretecin (DB imleci) kapanması için
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
+
+
+def preferred_type(accept):
+    """Accept başlığı msgpack istiyorsa ve kuruluysa MSGPACK_TYPE"""
+    if msgpack and MSGPACK_TYPE in (accept or ""):
+        return MSGPACK_TYPE
+    return JSON_TYPE
+
+
+def wants_ndjson(accept):
+    return NDJSON_TYPE in (accept or "")
+
+
+# ========== SÜTUNSAL KODLAMA ==========
+
+def to_columns(rows):
+    """Satır sözlükleri listesi -> sütun dizileri"""
+    columns = list(rows[0].keys()) if rows else []
+    return {
+        "columns": columns,
+        "rows": len(rows),
+        "data": [[row.get(column) for row in rows] for column in columns],
+    }
+
+
+def from_columns(table):
+    """to_columns'un tersi"""
+    columns = table["columns"]
+    return [dict(zip(columns, values)) for values in zip(*table["data"])] if columns else []
+
+
+def is_columnar(value):
+    return isinstance(value, dict) and "columns" in value and "data" in value
+
+
+# ========== GÖVDE ==========
+
+def dumps(obj, content_type=JSON_TYPE):
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(obj, use_bin_type=True)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(data, content_type=JSON_TYPE):
+    if content_type and content_type.startswith(MSGPACK_TYPE):
+        if not msgpack:
+            raise ValueError("msgpack kurulu değil")
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data.decode("utf-8")) if data else None
+
+
+def encode(obj, content_type=JSON_TYPE, encoding=None, min_size=MIN_COMPRESS_SIZE):
+    """Nesneyi gövdeye çevir: (bayt, Content-Encoding veya None)"""
+    body = dumps(obj, content_type)
+    if encoding and len(body) >= min_size:
+        return compress(body, encoding), encoding
+    return body, None
+
+
+def decode(body, content_type=JSON_TYPE, encoding=None, max_size=None):
+    return loads(decompress(body, encoding, max_size), content_type)
+
+
+# ========== NDJSON ==========
+
+def ndjson_lines(records):
+    """Kayıt listesini tek parça NDJSON baytına çevir"""
+    return b"".join(dumps(record) + b"\n" for record in records)
+
+
+def iter_ndjson(lines):
+    """Satır akışından kayıtları tek tek çöz (boş satırlar atlanır)"""
+    for line in lines:
+        if line:
+            yield json.loads(line)
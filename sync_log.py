@@ -0,0 +1,533 @@
+# sync_log.py
+"""
+Değişiklik Günlüğü - satır bazında delta senkronizasyonu
+
+portfolios, transactions, dividends ve settings tablolarındaki her ekleme,
+güncelleme ve silme tetikleyicilerle sync_changes tablosuna yazılır:
+
+    seq         tekdüze artan değişiklik numarası (senkron imleci)
+    tbl/row_key tablo + doğal anahtar (sembol, setting_key veya uid)
+    op          'upsert' ya da 'delete' (mezar taşı)
+    origin      değişikliği uygulayan cihaz; yerel düzenlemelerde NULL
+
+Satır başına yalnızca son değişiklik tutulur (eskisi silinip yeniden eklenir), yani
+günlük kendiliğinden sıkışır. Uzak değişiklikler apply() ile uygulanırken
+sync_meta.apply_origin aynı işlem içinde ayarlanır; tetikleyiciler bunu
+origin olarak yazar, böylece çekilen satırlar geri gönderilmez.
+
+Protokol (tek istek): istemci imlecinden sonraki yerel değişiklikleri
+POST /api/sync/delta ile gönderir, yanıt olarak sunucu imlecinden sonraki
+diğer cihazların değişikliklerini ve yeni imleci alır.
+
+Değişiklikler alan saatleriyle gider; iki tarafta da merge_engine ile alan
+bazında birleştirilir (bkz. merge_engine.py).
+"""
+
+import uuid
+import hashlib
+
+import merge_engine
+
+OP_UPSERT = "upsert"
+OP_DELETE = "delete"
+
+# tablo -> (anahtar sütunu, senkronlanan sütunlar)
+TRACKED_TABLES = {
+    "portfolios": ("sembol", ("sembol", "adet", "ort_maliyet", "guncel_fiyat")),
+    "transactions": ("uid", ("uid", "sembol", "tip", "adet", "fiyat", "toplam", "komisyon", "tarih")),
+    "dividends": ("uid", ("uid", "sembol", "tutar", "adet", "hisse_basi_tutar", "tarih")),
+    "settings": ("setting_key", ("setting_key", "setting_value")),
+}
+
+# Cihazlar arası kimlik için uid sütunu eklenen tablolar
+UID_TABLES = ("transactions", "dividends")
+
+# Geçişte mevcut satırların uid'i bu sütunlardan türetilir: aynı hesabın iki
+# cihazdaki (veya sunucudaki) aynı satırı aynı uid'i alır, ilk senkronda çoğalmaz
+CONTENT_UID_COLUMNS = {
+    "transactions": ("sembol", "tip", "adet", "fiyat", "tarih"),
+    "dividends": ("sembol", "tutar", "tarih"),
+}
+
+# Bir istekte gönderilen/alınan en fazla değişiklik
+PAGE_SIZE = 1000
+
+# Akışlı okuma/yazmada parça başına satır
+STREAM_BATCH_SIZE = 500
+
+# Tetikleyici gövdeleri değiştiğinde artırılır; eski tetikleyiciler yeniden kurulur
+TRIGGER_VERSION = 3
+
+_ORIGIN = "(SELECT value FROM sync_meta WHERE key = 'apply_origin')"
+_NEW_UID = "lower(hex(randomblob(16)))"
+
+
+def content_uid(table, values, occurrence):
+    """
+    Geçiş uid'i: içerik + aynı içerikli satırlar arasındaki sıra
+
+    user_id katılmaz (yerel ve sunucu hesap numaraları farklıdır); uid zaten
+    (user_id, uid) çiftiyle tekildir. Sayılar float'a çevrilir (100 == 100.0).
+    """
+    parts = [table]
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            parts.append(repr(float(value)))
+        else:
+            parts.append("" if value is None else str(value))
+    parts.append(str(occurrence))
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _log_sql(table, key_expr, op, user_expr):
+    # INSERT OR REPLACE yerine DELETE + INSERT: dıştaki UPSERT ifadesi tetikleyici
+    # içindeki çakışma kuralını geçersiz kılar
+    return f'''
+        DELETE FROM sync_changes WHERE user_id = {user_expr} AND tbl = '{table}' AND row_key = {key_expr};
+        INSERT INTO sync_changes (user_id, tbl, row_key, op, origin)
+        VALUES ({user_expr}, '{table}', {key_expr}, '{op}', {_ORIGIN});
+    '''
+
+
+def trigger_statements(table, key_column, columns):
+    """Bir tablo için INSERT/UPDATE/DELETE tetikleyicileri (günlük + alan saatleri)"""
+    uid = key_column == "uid"
+    statements = []
+
+    if uid:
+        # Yerel eklemelerde uid yok: önce üret, sonra günlüğe yaz
+        new_key = f"(SELECT uid FROM {table} WHERE id = NEW.id)"
+        insert_body = f'''
+            UPDATE {table} SET uid = {_NEW_UID} WHERE id = NEW.id AND uid IS NULL;
+            {_log_sql(table, new_key, OP_UPSERT, "NEW.user_id")}
+            {merge_engine.trigger_sql(table, key_column, columns, "insert", new_key)}
+        '''
+        # uid atayan güncelleme (OLD.uid NULL) ayrıca günlüğe yazılmaz
+        update_when = "WHEN OLD.uid IS NOT NULL"
+    else:
+        insert_body = (_log_sql(table, f"NEW.{key_column}", OP_UPSERT, "NEW.user_id")
+                       + merge_engine.trigger_sql(table, key_column, columns, "insert"))
+        update_when = ""
+
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_insert AFTER INSERT ON {table}
+        BEGIN {insert_body} END
+    ''')
+
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_update AFTER UPDATE ON {table}
+        {update_when}
+        BEGIN
+            UPDATE {table} SET updated_at = CURRENT_TIMESTAMP
+            WHERE id = NEW.id AND NEW.updated_at IS OLD.updated_at;
+            {_log_sql(table, f"OLD.{key_column}", OP_DELETE, "OLD.user_id")}
+            {_log_sql(table, f"NEW.{key_column}", OP_UPSERT, "NEW.user_id")}
+            {merge_engine.trigger_sql(table, key_column, columns, "update")}
+        END
+    ''')
+
+    statements.append(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_sync_{table}_delete AFTER DELETE ON {table}
+        WHEN OLD.{key_column} IS NOT NULL
+        BEGIN
+            {_log_sql(table, f"OLD.{key_column}", OP_DELETE, "OLD.user_id")}
+            {merge_engine.trigger_sql(table, key_column, columns, "delete")}
+        END
+    ''')
+    return statements
+
+
+class ChangeLog:
+    """sync_changes / sync_meta tabloları üzerinde delta senkronizasyonu"""
+
+    def __init__(self, db, page_size=PAGE_SIZE):
+        self.db = db
+        self.page_size = page_size
+
+    # ========== ŞEMA ==========
+
+    def install(self, cursor):
+        """Tabloları, uid/updated_at sütunlarını ve tetikleyicileri oluştur"""
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sync_changes'")
+        first_install = cursor.fetchone() is None
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                tbl TEXT NOT NULL,
+                row_key TEXT NOT NULL,
+                op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+                origin TEXT,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(user_id, tbl, row_key)
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sync_changes_user_seq
+            ON sync_changes(user_id, seq)
+        ''')
+
+        # Tablo sürümü (MAX(seq)) tek indeks aramasıyla bulunur
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sync_changes_user_tbl_seq
+            ON sync_changes(user_id, tbl, seq)
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            ) WITHOUT ROWID
+        ''')
+
+        for table in UID_TABLES:
+            columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+            if "uid" not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN uid TEXT")
+                self._assign_content_uids(cursor, table)
+            if "updated_at" not in columns:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP")
+                cursor.execute(f"UPDATE {table} SET updated_at = created_at")
+            cursor.execute(f'''
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_uid ON {table}(user_id, uid)
+            ''')
+
+        # Saatler cihaz kimliğini kullanır: tetikleyicilerden önce var olmalı
+        device = self.get_meta(cursor, "device_id")
+        if not device:
+            device = uuid.uuid4().hex
+            self.set_meta(cursor, "device_id", device)
+        merge_engine.install(cursor, TRACKED_TABLES, device)
+
+        rebuild = self.get_meta(cursor, "trigger_version") != str(TRIGGER_VERSION)
+        for table, (key_column, columns) in TRACKED_TABLES.items():
+            if rebuild:
+                for event in ("insert", "update", "delete"):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS trg_sync_{table}_{event}")
+            for statement in trigger_statements(table, key_column, columns):
+                cursor.execute(statement)
+        self.set_meta(cursor, "trigger_version", TRIGGER_VERSION)
+
+        if first_install:
+            # Mevcut satırlar ilk delta senkronunda gönderilsin
+            for table, (key_column, _) in TRACKED_TABLES.items():
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO sync_changes (user_id, tbl, row_key, op)
+                    SELECT user_id, '{table}', {key_column}, '{OP_UPSERT}' FROM {table}
+                    ORDER BY id
+                ''')
+
+    def _assign_content_uids(self, cursor, table):
+        """Mevcut satırlara içerikten türetilen uid ver (tek seferlik geçiş)"""
+        columns = CONTENT_UID_COLUMNS[table]
+        cursor.execute(f"SELECT id, user_id, {', '.join(columns)} FROM {table} ORDER BY id")
+        seen = {}
+        updates = []
+        for row in cursor.fetchall():
+            values = tuple(row[2:])
+            occurrence = seen.get((row[1], values), 0)
+            seen[(row[1], values)] = occurrence + 1
+            updates.append((content_uid(table, values, occurrence), row[0]))
+        cursor.executemany(f"UPDATE {table} SET uid = ? WHERE id = ?", updates)
+
+    # ========== META ==========
+
+    def get_meta(self, cursor, key, default=None):
+        cursor.execute("SELECT value FROM sync_meta WHERE key = ?", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, cursor, key, value):
+        cursor.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def device_id(self):
+        """Bu veritabanının kalıcı cihaz kimliği"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            device = self.get_meta(cursor, "device_id")
+            if not device:
+                device = uuid.uuid4().hex
+                self.set_meta(cursor, "device_id", device)
+            return device
+
+    def get_cursors(self, user_id):
+        """(gönderim imleci, çekme imleci)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            return (int(self.get_meta(cursor, f"push_cursor:{user_id}", 0)),
+                    int(self.get_meta(cursor, f"pull_cursor:{user_id}", 0)))
+
+    def latest_seq(self, user_id, exclude_origin=None):
+        """Kullanıcının en son değişiklik numarası (exclude_origin: o cihazınkiler hariç)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            if exclude_origin is None:
+                cursor.execute("SELECT MAX(seq) FROM sync_changes WHERE user_id = ?", (user_id,))
+                return cursor.fetchone()[0] or 0
+            # (user_id, seq) indeksinde sondan geriye, ilk eşleşmede durur
+            cursor.execute('''
+                SELECT seq FROM sync_changes WHERE user_id = ? AND origin IS NOT ?
+                ORDER BY seq DESC LIMIT 1
+            ''', (user_id, exclude_origin))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def pending(self, user_id):
+        """
+        Gönderilmeyi bekleyen yerel değişiklikler: (adet, en büyük seq)
+
+        sync_changes kalıcı giden kutusudur: imleçten sonraki yerel kayıtlar
+        uygulama kapansa da bir sonraki senkronda gönderilir.
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            push_cursor = int(self.get_meta(cursor, f"push_cursor:{user_id}", 0))
+            cursor.execute('''
+                SELECT COUNT(*), MAX(seq) FROM sync_changes
+                WHERE user_id = ? AND seq > ? AND origin IS NULL
+            ''', (user_id, push_cursor))
+            count, latest = cursor.fetchone()
+            return count, latest or push_cursor
+
+    def table_versions(self, user_id, tables=tuple(TRACKED_TABLES)):
+        """
+        Tablo başına içerik sürümü: son değişikliğin seq değeri (hiç yoksa 0)
+
+        Her değişiklik satırın günlük kaydını daha büyük bir seq ile yeniler;
+        sürüm yalnızca artar, tablo okunmadan ETag üretmek için yeterlidir.
+        """
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            versions = {}
+            for table in tables:
+                cursor.execute("SELECT MAX(seq) FROM sync_changes WHERE user_id = ? AND tbl = ?",
+                               (user_id, table))
+                versions[table] = cursor.fetchone()[0] or 0
+            return versions
+
+    # ========== OKUMA ==========
+
+    def changes_since(self, user_id, since=0, limit=None, exclude_origin=None, local_only=False):
+        """
+        seq > since olan değişiklikleri satır verisiyle getir
+
+        Dönüş: (değişiklikler, imleç, devamı var mı). İmleç taranan son seq'tir;
+        exclude_origin ile atlanan değişiklikler de imleci ilerletir.
+        """
+        limit = limit or self.page_size
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT seq, tbl, row_key, op, origin, changed_at FROM sync_changes
+                WHERE user_id = ? AND seq > ?
+                ORDER BY seq LIMIT ?
+            ''', (user_id, since, limit))
+            rows = cursor.fetchall()
+
+            cursor_seq = rows[-1][0] if rows else since
+            has_more = len(rows) == limit
+
+            selected = []
+            for seq, table, key, op, origin, changed_at in rows:
+                if local_only and origin is not None:
+                    continue
+                if exclude_origin is not None and origin == exclude_origin:
+                    continue
+                selected.append({"seq": seq, "table": table, "key": key, "op": op,
+                                 "changed_at": changed_at})
+
+            self._attach_rows(cursor, user_id, selected)
+            return selected, cursor_seq, has_more
+
+    def _attach_rows(self, cursor, user_id, changes):
+        """upsert değişikliklerine satırın güncel halini, tümüne saatleri ekle (tablo başına tek sorgu)"""
+        by_table = {}
+        for change in changes:
+            if change["op"] == OP_UPSERT:
+                by_table.setdefault(change["table"], []).append(change)
+
+        for table, items in by_table.items():
+            key_column, columns = TRACKED_TABLES[table]
+            found = {}
+            keys = [item["key"] for item in items]
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(f'''
+                    SELECT {", ".join(columns)}, updated_at FROM {table}
+                    WHERE user_id = ? AND {key_column} IN ({placeholders})
+                ''', (user_id, *chunk))
+                for row in cursor.fetchall():
+                    found[str(row[0])] = row
+
+            for item in items:
+                row = found.get(item["key"])
+                if row is None:
+                    # Satır bu arada silinmiş: mezar taşı olarak gönder
+                    item["op"] = OP_DELETE
+                    continue
+                item["row"] = {column: row[i] for i, column in enumerate(columns)}
+                item["updated_at"] = row[len(columns)]
+
+        by_table = {}
+        for change in changes:
+            by_table.setdefault(change["table"], []).append(change)
+        for table, items in by_table.items():
+            merge_engine.attach_clocks(cursor, user_id, table, items)
+
+    def iter_row_batches(self, user_id, table, batch_size=STREAM_BATCH_SIZE):
+        """
+        Tablonun senkronlanan sütunlarını imleçten parça parça oku
+
+        Tüm tablo belleğe alınmaz; akış yarıda bırakılırsa bağlantı kapanır.
+        """
+        key_column, columns = TRACKED_TABLES[table]
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE user_id = ? ORDER BY id",
+                           (user_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(zip(columns, row)) for row in rows]
+
+    # ========== UYGULAMA ==========
+
+    def apply(self, cursor, user_id, changes, origin, reconcile=True):
+        """
+        Uzak değişiklikleri uygula (çağıranın işlemi içinde)
+
+        origin tetikleyicilerin yazdığı kaynak kimliğidir; işlem bitmeden
+        temizlendiği için diğer bağlantılar hiçbir zaman görmez.
+
+        Saatli değişiklikler (clocks/hlc) merge_engine ile alan bazında
+        birleştirilir; saatsiz olanlar (eski istemciler, anlık görüntü) satırı
+        olduğu gibi yazar. Yerelde daha yeni alan kalan satırlar yeniden yerel
+        değişiklik olarak günlüğe alınır ki birleşmiş hali karşı tarafa da gitsin.
+        """
+        self.set_meta(cursor, "apply_origin", origin)
+        applied = 0
+        requeue = []
+        try:
+            for change in changes:
+                table = change.get("table")
+                if table not in TRACKED_TABLES:
+                    continue
+                key_column, columns = TRACKED_TABLES[table]
+                key = change.get("key")
+                if key is None:
+                    continue
+
+                if "clocks" in change or "hlc" in change:
+                    merged, local_newer = merge_engine.merge(cursor, user_id, table, key_column,
+                                                             columns, change)
+                    applied += merged
+                    if local_newer:
+                        requeue.append((table, key_column, key))
+                    continue
+
+                if change.get("op") == OP_DELETE:
+                    cursor.execute(f"DELETE FROM {table} WHERE user_id = ? AND {key_column} = ?",
+                                   (user_id, key))
+                else:
+                    row = dict(change.get("row") or {})
+                    row[key_column] = key
+                    present = [c for c in columns if c in row]
+                    updates = ", ".join(f"{c} = excluded.{c}" for c in present if c != key_column)
+                    cursor.execute(f'''
+                        INSERT INTO {table} (user_id, {", ".join(present)})
+                        VALUES (?, {", ".join("?" * len(present))})
+                        ON CONFLICT(user_id, {key_column}) DO {"UPDATE SET " + updates if updates else "NOTHING"}
+                    ''', (user_id, *(row[c] for c in present)))
+                applied += 1
+        finally:
+            cursor.execute("DELETE FROM sync_meta WHERE key = 'apply_origin'")
+
+        merge_engine.observe(cursor, [clock for change in changes
+                                      for clock in merge_engine.change_clocks(change)])
+        for table, key_column, key in requeue:
+            self._requeue(cursor, user_id, table, key_column, key)
+
+        if reconcile and any(change.get("table") in UID_TABLES for change in changes):
+            # İşlem/temettü değişikliklerini olay defterine yansıt
+            self.db.ledger.reconcile(cursor, user_id)
+        return applied
+
+    def _requeue(self, cursor, user_id, table, key_column, key):
+        """Satırı yeni seq ile yerel değişiklik (origin NULL) olarak günlüğe yaz"""
+        cursor.execute(f"SELECT 1 FROM {table} WHERE user_id = ? AND {key_column} = ?", (user_id, key))
+        op = OP_UPSERT if cursor.fetchone() else OP_DELETE
+        cursor.execute("DELETE FROM sync_changes WHERE user_id = ? AND tbl = ? AND row_key = ?",
+                       (user_id, table, key))
+        cursor.execute("INSERT INTO sync_changes (user_id, tbl, row_key, op) VALUES (?, ?, ?, ?)",
+                       (user_id, table, key, op))
+
+    def apply_pulled(self, user_id, changes, push_cursor, pull_cursor):
+        """İstemci: sunucudan gelenleri uygula ve imleçleri aynı işlemde ilerlet"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            applied = self.apply(cursor, user_id, changes, origin="server") if changes else 0
+            self.set_meta(cursor, f"push_cursor:{user_id}", push_cursor)
+            self.set_meta(cursor, f"pull_cursor:{user_id}", pull_cursor)
+            return applied
+
+    def ingest_rows(self, user_id, records, origin="server", batch_size=STREAM_BATCH_SIZE):
+        """
+        İstemci: {"table", "row"} kayıt akışını parça parça tek işlemde upsert et
+
+        Akış satırlarında saat yoktur: gönderilmemiş yerel değişikliği olan
+        satırlar (düzenleme veya silme) atlanır, ardından gelen delta onları
+        sunucuya gönderir ve birleştirmeyi saatler yapar.
+
+        Olay defteri mutabakatı her parçada değil sonda bir kez yapılır.
+        Dönüş: tablo başına uygulanan satır sayısı.
+        """
+        counts = {}
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            push_cursor = int(self.get_meta(cursor, f"push_cursor:{user_id}", 0))
+            cursor.execute('''
+                SELECT tbl, row_key FROM sync_changes
+                WHERE user_id = ? AND seq > ? AND origin IS NULL
+            ''', (user_id, push_cursor))
+            unsent = {(table, key) for table, key in cursor.fetchall()}
+            batch = []
+            for record in records:
+                table = record.get("table")
+                if table not in TRACKED_TABLES:
+                    continue
+                row = record.get("row") or {}
+                key = row.get(TRACKED_TABLES[table][0])
+                if (table, key) in unsent:
+                    continue
+                batch.append({"table": table, "key": key, "op": OP_UPSERT, "row": row})
+                counts[table] = counts.get(table, 0) + 1
+                if len(batch) >= batch_size:
+                    self.apply(cursor, user_id, batch, origin, reconcile=False)
+                    batch = []
+            if batch:
+                self.apply(cursor, user_id, batch, origin, reconcile=False)
+
+            if any(table in UID_TABLES for table in counts):
+                self.db.ledger.reconcile(cursor, user_id)
+        return counts
+
+    def sync_delta(self, user_id, device_id, since, changes):
+        """
+        Sunucu: cihazın değişikliklerini uygula, since sonrasındaki diğer
+        değişiklikleri döndür
+
+        since günlüğün sonundan ilerideyse (sunucu yedekten dönmüş) "reset"
+        döner: istemcinin imleci bu günlüğe ait değildir, tam senkron gerekir.
+        """
+        reset = since > self.latest_seq(user_id)
+        if changes:
+            with self.db.get_connection() as conn:
+                self.apply(conn.cursor(), user_id, changes, origin=device_id)
+        if reset:
+            return {"changes": [], "cursor": 0, "has_more": False, "reset": True}
+        pending, cursor_seq, has_more = self.changes_since(user_id, since, exclude_origin=device_id)
+        return {"changes": pending, "cursor": cursor_seq, "has_more": has_more}
@@ -0,0 +1,281 @@
+# sync_worker.py
+"""
+Arka Plan Senkron İşçisi - erteleme (debounce), geri çekilme (backoff) ve
+çevrimdışı kuyruk
+
+Giden kutusu sync_changes tablosudur (bkz. sync_log.ChangeLog.pending): yerel
+değişiklikler gönderilene kadar orada kalır, uygulama kapansa da kaybolmaz.
+
+Döngü:
+    - Giden kutusu her `poll_interval` saniyede kontrol edilir; yerel yazma
+      yollarının işçiyi ayrıca uyandırması gerekmez.
+    - Yerel değişiklik görülünce `debounce` saniye sessizlik beklenir (en fazla
+      `max_delay`), art arda düzenlemeler tek senkronda gider.
+    - Değişiklik yoksa yalnızca her `pull_interval` saniyede bir çekilir.
+    - Hata olursa üstel geri çekilme + jitter; sunucuya ulaşılamıyorsa durum
+      "offline" olur ve bir sonraki deneme zamanına kadar istek atılmaz.
+    - 401 yanıtında kimlik bilgileri yenilenene kadar durur.
+    - 429/503 yanıtındaki Retry-After süresinden önce tekrar denenmez
+      (durum "throttled").
+    - listen=True ise ayrı bir thread sunucunun değişiklik akışını (SSE) dinler:
+      bildirim gelince hemen çekilir; akış bağlıyken periyodik çekme yapılmaz.
+
+Kullanım:
+    worker = SyncWorker(cloud_sync)
+    worker.start()
+    worker.status()          # kuyruk derinliği, son başarı, hata sayısı...
+    worker.stop()
+"""
+
+import time
+import random
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+STATE_IDLE = "idle"
+STATE_PENDING = "pending"
+STATE_SYNCING = "syncing"
+STATE_OFFLINE = "offline"
+STATE_ERROR = "error"
+STATE_AUTH_ERROR = "auth_error"
+STATE_THROTTLED = "throttled"
+
+
+def parse_retry_after(value):
+    """Retry-After (saniye veya HTTP tarihi) -> saniye; geçersiz/yoksa None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class SyncWorker:
+    """CloudSync.sync_all_data'yı gerektiğinde çağıran arka plan thread'i"""
+
+    def __init__(self, cloud_sync, debounce=2.0, max_delay=30.0, pull_interval=300,
+                 poll_interval=1.0, backoff_base=2.0, backoff_max=300.0, listen=True):
+        self.cloud = cloud_sync
+        self.listen = listen
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.pull_interval = pull_interval
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.state = STATE_IDLE
+        self.queue_depth = 0
+        self.failures = 0
+        self.last_success = None
+        self.last_error = None
+        self.last_duration = None
+        self.sent_total = 0
+        self.received_total = 0
+        self.listening = False
+        self.notifications = 0
+
+        self._last_seq = None
+        self._first_pending = None
+        self._last_change = None
+        self._last_attempt = None
+        self._retry_at = 0.0
+        self._force = False
+        self._remote_pending = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listener = None
+        self._listener_stop = None
+
+    # ========== KONTROL ==========
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="sync-worker", daemon=True)
+        self._thread.start()
+        if self.listen:
+            # Her dinleyicinin kendi durdurma olayı: start() onu temizleyemez,
+            # eski dinleyici eski kimlik bilgileriyle çalışmaya devam edemez
+            self._listener_stop = threading.Event()
+            self._listener = threading.Thread(target=self._listen_loop, args=(self._listener_stop,),
+                                              name="sync-listener", daemon=True)
+            self._listener.start()
+        print("⚙️ Senkron işçisi başlatıldı")
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._listener:
+            # Okuma sırasında bloklanır; en geç bir kalp atışında (veya bağlantı
+            # koptuğunda) olayı görüp çıkar ve bir daha bildirim üretmez
+            self._listener_stop.set()
+            self._listener.join(timeout)
+            self._listener = self._listener_stop = None
+        self.listening = False
+
+    def notify_remote(self):
+        """Sunucuda başka cihazdan değişiklik var: ertelemeden çek (geri çekilmeye uyarak)"""
+        self.notifications += 1
+        self._remote_pending = True
+        self._wake.set()
+
+    def sync_now(self):
+        """Erteleme ve geri çekilmeyi atlayıp hemen senkronize et"""
+        self._force = True
+        self._retry_at = 0.0
+        if self.state == STATE_AUTH_ERROR:
+            self.state = STATE_IDLE
+        self._wake.set()
+
+    # ========== DÖNGÜ ==========
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self._tick(time.monotonic())
+            except Exception as e:
+                print(f"Senkron işçisi hatası: {e}")
+
+    def _tick(self, now):
+        cloud = self.cloud
+        if not cloud.enabled or not cloud.user_id:
+            return
+
+        count, latest = cloud.db.changes.pending(cloud.user_id)
+        self.queue_depth = count
+        if count and latest != self._last_seq:
+            self._last_change = now
+            self._first_pending = self._first_pending or now
+        self._last_seq = latest
+
+        force, self._force = self._force, False
+        if not force:
+            if self.state == STATE_AUTH_ERROR or now < self._retry_at:
+                return
+            if self._remote_pending:
+                pass
+            elif count:
+                quiet = now - self._last_change >= self.debounce
+                overdue = now - self._first_pending >= self.max_delay
+                # Geri çekilmeden dönüşte ertelemeyi bekleme
+                if not (quiet or overdue or self.failures):
+                    self.state = STATE_PENDING
+                    return
+            elif self.failures or self._last_attempt is None:
+                pass
+            elif self.listening or now - self._last_attempt < self.pull_interval:
+                # Akış bağlıyken uzak değişiklik zaten bildirilir
+                return
+
+        self._remote_pending = False
+        self._run(now)
+
+    def _run(self, now):
+        self.state = STATE_SYNCING
+        self._last_attempt = now
+        started = time.perf_counter()
+        result = self.cloud.sync_all_data()
+        self.last_duration = time.perf_counter() - started
+
+        if result.get("success"):
+            self.failures = 0
+            self.last_success = datetime.now()
+            self.last_error = None
+            self.sent_total += result.get("sent", 0)
+            self.received_total += result.get("received", 0)
+            self._first_pending = None
+            self._retry_at = 0.0
+            self.queue_depth, self._last_seq = self.cloud.db.changes.pending(self.cloud.user_id)
+            self.state = STATE_PENDING if self.queue_depth else STATE_IDLE
+            return
+
+        self.failures += 1
+        self.last_error = result.get("error")
+        if result.get("status") == 401:
+            # Token geçersiz: yeni giriş (set_credentials) veya sync_now'a kadar dur
+            self.state = STATE_AUTH_ERROR
+            return
+
+        delay = self.backoff_delay(self.failures)
+        if result.get("retry_after") is not None:
+            # Sunucu sınırladı: istediği süreden önce tekrar deneme
+            self.state = STATE_THROTTLED
+            delay = max(delay, result["retry_after"])
+        else:
+            self.state = STATE_OFFLINE if result.get("offline") else STATE_ERROR
+        self._retry_at = time.monotonic() + delay
+
+    def backoff_delay(self, failures):
+        """Üstel geri çekilme, üst sınırlı; yarısı rastgele (eşit jitter)"""
+        delay = min(self.backoff_base * (2 ** (failures - 1)), self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    # ========== BİLDİRİM AKIŞI ==========
+
+    def _listen_loop(self, stop):
+        """SSE akışına bağlı kal; koparsa geri çekilmeyle yeniden bağlan (stop kurulana kadar)"""
+        failures = 0
+        while not stop.is_set():
+            cloud = self.cloud
+            if not cloud.enabled or not cloud.user_id or self.state == STATE_AUTH_ERROR:
+                stop.wait(self.poll_interval * 5)
+                continue
+            server_delay = None
+            try:
+                _, pull_cursor = cloud.db.changes.get_cursors(cloud.user_id)
+                for event in cloud.change_events(since=pull_cursor):
+                    if stop.is_set():
+                        break
+                    self.listening = True
+                    failures = 0
+                    if event.get("event") == "change":
+                        self.notify_remote()
+            except Exception as e:
+                failures += 1
+                if failures == 1:
+                    print(f"Değişiklik akışı koptu, periyodik çekmeye dönüldü: {e}")
+                # 429 ile reddedildiyse sunucunun istediği kadar bekle
+                response = getattr(e, "response", None)
+                if response is not None:
+                    server_delay = parse_retry_after(response.headers.get("Retry-After"))
+            finally:
+                # Durdurulmuş eski dinleyici yenisinin durumunu ezmesin
+                if not stop.is_set():
+                    self.listening = False
+            # Sunucu akışı STREAM_MAX_AGE sonunda kapatır: hemen yeniden bağlan
+            delay = self.backoff_delay(failures) if failures else 0.5
+            stop.wait(max(delay, server_delay or 0))
+
+    # ========== DURUM ==========
+
+    def status(self):
+        now = time.monotonic()
+        return {
+            "state": self.state,
+            "queue_depth": self.queue_depth,
+            "last_success": self.last_success.isoformat() if self.last_success else None,
+            "last_error": self.last_error,
+            "consecutive_failures": self.failures,
+            "next_retry_in": max(0.0, self._retry_at - now) if self._retry_at else 0.0,
+            "last_duration_ms": round(self.last_duration * 1000, 1) if self.last_duration else None,
+            "sent_total": self.sent_total,
+            "received_total": self.received_total,
+            "listening": self.listening,
+            "notifications": self.notifications,
+        }
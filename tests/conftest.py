@@ -0,0 +1,125 @@
+# tests/conftest.py
+"""
+Ortak test yardımcıları: geçici veritabanı, gerçek HTTP üzerinde çalışan
+server.py ve onunla CloudSync üzerinden senkron
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+TRANSACTION = ("THYAO", "Alım", 10, 100.0, 1000.0, 0, "2024-01-15 10:30:00")
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """make_db("client") -> tmp_path altında yeni Database"""
+    def make(name):
+        return Database(str(tmp_path / f"{name}.db"))
+    return make
+
+
+def insert_transactions(db, user_id, rows=(TRANSACTION,)):
+    """
+    Ham işlem satırları (sembol, tip, adet, fiyat, toplam, komisyon, tarih)
+
+    add_transaction'ın lot/olay defteri işini yapmaz; senkron tetikleyicileri
+    çalışır. uid sütunu olmayan (eski şema) veritabanlarında da kullanılır.
+    """
+    with db.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO transactions (user_id, sembol, tip, adet, fiyat, toplam, komisyon, tarih)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(user_id, *row) for row in rows])
+
+
+@pytest.fixture
+def insert():
+    return insert_transactions
+
+
+# ========== SUNUCU ==========
+
+@pytest.fixture(scope="session")
+def live_server(tmp_path_factory):
+    """server.py ayrı thread'de werkzeug ile; (modül, adres)"""
+    from werkzeug.serving import make_server
+
+    root = tmp_path_factory.mktemp("server")
+    os.environ.update({
+        "DATABASE_FILE": str(root / "boot.db"),
+        "QUOTE_CACHE_FILE": str(root / "quotes.json"),
+        "RATE_LIMIT": "0",
+        "PASSWORD_ITERATIONS": "1000",
+        "HASH_WORKERS": "1",
+    })
+    import server
+
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield server, f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    server.adb.close()
+
+
+class CloudServer:
+    """Teste özel sunucu veritabanı; istemciler gerçek CloudSync ile bağlanır"""
+
+    def __init__(self, module, url, monkeypatch):
+        self.module = module
+        self.url = url
+        self.monkeypatch = monkeypatch
+        self.db = None
+        self._adbs = []
+
+    def use(self, db):
+        """Sunucu bundan sonra bu veritabanını kullanır (ör. yedekten dönüş)"""
+        from async_db import AsyncDatabase
+        from auth_service import AuthService
+
+        module = self.module
+        adb = AsyncDatabase(db, max_connections=2)
+        self._adbs.append(adb)
+        self.monkeypatch.setattr(module, "db", db)
+        self.monkeypatch.setattr(module, "adb", adb)
+        self.monkeypatch.setattr(module, "auth", AuthService(db, module.app.config['SECRET_KEY'],
+                                                             hasher=module.hasher))
+        self.db = db
+
+    def connect(self, client, client_user, server_user):
+        """İstemci veritabanı için kimliği ayarlanmış CloudSync"""
+        from cloud_sync import CloudSync
+
+        cloud = CloudSync(client, self.url)
+        cloud.set_credentials(client_user, self.module.auth.create_token(server_user))
+        return cloud
+
+    def close(self):
+        for adb in self._adbs:
+            adb.close()
+
+
+@pytest.fixture
+def cloud(live_server, monkeypatch):
+    server = CloudServer(*live_server, monkeypatch)
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def sync(cloud):
+    """sync(istemci, kullanıcı, sunucu, sunucu kullanıcısı) -> CloudSync.sync_all_data sonucu"""
+    def run(client, client_user, server, server_user):
+        if cloud.db is not server:
+            cloud.use(server)
+        result = cloud.connect(client, client_user, server_user).sync_all_data()
+        assert result["success"], result
+        return result
+    return run
@@ -0,0 +1,141 @@
+# tests/test_auth_service.py
+"""JWT doğrulama önbelleği ve token iptali"""
+
+import calendar
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+
+import auth_service
+from auth_service import AuthService
+from password_hasher import PasswordHasher
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def auth(make_db):
+    return AuthService(make_db("auth"), SECRET, hasher=PasswordHasher(iterations=1000))
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """jwt.decode çağrı sayısı"""
+    calls = []
+    original = auth_service.jwt.decode
+    monkeypatch.setattr(auth_service.jwt, "decode", lambda *a, **k: calls.append(1) or original(*a, **k))
+    return calls
+
+
+def issued_at(user_id, when):
+    """Belirli bir anda verilmiş token"""
+    payload = {"user_id": user_id, "iat": when, "exp": when + timedelta(days=7)}
+    return jwt.encode(payload, SECRET, algorithm="HS256")
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    """auth_service'in saati: saniyenin ortasında sabit"""
+    class Frozen(datetime):
+        now_value = datetime.utcnow().replace(microsecond=500000)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now_value
+
+    monkeypatch.setattr(auth_service, "datetime", Frozen)
+    return Frozen
+
+
+# ========== ÖNBELLEK ==========
+
+def test_verified_token_is_served_from_cache(auth, decodes):
+    token = auth.create_token(7)
+
+    assert auth.verify_token(token) == {"success": True, "user_id": 7}
+    assert auth.verify_token(token) == {"success": True, "user_id": 7}
+    assert len(decodes) == 1
+
+
+def test_token_cache_is_lru_bounded(make_db, decodes):
+    auth = AuthService(make_db("auth"), SECRET, token_cache_size=2)
+    first, second, third = (issued_at(user_id, datetime.utcnow()) for user_id in (1, 2, 3))
+
+    for token in (first, second, first, third):
+        auth.verify_token(token)
+    assert len(decodes) == 3
+
+    # En uzun süredir kullanılmayan (second) düştü, first hâlâ önbellekte
+    auth.verify_token(first)
+    assert len(decodes) == 3
+    auth.verify_token(second)
+    assert len(decodes) == 4
+
+
+def test_cached_token_expires(auth):
+    token = auth.create_token(7)
+    auth.verify_token(token)
+
+    user_id, _, iat = auth._token_cache[token]
+    auth._token_cache[token] = (user_id, 0, iat)
+
+    assert auth.verify_token(token) == {"success": False, "error": "Token süresi dolmuş"}
+    assert token not in auth._token_cache
+
+
+def test_invalid_and_expired_tokens(auth):
+    assert auth.verify_token("not-a-token")["error"] == "Geçersiz token"
+    assert auth.verify_token(issued_at(7, datetime.utcnow() - timedelta(days=8)))["error"] == "Token süresi dolmuş"
+    forged = jwt.encode({"user_id": 7, "exp": datetime.utcnow() + timedelta(days=1)}, "other", algorithm="HS256")
+    assert auth.verify_token(forged)["error"] == "Geçersiz token"
+
+
+# ========== İPTAL ==========
+
+def test_revoked_token_fails_even_when_cached(auth, make_db):
+    token, other = issued_at(7, datetime.utcnow()), issued_at(7, datetime.utcnow() - timedelta(seconds=1))
+    assert auth.verify_token(token)["success"]
+
+    assert auth.revoke_token(token)
+    assert auth.verify_token(token) == {"success": False, "error": "Token iptal edilmiş"}
+    assert auth.verify_token(other)["success"]
+
+    # İptal listesi sessions tablosundan yeniden yüklenir
+    reloaded = AuthService(auth.db, SECRET)
+    assert not reloaded.verify_token(token)["success"]
+    assert reloaded.verify_token(other)["success"]
+
+
+def test_revoke_user_tokens_keeps_same_second_tokens(auth, frozen):
+    now = frozen.now_value
+    before = issued_at(7, now - timedelta(seconds=1))
+    other_user = issued_at(8, now - timedelta(seconds=1))
+    assert auth.verify_token(before)["success"]
+
+    auth.revoke_user_tokens(7)
+
+    # iat tam saniye: iptalle aynı saniyede verilen token geçerli kalmalı
+    same_second = auth.create_token(7)
+    assert jwt.decode(same_second, SECRET, algorithms=["HS256"])["iat"] == calendar.timegm(now.utctimetuple())
+    assert auth.verify_token(before) == {"success": False, "error": "Token iptal edilmiş"}
+    assert auth.verify_token(same_second)["success"]
+    assert auth.verify_token(other_user)["success"]
+
+    # Yeniden yüklenen kesme zamanı da saniyeye yuvarlanır
+    reloaded = AuthService(auth.db, SECRET)
+    assert not reloaded.verify_token(before)["success"]
+    assert reloaded.verify_token(same_second)["success"]
+
+
+def test_change_password_revokes_existing_tokens(auth):
+    user_id = auth.register_user("ayse", "ayse@example.com", "eski-sifre")["user_id"]
+    old = issued_at(user_id, datetime.utcnow() - timedelta(minutes=5))
+    assert auth.verify_token(old)["success"]
+
+    assert not auth.change_password(user_id, "yanlis", "yeni-sifre")["success"]
+    assert auth.verify_token(old)["success"]
+
+    assert auth.change_password(user_id, "eski-sifre", "yeni-sifre")["success"]
+    assert not auth.verify_token(old)["success"]
+    assert auth.login_user("ayse", "yeni-sifre")["success"]
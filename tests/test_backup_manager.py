@@ -0,0 +1,96 @@
+# tests/test_backup_manager.py
+"""Snapshot yedekleri: canlı dosya ara kopyasız parçalanır, WAL doluysa kopya üzerinden"""
+
+import sqlite3
+
+import pytest
+
+from utils.backup_manager import BackupManager
+
+ROWS = [("THYAO", "Alım", 10, 100.0 + i, 1000.0 + i, 0, "2024-01-15 10:30:00") for i in range(500)]
+
+
+class Settings:
+    def __init__(self, location):
+        self.location = location
+
+    def get(self, key, default=None):
+        return self.location if key == "backup_location" else default
+
+
+@pytest.fixture
+def manager(make_db, insert, tmp_path):
+    db = make_db("live")
+    insert(db, 1, ROWS)
+    return BackupManager(db, Settings(str(tmp_path / "backups")))
+
+
+def staging_copies(monkeypatch, manager):
+    calls = []
+    original = manager._online_backup
+    monkeypatch.setattr(manager, "_online_backup", lambda *a, **k: calls.append(1) or original(*a, **k))
+    return calls
+
+
+def restored_count(manager, path):
+    target = manager.store.materialize(path)
+    assert manager.verify_backup(target)
+    conn = sqlite3.connect(target)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_snapshot_reads_live_file_without_staging_copy(manager, insert, monkeypatch):
+    copies = staging_copies(monkeypatch, manager)
+    progress = []
+
+    first = manager._snapshot("first", progress=lambda done, total: progress.append((done, total)))
+    assert copies == []
+    assert progress[-1][0] == progress[-1][1] > 0
+    assert restored_count(manager, first) == len(ROWS)
+
+    # İkinci yedek yalnızca değişen parçaları yazar
+    insert(manager.db, 1, ROWS[:1])
+    second = manager.store.load_manifest(manager._snapshot("second"))
+    assert copies == []
+    assert 0 < second["new_chunks"] < len(second["chunks"])
+
+
+def test_readers_lock_out_writers_during_direct_read(manager, monkeypatch):
+    original = manager.store.snapshot
+
+    def write_during_read(*args, **kwargs):
+        conn = sqlite3.connect(manager.db.db_name, timeout=0, isolation_level=None)
+        try:
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                conn.execute("DELETE FROM transactions")
+        finally:
+            conn.close()
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(manager.store, "snapshot", write_during_read)
+    assert restored_count(manager, manager._snapshot("locked")) == len(ROWS)
+
+
+def test_wal_is_checkpointed_or_copied(manager, insert, monkeypatch):
+    copies = staging_copies(monkeypatch, manager)
+    conn = sqlite3.connect(manager.db.db_name)
+    conn.execute("PRAGMA journal_mode=WAL")
+    insert(manager.db, 1, ROWS[:10])
+
+    # Okuyucu yoksa WAL boşaltılır ve dosya doğrudan okunur
+    assert restored_count(manager, manager._snapshot("checkpointed")) == len(ROWS) + 10
+    assert copies == []
+
+    # Açık okuyucu WAL'ın boşalmasını engeller: tutarlı kopya üzerinden
+    insert(manager.db, 1, ROWS[:10])
+    conn.execute("BEGIN")
+    conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+    insert(manager.db, 1, ROWS[:10])
+    try:
+        assert restored_count(manager, manager._snapshot("copied")) == len(ROWS) + 30
+        assert copies == [1]
+    finally:
+        conn.close()
@@ -0,0 +1,90 @@
+# tests/test_conditional_pull.py
+"""Koşullu çekme: yazma ETag'i değiştirir, eşleşen If-None-Match tabloları okumadan 304"""
+
+import requests
+
+DIVIDEND = ("THYAO", 150.0, 10, 15.0, "2024-06-01 10:00:00")
+
+
+def count_reads(monkeypatch, db, *methods):
+    """Sunucu veritabanında tablo okuma çağrıları"""
+    calls = []
+    for name in methods:
+        original = getattr(db, name)
+        monkeypatch.setattr(db, name, lambda *a, _name=name, _f=original, **k: calls.append(_name) or _f(*a, **k))
+    return calls
+
+
+def add_dividend(db, user_id):
+    with db.get_connection() as conn:
+        conn.execute('''
+            INSERT INTO dividends (user_id, sembol, tutar, adet, hisse_basi_tutar, tarih)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, *DIVIDEND))
+
+
+def test_pull_data_revalidates_with_etag(cloud, make_db, insert, monkeypatch):
+    server, client = make_db("server"), make_db("client")
+    cloud.use(server)
+    insert(server, 7)
+    reads = count_reads(monkeypatch, server, "get_transactions")
+    sync = cloud.connect(client, 1, 7)
+
+    first = sync.pull_data("transactions")
+    assert first["success"] and len(first["data"]) == 1
+    assert reads == ["get_transactions"]
+    etag = sync._pull_cache["transactions"][0]
+
+    # Değişiklik yok: 304, tablo okunmaz, önbellekteki veri döner
+    again = sync.pull_data("transactions")
+    assert again["not_modified"]
+    assert again["data"] == first["data"]
+    assert reads == ["get_transactions"]
+
+    # Başka tabloya yazma bu ETag'i etkilemez
+    add_dividend(server, 7)
+    assert sync.pull_data("transactions")["not_modified"]
+    assert reads == ["get_transactions"]
+
+    # Yazma sürümü artırır: yeni ETag ile tam yanıt
+    insert(server, 7, [("ASELS", "Alım", 5, 40.0, 200.0, 0, "2024-02-01 10:00:00")])
+    changed = sync.pull_data("transactions")
+    assert not changed.get("not_modified")
+    assert len(changed["data"]) == 2
+    assert reads == ["get_transactions"] * 2
+    assert sync._pull_cache["transactions"][0] != etag
+
+
+def test_if_none_match_returns_304_without_reading(cloud, make_db, insert, monkeypatch):
+    server = make_db("server")
+    cloud.use(server)
+    insert(server, 7)
+    add_dividend(server, 7)
+    reads = count_reads(monkeypatch, server, "get_portfolio", "get_transactions", "get_dividends", "get_settings")
+    headers = {"Authorization": f"Bearer {cloud.module.auth.create_token(7)}", "Accept": "application/json"}
+    url = f"{cloud.url}/api/pull/all"
+
+    response = requests.get(url, headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert etag.startswith('W/"7-')
+    assert sorted(reads) == ["get_dividends", "get_portfolio", "get_settings", "get_transactions"]
+
+    del reads[:]
+    not_modified = requests.get(url, headers={**headers, "If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["ETag"] == etag
+    assert reads == []
+
+    # Başka kullanıcının token'ı aynı ETag ile 304 alamaz
+    other = {**headers, "Authorization": f"Bearer {cloud.module.auth.create_token(8)}", "If-None-Match": etag}
+    assert requests.get(url, headers=other).status_code == 200
+
+    # Ayarlar yazılınca /api/pull/all ETag'i değişir
+    server.update_settings({"komisyon_orani": 0.001}, 7)
+    del reads[:]
+    after_write = requests.get(url, headers={**headers, "If-None-Match": etag})
+    assert after_write.status_code == 200
+    assert after_write.headers["ETag"] != etag
+    assert reads
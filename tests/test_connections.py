@@ -0,0 +1,28 @@
+# tests/test_connections.py
+"""Sabit bağlantı: iç bloklardaki commit dıştaki işlemi bölmez"""
+
+import pytest
+
+
+def count(db):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+
+def test_nested_commit_on_pinned_connection_keeps_outer_transaction(make_db, insert):
+    db = make_db("pinned")
+    db.pin_connection()
+    try:
+        with pytest.raises(RuntimeError):
+            with db.get_connection():
+                insert(db, 1)
+                db.sync_tax_lots(1)
+                raise RuntimeError("yarıda kesildi")
+        assert count(db) == 0
+
+        with db.get_connection():
+            insert(db, 1)
+            db.sync_tax_lots(1)
+        assert count(db) == 1
+    finally:
+        db.unpin_connection()
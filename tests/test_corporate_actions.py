@@ -0,0 +1,179 @@
+# tests/test_corporate_actions.py
+"""Bölünme ve bedelli: ex_date sınırı, çift düzeltme olmaması, lotlar ve düzeltilmiş fiyat"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.price_store import PriceStore, from_day, to_day
+
+EX_DATE = "2024-03-01"
+
+
+def trade(db, tip, adet, fiyat, tarih, sembol="THYAO", komisyon=1):
+    return db.add_transaction(user_id=1, sembol=sembol, tip=tip, adet=adet, fiyat=fiyat,
+                              tarih=tarih, komisyon=komisyon)
+
+
+def position(db):
+    (row,) = db.get_portfolio(1)
+    return row
+
+
+def lots(db):
+    return [(lot["adet_open"], round(lot["unit_cost"], 4), lot["acquired_at"][:10])
+            for lot in db.get_open_lots(1)]
+
+
+# ========== BÖLÜNME ==========
+
+def test_split_adjusts_holdings_once(make_db):
+    db = make_db("actions")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+    db.update_portfolio("THYAO", 10, 100.1, 110, user_id=1)
+
+    assert db.apply_stock_split("THYAO", 2, user_id=1, ex_date=EX_DATE)
+
+    split = position(db)
+    assert split["adet"] == 20
+    assert split["ort_maliyet"] == pytest.approx(50.05)
+    # Güncel fiyat da bölünme sonrası birime çevrilir
+    assert split["guncel_fiyat"] == pytest.approx(55)
+
+    # Yeniden hesaplama bölünmeyi ne geri alır ne tekrar uygular
+    for _ in range(2):
+        db.recalculate_portfolio_from_transactions(1)
+        assert position(db)["adet"] == 20
+        assert position(db)["ort_maliyet"] == pytest.approx(50.05)
+    assert lots(db) == [(20, 50.05, "2024-01-02")]
+
+
+def test_trade_on_split_ex_date_is_not_adjusted(make_db):
+    db = make_db("actions")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+    db.apply_stock_split("THYAO", 2, user_id=1, ex_date=EX_DATE)
+
+    # ex_date bölünme sonrası fiyatla işlem görülen ilk gün
+    trade(db, "Alım", 4, 55, f"{EX_DATE} 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert position(db)["adet"] == 24
+    assert position(db)["ort_maliyet"] == pytest.approx((1001 + 221) / 24)
+    assert lots(db) == [(20, 50.05, "2024-01-02"), (4, 55.25, EX_DATE)]
+    (ledger,) = db.get_positions(1)
+    assert ledger["adet"] == 24
+
+
+def test_split_without_ex_date_covers_earlier_trades_that_day(make_db):
+    db = make_db("actions")
+    today = date.today().isoformat()
+    trade(db, "Alım", 10, 100, f"{today} 00:00:01")
+    db.recalculate_portfolio_from_transactions(1)
+
+    db.apply_stock_split("THYAO", 2, user_id=1)
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert position(db)["adet"] == 20
+    assert lots(db) == [(20, 50.05, today)]
+
+
+# ========== BEDELLİ ==========
+
+def test_rights_issue_adds_commission_free_lot(make_db):
+    db = make_db("actions")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert db.apply_rights_issue("THYAO", 2, 50, user_id=1, ex_date=EX_DATE)
+
+    rights = position(db)
+    assert rights["adet"] == 15
+    assert rights["ort_maliyet"] == pytest.approx((1001 + 250) / 15)
+
+    for _ in range(2):
+        db.recalculate_portfolio_from_transactions(1)
+        assert position(db)["adet"] == 15
+        assert position(db)["ort_maliyet"] == pytest.approx((1001 + 250) / 15)
+    assert lots(db) == [(10, 100.1, "2024-01-02"), (5, 50.0, EX_DATE)]
+
+
+def test_rights_issue_counts_only_shares_held_before_ex_date(make_db):
+    db = make_db("actions")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Satış", 2, 110, "2024-02-01 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+    db.apply_rights_issue("THYAO", 2, 50, user_id=1, ex_date=EX_DATE)
+
+    # ex_date tarihli alım bedelli hakkı doğurmaz
+    trade(db, "Alım", 2, 60, f"{EX_DATE} 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert position(db)["adet"] == 8 + 4 + 2
+    assert [lot[0] for lot in lots(db)] == [8, 4, 2]
+    (ledger,) = db.get_positions(1)
+    assert ledger["adet"] == 14
+
+
+# ========== DÜZELTİLMİŞ FİYAT ==========
+
+EX_DAY = to_day(date.fromisoformat(EX_DATE))
+
+
+def bars(store, closes, first_day=EX_DAY - 3):
+    days = np.arange(first_day, first_day + len(closes))
+    store.upsert("THYAO", days, closes)
+    return days
+
+
+def adjusted_closes(store):
+    return store.read_adjusted("THYAO")["close"]
+
+
+def test_split_is_not_applied_to_provider_bars(make_db):
+    db = make_db("prices")
+    store = PriceStore(db)
+    # Sağlayıcı barları bölünmeye göre zaten düzeltilmiş
+    bars(store, [50.0, 50.0, 50.0, 51.0, 52.0])
+    db.add_corporate_action("THYAO", "split", 2, ex_date=EX_DATE)
+
+    np.testing.assert_allclose(adjusted_closes(store), [50.0, 50.0, 50.0, 51.0, 52.0])
+
+
+def test_rights_factor_applies_before_ex_date_only(make_db):
+    db = make_db("prices")
+    store = PriceStore(db)
+    bars(store, [100.0, 100.0, 100.0, 84.0, 85.0])
+    assert adjusted_closes(store)[0] == 100.0
+
+    db.add_corporate_action("THYAO", "rights", 2, price=50, ex_date=EX_DATE)
+
+    # Teorik fiyat (100 + 0.5 * 50) / 1.5 -> çarpan 125 / 150
+    factor = 125 / 150
+    np.testing.assert_allclose(adjusted_closes(store), [100 * factor] * 3 + [84.0, 85.0])
+
+    # Aynı aksiyonu başka kullanıcı da girdi: bir kez uygulanır
+    db.add_corporate_action("THYAO", "rights", 2, price=50, ex_date=EX_DATE, user_id=2)
+    np.testing.assert_allclose(adjusted_closes(store), [100 * factor] * 3 + [84.0, 85.0])
+
+
+def test_provider_split_replaces_unadjusted_bars_and_skips_rights(make_db):
+    db = make_db("prices")
+    store = PriceStore(db)
+    bars(store, [100.0, 100.0, 100.0], first_day=EX_DAY - 10)
+    db.add_corporate_action("THYAO", "rights", 2, price=50, ex_date=EX_DATE)
+
+    # Sağlayıcı aynı olayı bölünme olarak bildirdi; yeni çerçeve düzeltilmiş gelir
+    index = pd.to_datetime([from_day(d) for d in range(EX_DAY - 1, EX_DAY + 2)])
+    frame = pd.DataFrame({"Open": [66.0, 84.0, 85.0], "High": [66.0, 84.0, 85.0],
+                          "Low": [66.0, 84.0, 85.0], "Close": [66.0, 84.0, 85.0],
+                          "Volume": [1.0, 1.0, 1.0], "Stock Splits": [0.0, 1.5, 0.0]}, index=index)
+    store.upsert_frame("THYAO", frame)
+
+    data = store.read_adjusted("THYAO")
+    # Çerçeveden önceki düzeltilmemiş barlar silindi, bedelli tekrar uygulanmadı
+    assert data["day"].tolist() == [EX_DAY - 1, EX_DAY, EX_DAY + 1]
+    np.testing.assert_allclose(data["close"], [66.0, 84.0, 85.0])
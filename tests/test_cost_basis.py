@@ -0,0 +1,162 @@
+# tests/test_cost_basis.py
+"""Vektörel maliyet motoru, eski satır satır döngüyle aynı sonucu vermeli"""
+
+import numpy as np
+import pytest
+
+from utils.cost_basis import compute_cost_basis, summarize
+
+RATE = 0.0004
+
+
+def loop_portfolio(rows, commission_rate=RATE):
+    """
+    recalculate_portfolio_from_transactions'taki eski döngü (print'siz)
+
+    rows: tarih sırasında (sembol, tip, adet, fiyat, komisyon). Bedelli satırları
+    motorda olduğu gibi komisyonsuz alım sayılır; eski döngüde bu tip yoktu.
+    """
+    temp_portfolio = {}
+    for symbol, tip, adet, fiyat, stored_komisyon in rows:
+        if symbol not in temp_portfolio:
+            temp_portfolio[symbol] = {'adet': 0, 'toplam_maliyet': 0}
+
+        if tip in ('Alım', 'Bedelli'):
+            islem_tutari = adet * fiyat
+            if tip == 'Bedelli':
+                komisyon = 0
+            else:
+                komisyon = stored_komisyon if stored_komisyon and stored_komisyon > 0 else islem_tutari * commission_rate
+            temp_portfolio[symbol]['adet'] += adet
+            temp_portfolio[symbol]['toplam_maliyet'] += islem_tutari + komisyon
+
+        elif tip == 'Satış':
+            if temp_portfolio[symbol]['adet'] < adet:
+                continue
+            ortalama_maliyet = temp_portfolio[symbol]['toplam_maliyet'] / temp_portfolio[symbol]['adet']
+            temp_portfolio[symbol]['toplam_maliyet'] -= adet * ortalama_maliyet
+            temp_portfolio[symbol]['adet'] -= adet
+
+    return {symbol: (data['adet'], data['toplam_maliyet'] / data['adet'])
+            for symbol, data in temp_portfolio.items() if data['adet'] > 0}
+
+
+def engine_portfolio(rows, commission_rate=RATE):
+    summary = summarize(compute_cost_basis(*zip(*rows), commission_rate=commission_rate))
+    summary = summary[summary["adet"] > 0]
+    return {symbol: (adet, ort) for symbol, adet, ort
+            in zip(summary.index, summary["adet"], summary["ort_maliyet"])}
+
+
+def assert_same(actual, expected):
+    assert set(actual) == set(expected)
+    for symbol, (adet, ort) in expected.items():
+        assert actual[symbol][0] == pytest.approx(adet, abs=1e-9), symbol
+        assert actual[symbol][1] == pytest.approx(ort, rel=1e-9), symbol
+
+
+# ========== VAKALAR ==========
+
+CASES = {
+    "oversell_skipped": [
+        ("THYAO", "Alım", 10, 100.0, 5.0),
+        ("THYAO", "Satış", 15, 120.0, 5.0),     # eldekinden fazla, atlanır
+        ("THYAO", "Satış", 4, 130.0, 5.0),
+        ("THYAO", "Alım", 6, 90.0, 5.0),
+    ],
+    "sell_before_any_buy": [
+        ("ASELS", "Satış", 3, 50.0, 1.0),
+        ("ASELS", "Alım", 5, 40.0, 1.0),
+    ],
+    "zero_quantity_reset": [
+        ("THYAO", "Alım", 10, 100.0, 5.0),
+        ("THYAO", "Satış", 10, 150.0, 5.0),     # pozisyon kapanır
+        ("THYAO", "Alım", 4, 200.0, 2.0),       # maliyet sıfırdan başlar
+        ("THYAO", "Satış", 1, 210.0, 2.0),
+    ],
+    "default_commission": [
+        ("THYAO", "Alım", 10, 100.0, 0.0),      # kayıtlı komisyon yok: oran
+        ("THYAO", "Alım", 10, 120.0, None),
+        ("THYAO", "Satış", 5, 130.0, 0.0),
+        ("THYAO", "Alım", 3, 110.0, 7.5),
+    ],
+    "rights_row": [
+        ("THYAO", "Alım", 10, 100.0, 4.0),
+        ("THYAO", "Satış", 2, 110.0, 4.0),
+        ("THYAO", "Bedelli", 4, 50.0, 3.0),     # komisyonsuz alım
+        ("THYAO", "Satış", 6, 120.0, 4.0),
+    ],
+    "interleaved_symbols": [
+        ("THYAO", "Alım", 10, 100.0, 0.0),
+        ("ASELS", "Alım", 20, 40.0, 2.0),
+        ("THYAO", "Satış", 10, 110.0, 0.0),
+        ("ASELS", "Satış", 25, 45.0, 2.0),      # atlanır
+        ("ASELS", "Satış", 5, 45.0, 2.0),
+        ("THYAO", "Alım", 1, 105.0, 0.0),
+    ],
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_engine_matches_loop(name):
+    rows = CASES[name]
+    assert_same(engine_portfolio(rows), loop_portfolio(rows))
+
+
+def test_engine_matches_loop_on_random_ledger():
+    rng = np.random.default_rng(7)
+    rows = []
+    for _ in range(5000):
+        symbol = f"HSE{rng.integers(0, 20):02d}"
+        tip = rng.choice(["Alım", "Satış", "Satış", "Bedelli"], p=[0.5, 0.3, 0.15, 0.05])
+        # Küçük adetler: sık sık tam kapanış ve eldekinden fazla satış
+        rows.append((symbol, str(tip), float(rng.integers(1, 8)), float(rng.uniform(1, 250)),
+                     float(rng.choice([0.0, rng.uniform(0, 10)]))))
+
+    expected = loop_portfolio(rows)
+    assert_same(engine_portfolio(rows), expected)
+
+
+# ========== VERİTABANI ==========
+
+def portfolio(db):
+    return {row["sembol"]: (row["adet"], row["ort_maliyet"]) for row in db.get_portfolio(1)}
+
+
+def test_recalculate_matches_loop(make_db, insert):
+    db = make_db("cost")
+    # Vakalar aynı sembolleri kullandığı için her vakaya ayrı sembol eki
+    rows = [(f"{symbol}{case}", tip, adet, fiyat, komisyon)
+            for case, name in enumerate(("oversell_skipped", "zero_quantity_reset",
+                                         "default_commission", "interleaved_symbols"))
+            for symbol, tip, adet, fiyat, komisyon in CASES[name]]
+    insert(db, 1, [(symbol, tip, adet, fiyat, adet * fiyat, komisyon or 0, f"2024-01-{i + 1:02d} 10:00:00")
+                   for i, (symbol, tip, adet, fiyat, komisyon) in enumerate(rows)])
+
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert_same(portfolio(db), loop_portfolio(rows))
+
+
+def test_recalculate_with_rights_issue_matches_loop(make_db, insert):
+    db = make_db("cost")
+    rows = [
+        ("THYAO", "Alım", 10, 100.0, 4.0, "2024-01-02 10:00:00"),
+        ("THYAO", "Satış", 2, 110.0, 4.0, "2024-02-01 10:00:00"),
+        ("THYAO", "Alım", 4, 90.0, 0.0, "2024-04-01 10:00:00"),
+    ]
+    insert(db, 1, [(symbol, tip, adet, fiyat, adet * fiyat, komisyon, tarih)
+                   for symbol, tip, adet, fiyat, komisyon, tarih in rows])
+    db.add_corporate_action("THYAO", "rights", 2, price=50.0, ex_date="2024-03-01")
+
+    db.recalculate_portfolio_from_transactions(1)
+
+    # ex_date öncesi eldeki 8 hisseye 2:1 bedelli -> 4 yeni hisse x 50
+    expected = loop_portfolio([
+        ("THYAO", "Alım", 10, 100.0, 4.0),
+        ("THYAO", "Satış", 2, 110.0, 4.0),
+        ("THYAO", "Bedelli", 4, 50.0, 0.0),
+        ("THYAO", "Alım", 4, 90.0, 0.0),
+    ])
+    assert_same(portfolio(db), expected)
+    assert db.get_cost_basis_summary(1).loc["THYAO", "adet"] == pytest.approx(16)
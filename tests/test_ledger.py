@@ -0,0 +1,170 @@
+# tests/test_ledger.py
+"""Olay defteri: snapshot + kuyruk = baştan oynatma, düzenlemede iptal, as_of pozisyonları"""
+
+import json
+
+import pytest
+
+from ledger import EVENT_VOID, SNAPSHOT_INTERVAL, apply_event, empty_state
+
+
+def replay(db, user_id=1, as_of=None):
+    """Snapshot kullanmadan tüm olayları baştan katla"""
+    with db.get_connection() as conn:
+        query = "SELECT seq, event_type, sembol, ref_id, payload FROM ledger_events WHERE user_id = ?"
+        params = [user_id]
+        if as_of is not None:
+            query += " AND occurred_at <= ?"
+            params.append(as_of)
+        events = conn.execute(query + " ORDER BY occurred_at, seq", params).fetchall()
+    voided = {row["ref_id"] for row in events if row["event_type"] == EVENT_VOID}
+    state = empty_state()
+    for seq, event_type, symbol, _, payload in events:
+        if seq not in voided and event_type != EVENT_VOID:
+            apply_event(state, event_type, symbol, json.loads(payload))
+    return state
+
+
+def snapshots(db, user_id=1):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT as_of, last_seq FROM ledger_snapshots WHERE user_id = ? ORDER BY as_of",
+                            (user_id,)).fetchall()
+
+
+def append_trades(db, count, start_day=0):
+    """Her gün bir işlem: 3 alım, 1 satış döngüsü, iki sembol"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for i in range(start_day, start_day + count):
+            tarih = f"{2020 + i // 336}-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d} 10:00:00"
+            tip = "Satış" if i % 4 == 3 else "Alım"
+            db.ledger.append_trade(cursor, 1, None, ("THYAO", "ASELS")[i % 2], tip,
+                                   10 if tip == "Alım" else 15, 100.0 + i % 7, 1.0, tarih)
+        conn.commit()
+
+
+def trade(db, tip, adet, fiyat, tarih, sembol="THYAO"):
+    return db.add_transaction(user_id=1, sembol=sembol, tip=tip, adet=adet, fiyat=fiyat,
+                              tarih=tarih, komisyon=1)
+
+
+def test_snapshot_plus_tail_equals_full_replay(make_db):
+    db = make_db("ledger")
+    append_trades(db, 2 * SNAPSHOT_INTERVAL + 100)
+
+    assert len(snapshots(db)) == 2
+    assert db.ledger.get_state(1) == replay(db)
+
+    # Snapshot sınırlarının önü/arkası ve snapshot'lar arası bir an
+    for as_of in ("2020-03-05 10:00:00", "2021-06-01 10:00:00", "2022-12-28 10:00:00"):
+        assert db.ledger.get_state(1, as_of) == replay(db, as_of=as_of), as_of
+
+
+def test_backdated_event_drops_later_snapshots(make_db):
+    db = make_db("ledger")
+    append_trades(db, SNAPSHOT_INTERVAL + 10)
+    (old,) = snapshots(db)
+    before = db.ledger.get_state(1)["positions"]["THYAO"]["adet"]
+
+    # Tüm snapshot'lardan önceye tarihli alım: eski snapshot silinir; kuyruk
+    # hâlâ aralığın üstünde olduğu için tüm geçmişten yenisi yazılır
+    with db.get_connection() as conn:
+        db.ledger.append_trade(conn.cursor(), 1, None, "THYAO", "Alım", 7, 50.0, 1.0, "2019-06-01 10:00:00")
+        conn.commit()
+
+    (new,) = snapshots(db)
+    assert old["last_seq"] == SNAPSHOT_INTERVAL
+    assert new["last_seq"] == SNAPSHOT_INTERVAL + 10
+    state = db.ledger.get_state(1)
+    assert state == replay(db)
+    assert state["positions"]["THYAO"]["adet"] == before + 7
+
+
+def test_edited_transaction_is_voided_and_reappended(make_db):
+    db = make_db("ledger")
+    first = trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Alım", 10, 120, "2024-02-01 10:00:00")
+
+    with db.get_connection() as conn:
+        conn.execute("UPDATE transactions SET adet = 20, fiyat = 50 WHERE id = ?", (first,))
+        conn.commit()
+    db.recalculate_portfolio_from_transactions(1)
+
+    with db.get_connection() as conn:
+        events = conn.execute("SELECT seq, event_type, ref_id, payload FROM ledger_events ORDER BY seq").fetchall()
+    # Olay silinmez: iptal olayı eklenir, düzenlenmiş satır yeni olay olarak gelir
+    old = events[0]
+    assert [row["event_type"] for row in events] == ["trade", "trade", "void", "trade"]
+    assert events[2]["ref_id"] == old["seq"]
+    assert events[3]["ref_id"] == first
+    assert json.loads(events[3]["payload"])["adet"] == 20
+
+    (position,) = db.get_positions(1)
+    (portfolio,) = db.get_portfolio(1)
+    assert position["adet"] == portfolio["adet"] == 30
+    assert position["ort_maliyet"] == pytest.approx(portfolio["ort_maliyet"])
+
+
+def test_deleted_and_reinserted_row_is_relinked_not_voided(make_db):
+    db = make_db("ledger")
+    first = trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+
+    # uid göndermeyen eski istemci senkronu: satır silinip aynı içerikle eklenir
+    with db.get_connection() as conn:
+        row = conn.execute("SELECT user_id, sembol, tip, adet, fiyat, toplam, komisyon, tarih "
+                           "FROM transactions WHERE id = ?", (first,)).fetchone()
+        conn.execute("DELETE FROM transactions WHERE id = ?", (first,))
+        new_id = conn.execute('''
+            INSERT INTO transactions (user_id, sembol, tip, adet, fiyat, toplam, komisyon, tarih)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', tuple(row)).lastrowid
+        conn.commit()
+    db.recalculate_portfolio_from_transactions(1)
+
+    with db.get_connection() as conn:
+        events = conn.execute("SELECT event_type, ref_id FROM ledger_events ORDER BY seq").fetchall()
+    assert [tuple(row) for row in events] == [("trade", new_id)]
+
+
+def test_deleted_symbol_is_voided(make_db):
+    db = make_db("ledger")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Alım", 5, 40, "2024-01-03 10:00:00", sembol="ASELS")
+
+    db.delete_portfolio("THYAO", 1)
+
+    assert [p["sembol"] for p in db.get_positions(1)] == ["ASELS"]
+    # İptal, hedefinin zamanını taşır: geçmiş anlar da düzeltilmiş olur
+    assert [p["sembol"] for p in db.get_positions(1, as_of="2024-01-05")] == ["ASELS"]
+    assert db.ledger.get_state(1) == replay(db)
+
+
+def test_positions_as_of(make_db):
+    db = make_db("ledger")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Alım", 10, 120, "2024-02-01 10:00:00")
+    trade(db, "Satış", 5, 150, "2024-03-01 10:00:00")
+    db.add_dividend(user_id=1, sembol="THYAO", tutar=25, tarih="2024-04-01 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+    db.apply_stock_split("THYAO", 2, user_id=1, ex_date="2024-05-01 00:00:00")
+
+    def at(as_of):
+        (position,) = db.get_positions(1, as_of=as_of)
+        return position
+
+    assert db.get_positions(1, as_of="2024-01-01") == []
+    assert at("2024-01-02 10:00:00")["adet"] == 10
+    assert at("2024-01-31")["ort_maliyet"] == pytest.approx(100.1)
+
+    mid = at("2024-02-15")
+    assert mid["adet"] == 20
+    assert mid["ort_maliyet"] == pytest.approx(110.1)
+
+    after_sale = at("2024-03-15")
+    assert after_sale["adet"] == 15
+    assert after_sale["gerceklesen_kar"] == pytest.approx(5 * 150 - 1 - 5 * 110.1)
+    assert after_sale["temettu"] == 0
+
+    assert at("2024-04-15")["temettu"] == 25
+    assert at("2024-05-02")["adet"] == 30
+    assert at(None)["adet"] == 30
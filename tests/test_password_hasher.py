@@ -0,0 +1,146 @@
+# tests/test_password_hasher.py
+"""Şifre hash biçimleri, eski hash'in yenilenmesi ve giriş kısıtlama"""
+
+import hashlib
+import secrets
+
+import pytest
+
+import password_hasher
+from auth_service import AuthService
+from password_hasher import LEGACY_ITERATIONS, LoginThrottle, PasswordHasher
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(password_hasher.time, "monotonic", clock)
+    return clock
+
+
+def legacy_hash(password):
+    """Eski biçim: <salt>$<hex>, sabit 100000 iterasyon"""
+    salt = secrets.token_hex(32)
+    return f"{salt}${hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), LEGACY_ITERATIONS).hex()}"
+
+
+# ========== HASH ==========
+
+def test_hash_round_trip_and_rehash_rules():
+    hasher = PasswordHasher(iterations=1000)
+    stored = hasher.hash("gizli-sifre")
+
+    assert stored.startswith("pbkdf2_sha256$1000$")
+    assert hasher.verify("gizli-sifre", stored)
+    assert not hasher.verify("yanlis", stored)
+    assert not hasher.verify("gizli-sifre", "bozuk")
+    assert not hasher.needs_rehash(stored)
+
+    # İş faktörü değişti veya eski biçim: yenilenmeli
+    assert PasswordHasher(iterations=2000).needs_rehash(stored)
+    legacy = legacy_hash("gizli-sifre")
+    assert hasher.verify("gizli-sifre", legacy)
+    assert hasher.needs_rehash(legacy)
+    # Tanınmayan biçim yenilenmez (doğrulanamaz da)
+    assert not hasher.needs_rehash("bozuk")
+
+
+def test_login_rehashes_legacy_hash(make_db):
+    auth = AuthService(make_db("auth"), "secret", hasher=PasswordHasher(iterations=1000))
+    user_id = auth.register_user("ayse", "ayse@example.com", "gizli-sifre")["user_id"]
+    with auth.db.get_connection() as conn:
+        conn.execute("UPDATE users SET password_hash = ? WHERE id = ?", (legacy_hash("gizli-sifre"), user_id))
+        updated_at = conn.execute("SELECT updated_at FROM users WHERE id = ?", (user_id,)).fetchone()[0]
+    auth.invalidate_user(user_id)
+
+    # Yanlış şifre hash'i değiştirmez
+    assert not auth.login_user("ayse", "yanlis")["success"]
+    assert "$" in auth.db.get_user("ayse")["password_hash"]
+    assert not auth.db.get_user("ayse")["password_hash"].startswith("pbkdf2_sha256$")
+
+    assert auth.login_user("ayse", "gizli-sifre")["success"]
+    user = auth.db.get_user("ayse")
+    assert user["password_hash"].startswith("pbkdf2_sha256$1000$")
+    # Sessiz yenileme: updated_at (senkron/profil zamanı) değişmez
+    assert user["updated_at"] == updated_at
+    assert auth.login_user("ayse", "gizli-sifre")["success"]
+
+
+# ========== KISITLAMA ==========
+
+def test_lockout_after_max_failures_and_backoff(clock):
+    throttle = LoginThrottle(max_failures=3, window=300, lockout=60, max_lockout=200)
+
+    for _ in range(2):
+        throttle.record_failure("user:ayse")
+    assert throttle.retry_after("user:ayse") == 0
+
+    # Her kilit öncekinin iki katı, üst sınırlı: 60, 120, 200, 200
+    for expected in (60, 120, 200, 200):
+        while throttle.retry_after("user:ayse") == 0:
+            throttle.record_failure("user:ayse")
+        assert throttle.retry_after("user:ayse") == expected
+        clock.now += expected
+        assert throttle.retry_after("user:ayse") == 0
+
+
+def test_failures_outside_window_do_not_count(clock):
+    throttle = LoginThrottle(max_failures=3, window=300)
+    throttle.record_failure("user:ayse")
+    throttle.record_failure("user:ayse")
+    clock.now += 301
+    throttle.record_failure("user:ayse")
+    assert throttle.retry_after("user:ayse") == 0
+
+
+def test_success_resets_account_but_not_ip(clock):
+    throttle = LoginThrottle(max_failures=3)
+    for _ in range(2):
+        throttle.record_failure("user:ayse", "ip:10.0.0.1")
+
+    throttle.record_success("user:ayse")
+    throttle.record_failure("user:ayse", "ip:10.0.0.1")
+
+    assert throttle.retry_after("user:ayse") == 0
+    assert throttle.retry_after("ip:10.0.0.1") == 60
+    # Kilitli IP diğer hesapları da bekletir
+    assert throttle.retry_after("user:mehmet", "ip:10.0.0.1") == 60
+
+
+def test_idle_keys_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(password_hasher, "THROTTLE_MAX_KEYS", 3)
+    throttle = LoginThrottle(max_failures=2, window=300)
+    throttle.record_failure("user:a")
+    throttle.record_failure("user:b")
+    throttle.record_failure("user:c", "user:c")
+
+    clock.now += 301
+    throttle.record_failure("user:d")
+    # Penceresi geçenler unutuldu; kilit süresi dolmuş c de
+    assert set(throttle._failures) == {"user:d"}
+    assert throttle._strikes == {}
+
+
+def test_login_user_reports_retry_after(make_db, clock):
+    auth = AuthService(make_db("auth"), "secret", hasher=PasswordHasher(iterations=1000),
+                       throttle=LoginThrottle(max_failures=2, lockout=30))
+    auth.register_user("ayse", "ayse@example.com", "gizli-sifre")
+
+    for _ in range(2):
+        assert auth.login_user("ayse", "yanlis", ip="10.0.0.1")["error"] == "Kullanıcı adı veya şifre yanlış"
+
+    # Kilitliyken doğru şifre de reddedilir, hash hesaplanmaz
+    locked = auth.login_user("ayse", "gizli-sifre", ip="10.0.0.2")
+    assert not locked["success"]
+    assert locked["retry_after"] == 31
+
+    clock.now += 30
+    assert auth.login_user("ayse", "gizli-sifre", ip="10.0.0.2")["success"]
@@ -0,0 +1,121 @@
+# tests/test_quote_cache.py
+"""Paylaşılan fiyat önbelleği: bulunamayan sembollerin negatif önbelleği"""
+
+import time
+
+import pytest
+
+import quote_cache
+from quote_cache import QuoteCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(quote_cache.time, "monotonic", clock)
+    return clock
+
+
+class Provider:
+    """Yalnızca bilinen sembolleri döndüren sahte sağlayıcı"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+        self.error = None
+
+    def __call__(self, tickers):
+        self.calls.append(list(tickers))
+        if self.error:
+            raise self.error
+        return {t: {"price": self.prices[t], "prev_close": None} for t in tickers if t in self.prices}
+
+
+def test_unknown_ticker_is_negatively_cached(clock):
+    provider = Provider({"THYAO.IS": 300.0})
+    cache = QuoteCache(fetcher=provider, miss_ttl=600)
+
+    _, missing, _ = cache.get(["THYAO.IS", "BOGUS.IS"])
+    assert missing == ["THYAO.IS", "BOGUS.IS"]
+    cache.refresh(sorted(cache._new))
+
+    found, missing, _ = cache.get(["THYAO.IS", "BOGUS.IS"])
+    assert list(found) == ["THYAO.IS"] and missing == ["BOGUS.IS"]
+    # Tekrar istenmesi işçiyi uyandırmaz ve izlenenlere eklenmez
+    assert cache._new == set()
+    assert "BOGUS.IS" not in cache._interest
+    assert cache._wanted() == ["THYAO.IS"]
+    assert cache.stats()["misses"] == 1
+
+    # Süre dolunca bir kez daha denenir
+    clock.now += 601
+    cache.get(["BOGUS.IS"])
+    assert cache._new == {"BOGUS.IS"}
+    assert cache._wanted() == ["BOGUS.IS", "THYAO.IS"]
+    assert cache.stats()["misses"] == 0
+
+
+def test_provider_error_is_not_a_miss(clock):
+    provider = Provider({"THYAO.IS": 300.0})
+    provider.error = RuntimeError("timeout")
+    cache = QuoteCache(fetcher=provider)
+
+    cache.get(["THYAO.IS"])
+    cache.refresh(["THYAO.IS"])
+    assert cache.stats()["misses"] == 0
+
+    # Hata geçici: sonraki istek yeniden çekmeye aday
+    provider.error = None
+    cache.get(["THYAO.IS"])
+    assert cache._new == {"THYAO.IS"}
+    cache.refresh(["THYAO.IS"])
+    found, _, _ = cache.get(["THYAO.IS"])
+    assert found["THYAO.IS"]["price"] == 300.0
+
+
+def test_listed_ticker_clears_its_miss(clock):
+    provider = Provider({})
+    cache = QuoteCache(fetcher=provider, miss_ttl=600)
+    cache.refresh(["NEWCO.IS"])
+    assert cache.stats()["misses"] == 1
+
+    # Portföydeki sembol tam yenilemede yine çekilir; listelenince kayıt düşer
+    provider.prices["NEWCO.IS"] = 12.5
+    cache.refresh(["NEWCO.IS"])
+    assert cache.stats()["misses"] == 0
+    assert cache.get(["NEWCO.IS"])[0]["NEWCO.IS"]["price"] == 12.5
+
+
+def test_worker_does_not_refetch_unknown_ticker():
+    provider = Provider({})
+    cache = QuoteCache(fetcher=provider, refresh_interval=3600)
+    cache.start()
+    try:
+        cache.get(["BOGUS.IS"])
+        deadline = time.monotonic() + 5
+        while cache.stats()["misses"] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert provider.calls == [["BOGUS.IS"]]
+
+        for _ in range(5):
+            cache.get(["BOGUS.IS"])
+        time.sleep(0.2)
+        assert provider.calls == [["BOGUS.IS"]]
+    finally:
+        cache.stop()
+
+
+def test_single_ticker_rule():
+    from utils.price_store import to_ticker
+
+    assert to_ticker is quote_cache.to_ticker
+    assert to_ticker(" thyao ") == "THYAO.IS"
+    assert to_ticker("TRY=X") == "TRY=X"
@@ -0,0 +1,161 @@
+# tests/test_request_limits.py
+"""Token bucket / istek sınırlayıcı ve 429 + Retry-After sözleşmesi"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import request_limits
+from request_limits import READ, WRITE, RequestLimiter, TokenBucket, parse_limit, request_cost, retry_seconds
+from sync_worker import STATE_THROTTLED, SyncWorker, parse_retry_after
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(request_limits.time, "monotonic", clock)
+    return clock
+
+
+def test_parse_limit_and_cost():
+    assert parse_limit("2:20") == (2.0, 20.0)
+    assert parse_limit("5") == (5.0, 5.0)
+    for bad in ("0:10", "2:0.5", "x"):
+        with pytest.raises(ValueError):
+            parse_limit(bad)
+
+    assert request_cost(READ, 10 * request_limits.WRITE_COST_BYTES) == 1
+    assert request_cost(WRITE, 0) == 1
+    assert request_cost(WRITE, request_limits.WRITE_COST_BYTES - 1) == 1
+    assert request_cost(WRITE, 3 * request_limits.WRITE_COST_BYTES) == 4
+
+    assert retry_seconds(0.01) == 1
+    assert retry_seconds(1.2) == 2
+
+
+# ========== KOVA ==========
+
+def test_bucket_refills_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=4)
+    assert bucket.level("k", 0) == 4
+
+    bucket.take("k", 4, 0)
+    assert bucket.level("k", 0) == 0
+    assert bucket.wait_time("k", 1, 0) == pytest.approx(0.5)
+    assert bucket.level("k", 1) == pytest.approx(2)
+    # Kapasitenin üstüne dolmaz
+    assert bucket.level("k", 60) == 4
+
+
+def test_cost_above_burst_is_capped():
+    bucket = TokenBucket(rate=2, burst=4)
+    # Kapasiteden büyük istek dolu kovayla geçer (hiç geçemez olmasın), kovayı boşaltır
+    assert bucket.wait_time("k", 10, 0) == 0
+    bucket.take("k", 10, 0)
+    assert bucket.level("k", 0) == 0
+    assert bucket.wait_time("k", 10, 0) == pytest.approx(2)
+
+
+def test_rejected_request_deducts_nothing(clock):
+    limiter = RequestLimiter({("user", WRITE): "1:2", ("ip", WRITE): "1:5"})
+    user = limiter.buckets[("user", WRITE)]
+    ip = limiter.buckets[("ip", WRITE)]
+
+    assert limiter.check(WRITE, user_id=1, ip="10.0.0.1") == 0
+    assert limiter.check(WRITE, user_id=1, ip="10.0.0.1") == 0
+    wait = limiter.check(WRITE, user_id=1, ip="10.0.0.1")
+    assert wait == pytest.approx(1)
+    # Kullanıcı kovası reddetti: IP kovasından da düşülmedi
+    assert ip.level("10.0.0.1", clock.now) == 3
+    assert user.level(1, clock.now) == 0
+    assert limiter.stats()["rejected"] == 1
+
+    # Aynı IP'den başka kullanıcı etkilenmez
+    assert limiter.check(WRITE, user_id=2, ip="10.0.0.1") == 0
+
+    clock.now += 1
+    assert limiter.check(WRITE, user_id=1, ip="10.0.0.1") == 0
+
+
+def test_read_and_write_budgets_are_separate(clock):
+    limiter = RequestLimiter({("user", WRITE): "1:1"})
+    assert limiter.check(WRITE, user_id=1) == 0
+    assert limiter.check(WRITE, user_id=1) > 0
+    assert limiter.check(READ, user_id=1) == 0
+
+
+def test_full_buckets_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(request_limits, "MAX_KEYS", 4)
+    limiter = RequestLimiter({("ip", READ): "1:2"})
+    bucket = limiter.buckets[("ip", READ)]
+
+    for i in range(4):
+        limiter.check(READ, ip=f"10.0.0.{i}")
+    assert len(bucket) == 4
+
+    # Eskiler dolunca yeni anahtar eşiği aşınca atılırlar
+    clock.now += 10
+    limiter.check(READ, ip="10.0.1.1")
+    assert len(bucket) == 1
+    assert limiter.stats()["keys"]["ip_read"] == 1
+
+    # Hepsi aktifken eşik iki katına çıkar: her istekte tarama yapılmaz
+    for i in range(5):
+        limiter.check(READ, ip=f"10.0.2.{i}")
+    assert len(bucket) == 6
+    assert bucket.max_keys == 2 * 5
+
+
+# ========== 429 SÖZLEŞMESİ ==========
+
+def test_parse_retry_after():
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("bogus") is None
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after("-3") == 0.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=120), usegmt=True)
+    assert 110 < parse_retry_after(later) <= 120
+
+
+def test_throttled_sync_waits_for_retry_after(cloud, make_db, insert, monkeypatch):
+    server, client = make_db("server"), make_db("client")
+    cloud.use(server)
+    insert(client, 1)
+
+    # Kullanıcı başına yazma: kapasite 1, 100 saniyede bir jeton
+    monkeypatch.setattr(cloud.module, "RATE_LIMIT", True)
+    monkeypatch.setattr(cloud.module, "limiter", RequestLimiter({("user", WRITE): "0.01:1"}))
+
+    sync = cloud.connect(client, 1, 7)
+    assert sync.sync_all_data()["success"]
+
+    insert(client, 1, [("ASELS", "Alım", 5, 40.0, 200.0, 0, "2024-02-01 10:00:00")])
+    result = sync.sync_all_data()
+    assert not result["success"]
+    assert result["status"] == 429
+    assert result["retry_after"] == 100
+
+    worker = SyncWorker(sync, listen=False, debounce=0, backoff_base=1)
+    calls = []
+    original = sync.sync_all_data
+    monkeypatch.setattr(sync, "sync_all_data", lambda: calls.append(1) or original())
+
+    worker._tick(time.monotonic())
+    assert calls == [1]
+    assert worker.state == STATE_THROTTLED
+    assert 99 < worker.status()["next_retry_in"] <= 100
+
+    # Retry-After dolmadan yeni istek gitmez; gönderilmeyen değişiklik kuyrukta kalır
+    worker._tick(time.monotonic() + 50)
+    assert calls == [1]
+    assert worker.queue_depth == 1
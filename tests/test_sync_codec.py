@@ -0,0 +1,49 @@
+# tests/test_sync_codec.py
+"""Sınırlı gzip açma: boyut sınırı, ardışık üyeler ve kesilmiş gövde"""
+
+import gzip
+import zlib
+
+import pytest
+
+from sync_codec import PayloadTooLarge, decompress
+
+BODY = b'{"sembol":"THYAO","adet":10}' * 100
+
+
+def test_gzip_round_trip_within_limit():
+    data = gzip.compress(BODY)
+    assert decompress(data, "gzip", max_size=len(BODY)) == BODY
+    assert decompress(data, "gzip") == BODY
+
+
+def test_gzip_multiple_members_share_budget():
+    data = gzip.compress(BODY) + gzip.compress(BODY)
+    assert decompress(data, "gzip", max_size=2 * len(BODY)) == 2 * BODY
+    with pytest.raises(PayloadTooLarge):
+        decompress(data, "gzip", max_size=2 * len(BODY) - 1)
+
+
+def test_gzip_over_limit_raises_payload_too_large():
+    with pytest.raises(PayloadTooLarge):
+        decompress(gzip.compress(BODY), "gzip", max_size=len(BODY) - 1)
+
+
+def test_truncated_gzip_is_rejected():
+    data = gzip.compress(BODY)
+    # Sınırsız yol gibi sınırlı yol da kesilmiş akışı kabul etmez
+    for cut in (len(data) // 2, len(data) - 4):
+        with pytest.raises(EOFError):
+            decompress(data[:cut], "gzip")
+        with pytest.raises(ValueError) as error:
+            decompress(data[:cut], "gzip", max_size=len(BODY))
+        assert not isinstance(error.value, PayloadTooLarge)
+
+    # İkinci üyesi kesilmiş gövde de
+    with pytest.raises(ValueError):
+        decompress(data + data[:-4], "gzip", max_size=2 * len(BODY))
+
+
+def test_trailing_garbage_is_rejected():
+    with pytest.raises(zlib.error):
+        decompress(gzip.compress(BODY) + b"garbage!", "gzip", max_size=2 * len(BODY))
@@ -0,0 +1,49 @@
+# tests/test_sync_delta.py
+"""Delta senkronu: sunucu günlüğü istemci imlecinin gerisine düşerse tam senkron yapılır"""
+
+import sqlite3
+
+from database import Database
+
+
+def count(db, user_id):
+    with db.get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+
+def backup(db, path):
+    """Sunucunun o anki kopyası (yedekten dönüşü taklit eder)"""
+    target = sqlite3.connect(path)
+    with db.get_connection() as conn:
+        conn.backup(target)
+    target.close()
+
+
+def test_restored_server_triggers_full_resync(make_db, sync, insert, tmp_path):
+    client, server = make_db("client"), make_db("server")
+    insert(server, 7)
+    sync(client, 1, server, 7)
+    snapshot = str(tmp_path / "snapshot.db")
+    backup(server, snapshot)
+
+    insert(server, 7, [("ASELS", "Alım", 5, 50.0, 250.0, 0, "2024-02-01 10:00:00")])
+    sync(client, 1, server, 7)
+    assert count(client, 1) == 2
+
+    restored = Database(snapshot)
+    result = sync(client, 1, restored, 7)
+
+    assert result["resync"] is True
+    assert count(restored, 7) == 2
+    assert sync(client, 1, restored, 7).get("resync") is None
+
+
+def test_current_cursor_is_not_reset(make_db, sync, insert):
+    client, server = make_db("client"), make_db("server")
+    insert(server, 7)
+    sync(client, 1, server, 7)
+    _, pull_cursor = client.changes.get_cursors(1)
+
+    result = server.changes.sync_delta(7, client.changes.device_id(), pull_cursor, [])
+
+    assert "reset" not in result
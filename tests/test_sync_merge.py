@@ -0,0 +1,80 @@
+# tests/test_sync_merge.py
+"""İki istemci, bir sunucu: eşzamanlı düzenlemeler ve toplu tam kopya aynı sonuca varmalı"""
+
+def add_row(db, user_id, insert):
+    insert(db, user_id)
+    with db.get_connection() as conn:
+        return conn.execute("SELECT uid FROM transactions WHERE user_id = ?", (user_id,)).fetchone()[0]
+
+
+def edit(db, user_id, uid, **values):
+    with db.get_connection() as conn:
+        conn.execute(f"UPDATE transactions SET {', '.join(f'{k} = ?' for k in values)} "
+                     "WHERE user_id = ? AND uid = ?", (*values.values(), user_id, uid))
+
+
+def rows(db, user_id):
+    with db.get_connection() as conn:
+        return sorted(tuple(row) for row in conn.execute(
+            "SELECT uid, sembol, tip, adet, fiyat, komisyon, tarih FROM transactions WHERE user_id = ?",
+            (user_id,)))
+
+
+def hlc(db):
+    with db.get_connection() as conn:
+        return int(conn.execute("SELECT value FROM sync_meta WHERE key = 'hlc'").fetchone()[0])
+
+
+def setup(make_db, sync, insert):
+    a, b, server = make_db("a"), make_db("b"), make_db("server")
+    uid = add_row(a, 1, insert)
+    sync(a, 1, server, 7)
+    sync(b, 1, server, 7)
+    return a, b, server, uid
+
+
+def test_concurrent_field_edits_converge(make_db, sync, insert):
+    a, b, server, uid = setup(make_db, sync, insert)
+
+    edit(a, 1, uid, fiyat=110.0)
+    edit(b, 1, uid, adet=20)
+    sync(a, 1, server, 7)
+    sync(b, 1, server, 7)
+    sync(a, 1, server, 7)
+
+    assert rows(a, 1) == rows(b, 1) == rows(server, 7)
+    assert rows(a, 1)[0][3:5] == (20, 110.0)
+
+
+def test_tombstone_clock_is_observed(make_db, sync, insert):
+    a, b, server, uid = setup(make_db, sync, insert)
+    with a.get_connection() as conn:
+        # A'nın saati ileride: mezar taşı sunucu/B saatinden büyük
+        conn.execute("UPDATE sync_meta SET value = ? WHERE key = 'hlc'", (hlc(a) + 10 ** 9,))
+    with a.get_connection() as conn:
+        conn.execute("DELETE FROM transactions WHERE user_id = 1 AND uid = ?", (uid,))
+    tombstone = hlc(a)
+
+    sync(a, 1, server, 7)
+    sync(b, 1, server, 7)
+
+    assert rows(b, 1) == rows(server, 7) == []
+    assert hlc(server) >= tombstone
+    assert hlc(b) >= tombstone
+
+
+def test_batch_copy_edits_reach_other_clients(make_db, sync, insert, cloud):
+    a, b, server, uid = setup(make_db, sync, insert)
+    # B'nin fiyat alanı saatli: toplu kopya eski saatle gelirse B onu reddeder
+    edit(b, 1, uid, fiyat=90.0)
+    sync(b, 1, server, 7)
+    sync(a, 1, server, 7)
+    edit(a, 1, uid, fiyat=125.0)
+
+    result = cloud.connect(a, 1, 7).sync_batch()
+    assert result["success"], result
+    sync(b, 1, server, 7)
+    sync(a, 1, server, 7)
+
+    assert rows(a, 1) == rows(b, 1) == rows(server, 7)
+    assert rows(b, 1)[0][4] == 125.0
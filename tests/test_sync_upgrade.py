@@ -0,0 +1,106 @@
+# tests/test_sync_upgrade.py
+"""uid öncesi veritabanından yükseltme: ilk delta senkronu satırları çoğaltmamalı"""
+
+from database import Database
+from sync_log import UID_TABLES
+
+TRANSACTIONS = [
+    ("THYAO", "Alım", 100, 250.5, 25050, 0, "2024-01-15 10:30:00"),
+    ("AKBNK", "Alım", 500, 45.75, 22875, 0, "2024-01-20 14:15:00"),
+    ("THYAO", "Satış", 40, 280.0, 11200, 0, "2024-03-01 11:00:00"),
+]
+DIVIDEND = ("AKBNK", 1250.0, 500, 2.5, "2024-04-10")
+
+
+def downgrade(db):
+    """Senkron günlüğü, saatler ve uid sütunları eklenmeden önceki şemaya dön"""
+    with db.get_connection() as conn:
+        cursor = conn.cursor()
+        for (name,) in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_sync_%'").fetchall():
+            cursor.execute(f"DROP TRIGGER {name}")
+        for table in ("sync_changes", "sync_meta", "sync_field_clocks", "sync_row_clocks"):
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        for table in UID_TABLES:
+            cursor.execute(f"DROP INDEX IF EXISTS idx_{table}_uid")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN uid")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN updated_at")
+
+
+def legacy_account(db, user_id, insert, padding=0):
+    """Aynı hesabın verisi; padding ile satır id'leri iki veritabanında farklı olur"""
+    downgrade(db)
+    insert(db, user_id, [("X", "Alım", 1, 1, 1, 0, "2000-01-01")] * padding)
+    with db.get_connection() as conn:
+        conn.execute("DELETE FROM transactions WHERE sembol = 'X'")
+    insert(db, user_id, TRANSACTIONS)
+    with db.get_connection() as conn:
+        conn.execute('''
+            INSERT INTO dividends (user_id, sembol, tutar, adet, hisse_basi_tutar, tarih)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (user_id, *DIVIDEND))
+
+
+def counts(db, user_id):
+    with db.get_connection() as conn:
+        return tuple(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE user_id = ?", (user_id,)).fetchone()[0]
+                     for table in UID_TABLES)
+
+
+def uids(db, user_id):
+    with db.get_connection() as conn:
+        return {table: sorted(row[0] for row in conn.execute(
+            f"SELECT uid FROM {table} WHERE user_id = ?", (user_id,))) for table in UID_TABLES}
+
+
+def test_upgrade_assigns_same_uids_on_both_sides(make_db, insert):
+    client, server = make_db("client"), make_db("server")
+    legacy_account(client, 1, insert)
+    legacy_account(server, 7, insert, padding=5)
+
+    client, server = Database(client.db_name), Database(server.db_name)
+
+    assert uids(client, 1) == uids(server, 7)
+
+
+def test_first_delta_sync_after_upgrade_does_not_duplicate(make_db, sync, insert):
+    client, server = make_db("client"), make_db("server")
+    legacy_account(client, 1, insert)
+    legacy_account(server, 7, insert, padding=5)
+    client, server = Database(client.db_name), Database(server.db_name)
+
+    sync(client, 1, server, 7)
+    sync(client, 1, server, 7)
+
+    assert counts(client, 1) == (3, 1)
+    assert counts(server, 7) == (3, 1)
+
+
+def test_identical_rows_keep_distinct_uids(make_db, insert):
+    db = make_db("client")
+    downgrade(db)
+    insert(db, 1, [TRANSACTIONS[0]] * 2)
+    db = Database(db.db_name)
+
+    assert len(set(uids(db, 1)["transactions"])) == 2
+
+
+def test_first_sync_keeps_unsynced_local_edits(make_db, sync, insert):
+    client, server = make_db("client"), make_db("server")
+    legacy_account(client, 1, insert)
+    legacy_account(server, 7, insert, padding=5)
+    client, server = Database(client.db_name), Database(server.db_name)
+    server.update_settings({"tema": "dark"}, 7)
+
+    with client.get_connection() as conn:
+        conn.execute("UPDATE transactions SET fiyat = 260.0 WHERE user_id = 1 AND tip = 'Satış'")
+    client.update_settings({"tema": "light"}, 1)
+    sync(client, 1, server, 7)
+
+    for db, user_id in ((client, 1), (server, 7)):
+        with db.get_connection() as conn:
+            (fiyat,) = conn.execute("SELECT fiyat FROM transactions WHERE user_id = ? AND tip = 'Satış'",
+                                    (user_id,)).fetchone()
+        assert fiyat == 260.0
+        assert db.get_settings(user_id)["tema"] == "light"
+    assert counts(client, 1) == counts(server, 7) == (3, 1)
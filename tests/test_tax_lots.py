@@ -0,0 +1,105 @@
+# tests/test_tax_lots.py
+"""Vergi lotları: alım/satım kaydı, yeniden hesaplama ve gerçekleşen kazanç"""
+
+import pytest
+
+
+def trade(db, tip, adet, fiyat, tarih, sembol="THYAO", komisyon=1):
+    return db.add_transaction(user_id=1, sembol=sembol, tip=tip, adet=adet, fiyat=fiyat,
+                              tarih=tarih, komisyon=komisyon)
+
+
+def test_buy_sell_recalculate_and_realized_gains(make_db):
+    db = make_db("lots")
+    trade(db, "Alım", 10, 100, "2024-01-01 10:00:00")
+    trade(db, "Satış", 4, 150, "2024-02-01 10:00:00")
+
+    db.recalculate_portfolio_from_transactions(1)
+
+    (position,) = db.get_portfolio(1)
+    assert position["adet"] == 6
+    assert position["ort_maliyet"] == pytest.approx(100.1)
+    (gain,) = db.get_realized_gains(user_id=1)
+    assert gain["adet"] == 4
+    assert gain["gain"] == pytest.approx(4 * (149.75 - 100.1))
+
+
+def gains(db):
+    return [(row["adet"], round(row["unit_cost"], 4), row["sold_at"][:10], row["long_term"])
+            for row in db.get_realized_gains(user_id=1)]
+
+
+def two_lots_and_a_sale(db):
+    trade(db, "Alım", 10, 100, "2023-01-02 10:00:00")
+    trade(db, "Alım", 10, 120, "2024-01-02 10:00:00")
+    trade(db, "Satış", 15, 150, "2024-06-03 10:00:00")
+
+
+def test_fifo_sells_oldest_lot_first_and_splits_long_term(make_db):
+    db = make_db("lots")
+    two_lots_and_a_sale(db)
+
+    assert gains(db) == [(10, 100.1, "2024-06-03", 1), (5, 120.1, "2024-06-03", 0)]
+    proceeds = (2250 - 1) / 15
+    summary = db.get_realized_gain_summary(user_id=1)
+    assert summary["uzun_vade"] == pytest.approx(10 * (proceeds - 100.1))
+    assert summary["kisa_vade"] == pytest.approx(5 * (proceeds - 120.1))
+    (lot,) = db.get_open_lots(user_id=1)
+    assert (lot["adet_open"], lot["unit_cost"]) == (5, pytest.approx(120.1))
+
+
+def test_average_method_sells_pro_rata_at_average_cost(make_db):
+    db = make_db("lots")
+    db.update_settings({"lot_method": "average"}, 1)
+    two_lots_and_a_sale(db)
+
+    assert gains(db) == [(7.5, 110.1, "2024-06-03", 1), (7.5, 110.1, "2024-06-03", 0)]
+    assert sum(row["gain"] for row in db.get_realized_gains(user_id=1)) == \
+        pytest.approx(15 * ((2250 - 1) / 15 - 110.1))
+
+
+def test_backdated_buy_rebuilds_fifo_order(make_db):
+    db = make_db("lots")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Satış", 10, 150, "2024-03-01 10:00:00")
+    trade(db, "Alım", 10, 50, "2023-06-01 10:00:00")
+
+    assert gains(db) == [(10, 50.1, "2024-03-01", 0)]
+    (lot,) = db.get_open_lots(user_id=1)
+    assert lot["unit_cost"] == pytest.approx(100.1)
+
+
+def test_oversell_is_skipped_by_lots_and_portfolio(make_db):
+    db = make_db("lots")
+    trade(db, "Alım", 5, 100, "2024-01-02 10:00:00")
+    trade(db, "Satış", 10, 150, "2024-02-01 10:00:00")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert gains(db) == []
+    (position,) = db.get_portfolio(1)
+    assert position["adet"] == 5
+    assert db.get_open_lots(user_id=1)[0]["adet_open"] == 5
+
+
+def test_edit_with_same_amount_rebuilds_lots(make_db):
+    db = make_db("lots")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Satış", 10, 150, "2024-03-01 10:00:00")
+    with db.get_connection() as conn:
+        conn.execute("UPDATE transactions SET adet = 20, fiyat = 50 WHERE tip = 'Alım'")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert gains(db) == [(10, 50.05, "2024-03-01", 0)]
+
+
+def test_type_flip_with_same_amounts_rebuilds_lots(make_db):
+    db = make_db("lots")
+    trade(db, "Alım", 10, 100, "2024-01-02 10:00:00")
+    trade(db, "Satış", 10, 100, "2024-02-01 10:00:00")
+    trade(db, "Alım", 10, 100, "2024-03-01 10:00:00")
+    with db.get_connection() as conn:
+        conn.execute("UPDATE transactions SET tip = CASE tip WHEN 'Alım' THEN 'Satış' ELSE 'Alım' END "
+                     "WHERE tarih >= '2024-02-01'")
+    db.recalculate_portfolio_from_transactions(1)
+
+    assert gains(db) == [(10, 100.1, "2024-03-01", 0)]
@@ -106,3 +106,61 @@ def showerror(title, message):
 def askyesno(title, message):
     msg = CustomMessagebox(title, message, icon="question", option_type="yesno")
     return msg.get()
+
+
+class SymbolSuggestions:
+    """Giriş kutusunun altında açılan sembol önerileri (utils.symbol_index)"""
+    
+    def __init__(self, entry, on_select=None, kinds=None, limit=6):
+        self.entry = entry
+        self.on_select = on_select
+        self.kinds = kinds
+        self.limit = limit
+        self.frame = None
+        
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        # Öneriye tıklama odak kaybından sonra işlensin diye gecikmeli kapat
+        entry.bind("<FocusOut>", lambda e: entry.after(150, self.hide), add="+")
+    
+    def _on_key(self, event):
+        if event.keysym in ("Return", "KP_Enter", "Escape", "Tab", "Up", "Down"):
+            return
+        from utils.symbol_index import get_symbol_index
+        self.show(get_symbol_index().search(self.entry.get(), self.limit, self.kinds))
+    
+    def show(self, results):
+        self.hide()
+        if not results:
+            return
+        
+        # Pencerenin üstüne yerleştir (diğer widget'ların üzerinde görünür)
+        top = self.entry.winfo_toplevel()
+        x = self.entry.winfo_rootx() - top.winfo_rootx()
+        y = self.entry.winfo_rooty() - top.winfo_rooty() + self.entry.winfo_height() + 2
+        
+        self.frame = ctk.CTkFrame(top, corner_radius=8, border_width=1)
+        self.frame.place(x=x, y=y, width=self.entry.winfo_width())
+        
+        for result in results:
+            ctk.CTkButton(
+                self.frame, text=f"{result['kod']}  ·  {result['ad']}", anchor="w", height=28,
+                fg_color="transparent", text_color=("gray10", "gray90"), hover_color=("gray75", "gray30"),
+                command=lambda r=result: self._select(r)
+            ).pack(fill="x", padx=4, pady=1)
+    
+    def hide(self):
+        if self.frame is not None:
+            try:
+                self.frame.destroy()
+            except Exception:
+                pass
+            self.frame = None
+    
+    def _select(self, result):
+        self.entry.delete(0, "end")
+        self.entry.insert(0, result["kod"])
+        self.hide()
+        self.entry.focus()
+        if self.on_select:
+            self.on_select(result)
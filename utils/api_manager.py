@@ -6,6 +6,8 @@ from abc import ABC, abstractmethod
 from typing import Tuple, Optional, Dict
 import threading
 
+from quote_cache import to_ticker
+
 class APIProvider(ABC):
     """Base API Provider sınıfı"""
     
@@ -254,6 +256,67 @@ class AlphaVantageProvider(APIProvider):
         return None
 
 
+class CloudQuoteProvider(APIProvider):
+    """
+    Bulut sunucusunun paylaşılan fiyat önbelleği (GET /api/quotes)
+
+    Sunucu tüm kullanıcıların sembollerini tek işçiyle yeniler; istemci
+    Yahoo'ya gitmez. Toplu yanıt `memo_ttl` saniye bellekte tutulur, sembol
+    başına get_stock_price çağrıları tekrar istek atmaz.
+    """
+    
+    def __init__(self, cloud_sync, memo_ttl: float = 30):
+        super().__init__()
+        self.cloud_sync = cloud_sync
+        self.memo_ttl = memo_ttl
+        self._memo = {}  # ticker -> (zaman, fiyat)
+    
+    @property
+    def available(self) -> bool:
+        return bool(self.cloud_sync and self.cloud_sync.enabled and self.cloud_sync.token)
+    
+    def validate(self) -> Tuple[bool, str]:
+        if not self.available:
+            return (False, "Bulut senkronizasyonu kapalı")
+        
+        cached = self.get_cached_result()
+        if cached:
+            return cached
+        
+        result = self.cloud_sync.get_quotes(["XU100.IS"])
+        if result.get("success"):
+            result = (True, "Bulut fiyat önbelleği çalışıyor")
+        else:
+            result = (False, f"Bağlantı hatası: {str(result.get('error'))[:50]}")
+        self._cache_result(result)
+        return result
+    
+    def get_stock_prices(self, symbols) -> Dict[str, float]:
+        """Sembol -> fiyat (tek istek; bulunamayanlar sonuçta yer almaz)"""
+        if not self.available:
+            return {}
+        
+        now = time.time()
+        prices, wanted = {}, {}
+        for symbol in symbols:
+            memo = self._memo.get(to_ticker(symbol))
+            if memo and now - memo[0] < self.memo_ttl:
+                prices[symbol] = memo[1]
+            else:
+                wanted[to_ticker(symbol)] = symbol
+        
+        if wanted:
+            result = self.cloud_sync.get_quotes(list(wanted))
+            for ticker, quote in (result.get("quotes") or {}).items():
+                if ticker in wanted and quote.get("price") is not None:
+                    self._memo[ticker] = (now, float(quote["price"]))
+                    prices[wanted[ticker]] = float(quote["price"])
+        return prices
+    
+    def get_stock_price(self, symbol: str) -> Optional[float]:
+        return self.get_stock_prices([symbol]).get(symbol)
+
+
 class APIManager:
     """Tüm API provider'ları yönetir"""
     
@@ -264,10 +327,12 @@ class APIManager:
         "alpha_vantage": AlphaVantageProvider
     }
     
-    def __init__(self, settings_manager=None):
+    def __init__(self, settings_manager=None, cloud_sync=None):
         self.settings_manager = settings_manager
         self.providers = {}
         self._init_providers()
+        # Bulut senkronu açıksa fiyatlar önce sunucunun paylaşılan önbelleğinden
+        self.cloud_provider = CloudQuoteProvider(cloud_sync) if cloud_sync else None
     
     def _init_providers(self):
         """Tüm provider'ları başlat"""
@@ -320,8 +385,24 @@ class APIManager:
         return self.providers.get("yfinance")
     
     def get_stock_price(self, symbol: str) -> Optional[float]:
-        """Aktif provider ile hisse fiyatı al"""
+        """Aktif provider ile hisse fiyatı al (bulut önbelleği varsa önce o)"""
+        if self.cloud_provider and self.cloud_provider.available:
+            price = self.cloud_provider.get_stock_price(symbol)
+            if price is not None:
+                return price
         provider = self.get_active_provider()
         if provider:
             return provider.get_stock_price(symbol)
-        return None
\ No newline at end of file
+        return None
+    
+    def get_stock_prices(self, symbols) -> Dict[str, Optional[float]]:
+        """Birden çok fiyat: bulut önbelleğinden tek istek, eksikler aktif provider'dan"""
+        prices = {}
+        if self.cloud_provider and self.cloud_provider.available:
+            prices = self.cloud_provider.get_stock_prices(symbols)
+        
+        provider = self.get_active_provider()
+        for symbol in symbols:
+            if symbol not in prices:
+                prices[symbol] = provider.get_stock_price(symbol) if provider else None
+        return prices
\ No newline at end of file
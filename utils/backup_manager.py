@@ -2,16 +2,32 @@
 
 import os
 import json
+import time
+import sqlite3
 import shutil
 from datetime import datetime
 from pathlib import Path
 
+from utils.backup_store import BackupStore, MANIFEST_EXT
+
+# Online backup her adımda kopyalanacak sayfa sayısı ve adımlar arası bekleme.
+# Küçük adımlar yazıcıların araya girebilmesini sağlar (uygulama donmaz).
+BACKUP_PAGES_PER_STEP = 64
+BACKUP_STEP_PAUSE = 0.002
+
+# Yedek öncesi WAL checkpoint'inin okuyucuları bekleme süresi (ms); dolarsa kopyaya düşülür
+CHECKPOINT_WAIT_MS = 100
+
+# Depoda tutulacak otomatik snapshot sayısı (parçalar paylaşıldığı için ucuz)
+KEEP_SNAPSHOTS = 365
+
 class BackupManager:
     """Otomatik yedekleme yöneticisi"""
     
-    def __init__(self, db, settings_manager):
+    def __init__(self, db, settings_manager, user_id=1):
         self.db = db
         self.settings = settings_manager
+        self.user_id = user_id
         self.backup_dir = self.settings.get("backup_location", "")
         
         if not self.backup_dir:
@@ -20,18 +36,113 @@ class BackupManager:
         
         # Klasörü oluştur
         os.makedirs(self.backup_dir, exist_ok=True)
+        
+        # Tekilleştirilmiş snapshot deposu
+        self.store = BackupStore(os.path.join(self.backup_dir, "store"))
+    
+    def _online_backup(self, source_path, target_path, progress=None):
+        """sqlite3 online backup API ile sayfa adımlarıyla kopyala"""
+        tmp_path = f"{target_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        
+        def on_step(status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+            # Adımlar arasında diğer thread'lere/yazıcılara fırsat ver
+            time.sleep(BACKUP_STEP_PAUSE)
+        
+        # Canlı veritabanı: geri yükleme bu kopya bitene kadar bekler
+        src = self.db.raw_connection() if source_path == self.db.db_name else sqlite3.connect(source_path)
+        dst = sqlite3.connect(tmp_path)
+        try:
+            src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=on_step)
+        finally:
+            dst.close()
+            src.close()
+        
+        # Yarım kalmış yedek asla gerçek isimle görünmesin
+        os.replace(tmp_path, target_path)
+        return target_path
+    
+    @staticmethod
+    def verify_backup(backup_path):
+        """Yedeğin geçerli bir SQLite veritabanı olduğunu doğrula"""
+        try:
+            conn = sqlite3.connect(f"file:{Path(backup_path).as_posix()}?mode=ro", uri=True)
+            try:
+                result = conn.execute("PRAGMA quick_check").fetchone()
+                has_tables = conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name='transactions'"
+                ).fetchone()[0]
+            finally:
+                conn.close()
+            return result and result[0] == "ok" and has_tables == 1
+        except sqlite3.DatabaseError:
+            return False
     
-    def create_backup(self, auto=False):
-        """Yedek oluştur"""
+    def _lock_for_read(self, conn):
+        """
+        Okuma işlemi aç; ana dosya bu işlemin gördüğü veriyle birebir aynıysa True
+        
+        Rollback günlüğünde paylaşımlı kilit yazıcıları işlem bitene kadar
+        bekletir (busy timeout). WAL'da önce checkpoint yapılır; işlem başladığında
+        WAL boşsa checkpoint bu okuyucunun görmediği sayfaları dosyaya yazamaz.
+        """
+        db_path = self.db.db_name
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+            conn.execute(f"PRAGMA busy_timeout = {CHECKPOINT_WAIT_MS}")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+        conn.execute("BEGIN")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        
+        wal_path = db_path + "-wal"
+        if os.path.exists(wal_path) and os.path.getsize(wal_path) > 0:
+            return False
+        return os.path.getsize(db_path) == page_count * page_size
+    
+    def _snapshot(self, snapshot_id, label="", progress=None):
+        """Veritabanının tutarlı görüntüsünü parçala, depoya yalnızca yeni parçaları ekle"""
+        # Manuel ve otomatik yedek aynı anda çalışabilir: kimlik seçimi, kopya
+        # ve manifest depo kilidi altında (gc yarım yedeğin parçalarını silmesin)
+        with self.store.lock:
+            # Aynı saniyede alınan yedekler birbirinin üzerine yazmasın
+            base_id, n = snapshot_id, 1
+            while os.path.exists(self.store.manifest_path(snapshot_id)):
+                snapshot_id = f"{base_id}_{n}"
+                n += 1
+            
+            # Canlı dosya tutarlıysa okuma işlemi açıkken doğrudan parçala:
+            # ara kopya yazılıp yeniden okunmaz (G/Ç DB boyutu kadar)
+            conn = self.db.raw_connection(isolation_level=None)
+            try:
+                if self._lock_for_read(conn):
+                    return self.store.snapshot(self.db.db_name, snapshot_id, label, progress)
+            finally:
+                conn.close()
+            
+            # WAL boşaltılamadı (uzun süren okuyucu): sayfa adımlı kopya üzerinden
+            staging = os.path.join(self.store.root, f"{snapshot_id}.staging")
+            try:
+                self._online_backup(self.db.db_name, staging, progress)
+                return self.store.snapshot(staging, snapshot_id, label)
+            finally:
+                if os.path.exists(staging):
+                    os.remove(staging)
+    
+    def create_backup(self, auto=False, progress=None):
+        """Yedek oluştur (depoya tekilleştirilmiş snapshot)"""
         try:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"backup_{'auto_' if auto else ''}{timestamp}.json"
-            backup_path = os.path.join(self.backup_dir, backup_name)
+            snapshot_id = f"backup_{'auto_' if auto else ''}{timestamp}"
             
-            # Veritabanı verilerini dışa aktar
-            self.db.export_data(backup_path, user_id=1)
+            # Veritabanını parça parça oku, değişen parçaları depola
+            backup_path = self._snapshot(snapshot_id, "auto" if auto else "manual", progress)
             
-            # Eski yedekleri temizle (son 10'u tut)
+            # Eski yedekleri temizle
             self.cleanup_old_backups()
             
             # Son yedek tarihini güncelle
@@ -44,35 +155,104 @@ class BackupManager:
             print(f"Yedekleme hatası: {e}")
             return None
     
+    def export_json(self, filename, user_id=None):
+        """Kullanıcı verilerini JSON olarak dışa aktar (taşınabilir format)"""
+        return self.db.export_data(filename, user_id=user_id or self.user_id)
+    
     def restore_backup(self, backup_path):
         """Yedeği geri yükle"""
         try:
-            # Mevcut veritabanını yedekle (güvenlik)
-            current_backup = os.path.join(self.backup_dir, f"before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db")
-            if os.path.exists(self.db.db_name):
-                shutil.copy(self.db.db_name, current_backup)
+            # Eski JSON yedekleri: kullanıcı verisi olarak içe aktar
+            if backup_path.lower().endswith('.json'):
+                return self.db.import_data(backup_path, user_id=self.user_id)
             
-            # Geri yükle
-            self.db.import_data(backup_path, user_id=1)
+            # Depodaki snapshot: parçalardan geçici dosyaya birleştir
+            materialized = None
+            if backup_path.endswith(MANIFEST_EXT):
+                materialized = self.store.materialize(backup_path)
+                backup_path = materialized
             
-            return True
+            try:
+                if not self.verify_backup(backup_path):
+                    print(f"Geçersiz yedek dosyası: {backup_path}")
+                    return False
+                
+                # Mevcut veritabanını yedekle (güvenlik)
+                if os.path.exists(self.db.db_name):
+                    self._snapshot(f"before_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}", "before_restore")
+                
+                self._swap_in(backup_path)
+                return True
+            finally:
+                if materialized and os.path.exists(materialized):
+                    os.remove(materialized)
         
         except Exception as e:
             print(f"Geri yükleme hatası: {e}")
             return False
     
+    def _swap_in(self, backup_path):
+        """Yedek dosyasını canlı veritabanının yerine atomik olarak koy"""
+        db_path = self.db.db_name
+        staging = f"{db_path}.restore"
+        shutil.copyfile(backup_path, staging)
+        
+        try:
+            # Uygulamanın diğer bağlantıları (fiyat deposu, bakım, async thread'ler)
+            # kapanana kadar bekle; değişim bitene kadar yeni bağlantı açılmaz.
+            # Çıkışta PriceStore gibi önbellekler temizlenir.
+            with self.db.exclusive():
+                # WAL modundaysa bekleyen sayfaları ana dosyaya aktar
+                try:
+                    conn = sqlite3.connect(db_path)
+                    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                    conn.close()
+                except sqlite3.DatabaseError:
+                    pass
+                
+                # Windows'ta dosya kısa süreli açık olabilir - birkaç kez dene
+                for attempt in range(5):
+                    try:
+                        os.replace(staging, db_path)
+                        break
+                    except PermissionError:
+                        if attempt == 4:
+                            raise
+                        time.sleep(0.2)
+                
+                # Eski dosyaya ait WAL/SHM artıkları yeni dosyayla karışmasın
+                for suffix in ("-wal", "-shm"):
+                    leftover = db_path + suffix
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+        finally:
+            # Zaman aşımı/hata: yarım kalan kopya bırakılmaz
+            if os.path.exists(staging):
+                os.remove(staging)
+    
     def get_backup_list(self):
         """Yedek listesini al"""
         try:
             backups = []
+            for snapshot in self.store.list_snapshots():
+                backups.append({
+                    "name": snapshot["id"],
+                    "path": snapshot["path"],
+                    "size": snapshot["size"],
+                    "format": "snapshot",
+                    "created": snapshot["created"]
+                })
+            
+            # Eski tam kopyalar (.db / .json)
             for file in os.listdir(self.backup_dir):
-                if file.endswith('.json'):
+                if file.endswith('.db') or file.endswith('.json'):
                     path = os.path.join(self.backup_dir, file)
                     stat = os.stat(path)
                     backups.append({
                         "name": file,
                         "path": path,
                         "size": stat.st_size,
+                        "format": "json" if file.endswith('.json') else "sqlite",
                         "created": datetime.fromtimestamp(stat.st_mtime)
                     })
             
@@ -84,18 +264,25 @@ class BackupManager:
             print(f"Yedek listesi alma hatası: {e}")
             return []
     
-    def cleanup_old_backups(self, keep=10):
+    def cleanup_old_backups(self, keep=10, keep_snapshots=KEEP_SNAPSHOTS):
         """Eski yedekleri temizle"""
         try:
             backups = self.get_backup_list()
             
             # Sadece otomatik yedekleri temizle
-            auto_backups = [b for b in backups if "auto_" in b["name"]]
+            auto_backups = [b for b in backups if "auto_" in b["name"] and b["format"] != "snapshot"]
             
             # Son X tanesini tut, diğerlerini sil
             if len(auto_backups) > keep:
                 for backup in auto_backups[keep:]:
                     os.remove(backup["path"])
+            
+            # Snapshot'lar: saklama sınırını aşanları sil, sahipsiz parçaları topla
+            auto_snapshots = [b for b in backups if "auto_" in b["name"] and b["format"] == "snapshot"]
+            if len(auto_snapshots) > keep_snapshots:
+                for backup in auto_snapshots[keep_snapshots:]:
+                    self.store.delete_snapshot(backup["path"])
+                self.store.gc()
         
         except Exception as e:
             print(f"Yedek temizleme hatası: {e}")
@@ -104,4 +291,4 @@ class BackupManager:
         """Otomatik yedekleme kontrolü"""
         if self.settings.backup_needed():
             return self.create_backup(auto=True)
-        return None
\ No newline at end of file
+        return None
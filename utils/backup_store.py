@@ -0,0 +1,253 @@
+# utils/backup_store.py
+
+"""
+Tekilleştirilmiş yedek deposu - sıkıştırılmış, içerik adresli parçalar
+
+Yapı:
+    <backup_dir>/store/chunks/ab/abcd...   zlib ile sıkıştırılmış parça (adı = BLAKE2b özeti)
+    <backup_dir>/store/snapshots/<id>.manifest   parça listesi (JSON)
+
+Her yedek veritabanı dosyasını sayfa sınırlarına hizalı parçalara böler.
+Aynı içerikli parça depoda bir kez tutulur; yeni yedekte yalnızca değişen
+sayfalar sıkıştırılıp yazılır, geri kalanı önceki yedeklerle paylaşılır.
+
+Maliyet: her yedekte veritabanı dosyası bir kez okunup parça parça özetlenir
+(ara kopya yok; CPU/okuma DB boyutuyla orantılı). Sıkıştırma, yazma ve
+kaplanan alan yalnızca değişen parçalar kadardır.
+
+Aynı depoyu kullanan snapshot ve gc işlemleri depo kilidiyle sıralanır;
+aksi halde gc, manifesti henüz yazılmamış bir yedeğin parçalarını silebilir.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+# Bir parçadaki SQLite sayfası sayısı (4 KB sayfa ile 16 KB parça)
+CHUNK_PAGES = 4
+COMPRESS_LEVEL = 6
+MANIFEST_EXT = ".manifest"
+
+
+# Depo kökü -> kilit (aynı depoyu açan tüm BackupStore nesneleri paylaşır)
+_STORE_LOCKS = {}
+_STORE_LOCKS_GUARD = threading.Lock()
+
+
+def _store_lock(root):
+    key = os.path.realpath(root)
+    with _STORE_LOCKS_GUARD:
+        return _STORE_LOCKS.setdefault(key, threading.RLock())
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+def sqlite_page_size(path):
+    """SQLite başlığından sayfa boyutunu oku (geçersizse 4096)"""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(100)
+        if not header.startswith(b"SQLite format 3\x00"):
+            return 4096
+        size = int.from_bytes(header[16:18], "big")
+        return 65536 if size == 1 else (size or 4096)
+    except OSError:
+        return 4096
+
+
+class BackupStore:
+    """Snapshot oluşturma, geri açma ve çöp toplama"""
+
+    def __init__(self, root):
+        self.root = root
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.snapshot_dir = os.path.join(root, "snapshots")
+        os.makedirs(self.chunk_dir, exist_ok=True)
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        self.lock = _store_lock(root)
+
+    # ========== PARÇALAR ==========
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunk_dir, digest[:2], digest)
+
+    def has_chunk(self, digest):
+        return os.path.exists(self._chunk_path(digest))
+
+    def _put_chunk(self, digest, data):
+        """Parçayı yoksa sıkıştırıp yaz; yazılan bayt sayısını döndür"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = zlib.compress(data, COMPRESS_LEVEL)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(packed)
+        os.replace(tmp_path, path)
+        return len(packed)
+
+    def _get_chunk(self, digest):
+        with open(self._chunk_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if _digest(data) != digest:
+            raise ValueError(f"Bozuk parça: {digest}")
+        return data
+
+    # ========== SNAPSHOT ==========
+
+    def manifest_path(self, snapshot_id):
+        return os.path.join(self.snapshot_dir, snapshot_id + MANIFEST_EXT)
+
+    def snapshot(self, source_path, snapshot_id, label="", progress=None):
+        """
+        Veritabanı dosyasını okurken parçalayıp depoya ekle
+
+        Dosya okuma boyunca değişmemeli: tutarlı bir kopya ya da okuma
+        işlemiyle kilitlenmiş canlı dosya. progress(okunan, toplam) sayfa.
+        """
+        with self.lock:
+            return self._snapshot(source_path, snapshot_id, label, progress)
+
+    def _snapshot(self, source_path, snapshot_id, label, progress=None):
+        page_size = sqlite_page_size(source_path)
+        chunk_size = page_size * CHUNK_PAGES
+        total_pages = os.path.getsize(source_path) // page_size
+
+        chunks = []
+        whole = hashlib.blake2b(digest_size=20)
+        size = 0
+        new_chunks = 0
+        written = 0
+
+        with open(source_path, "rb") as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                digest = _digest(data)
+                whole.update(data)
+                size += len(data)
+                chunks.append(digest)
+
+                # Önceki snapshot'larda olan parça tekrar sıkıştırılmaz
+                if not self.has_chunk(digest):
+                    written += self._put_chunk(digest, data)
+                    new_chunks += 1
+                if progress:
+                    progress(size // page_size, total_pages)
+
+        manifest = {
+            "id": snapshot_id,
+            "label": label,
+            "created": datetime.now().isoformat(),
+            "size": size,
+            "page_size": page_size,
+            "chunk_size": chunk_size,
+            "digest": whole.hexdigest(),
+            "new_chunks": new_chunks,
+            "written": written,
+            "chunks": chunks,
+        }
+
+        # Manifest en son yazılır: yarım kalan yedek listede görünmez
+        path = self.manifest_path(snapshot_id)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def load_manifest(self, manifest_path):
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def materialize(self, manifest_path, target_path=None):
+        """Snapshot'ı parçalardan tekrar birleştirip dosyaya yaz"""
+        manifest = self.load_manifest(manifest_path)
+        if target_path is None:
+            fd, target_path = tempfile.mkstemp(suffix=".db", dir=self.root)
+            os.close(fd)
+
+        whole = hashlib.blake2b(digest_size=20)
+        with open(target_path, "wb") as f:
+            for digest in manifest["chunks"]:
+                data = self._get_chunk(digest)
+                whole.update(data)
+                f.write(data)
+
+        if whole.hexdigest() != manifest["digest"]:
+            os.remove(target_path)
+            raise ValueError(f"Snapshot doğrulanamadı: {manifest['id']}")
+        return target_path
+
+    def list_snapshots(self):
+        """Manifest özetleri (en yeni önce)"""
+        snapshots = []
+        for file in os.listdir(self.snapshot_dir):
+            if not file.endswith(MANIFEST_EXT):
+                continue
+            path = os.path.join(self.snapshot_dir, file)
+            try:
+                manifest = self.load_manifest(path)
+            except (OSError, ValueError):
+                continue
+            snapshots.append({
+                "id": manifest["id"],
+                "label": manifest.get("label", ""),
+                "path": path,
+                "size": manifest["size"],
+                "written": manifest.get("written", 0),
+                "created": datetime.fromisoformat(manifest["created"]),
+            })
+        snapshots.sort(key=lambda x: x["created"], reverse=True)
+        return snapshots
+
+    def delete_snapshot(self, manifest_path):
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    # ========== TEMİZLİK ==========
+
+    def gc(self):
+        """Hiçbir manifestin referans vermediği parçaları sil"""
+        with self.lock:
+            return self._gc()
+
+    def _gc(self):
+        referenced = set()
+        for snapshot in self.list_snapshots():
+            referenced.update(self.load_manifest(snapshot["path"])["chunks"])
+
+        removed = 0
+        for prefix in os.listdir(self.chunk_dir):
+            prefix_dir = os.path.join(self.chunk_dir, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for name in os.listdir(prefix_dir):
+                if name not in referenced:
+                    os.remove(os.path.join(prefix_dir, name))
+                    removed += 1
+        return removed
+
+    def stats(self):
+        """Mantıksal boyut / diskte kaplanan alan"""
+        snapshots = self.list_snapshots()
+        stored = 0
+        chunk_count = 0
+        for dirpath, _, files in os.walk(self.chunk_dir):
+            for name in files:
+                stored += os.path.getsize(os.path.join(dirpath, name))
+                chunk_count += 1
+        return {
+            "snapshots": len(snapshots),
+            "logical_bytes": sum(s["size"] for s in snapshots),
+            "stored_bytes": stored,
+            "chunks": chunk_count,
+        }
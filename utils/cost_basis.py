@@ -0,0 +1,273 @@
+# utils/cost_basis.py
+
+"""
+Vektörel maliyet motoru - tüm işlem defteri üzerinde ortalama maliyet
+
+recalculate_portfolio_from_transactions ile aynı kuralları uygular:
+  * Alım maliyetine komisyon eklenir (kayıtlı komisyon yoksa oran ile)
+  * Satış ortalama maliyeti değiştirmez, maliyetten adet oranında düşer
+  * Eldeki adetten büyük satışlar yok sayılır
+  * Bedelli (sermaye artırımı) satırları komisyonsuz alım gibi işlenir
+
+Ortalama maliyette satış sonrası kalan maliyet C_k = C_{k-1} * r_k + b_k
+(r_k = kalan/önceki adet, b_k = alım maliyeti) doğrusal özyinelemesidir.
+P_k = r_1 * ... * r_k ile C_k = P_k * cumsum(b_j / P_j) olur; pozisyonun
+sıfırlandığı yerlerde (r = 0) seri yeni bir bölüme ayrılır.
+"""
+
+import numpy as np
+import pandas as pd
+
+BUY_TYPES = ("Alım",)
+SELL_TYPES = ("Satış",)
+# apply_corporate_actions'ın eklediği sentetik bedelli satırlarının tipi
+RIGHTS_TYPES = ("Bedelli",)
+
+ACTION_SPLIT = "split"
+ACTION_RIGHTS = "rights"
+
+EPS = 1e-9
+# exp(-log P) taşmasın diye bu eşiğin altındaki bölümler döngüyle hesaplanır
+MIN_LOG_SCALE = -300.0
+
+
+def _segment_cumsum(values, starts):
+    """Her bölüm başında sıfırlanan kümülatif toplam (global cumsum - ofset)"""
+    total = np.cumsum(values)
+    start_idx = np.flatnonzero(starts)
+    offset = total[start_idx] - values[start_idx]
+    return total - np.repeat(offset, np.diff(np.append(start_idx, values.size)))
+
+
+def _segment_cumsum_exact(values, starts):
+    """Büyüklükleri bölümden bölüme çok değişen değerler için bölüm içi toplam"""
+    # Global cumsum'dan ofset çıkarmak, önceki büyük bölümlerin yanında
+    # küçük bölümlerin hassasiyetini kaybettirir; groupby bölüm içinde toplar
+    segment = np.cumsum(starts)
+    return pd.Series(values).groupby(segment, sort=False).cumsum().to_numpy()
+
+
+def _first_per_group(mask, groups):
+    """Her grupta mask'in ilk True olduğu satırlar"""
+    idx = np.flatnonzero(mask)
+    if idx.size == 0:
+        return idx
+    _, first = np.unique(groups[idx], return_index=True)
+    return idx[first]
+
+
+def _scalar_costs(qty_before, adet, buy_cost, is_sell):
+    """Ölçek taşması olan bölümler için adım adım hesap"""
+    costs = np.empty(adet.size)
+    cost = 0.0
+    for i in range(adet.size):
+        if is_sell[i]:
+            cost = 0.0 if qty_before[i] - adet[i] <= EPS else cost * (qty_before[i] - adet[i]) / qty_before[i]
+        cost += buy_cost[i]
+        costs[i] = cost
+    return costs
+
+
+def compute_cost_basis(symbols, tips, adet, fiyat, komisyon, commission_rate=0.0004, presorted=False):
+    """
+    Tarih sırasına göre verilmiş işlemlerden satır bazında maliyet durumu
+
+    Args:
+        symbols, tips: sembol ve işlem tipi dizileri
+        adet, fiyat, komisyon: sayısal diziler (komisyon 0/None ise oran uygulanır)
+        commission_rate: kayıtlı komisyonu olmayan işlemler için oran
+        presorted: işlemler zaten sembol, tarih sırasında ise True (gruplama atlanır)
+
+    Returns:
+        DataFrame: sembole göre gruplanmış (grup içinde tarih sırası) satırlar;
+        index = girişteki satır numarası. Sütunlar: sembol, gecerli, adet (sonrası),
+        toplam_maliyet, ort_maliyet, satis_maliyeti, gerceklesen_kar, komisyon
+    """
+    symbols = np.asarray(symbols, dtype=object)
+    tips = np.asarray(tips, dtype=object)
+    adet = np.asarray(adet, dtype=np.float64)
+    fiyat = np.asarray(fiyat, dtype=np.float64)
+    komisyon = np.nan_to_num(np.asarray(komisyon, dtype=np.float64))
+    n = adet.size
+
+    columns = ["sembol", "gecerli", "adet", "toplam_maliyet", "ort_maliyet",
+               "satis_maliyeti", "gerceklesen_kar", "komisyon"]
+    if n == 0:
+        return pd.DataFrame(columns=columns)
+
+    if presorted:
+        order = np.arange(n)
+    else:
+        # Sembole göre grupla; grup içinde tarih sırası korunur (stable sort)
+        codes, _ = pd.factorize(symbols)
+        order = np.argsort(codes, kind="stable")
+        symbols, tips = symbols[order], tips[order]
+        adet, fiyat, komisyon = adet[order], fiyat[order], komisyon[order]
+
+    a = adet
+    gross = a * fiyat
+    # Metin karşılaştırması bir kez: tip kodları üzerinden maskeler
+    tip_codes, tip_values = pd.factorize(tips)
+    is_rights = np.isin(tip_codes, [i for i, tip in enumerate(tip_values) if tip in RIGHTS_TYPES])
+    is_buy = is_rights | np.isin(tip_codes, [i for i, tip in enumerate(tip_values) if tip in BUY_TYPES])
+    is_sell = np.isin(tip_codes, [i for i, tip in enumerate(tip_values) if tip in SELL_TYPES])
+    fee = np.where(is_rights, 0.0, np.where(komisyon > 0, komisyon, gross * commission_rate))
+
+    group_start = np.empty(n, dtype=bool)
+    group_start[0] = True
+    group_start[1:] = symbols[1:] != symbols[:-1]
+    codes = np.cumsum(group_start)
+
+    # Eldeki adetten büyük satışları, her sembolde en erken olandan başlayarak ele
+    valid_sell = is_sell.copy()
+    signed = np.where(is_buy, a, 0.0) - np.where(valid_sell, a, 0.0)
+    qty = _segment_cumsum(signed, group_start)
+    bad = valid_sell & (qty - signed + EPS < a)
+    while bad.any():
+        first = _first_per_group(bad, codes)
+        valid_sell[first] = False
+
+        # Atlanan satış, sembolün sonraki tüm satırlarında adedi geri ekler
+        delta = np.zeros(n)
+        delta[first] = a[first]
+        signed[first] = 0.0
+        qty += _segment_cumsum(delta, group_start)
+        bad = valid_sell & (qty - signed + EPS < a)
+    qty_before = qty - signed
+
+    # Pozisyonun sıfırlandığı satırdan sonra yeni bölüm başlar
+    closed = np.abs(qty) <= EPS
+    segment_start = group_start.copy()
+    segment_start[1:] |= closed[:-1]
+
+    ratio = np.ones(n)
+    np.divide(qty, qty_before, out=ratio, where=valid_sell & ~closed)
+    buy_cost = np.where(is_buy, gross + fee, 0.0)
+
+    log_scale = _segment_cumsum(np.log(ratio), segment_start)
+    scaled = _segment_cumsum_exact(buy_cost * np.exp(-np.maximum(log_scale, MIN_LOG_SCALE)), segment_start)
+    cost = np.exp(log_scale) * scaled
+    cost[closed] = 0.0
+
+    # Çok sayıda kısmi satış içeren bölümler (aşırı küçük ölçek) döngüyle
+    overflow = log_scale < MIN_LOG_SCALE
+    if overflow.any():
+        segment = np.cumsum(segment_start) - 1
+        for seg in np.unique(segment[overflow]):
+            rows = np.flatnonzero(segment == seg)
+            cost[rows] = _scalar_costs(qty_before[rows], a[rows], buy_cost[rows], valid_sell[rows])
+
+    cost_before = np.zeros(n)
+    cost_before[1:] = np.where(segment_start[1:], 0.0, cost[:-1])
+    sell_cost = np.zeros(n)
+    np.multiply(cost_before, a / np.where(qty_before > 0, qty_before, 1.0), out=sell_cost, where=valid_sell)
+    realized = np.where(valid_sell, gross - fee - sell_cost, 0.0)
+
+    avg = np.zeros(n)
+    np.divide(cost, qty, out=avg, where=~closed)
+
+    result = pd.DataFrame({
+        "sembol": symbols,
+        "gecerli": is_buy | valid_sell,
+        "adet": qty,
+        "toplam_maliyet": cost,
+        "ort_maliyet": avg,
+        "satis_maliyeti": sell_cost,
+        "gerceklesen_kar": realized,
+        "komisyon": np.where(is_buy | valid_sell, fee, 0.0),
+    })
+    result.index = order
+    return result
+
+
+def summarize(rows):
+    """compute_cost_basis sonucundan sembol başına son durum"""
+    if rows.empty:
+        return pd.DataFrame(columns=["adet", "toplam_maliyet", "ort_maliyet", "gerceklesen_kar", "komisyon"])
+
+    # Satırlar sembole göre gruplu: grup sınırları ve son satırlar
+    symbols = rows["sembol"].to_numpy()
+    starts = np.flatnonzero(np.concatenate(([True], symbols[1:] != symbols[:-1])))
+    last = np.append(starts[1:], len(rows)) - 1
+
+    summary = pd.DataFrame({
+        "adet": rows["adet"].to_numpy()[last],
+        "toplam_maliyet": rows["toplam_maliyet"].to_numpy()[last],
+        "ort_maliyet": rows["ort_maliyet"].to_numpy()[last],
+        "gerceklesen_kar": np.add.reduceat(rows["gerceklesen_kar"].to_numpy(), starts),
+        "komisyon": np.add.reduceat(rows["komisyon"].to_numpy(), starts),
+    }, index=pd.Index(symbols[starts], name="sembol"))
+    return summary
+
+
+def transactions_to_arrays(rows):
+    """sqlite satırlarını (sembol, tip, adet, fiyat, komisyon) dizilere çevir"""
+    if not rows:
+        return [np.empty(0)] * 5
+    symbols, tips, adet, fiyat, komisyon = zip(*rows)
+    return (
+        np.array(symbols, dtype=object),
+        np.array(tips, dtype=object),
+        np.array(adet, dtype=np.float64),
+        np.array(fiyat, dtype=np.float64),
+        np.array([k or 0.0 for k in komisyon], dtype=np.float64),
+    )
+
+
+def apply_corporate_actions(arrays, tarih, actions, commission_rate=0.0004):
+    """
+    Bölünme ve bedelli sermaye artırımlarını işlem dizilerine uygula
+
+    Args:
+        arrays: transactions_to_arrays çıktısı (sembol + tarih sıralı)
+        tarih: işlem tarihleri (arrays ile aynı sırada)
+        actions: (sembol, tip, oran, fiyat, ex_date) listesi, ex_date sırasında
+        commission_rate: bedelli öncesi eldeki adet hesabı için komisyon oranı
+
+    ex_date yeni koşullarla işlem görülen ilk andır: o gün tarihli işlemler
+    bölünme sonrası fiyatla yapılmıştır ve düzeltilmez (fiyat barları ve olay
+    defteriyle aynı sınır). ex_date saat de içerebilir ("YYYY-MM-DD HH:MM:SS"):
+    tarihi verilmeden kaydedilen aksiyon o ana kadar girilen tüm işlemleri kapsar.
+
+    Bölünme: ex_date'ten önceki işlemlerin adedi oranla çarpılır, fiyatı bölünür
+    (kümülatif: sonraki bölünmeler önceki satırlara tekrar uygulanır).
+    Bedelli: ex_date öncesi eldeki adet / oran kadar, komisyonsuz sentetik
+    alım satırı eklenir.
+
+    Returns:
+        (arrays, days, source): düzeltilmiş diziler, satır günleri (YYYY-MM-DD)
+        ve her satırın girişteki satır numarası (sentetik satırlarda -1)
+    """
+    symbols, tips, adet, fiyat, komisyon = (np.array(a, copy=True) for a in arrays)
+    stamps = np.array([str(t).replace("T", " ")[:19] for t in tarih], dtype=object)
+    source = np.arange(adet.size)
+
+    for symbol, tip, oran, price, ex_date in actions:
+        if not oran or oran <= 0:
+            continue
+        ex_date = str(ex_date).replace("T", " ")[:19]
+        before = np.flatnonzero((symbols == symbol) & (stamps < ex_date))
+        if before.size == 0:
+            continue
+
+        if tip == ACTION_SPLIT:
+            adet[before] *= oran
+            fiyat[before] /= oran
+
+        elif tip == ACTION_RIGHTS:
+            # Sembolün ex_date öncesi satırları gruplu olduğu için ardışık
+            held = compute_cost_basis(symbols[before], tips[before], adet[before], fiyat[before],
+                                      komisyon[before], commission_rate, presorted=True)["adet"].iloc[-1]
+            if held <= EPS:
+                continue
+            pos = before[-1] + 1
+            symbols = np.insert(symbols, pos, symbol)
+            tips = np.insert(tips, pos, RIGHTS_TYPES[0])
+            adet = np.insert(adet, pos, held / oran)
+            fiyat = np.insert(fiyat, pos, price or 0.0)
+            komisyon = np.insert(komisyon, pos, 0.0)
+            stamps = np.insert(stamps, pos, ex_date)
+            source = np.insert(source, pos, -1)
+
+    days = np.array([stamp[:10] for stamp in stamps], dtype=object)
+    return (symbols, tips, adet, fiyat, komisyon), days, source
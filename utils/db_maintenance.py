@@ -0,0 +1,321 @@
+# utils/db_maintenance.py
+
+"""
+Veritabanı bakım servisi - boş sayfa/parçalanma takibi ve boşta bakım
+
+Görevler (yalnızca veritabanı IDLE_SECONDS boyunca kullanılmadığında):
+    optimize            PRAGMA optimize (ucuz, birkaç saatte bir)
+    analyze             günde bir kez satır sayılarını sqlite_stat1 ile karşılaştır,
+                        eskimiş tablolar varsa ANALYZE
+    incremental_vacuum  boş sayfaları adım adım dosyadan geri ver
+    vacuum              auto_vacuum=INCREMENTAL'a tek seferlik geçiş veya
+                        aşırı parçalanmada tam VACUUM
+    checkpoint          WAL modundaysa wal_checkpoint(PASSIVE)
+
+Her dakikalık kontrol yalnızca PRAGMA'ları okur; tablo taraması gerektiren
+eski istatistik kontrolü (COUNT(*)) ve nesne boyutları (dbstat) yalnızca
+analyze vadesi geldiğinde veya istatistik ekranında çalışır.
+
+Son çalışma zamanları maintenance_log tablosunda tutulur. Servis kendi
+bağlantılarını açar; böylece bakım sorguları Database.last_activity'yi
+(boşta süresini) sıfırlamaz.
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Veritabanı bu kadar saniye kullanılmadıysa "boşta" sayılır
+IDLE_SECONDS = 120
+CHECK_INTERVAL = 60
+
+OPTIMIZE_EVERY = timedelta(hours=6)
+ANALYZE_EVERY = timedelta(days=1)
+VACUUM_EVERY = timedelta(days=7)
+CHECKPOINT_EVERY = timedelta(hours=1)
+
+# Satır sayısı son ANALYZE'dan bu oranda (ve en az STALE_MIN_ROWS satır) saptıysa istatistik eski
+STALE_RATIO = 0.25
+STALE_MIN_ROWS = 50
+
+# Artımlı vakum: bu kadar boş sayfa birikince, her adımda en fazla bu kadar sayfa
+MIN_FREE_PAGES = 256
+VACUUM_STEP_PAGES = 1024
+# Boş sayfa oranı bunu aşarsa tam VACUUM
+FULL_VACUUM_RATIO = 0.25
+
+AUTO_VACUUM_MODES = {0: "none", 1: "full", 2: "incremental"}
+
+
+class DatabaseMaintenance:
+    """Boyut/parçalanma istatistikleri ve zamanlanmış bakım"""
+
+    def __init__(self, db, idle_seconds=IDLE_SECONDS):
+        self.db = db
+        self.idle_seconds = idle_seconds
+        self._running = False
+        self._lock = threading.Lock()
+
+    # ========== İSTATİSTİKLER ==========
+
+    def _pragma(self, conn, name):
+        return conn.execute(f"PRAGMA {name}").fetchone()[0]
+
+    def object_sizes(self, conn):
+        """Tablo/indeks başına diskte kaplanan bayt (dbstat yoksa boş liste)"""
+        try:
+            rows = conn.execute('''
+                SELECT s.name, m.type, m.tbl_name, SUM(s.pgsize) AS size, COUNT(*) AS pages
+                FROM dbstat s
+                LEFT JOIN sqlite_master m ON m.name = s.name
+                GROUP BY s.name
+                ORDER BY size DESC
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            return []
+        return [{"name": r[0], "type": r[1] or "table", "table": r[2] or r[0],
+                 "size": r[3], "pages": r[4]} for r in rows]
+
+    def stale_tables(self, conn):
+        """İstatistiği hiç olmayan veya satır sayısı belirgin değişen tablolar"""
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+
+        analyzed = {}
+        has_stat = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+        ).fetchone()
+        if has_stat:
+            # stat sütununun ilk sayısı ANALYZE anındaki satır sayısı
+            for tbl, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+                try:
+                    analyzed[tbl] = max(analyzed.get(tbl, 0), int(str(stat).split()[0]))
+                except (ValueError, IndexError):
+                    continue
+
+        stale = []
+        for table in tables:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+            before = analyzed.get(table)
+            if before is None:
+                if rows >= STALE_MIN_ROWS:
+                    stale.append(table)
+            elif abs(rows - before) >= STALE_MIN_ROWS and abs(rows - before) > before * STALE_RATIO:
+                stale.append(table)
+        return stale
+
+    def last_runs(self, conn):
+        return {r[0]: r[1] for r in conn.execute("SELECT task, last_run FROM maintenance_log")}
+
+    def stats(self, include_objects=True, include_stale=True):
+        """
+        Dosya boyutu, boş sayfalar, parçalanma, nesne boyutları, eski istatistikler
+
+        include_objects/include_stale tüm tabloları tarar: arayüz thread'inde çağırmayın.
+        """
+        conn = self._raw_connection()
+        try:
+            page_size = self._pragma(conn, "page_size")
+            page_count = self._pragma(conn, "page_count")
+            freelist = self._pragma(conn, "freelist_count")
+            wal_path = self.db.db_name + "-wal"
+            return {
+                "file_size": os.path.getsize(self.db.db_name) if os.path.exists(self.db.db_name) else 0,
+                "wal_size": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+                "page_size": page_size,
+                "page_count": page_count,
+                "freelist_count": freelist,
+                "free_bytes": freelist * page_size,
+                "fragmentation": freelist / page_count if page_count else 0.0,
+                "auto_vacuum": AUTO_VACUUM_MODES.get(self._pragma(conn, "auto_vacuum"), "none"),
+                "journal_mode": self._pragma(conn, "journal_mode"),
+                "objects": self.object_sizes(conn) if include_objects else [],
+                "stale_tables": self.stale_tables(conn) if include_stale else [],
+                "last_runs": self.last_runs(conn),
+            }
+        finally:
+            conn.close()
+
+    # ========== GÖREVLER ==========
+
+    def is_idle(self):
+        """Son veritabanı erişiminden bu yana yeterli süre geçti mi?"""
+        last = getattr(self.db, "last_activity", 0.0)
+        return time.monotonic() - last >= self.idle_seconds
+
+    def _due(self, last_runs, task, every):
+        last = last_runs.get(task)
+        if not last:
+            return True
+        try:
+            return datetime.now() - datetime.fromisoformat(last) >= every
+        except ValueError:
+            return True
+
+    def _record(self, task, started, detail=""):
+        conn = self._raw_connection()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO maintenance_log (task, last_run, duration_ms, detail)
+                VALUES (?, ?, ?, ?)
+            ''', (task, datetime.now().isoformat(timespec="seconds"),
+                  (time.perf_counter() - started) * 1000, detail))
+        finally:
+            conn.close()
+
+    def _raw_connection(self):
+        """Autocommit bağlantı (VACUUM işlem içinde çalışamaz)"""
+        return self.db.raw_connection(isolation_level=None, timeout=5)
+
+    def optimize(self):
+        started = time.perf_counter()
+        conn = self._raw_connection()
+        try:
+            conn.execute("PRAGMA optimize")
+        finally:
+            conn.close()
+        self._record("optimize", started)
+
+    def check_stale(self):
+        """Eski istatistikli tabloları bul (satır sayımı; analyze vadesinde)"""
+        conn = self._raw_connection()
+        try:
+            return self.stale_tables(conn)
+        finally:
+            conn.close()
+
+    def analyze(self, tables=None):
+        started = time.perf_counter()
+        conn = self._raw_connection()
+        try:
+            if tables:
+                for table in tables:
+                    conn.execute(f'ANALYZE "{table}"')
+            else:
+                conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        self._record("analyze", started, ", ".join(tables or []))
+
+    def incremental_vacuum(self, max_pages=None, stop_when_busy=True):
+        """Boş sayfaları adım adım geri ver; kullanıcı geri dönerse dur"""
+        started = time.perf_counter()
+        freed = 0
+        conn = self._raw_connection()
+        try:
+            while max_pages is None or freed < max_pages:
+                free = self._pragma(conn, "freelist_count")
+                if free == 0:
+                    break
+                step = min(free, VACUUM_STEP_PAGES)
+                # execute() pragmayı tek adım (1 sayfa) çalıştırır; executescript sonuna kadar
+                conn.executescript(f"PRAGMA incremental_vacuum({step});")
+                freed += step
+                if stop_when_busy and not self.is_idle():
+                    break
+        finally:
+            conn.close()
+        self._record("incremental_vacuum", started, f"{freed} sayfa")
+        return freed
+
+    def vacuum(self, incremental=True):
+        """Tam VACUUM; gerekirse auto_vacuum=INCREMENTAL'a geçiş (tek seferlik)"""
+        started = time.perf_counter()
+        conn = self._raw_connection()
+        try:
+            if incremental:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        self._record("vacuum", started)
+
+    def checkpoint(self):
+        started = time.perf_counter()
+        conn = self._raw_connection()
+        try:
+            result = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        finally:
+            conn.close()
+        self._record("checkpoint", started, f"{result[2]}/{result[1]} sayfa" if result else "")
+
+    def run_due(self, force=False):
+        """Vadesi gelen görevleri çalıştır (force: boşta beklemeden hepsini)"""
+        if not self._lock.acquire(blocking=False):
+            return []
+        try:
+            if not force and not self.is_idle():
+                return []
+
+            stats = self.stats(include_objects=False, include_stale=False)
+            last_runs = stats["last_runs"]
+            done = []
+
+            def due(task, every):
+                return force or self._due(last_runs, task, every)
+
+            # Parçalanma/ilk geçiş: tam VACUUM pahalı, sadece gerektiğinde
+            needs_conversion = stats["auto_vacuum"] != "incremental"
+            too_fragmented = stats["fragmentation"] > FULL_VACUUM_RATIO and stats["freelist_count"] >= MIN_FREE_PAGES
+            if (needs_conversion or too_fragmented) and due("vacuum", VACUUM_EVERY):
+                self.vacuum()
+                done.append("vacuum")
+            elif stats["freelist_count"] >= (1 if force else MIN_FREE_PAGES) and stats["auto_vacuum"] == "incremental":
+                self.incremental_vacuum(stop_when_busy=not force)
+                done.append("incremental_vacuum")
+
+            if due("analyze", ANALYZE_EVERY):
+                started = time.perf_counter()
+                stale = self.check_stale()
+                if stale:
+                    self.analyze(stale)
+                    done.append("analyze")
+                else:
+                    # Kontrol de kaydedilir: sayım ertesi güne kadar tekrarlanmaz
+                    self._record("analyze", started, "güncel")
+
+            if due("optimize", OPTIMIZE_EVERY):
+                self.optimize()
+                done.append("optimize")
+
+            if stats["journal_mode"] == "wal" and due("checkpoint", CHECKPOINT_EVERY):
+                self.checkpoint()
+                done.append("checkpoint")
+
+            if done:
+                print(f"[DB] Bakım tamamlandı: {', '.join(done)}")
+            return done
+
+        except sqlite3.OperationalError as e:
+            # Başka bir bağlantı kilitliyse sonraki boşta pencerede tekrar denenir
+            print(f"[WARN] Veritabanı bakımı ertelendi: {e}")
+            return []
+        finally:
+            self._lock.release()
+
+    # ========== ZAMANLAYICI ==========
+
+    def start(self, interval=CHECK_INTERVAL):
+        """Arka planda periyodik kontrol (daemon thread)"""
+        if self._running:
+            return
+        self._running = True
+
+        def loop():
+            while self._running:
+                for _ in range(int(interval)):
+                    if not self._running:
+                        return
+                    time.sleep(1)
+                try:
+                    self.run_due()
+                except Exception as e:
+                    print(f"Veritabanı bakım hatası: {e}")
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def stop(self):
+        self._running = False
@@ -8,9 +8,10 @@ import yfinance as yf
 class PortfolioMetrics:
     """Portföy metrikleri hesaplayıcı - Güvenli Versiyon"""
     
-    def __init__(self, portfolio, transactions):
+    def __init__(self, portfolio, transactions, price_store=None):
         self.portfolio = portfolio or []
         self.transactions = transactions or []
+        self.price_store = price_store
     
     def calculate_total_return(self):
         """Toplam getiri %"""
@@ -26,6 +27,15 @@ class PortfolioMetrics:
             print(f"Getiri hesaplama hatası: {e}")
             return 0
     
+    def _get_closes(self, symbol, days):
+        """Kapanış fiyatları - önce yerel daily_prices tablosu, yoksa ağ"""
+        if self.price_store:
+            _, closes = self.price_store.get_closes(symbol, days)
+            return closes
+        
+        hist = yf.Ticker(f"{symbol}.IS").history(period=f"{days}d")
+        return hist['Close'].dropna().values if not hist.empty else np.empty(0)
+    
     def calculate_daily_returns(self, days=30):
         """Günlük getiri serisini hesapla"""
         try:
@@ -33,16 +43,15 @@ class PortfolioMetrics:
             for stock in self.portfolio:
                 symbol = stock['sembol']
                 try:
-                    ticker = yf.Ticker(f"{symbol}.IS")
-                    hist = ticker.history(period=f"{days}d")
+                    closes = self._get_closes(symbol, days)
                     
-                    if not hist.empty:
-                        daily_return = hist['Close'].pct_change().dropna()
+                    if closes.size > 1:
+                        daily_return = closes[1:] / closes[:-1] - 1
                         weight = (stock['adet'] * stock.get('guncel_fiyat', stock['ort_maliyet']))
                         
                         returns.append({
                             'symbol': symbol,
-                            'returns': daily_return.values,
+                            'returns': daily_return,
                             'weight': weight
                         })
                 except Exception as stock_error:
@@ -0,0 +1,474 @@
+# utils/price_store.py
+
+"""
+Günlük fiyat deposu - daily_prices tablosu üzerinde NumPy tabanlı okuma/yazma
+
+Metrikler, grafikler, alarmlar ve korelasyon matrisi kapanış fiyatlarını
+buradan okur. Ağ (yfinance) yalnızca tabloda eksik kalan günler için çağrılır.
+
+Yahoo history() barları bölünmelere göre zaten düzeltilmiş gelir: bölünme
+çarpanı tekrar uygulanmaz. Sağlayıcı yeni bir bölünme bildirdiğinde
+(Stock Splits sütunu) o tarihten önce kaydedilmiş eski (düzeltilmemiş) barlar
+silinir ve bir sonraki okumada düzeltilmiş haliyle yeniden çekilir.
+
+Okumalar varsayılan olarak corporate_actions tablosundaki bedelli kayıtlarına
+göre düzeltilir; sağlayıcının aynı tarihte bölünme olarak işlediği bedelliler
+atlanır. Aynı aksiyonu birden çok kullanıcı farklı ex_date ile girmiş olabilir:
+ACTION_MERGE_DAYS içindeki aynı tip/oranlı kayıtlar tek aksiyon sayılır.
+Düzeltilmiş seri sembol başına bellekte tutulur; yeni gelen barlar seriye
+eklenir, seri yalnızca yeni aksiyon kaydedildiğinde baştan hesaplanır.
+"""
+
+import threading
+import time
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from quote_cache import to_ticker
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+FIELDS = ("open", "high", "low", "close", "volume")
+
+# Aynı sembol için ağdan tekrar veri istemeden önce beklenecek süre (saniye)
+REFRESH_INTERVAL = 900
+
+# Bu kadar gün içindeki aynı tip/oranlı aksiyon kayıtları tek aksiyondur
+ACTION_MERGE_DAYS = 30
+
+
+def to_day(value):
+    """date/datetime/Timestamp -> 1970'ten beri gün sayısı"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day):
+    """Gün sayısı -> date"""
+    return date.fromordinal(int(day) + EPOCH_ORDINAL)
+
+
+def today_day():
+    return date.today().toordinal() - EPOCH_ORDINAL
+
+
+def base_symbol(ticker):
+    """Yahoo ticker'ından uygulama sembolü (THYAO.IS -> THYAO)"""
+    return ticker[:-3] if ticker.endswith(".IS") else ticker
+
+
+class PriceStore:
+    """daily_prices tablosu için toplu yazma / aralık okuma API'si"""
+
+    def __init__(self, db):
+        self.db = db
+        self._symbol_ids = {}
+        self._last_fetch = {}
+        self._lock = threading.Lock()
+        # ticker -> düzeltilmiş tam seri + aksiyon imzası
+        self._adjusted = {}
+        # Geri yüklenen dosyada sembol id'leri ve seriler farklı olabilir
+        db.add_cache_listener(self.reset)
+
+    def reset(self):
+        """Bellekteki sembol id'lerini, çekme zamanlarını ve serileri bırak"""
+        with self._lock:
+            self._symbol_ids.clear()
+            self._last_fetch.clear()
+            self._adjusted.clear()
+
+    # ========== SEMBOL SÖZLÜĞÜ ==========
+
+    def symbol_id(self, symbol, create=True):
+        """Sembolün tamsayı id'sini getir (yoksa oluştur)"""
+        ticker = to_ticker(symbol)
+        cached = self._symbol_ids.get(ticker)
+        if cached is not None:
+            return cached
+
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM price_symbols WHERE symbol = ?", (ticker,))
+            row = cursor.fetchone()
+            if row:
+                symbol_id = row[0]
+            elif create:
+                cursor.execute("INSERT INTO price_symbols (symbol) VALUES (?)", (ticker,))
+                symbol_id = cursor.lastrowid
+            else:
+                return None
+
+        self._symbol_ids[ticker] = symbol_id
+        return symbol_id
+
+    # ========== YAZMA ==========
+
+    def upsert(self, symbol, days, close, open=None, high=None, low=None, volume=None):
+        """Dizi olarak verilen günlük barları toplu ekle/güncelle"""
+        days = np.asarray(days, dtype=np.int64)
+        if days.size == 0:
+            return 0
+
+        n = days.size
+        missing = np.full(n, np.nan)
+        columns = [
+            np.asarray(col, dtype=np.float64) if col is not None else missing
+            for col in (open, high, low, close, volume)
+        ]
+
+        symbol_id = self.symbol_id(symbol)
+        rows = [
+            (symbol_id, int(d), *(None if np.isnan(v) else float(v) for v in values))
+            for d, *values in zip(days, *columns)
+        ]
+
+        with self.db.get_connection() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO daily_prices
+                (symbol_id, day, open, high, low, close, volume)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+        # Önbellekteki düzeltilmiş seriye yeni barları ekle (yeniden hesaplamadan)
+        self._merge_adjusted(to_ticker(symbol), days, dict(zip(FIELDS, columns)))
+        return n
+
+    def upsert_frame(self, symbol, hist):
+        """yfinance history() DataFrame'ini tabloya yaz"""
+        if hist is None or hist.empty:
+            return 0
+        index = pd.DatetimeIndex(hist.index)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        days = (index.normalize() - pd.Timestamp("1970-01-01")).days.values
+        if "Stock Splits" in hist:
+            ratios = np.nan_to_num(np.asarray(hist["Stock Splits"].values, dtype=np.float64))
+            hits = np.flatnonzero(ratios > 0)
+            if hits.size:
+                self._record_provider_splits(symbol, days[hits], ratios[hits], int(days.min()))
+        return self.upsert(
+            symbol, days, hist["Close"].values,
+            open=hist["Open"].values if "Open" in hist else None,
+            high=hist["High"].values if "High" in hist else None,
+            low=hist["Low"].values if "Low" in hist else None,
+            volume=hist["Volume"].values if "Volume" in hist else None,
+        )
+
+    def _record_provider_splits(self, symbol, split_days, ratios, frame_start):
+        """
+        Sağlayıcının bildirdiği bölünmeleri kaydet
+
+        Yeni bir bölünme, ondan önce kaydedilmiş barların düzeltilmemiş olduğu
+        anlamına gelir: çerçeveden önceki barlar silinir, ensure_history eksik
+        kalan geçmişi düzeltilmiş haliyle yeniden çeker.
+        """
+        symbol_id = self.symbol_id(symbol)
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            added = 0
+            for day, ratio in zip(split_days, ratios):
+                cursor.execute("INSERT OR IGNORE INTO price_splits (symbol_id, day, ratio) VALUES (?, ?, ?)",
+                               (symbol_id, int(day), float(ratio)))
+                added += cursor.rowcount
+            if added:
+                cursor.execute("DELETE FROM daily_prices WHERE symbol_id = ? AND day < ?",
+                               (symbol_id, frame_start))
+            conn.commit()
+        if added:
+            ticker = to_ticker(symbol)
+            with self._lock:
+                for key in [k for k in self._last_fetch if k[0] == ticker]:
+                    del self._last_fetch[key]
+                self._adjusted.pop(ticker, None)
+
+    # ========== OKUMA ==========
+
+    def read_range(self, symbol, start_day=None, end_day=None):
+        """[start_day, end_day] aralığını NumPy dizileri olarak getir"""
+        result = {"day": np.empty(0, dtype=np.int64)}
+        result.update({field: np.empty(0) for field in FIELDS})
+
+        symbol_id = self.symbol_id(symbol, create=False)
+        if symbol_id is None:
+            return result
+
+        start_day = -(1 << 31) if start_day is None else start_day
+        end_day = (1 << 31) if end_day is None else end_day
+
+        with self.db.get_connection() as conn:
+            rows = conn.execute('''
+                SELECT day, open, high, low, close, volume
+                FROM daily_prices
+                WHERE symbol_id = ? AND day BETWEEN ? AND ?
+                ORDER BY day
+            ''', (symbol_id, start_day, end_day)).fetchall()
+
+        if not rows:
+            return result
+
+        # None -> NaN; tek bir float matrisine alıp sütunlara böl
+        data = np.array([tuple(r) for r in rows], dtype=np.float64)
+        result["day"] = data[:, 0].astype(np.int64)
+        for i, field in enumerate(FIELDS, start=1):
+            result[field] = data[:, i]
+        return result
+
+    # ========== ŞİRKET AKSİYONU DÜZELTMESİ ==========
+
+    def _action_rows(self, ticker):
+        """Sembolün fiyata uygulanacak aksiyonları (kullanıcılar arasında tekil)"""
+        symbol_id = self.symbol_id(ticker, create=False)
+        with self.db.get_connection() as conn:
+            # Bölünmeler sağlayıcı barlarında zaten var
+            rows = conn.execute('''
+                SELECT tip, oran, fiyat, ex_date FROM corporate_actions
+                WHERE sembol IN (?, ?) AND oran > 0 AND tip != 'split'
+                ORDER BY ex_date
+            ''', (base_symbol(ticker), ticker)).fetchall()
+            provider_days = [row[0] for row in conn.execute(
+                "SELECT day FROM price_splits WHERE symbol_id = ?", (symbol_id,))]
+        return self._canonical_actions(rows, provider_days)
+
+    @staticmethod
+    def _canonical_actions(rows, provider_days=()):
+        """
+        Aynı aksiyonun kullanıcı başına kayıtlarını tek satıra indir
+
+        Aynı tip/oran/fiyatlı ve ACTION_MERGE_DAYS içinde kalan kayıtlar bir
+        kümedir; ex_date en çok girilen tarih (eşitlikte en erken) olur.
+        Sağlayıcının bu pencerede bölünme bildirdiği aksiyonlar atlanır.
+        """
+        clusters = []
+        for tip, oran, fiyat, ex_date in rows:
+            day = to_day(date.fromisoformat(str(ex_date)[:10]))
+            for cluster in clusters:
+                if cluster["key"] == (tip, oran, fiyat) and day - cluster["first"] <= ACTION_MERGE_DAYS:
+                    cluster["days"].append(day)
+                    break
+            else:
+                clusters.append({"key": (tip, oran, fiyat), "first": day, "days": [day]})
+
+        actions = []
+        for cluster in clusters:
+            days = cluster["days"]
+            day = min(set(days), key=lambda d: (-days.count(d), d))
+            if any(abs(day - p) <= ACTION_MERGE_DAYS for p in provider_days):
+                continue
+            actions.append((*cluster["key"], from_day(day).isoformat()))
+        actions.sort(key=lambda a: a[3])
+        return actions
+
+    def _action_token(self, ticker):
+        """Aksiyon imzası: değişmedikçe önbellekteki seri geçerli"""
+        symbol_id = self.symbol_id(ticker, create=False)
+        with self.db.get_connection() as conn:
+            return tuple(conn.execute('''
+                SELECT COUNT(*), MAX(id),
+                       (SELECT COUNT(*) FROM price_splits WHERE symbol_id = ?)
+                FROM corporate_actions WHERE sembol IN (?, ?)
+            ''', (symbol_id, base_symbol(ticker), ticker)).fetchone())
+
+    @staticmethod
+    def _factor_schedule(actions, days, close):
+        """
+        Aksiyonlardan kümülatif fiyat/hacim çarpanları
+
+        Returns:
+            (ex_days, price_factor, volume_factor): gün d için çarpan
+            factor[searchsorted(ex_days, d, 'right')]; son eleman 1
+        """
+        ex_days = np.array([to_day(date.fromisoformat(str(a[3])[:10])) for a in actions], dtype=np.int64)
+        price = np.ones(len(actions))
+        volume = np.ones(len(actions))
+        for i, (tip, oran, fiyat, _) in enumerate(actions):
+            if tip == "split":
+                price[i] = 1.0 / oran
+                volume[i] = oran
+            elif tip == "rights" and fiyat is not None:
+                # Teorik bedelli fiyatı / ex_date öncesi son kapanış
+                idx = np.searchsorted(days, ex_days[i]) - 1
+                if idx >= 0 and close[idx] > 0:
+                    new_per_old = 1.0 / oran
+                    price[i] = (close[idx] + new_per_old * fiyat) / ((1 + new_per_old) * close[idx])
+
+        # ex_date'ten önceki günlere o tarihten sonraki tüm aksiyonlar uygulanır
+        price_factor = np.append(np.cumprod(price[::-1])[::-1], 1.0)
+        volume_factor = np.append(np.cumprod(volume[::-1])[::-1], 1.0)
+        return ex_days, price_factor, volume_factor
+
+    @staticmethod
+    def _adjust(entry, days, columns):
+        idx = np.searchsorted(entry["ex_days"], days, side="right")
+        price_factor = entry["price_factor"][idx]
+        adjusted = {field: columns[field] * price_factor for field in FIELDS if field != "volume"}
+        adjusted["volume"] = columns["volume"] * entry["volume_factor"][idx]
+        return adjusted
+
+    def _adjusted_series(self, symbol):
+        """Sembolün düzeltilmiş tam serisi (önbellekten)"""
+        ticker = to_ticker(symbol)
+        token = self._action_token(ticker)
+        entry = self._adjusted.get(ticker)
+        if entry is not None and entry["token"] == token:
+            return entry
+
+        raw = self.read_range(symbol)
+        actions = self._action_rows(ticker)
+        ex_days, price_factor, volume_factor = self._factor_schedule(actions, raw["day"], raw["close"])
+        entry = {"token": token, "ex_days": ex_days, "price_factor": price_factor,
+                 "volume_factor": volume_factor, "day": raw["day"]}
+        entry.update(self._adjust(entry, raw["day"], raw))
+        self._adjusted[ticker] = entry
+        return entry
+
+    def _merge_adjusted(self, ticker, days, columns):
+        entry = self._adjusted.get(ticker)
+        if entry is None:
+            return
+        if days.size and entry["ex_days"].size and days.min() < entry["ex_days"][-1]:
+            # Bedelli çarpanı ex_date öncesi kapanışa bağlı: eski barlar geldiyse yeniden kur
+            self._adjusted.pop(ticker, None)
+            return
+
+        adjusted = self._adjust(entry, days, columns)
+        keep = ~np.isin(entry["day"], days)
+        merged_days = np.concatenate([entry["day"][keep], days])
+        order = np.argsort(merged_days, kind="stable")
+        entry["day"] = merged_days[order]
+        for field in FIELDS:
+            entry[field] = np.concatenate([entry[field][keep], adjusted[field]])[order]
+
+    def invalidate_adjustments(self, symbol=None):
+        """Düzeltilmiş seri önbelleğini temizle (tek sembol veya tümü)"""
+        if symbol is None:
+            self._adjusted.clear()
+        else:
+            self._adjusted.pop(to_ticker(symbol), None)
+
+    def read_adjusted(self, symbol, start_day=None, end_day=None):
+        """read_range ile aynı biçimde, aksiyonlara göre düzeltilmiş aralık"""
+        entry = self._adjusted_series(symbol)
+        lo = 0 if start_day is None else np.searchsorted(entry["day"], start_day, side="left")
+        hi = entry["day"].size if end_day is None else np.searchsorted(entry["day"], end_day, side="right")
+        result = {"day": entry["day"][lo:hi]}
+        result.update({field: entry[field][lo:hi] for field in FIELDS})
+        return result
+
+    def last_day(self, symbol):
+        """Tablodaki en son gün (yoksa None)"""
+        return self._day_bounds(symbol)[1]
+
+    def _day_bounds(self, symbol):
+        symbol_id = self.symbol_id(symbol, create=False)
+        if symbol_id is None:
+            return None, None
+        with self.db.get_connection() as conn:
+            row = conn.execute(
+                "SELECT MIN(day), MAX(day) FROM daily_prices WHERE symbol_id = ?", (symbol_id,)
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, None)
+
+    # ========== AĞDAN TAMAMLAMA ==========
+
+    def _fetch(self, symbol, start_day, end_day=None):
+        """Eksik aralığı yfinance'den çekip tabloya yaz"""
+        import yfinance as yf
+
+        start = from_day(start_day)
+        end = from_day((end_day if end_day is not None else today_day()) + 1)
+        try:
+            hist = yf.Ticker(to_ticker(symbol)).history(start=start, end=end)
+            return self.upsert_frame(symbol, hist)
+        except Exception as e:
+            print(f"Fiyat geçmişi alınamadı ({symbol}): {e}")
+            return 0
+
+    def ensure_history(self, symbol, days, force=False):
+        """Son `days` günü tabloda bulundur; sadece eksik uçları ağdan çek"""
+        key = (to_ticker(symbol), days)
+        now = time.time()
+        with self._lock:
+            if not force and now - self._last_fetch.get(key, 0) < REFRESH_INTERVAL:
+                return
+            self._last_fetch[key] = now
+
+        today = today_day()
+        start = today - days
+        first, last = self._day_bounds(symbol)
+
+        if first is None:
+            self._fetch(symbol, start)
+            return
+
+        # Geriye doğru eksik (hisse o tarihte yoksa yfinance boş döner)
+        if first > start + 5:
+            self._fetch(symbol, start, first - 1)
+
+        # İleriye doğru eksik; bugünün barı gün içinde güncellendiği için tekrar yazılır
+        if last < today:
+            self._fetch(symbol, last)
+
+    def _read(self, symbol, start_day, adjusted):
+        if adjusted:
+            return self.read_adjusted(symbol, start_day, None)
+        return self.read_range(symbol, start_day, None)
+
+    def get_closes(self, symbol, days, refresh=True, adjusted=True):
+        """Son `days` günün (gün, kapanış) dizileri"""
+        if refresh:
+            self.ensure_history(symbol, days)
+        data = self._read(symbol, today_day() - days, adjusted)
+        mask = ~np.isnan(data["close"])
+        return data["day"][mask], data["close"][mask]
+
+    def get_close_matrix(self, symbols, days, refresh=True, adjusted=True):
+        """Sembolleri ortak gün eksenine hizalanmış kapanış matrisi (gün x sembol, eksik=NaN)"""
+        series = [self.get_closes(symbol, days, refresh, adjusted) for symbol in symbols]
+        all_days = np.unique(np.concatenate([d for d, _ in series])) if series else np.empty(0, np.int64)
+
+        matrix = np.full((all_days.size, len(symbols)), np.nan)
+        for j, (d, closes) in enumerate(series):
+            if d.size:
+                matrix[np.searchsorted(all_days, d), j] = closes
+        return all_days, matrix
+
+    def get_frame(self, symbol, days, refresh=True, adjusted=True):
+        """Grafikler için yfinance history() biçiminde DataFrame"""
+        if refresh:
+            self.ensure_history(symbol, days)
+        data = self._read(symbol, today_day() - days, adjusted)
+        index = pd.to_datetime(data["day"], unit="D")
+        return pd.DataFrame({
+            "Open": data["open"],
+            "High": data["high"],
+            "Low": data["low"],
+            "Close": data["close"],
+            "Volume": data["volume"],
+        }, index=index)
+
+    def refresh_latest(self, symbols):
+        """Alarmlar için: bugünün barını güncelle ve son kapanışları döndür"""
+        prices = {}
+        today = today_day()
+        for symbol in symbols:
+            _, last = self._day_bounds(symbol)
+            self._fetch(symbol, last if last is not None else today - 7)
+            d, closes = self.get_closes(symbol, 14, refresh=False)
+            if closes.size:
+                prices[symbol] = float(closes[-1])
+        return prices
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_price_store(db):
+    """Veritabanı başına tek PriceStore (sembol id önbelleği paylaşılır)"""
+    with _stores_lock:
+        store = _stores.get(db.db_name)
+        if store is None:
+            store = _stores[db.db_name] = PriceStore(db)
+        return store
@@ -0,0 +1,204 @@
+# utils/symbol_index.py
+
+"""
+Sembol evreni indeksi - tuş vuruşu hızında otomatik tamamlama
+
+BIST hisseleri, TEFAS fonları, kripto id'leri ve emtialar paketle gelen
+symbols.json dosyasından bir kez yüklenir. Arama anahtarları (kod ve ad
+kelimeleri) Türkçe karakterden arındırılıp sıralı bir listede tutulur:
+önek araması iki bisect ile, bulanık arama (1 harf hata) önceden
+hesaplanmış silme komşuluğu sözlüğüyle yapılır - ağ ve döngü yok.
+"""
+
+import os
+import json
+import threading
+from bisect import bisect_left
+
+SYMBOLS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "symbols.json")
+
+KIND_BIST = "bist"
+KIND_TEFAS = "tefas"
+KIND_CRYPTO = "crypto"
+KIND_COMMODITY = "commodity"
+
+# Eşit puanlı sonuçlarda sıralama önceliği
+KIND_ORDER = {KIND_BIST: 0, KIND_TEFAS: 1, KIND_CRYPTO: 2, KIND_COMMODITY: 3}
+
+# Bulanık aramanın devreye girdiği en kısa sorgu / indekslenen en uzun önek
+FUZZY_MIN_LEN = 4
+FUZZY_MAX_LEN = 10
+
+_FOLD_MAP = str.maketrans("çğıöşüÇĞİÖŞÜâîûÂÎÛ", "cgiosuCGIOSUaiuAIU")
+
+
+def fold(text):
+    """Türkçe karakterleri ASCII'ye indir ve büyük harf yap (İ/ı/I farkı kalmaz)"""
+    return text.translate(_FOLD_MAP).upper().strip()
+
+
+def _deletions(key):
+    """Anahtarın tek harf silinmiş varyantları"""
+    return {key[:i] + key[i + 1:] for i in range(len(key))}
+
+
+class SymbolIndex:
+    """Önek + bulanık arama yapan bellek içi sembol indeksi"""
+
+    def __init__(self, entries=()):
+        self.entries = []
+        self._by_code = {}
+        self._keys = []
+        self._key_refs = []
+        self._fuzzy = {}
+        self.add(entries)
+
+    @classmethod
+    def from_file(cls, path=SYMBOLS_FILE):
+        """symbols.json'u yükle: {"bist": [[kod, ad], ...], "crypto": [[id, ad, sembol], ...]}"""
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        entries = []
+        for kind in KIND_ORDER:
+            for item in data.get(kind, []):
+                entries.append({
+                    "kod": item[0],
+                    "ad": item[1],
+                    "tur": kind,
+                    "ticker": item[2] if len(item) > 2 else None,
+                })
+        return cls(entries)
+
+    # ========== İNDEKSLEME ==========
+
+    def add(self, entries):
+        """Yeni semboller ekle (örn. portföydeki veya API'den gelen) ve indeksi yeniden kur"""
+        added = False
+        for entry in entries:
+            key = (fold(entry["kod"]), entry.get("tur"))
+            if key in self._by_code:
+                continue
+            self._by_code[key] = len(self.entries)
+            self.entries.append(entry)
+            added = True
+        if added:
+            self._build()
+
+    def _entry_keys(self, entry):
+        """Kod, kripto sembolü ve ad kelimeleri (0 = kod, 1 = ad)"""
+        keys = [(fold(entry["kod"]), 0)]
+        if entry.get("ticker") and entry["tur"] == KIND_CRYPTO:
+            keys.append((fold(entry["ticker"]), 0))
+        for word in entry.get("ad", "").replace("-", " ").split():
+            word = fold(word)
+            if len(word) >= 2:
+                keys.append((word, 1))
+        return keys
+
+    def _build(self):
+        pairs = []
+        fuzzy = {}
+        for i, entry in enumerate(self.entries):
+            for key, rank in self._entry_keys(entry):
+                pairs.append((key, rank, i))
+
+                # Her önek ve tek harf silinmiş hali -> kayıt (1 harf hata toleransı)
+                for length in range(FUZZY_MIN_LEN - 1, min(len(key), FUZZY_MAX_LEN) + 1):
+                    prefix = key[:length]
+                    for variant in _deletions(prefix) | {prefix}:
+                        fuzzy.setdefault(variant, set()).add(i)
+
+        pairs.sort()
+        self._keys = [key for key, _, _ in pairs]
+        self._key_refs = [(rank, i) for _, rank, i in pairs]
+        self._fuzzy = fuzzy
+
+    # ========== ARAMA ==========
+
+    def _score(self, query, rank, i):
+        entry = self.entries[i]
+        code = fold(entry["kod"])
+        exact = 0 if query in (code, fold(entry.get("ticker") or "")) else 1
+        return (exact, rank, KIND_ORDER.get(entry["tur"], 9), len(code), code)
+
+    def search(self, query, limit=8, kinds=None, fuzzy=True):
+        """
+        Önek araması; yetersizse bulanık eşleşmelerle tamamla
+
+        Args:
+            query: kullanıcının yazdığı metin ("garan", "türk hava", "btc")
+            limit: en fazla sonuç
+            kinds: sadece bu türler (örn. ("bist",))
+            fuzzy: 1 harf hatalı eşleşmeleri de ekle
+
+        Returns:
+            list: {"kod", "ad", "tur", "ticker"} sözlükleri
+        """
+        words = fold(query).split()
+        if not words:
+            return []
+
+        # Çok kelimede ilk kelimeyle ara, diğer kelimeleri adda filtrele
+        head, rest = words[0], words[1:]
+        lo = bisect_left(self._keys, head)
+        hi = bisect_left(self._keys, head + "\uffff")
+
+        best = {}
+        for rank, i in self._key_refs[lo:hi]:
+            if kinds and self.entries[i]["tur"] not in kinds:
+                continue
+            score = self._score(head, rank, i)
+            if i not in best or score < best[i]:
+                best[i] = score
+
+        if fuzzy and len(best) < limit and len(head) >= FUZZY_MIN_LEN:
+            candidates = set()
+            for variant in _deletions(head) | {head}:
+                candidates |= self._fuzzy.get(variant, set())
+            for i in candidates:
+                if i in best or (kinds and self.entries[i]["tur"] not in kinds):
+                    continue
+                # Bulanık sonuçlar her zaman önek eşleşmelerinin ardından gelir
+                best[i] = (2,) + self._score(head, 1, i)[1:]
+
+        if rest:
+            best = {
+                i: score for i, score in best.items()
+                if all(any(fold(w).startswith(r) for w in self.entries[i]["ad"].split()) for r in rest)
+            }
+
+        ordered = sorted(best, key=best.get)[:limit]
+        return [self.entries[i] for i in ordered]
+
+    def lookup(self, code, kind=None):
+        """Kodun tam karşılığı (yoksa None)"""
+        code = fold(code)
+        if kind is not None:
+            i = self._by_code.get((code, kind))
+            return self.entries[i] if i is not None else None
+        for kind in KIND_ORDER:
+            i = self._by_code.get((code, kind))
+            if i is not None:
+                return self.entries[i]
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_symbol_index():
+    """Uygulama genelinde tek indeks (ilk çağrıda dosyadan yüklenir)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = SymbolIndex.from_file()
+            except (OSError, ValueError) as e:
+                print(f"[WARN] Sembol listesi yüklenemedi: {e}")
+                _index = SymbolIndex()
+        return _index